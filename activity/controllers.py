@@ -11,6 +11,7 @@ from .models import ActivityComment, ActivityNoticeSeed, ActivityManager, Activi
     NOTICE_FRIEND_ACTIVITY_POSTS, \
     NOTICE_FRIEND_ENDORSEMENTS, NOTICE_FRIEND_ENDORSEMENTS_SEED, \
     NOTICE_VOTER_DAILY_SUMMARY, NOTICE_VOTER_DAILY_SUMMARY_SEED
+from .controllers_daily_summary import VoterDailySummaryBuilder
 from config.base import get_environment_variable
 from django.utils.timezone import now
 from friend.models import FriendManager
@@ -728,134 +729,15 @@ def assemble_voter_daily_summary(
         assemble_activity_start_date=None,
         recipient_voter_we_vote_id='',
         number_of_friends_to_display=3):
-    status = ''
-    success = True
-    activity_manager = ActivityManager()
-    friend_manager = FriendManager()
-    friend_activity_dict_list = []
-    reaction_manager = ReactionManager()
-    subject = 'Discussion(s) have been added'
-    introduction_line = 'At least one friend has added a discussion.'
-
-    # Collect all of the data about activity in this voter's network since the last daily_summary
-    current_friends_results = friend_manager.retrieve_friends_we_vote_id_list(recipient_voter_we_vote_id)
-    success = current_friends_results['success']
-    status += current_friends_results['status']
-    if not current_friends_results['friends_we_vote_id_list_found']:
-        status += "ASSEMBLE_VOTER_DAILY_SUMMARY_NO_FRIENDS_FOUND "
-        results = {
-            'success':                      success,
-            'status':                       status,
-            'friend_activity_dict_list':    friend_activity_dict_list,
-            'introduction_line':            introduction_line,
-            'subject':                      subject,
-        }
-        return results
-    else:
-        friends_we_vote_id_list = current_friends_results['friends_we_vote_id_list']
-
-    # ##########################
-    # Each activity post, with name, first line, # of comments and # of likes
-    highest_priority_by_friend_we_vote_id = {}
-    raw_list_by_friend_we_vote_id = {}
-    post_results = activity_manager.retrieve_activity_post_list(
-        speaker_voter_we_vote_id_list=friends_we_vote_id_list,
-        since_date=assemble_activity_start_date)
-    if post_results['success']:
-        friends_post_list = post_results['activity_post_list']
-        for one_post in friends_post_list:
-            number_of_comments = activity_manager.fetch_number_of_comments(one_post.we_vote_id)
-            number_of_likes = reaction_manager.fetch_number_of_likes(one_post.we_vote_id)
-            # Higher priority score makes it more likely this post is at top of list
-            priority_score = 0
-            if not one_post.speaker_name or one_post.speaker_name.startswith('Voter-'):
-                priority_score -= 20
-            if one_post.speaker_profile_image_url_medium and len(one_post.speaker_profile_image_url_medium) > 1:
-                priority_score += 10
-            if number_of_comments > 0:
-                priority_score += number_of_comments * 3
-            if number_of_likes > 0:
-                priority_score += number_of_likes * 1
-            highlight_item_dict = {
-                # 'date_created':                     one_post.date_created.strftime(DATE_FORMAT_YMD_HMS),
-                'number_of_comments':               number_of_comments,
-                'number_of_likes':                  number_of_likes,
-                'priority_score':                   priority_score,
-                'speaker_name':                     one_post.speaker_name,
-                'speaker_profile_image_url_medium': one_post.speaker_profile_image_url_medium,
-                'speaker_voter_we_vote_id':         one_post.speaker_voter_we_vote_id,
-                'statement_text':                   one_post.statement_text,
-                'we_vote_id':                       one_post.we_vote_id,
-            }
-            if one_post.speaker_voter_we_vote_id in highest_priority_by_friend_we_vote_id and \
-                    highest_priority_by_friend_we_vote_id[one_post.speaker_voter_we_vote_id] > priority_score:
-                # Do not add this highlight_item_dict because the highlight item captured for this person
-                #  already has a higher priority_score
-                pass
-            else:
-                raw_list_by_friend_we_vote_id[one_post.speaker_voter_we_vote_id] = highlight_item_dict
-                highest_priority_by_friend_we_vote_id[one_post.speaker_voter_we_vote_id] = priority_score
-
-    # ##########################
-    # Endorsements made
-
-    # ##########################
-    # Now that we know raw_list_by_friend_we_vote_id only has one highlight_item_dict per friend,
-    #  drop them into simple friend_activity_dict_list so we can sort them by priority_score
-    friend_activity_dict_list = raw_list_by_friend_we_vote_id.values()
-    sorted(friend_activity_dict_list, key=lambda item: item['priority_score'], reverse=True)
-
-    friend_name_list_in_order = []
-    names_stored = 0
-    for one_activity_dict in friend_activity_dict_list:
-        if names_stored < number_of_friends_to_display:
-            friend_name_list_in_order.append(one_activity_dict['speaker_name'])
-            names_stored += 1
-
-    if len(friend_name_list_in_order) > 0:
-        introduction_line = ''
-        subject = ''
-        if len(friend_name_list_in_order) == 1:
-            subject += friend_name_list_in_order[0]
-            subject += " added a discussion"
-
-            introduction_line += "Your friend "
-            introduction_line += friend_name_list_in_order[0]
-            introduction_line += " has added one or more discussion."
-        elif len(friend_name_list_in_order) == 2:
-            subject += friend_name_list_in_order[0]
-            subject += " and "
-            subject += friend_name_list_in_order[1]
-            subject += " added discussions"
-
-            introduction_line += "Your friends "
-            introduction_line += friend_name_list_in_order[0]
-            introduction_line += " and "
-            introduction_line += friend_name_list_in_order[1]
-            introduction_line += " have added discussions."
-        elif len(friend_name_list_in_order) >= 3:
-            subject += friend_name_list_in_order[0]
-            subject += ", "
-            subject += friend_name_list_in_order[1]
-            subject += " and "
-            subject += friend_name_list_in_order[2]
-            subject += " added discussions"
-
-            introduction_line += "Your friends "
-            introduction_line += friend_name_list_in_order[0]
-            introduction_line += ", "
-            introduction_line += friend_name_list_in_order[1]
-            introduction_line += " and "
-            introduction_line += friend_name_list_in_order[2]
-            introduction_line += " have added discussions."
-    results = {
-        'success':                      success,
-        'status':                       status,
-        'friend_activity_dict_list':    friend_activity_dict_list,
-        'introduction_line':            introduction_line,
-        'subject':                      subject,
-    }
-    return results
+    """
+    Assemble the daily summary for one voter. To send summaries to many voters, use one VoterDailySummaryBuilder
+    for all of them, so each friend's posts are only counted once.
+    """
+    voter_daily_summary_builder = VoterDailySummaryBuilder(
+        assemble_activity_start_date=assemble_activity_start_date,
+        number_of_friends_to_display=number_of_friends_to_display)
+    return voter_daily_summary_builder.assemble_voter_daily_summary(
+        recipient_voter_we_vote_id=recipient_voter_we_vote_id)
 
 
 def notice_voter_daily_summary_send(  # NOTICE_VOTER_DAILY_SUMMARY
@@ -1167,6 +1049,18 @@ def process_activity_notice_seeds_triggered_by_batch_process():
             continue_retrieving_to_be_added_to_voter_summary = False
 
     # Send email notifications (notices_to_be_scheduled=True)
+    # All of the daily summaries waiting to go out share one builder, so each friend's posts are only counted once
+    voter_daily_summary_builder = VoterDailySummaryBuilder(
+        assemble_activity_start_date=now() - timedelta(hours=24))
+    try:
+        queryset = ActivityNoticeSeed.objects.using('readonly').filter(
+            activity_notices_scheduled=False,
+            deleted=False,
+            kind_of_seed=NOTICE_VOTER_DAILY_SUMMARY_SEED)
+        voter_daily_summary_builder.load_recipients(
+            list(queryset.values_list('recipient_voter_we_vote_id', flat=True)[:1000]))
+    except Exception as e:
+        status += "VOTER_DAILY_SUMMARY_BUILDER_LOAD_FAILED: " + str(e) + " "
     continue_retrieving_notices_to_be_scheduled = True
     activity_notice_seed_id_already_reviewed_list = []  # Reset
     safety_valve_count = 0
@@ -1185,19 +1079,23 @@ def process_activity_notice_seeds_triggered_by_batch_process():
             activity_notice_seed = results['activity_notice_seed']
             activity_notice_seed_id_already_reviewed_list.append(activity_notice_seed.id)
             # activity_notice_seed_count += 1
-            schedule_results = schedule_activity_notices_from_seed(activity_notice_seed)
+            schedule_results = schedule_activity_notices_from_seed(
+                activity_notice_seed, voter_daily_summary_builder=voter_daily_summary_builder)
             # activity_notice_seed.activity_notices_scheduled = True  # Marked in function immediately above
             # if not schedule_results['success']:
             status += schedule_results['status']
             # activity_notice_count += create_results['activity_notice_count']
         else:
             continue_retrieving_notices_to_be_scheduled = False
+    if positive_value_exists(voter_daily_summary_builder.metrics['recipients_assembled']):
+        status += voter_daily_summary_builder.generate_metrics_status()
 
     results = {
         'success':                      success,
         'status':                       status,
         'activity_notice_seed_count':   activity_notice_seed_count,
         'activity_notice_count':        activity_notice_count,
+        'voter_daily_summary_metrics':  voter_daily_summary_builder.fetch_metrics(),
     }
     return results
 
@@ -1708,7 +1606,7 @@ def update_or_create_voter_daily_summary_seeds_from_seed(activity_notice_seed):
     return results
 
 
-def schedule_activity_notices_from_seed(activity_notice_seed):
+def schedule_activity_notices_from_seed(activity_notice_seed, voter_daily_summary_builder=None):
     status = ''
     success = True
     activity_notice_count = 0
@@ -2106,13 +2004,12 @@ def schedule_activity_notices_from_seed(activity_notice_seed):
                 status += "FAILED_SAVING_NOTICE_CAMPAIGNX_SUPER_SHARE_ITEM_SEED_AS_SENT: " + str(e) + " "
                 success = False
     elif activity_notice_seed.kind_of_seed == NOTICE_VOTER_DAILY_SUMMARY_SEED:
-        # Make this either when the last SEED was created OR 24 hours ago
-        assemble_activity_start_date = now() - timedelta(hours=24)
-
-        assemble_results = assemble_voter_daily_summary(
-            assemble_activity_start_date=assemble_activity_start_date,
-            recipient_voter_we_vote_id=activity_notice_seed.recipient_voter_we_vote_id,
-        )
+        if voter_daily_summary_builder is None:
+            # Make this either when the last SEED was created OR 24 hours ago
+            voter_daily_summary_builder = VoterDailySummaryBuilder(
+                assemble_activity_start_date=now() - timedelta(hours=24))
+        assemble_results = voter_daily_summary_builder.assemble_voter_daily_summary(
+            recipient_voter_we_vote_id=activity_notice_seed.recipient_voter_we_vote_id)
 
         send_results = notice_voter_daily_summary_send(
             recipient_voter_we_vote_id=activity_notice_seed.recipient_voter_we_vote_id,
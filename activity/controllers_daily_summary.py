@@ -0,0 +1,229 @@
+# activity/controllers_daily_summary.py
+# Brought to you by We Vote. Be good.
+# -*- coding: UTF-8 -*-
+
+import time
+from contextlib import ExitStack, contextmanager
+from django.db import connections
+from django.db.models import Count, Q
+from friend.models import CurrentFriend
+from reaction.models import ReactionLike
+from .models import ActivityComment, ActivityPost
+import wevote_functions.admin
+from wevote_functions.functions import positive_value_exists
+
+logger = wevote_functions.admin.get_logger(__name__)
+
+DAILY_SUMMARY_QUERY_CHUNK_SIZE = 1000
+# Like retrieve_activity_post_list, we only look at the most recent posts, but we limit per friend
+DAILY_SUMMARY_MAXIMUM_POSTS_PER_SPEAKER = 200
+
+
+def generate_voter_daily_summary_subject_and_introduction(friend_name_list_in_order):
+    subject = 'Discussion(s) have been added'
+    introduction_line = 'At least one friend has added a discussion.'
+    if len(friend_name_list_in_order) == 1:
+        subject = friend_name_list_in_order[0] + " added a discussion"
+        introduction_line = "Your friend " + friend_name_list_in_order[0] + " has added one or more discussion."
+    elif len(friend_name_list_in_order) == 2:
+        subject = friend_name_list_in_order[0] + " and " + friend_name_list_in_order[1] + " added discussions"
+        introduction_line = "Your friends " + friend_name_list_in_order[0] + " and " + friend_name_list_in_order[1] + \
+            " have added discussions."
+    elif len(friend_name_list_in_order) >= 3:
+        friend_names = friend_name_list_in_order[0] + ", " + friend_name_list_in_order[1] + " and " + \
+            friend_name_list_in_order[2]
+        subject = friend_names + " added discussions"
+        introduction_line = "Your friends " + friend_names + " have added discussions."
+    return subject, introduction_line
+
+
+def generate_activity_post_highlight(one_post, number_of_comments, number_of_likes):
+    # Higher priority score makes it more likely this post is at top of list
+    priority_score = 0
+    if not one_post.speaker_name or one_post.speaker_name.startswith('Voter-'):
+        priority_score -= 20
+    if one_post.speaker_profile_image_url_medium and len(one_post.speaker_profile_image_url_medium) > 1:
+        priority_score += 10
+    if number_of_comments > 0:
+        priority_score += number_of_comments * 3
+    if number_of_likes > 0:
+        priority_score += number_of_likes * 1
+    return {
+        'number_of_comments':               number_of_comments,
+        'number_of_likes':                  number_of_likes,
+        'priority_score':                   priority_score,
+        'speaker_name':                     one_post.speaker_name,
+        'speaker_profile_image_url_medium': one_post.speaker_profile_image_url_medium,
+        'speaker_voter_we_vote_id':         one_post.speaker_voter_we_vote_id,
+        'statement_text':                   one_post.statement_text,
+        'we_vote_id':                       one_post.we_vote_id,
+    }
+
+
+class VoterDailySummaryBuilder:
+    """
+    Assembles the NOTICE_VOTER_DAILY_SUMMARY contents for many recipients in one run. Friend lists, friends' posts,
+    and the comment and like counts for those posts are loaded for all recipients at once with grouped queries, and
+    each friend's highlight is worked out once, no matter how many of their friends get a summary.
+    """
+
+    def __init__(self, assemble_activity_start_date=None, number_of_friends_to_display=3):
+        self.assemble_activity_start_date = assemble_activity_start_date
+        self.number_of_friends_to_display = number_of_friends_to_display
+        self.friends_we_vote_id_set_by_recipient = {}
+        # speaker_voter_we_vote_id -> the highlight_item_dict for their highest priority post, or None
+        self.highlight_by_speaker_we_vote_id = {}
+        self.metrics = {
+            'recipients_loaded':    0,
+            'recipients_assembled': 0,
+            'speakers_loaded':      0,
+            'posts_loaded':         0,
+            'query_count':          0,
+            'seconds':              0.0,
+        }
+
+    @contextmanager
+    def measure(self):
+        start_time = time.monotonic()
+        with ExitStack() as stack:
+            for alias in connections:
+                stack.enter_context(connections[alias].execute_wrapper(self.count_one_query))
+            try:
+                yield
+            finally:
+                self.metrics['seconds'] += time.monotonic() - start_time
+
+    def count_one_query(self, execute, sql, params, many, context):
+        self.metrics['query_count'] += 1
+        return execute(sql, params, many, context)
+
+    def load_recipients(self, recipient_voter_we_vote_id_list):
+        """
+        Load everything needed to assemble the summaries for these recipients, skipping anything already loaded
+        """
+        with self.measure():
+            new_recipient_we_vote_id_list = list(
+                {we_vote_id for we_vote_id in recipient_voter_we_vote_id_list if positive_value_exists(we_vote_id)} -
+                self.friends_we_vote_id_set_by_recipient.keys())
+            for start_index in range(0, len(new_recipient_we_vote_id_list), DAILY_SUMMARY_QUERY_CHUNK_SIZE):
+                self.load_friends_for_recipients(
+                    new_recipient_we_vote_id_list[start_index:start_index + DAILY_SUMMARY_QUERY_CHUNK_SIZE])
+
+            new_speaker_we_vote_id_set = set()
+            for recipient_voter_we_vote_id in new_recipient_we_vote_id_list:
+                new_speaker_we_vote_id_set.update(self.friends_we_vote_id_set_by_recipient[recipient_voter_we_vote_id])
+            new_speaker_we_vote_id_list = list(new_speaker_we_vote_id_set - self.highlight_by_speaker_we_vote_id.keys())
+            for start_index in range(0, len(new_speaker_we_vote_id_list), DAILY_SUMMARY_QUERY_CHUNK_SIZE):
+                self.load_highlights_for_speakers(
+                    new_speaker_we_vote_id_list[start_index:start_index + DAILY_SUMMARY_QUERY_CHUNK_SIZE])
+
+    def load_friends_for_recipients(self, recipient_voter_we_vote_id_list):
+        for recipient_voter_we_vote_id in recipient_voter_we_vote_id_list:
+            self.friends_we_vote_id_set_by_recipient[recipient_voter_we_vote_id] = set()
+        recipient_voter_we_vote_id_set = set(recipient_voter_we_vote_id_list)
+        friend_pair_list = CurrentFriend.objects.using('readonly') \
+            .filter(Q(viewer_voter_we_vote_id__in=recipient_voter_we_vote_id_list) |
+                    Q(viewee_voter_we_vote_id__in=recipient_voter_we_vote_id_list)) \
+            .values_list('viewer_voter_we_vote_id', 'viewee_voter_we_vote_id')
+        for viewer_voter_we_vote_id, viewee_voter_we_vote_id in friend_pair_list:
+            if viewer_voter_we_vote_id in recipient_voter_we_vote_id_set and \
+                    positive_value_exists(viewee_voter_we_vote_id):
+                self.friends_we_vote_id_set_by_recipient[viewer_voter_we_vote_id].add(viewee_voter_we_vote_id)
+            if viewee_voter_we_vote_id in recipient_voter_we_vote_id_set and \
+                    positive_value_exists(viewer_voter_we_vote_id):
+                self.friends_we_vote_id_set_by_recipient[viewee_voter_we_vote_id].add(viewer_voter_we_vote_id)
+        self.metrics['recipients_loaded'] += len(recipient_voter_we_vote_id_list)
+
+    def load_highlights_for_speakers(self, speaker_voter_we_vote_id_list):
+        for speaker_voter_we_vote_id in speaker_voter_we_vote_id_list:
+            self.highlight_by_speaker_we_vote_id[speaker_voter_we_vote_id] = None
+        self.metrics['speakers_loaded'] += len(speaker_voter_we_vote_id_list)
+
+        queryset = ActivityPost.objects.using('readonly').filter(
+            speaker_voter_we_vote_id__in=speaker_voter_we_vote_id_list, deleted=False)
+        if positive_value_exists(self.assemble_activity_start_date):
+            queryset = queryset.filter(date_created__gte=self.assemble_activity_start_date)
+        queryset = queryset.only(
+            'id', 'speaker_name', 'speaker_profile_image_url_medium', 'speaker_voter_we_vote_id', 'statement_text',
+            'we_vote_id')
+        post_list_by_speaker_we_vote_id = {}
+        for one_post in queryset.order_by('-id'):
+            speaker_post_list = post_list_by_speaker_we_vote_id.setdefault(one_post.speaker_voter_we_vote_id, [])
+            if len(speaker_post_list) < DAILY_SUMMARY_MAXIMUM_POSTS_PER_SPEAKER:
+                speaker_post_list.append(one_post)
+        post_we_vote_id_list = [one_post.we_vote_id for speaker_post_list in post_list_by_speaker_we_vote_id.values()
+                                for one_post in speaker_post_list]
+        self.metrics['posts_loaded'] += len(post_we_vote_id_list)
+        if not post_we_vote_id_list:
+            return
+
+        comment_count_list = ActivityComment.objects.using('readonly') \
+            .filter(parent_we_vote_id__in=post_we_vote_id_list, deleted=False) \
+            .filter(Q(parent_comment_we_vote_id=None) | Q(parent_comment_we_vote_id="")) \
+            .values('parent_we_vote_id') \
+            .annotate(number_of_comments=Count('id'))
+        number_of_comments_by_post = {
+            one_count['parent_we_vote_id']: one_count['number_of_comments'] for one_count in comment_count_list}
+        like_count_list = ReactionLike.objects.using('readonly') \
+            .filter(liked_item_we_vote_id__in=post_we_vote_id_list) \
+            .values('liked_item_we_vote_id') \
+            .annotate(number_of_likes=Count('id'))
+        number_of_likes_by_post = {
+            one_count['liked_item_we_vote_id']: one_count['number_of_likes'] for one_count in like_count_list}
+
+        for speaker_voter_we_vote_id, speaker_post_list in post_list_by_speaker_we_vote_id.items():
+            highest_priority_highlight = None
+            # Oldest first, so a newer post with the same priority_score replaces an older one
+            for one_post in reversed(speaker_post_list):
+                highlight_item_dict = generate_activity_post_highlight(
+                    one_post,
+                    number_of_comments_by_post.get(one_post.we_vote_id, 0),
+                    number_of_likes_by_post.get(one_post.we_vote_id, 0))
+                if highest_priority_highlight is None or \
+                        highlight_item_dict['priority_score'] >= highest_priority_highlight['priority_score']:
+                    highest_priority_highlight = highlight_item_dict
+            self.highlight_by_speaker_we_vote_id[speaker_voter_we_vote_id] = highest_priority_highlight
+
+    def assemble_voter_daily_summary(self, recipient_voter_we_vote_id=''):
+        status = ''
+        success = True
+        try:
+            self.load_recipients([recipient_voter_we_vote_id])
+        except Exception as e:
+            status += "ASSEMBLE_VOTER_DAILY_SUMMARY_LOAD_FAILED: " + str(e) + " "
+            success = False
+        friends_we_vote_id_set = self.friends_we_vote_id_set_by_recipient.get(recipient_voter_we_vote_id, set())
+        if not friends_we_vote_id_set:
+            status += "ASSEMBLE_VOTER_DAILY_SUMMARY_NO_FRIENDS_FOUND "
+
+        # Copies, since notice_voter_daily_summary_send adds the view url for each recipient
+        friend_activity_dict_list = [
+            dict(self.highlight_by_speaker_we_vote_id[friend_we_vote_id])
+            for friend_we_vote_id in friends_we_vote_id_set
+            if self.highlight_by_speaker_we_vote_id.get(friend_we_vote_id) is not None]
+        friend_activity_dict_list.sort(
+            key=lambda item: (item['priority_score'], item['we_vote_id']), reverse=True)
+        friend_name_list_in_order = [
+            one_activity_dict['speaker_name']
+            for one_activity_dict in friend_activity_dict_list[:self.number_of_friends_to_display]]
+        subject, introduction_line = generate_voter_daily_summary_subject_and_introduction(friend_name_list_in_order)
+        self.metrics['recipients_assembled'] += 1
+
+        results = {
+            'success':                      success,
+            'status':                       status,
+            'friend_activity_dict_list':    friend_activity_dict_list,
+            'introduction_line':            introduction_line,
+            'subject':                      subject,
+        }
+        return results
+
+    def fetch_metrics(self):
+        return dict(self.metrics)
+
+    def generate_metrics_status(self):
+        return "VOTER_DAILY_SUMMARY_BUILDER recipients: {recipients} speakers: {speakers} posts: {posts} " \
+               "queries: {queries} seconds: {seconds:.2f} ".format(
+                recipients=self.metrics['recipients_assembled'], speakers=self.metrics['speakers_loaded'],
+                posts=self.metrics['posts_loaded'], queries=self.metrics['query_count'],
+                seconds=self.metrics['seconds'])
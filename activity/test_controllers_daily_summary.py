@@ -0,0 +1,28 @@
+# activity/test_controllers_daily_summary.py
+# Brought to you by We Vote. Be good.
+# -*- coding: UTF-8 -*-
+
+from types import SimpleNamespace
+from django.test import SimpleTestCase
+from .controllers_daily_summary import generate_activity_post_highlight, \
+    generate_voter_daily_summary_subject_and_introduction
+
+
+class VoterDailySummaryTests(SimpleTestCase):
+
+    def test_subject_and_introduction(self):
+        subject, introduction_line = generate_voter_daily_summary_subject_and_introduction([])
+        self.assertEqual(subject, 'Discussion(s) have been added')
+        subject, introduction_line = generate_voter_daily_summary_subject_and_introduction(['Ann'])
+        self.assertEqual(subject, 'Ann added a discussion')
+        subject, introduction_line = generate_voter_daily_summary_subject_and_introduction(['Ann', 'Bo', 'Cy'])
+        self.assertEqual(subject, 'Ann, Bo and Cy added discussions')
+        self.assertEqual(introduction_line, 'Your friends Ann, Bo and Cy have added discussions.')
+
+    def test_highlight_priority_score(self):
+        one_post = SimpleNamespace(
+            speaker_name='Voter-123', speaker_profile_image_url_medium='https://example.com/a.jpg',
+            speaker_voter_we_vote_id='wvvoter1', statement_text='Hello', we_vote_id='wvpost1')
+        highlight_item_dict = generate_activity_post_highlight(one_post, number_of_comments=2, number_of_likes=5)
+        self.assertEqual(highlight_item_dict['priority_score'], -20 + 10 + 6 + 5)
+        self.assertEqual(highlight_item_dict['we_vote_id'], 'wvpost1')
@@ -0,0 +1,381 @@
+import json
+import os
+import random
+import string
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from activity.models import ActivityPost
+from ballot.models import BallotItem, CANDIDATE, MEASURE, VoterBallotSaved
+from campaign.models import CampaignX, CampaignXSupporter
+from candidate.models import CandidateCampaign, CandidateToOfficeLink
+from election.models import Election
+from follow.models import FollowOrganization, FOLLOWING
+from friend.models import CurrentFriend
+from measure.models import ContestMeasure
+from office.models import ContestOffice
+from organization.models import NONPROFIT, Organization
+from position.models import INFORMATION_ONLY, OPPOSE, PositionAggregate, PositionAggregateManager, \
+    PositionEntered, PositionForFriends, SUPPORT
+from voter.models import Voter, VoterDeviceLink
+from voter_guide.models import VoterGuide
+
+# Every row this command creates has a we_vote_id starting with "wvlt" ("lt" in place of the site prefix), or belongs
+# to the load test election, so --delete can find all of them again
+LOAD_TEST_WE_VOTE_ID_PREFIX = 'wvlt'
+LOAD_TEST_GOOGLE_CIVIC_ELECTION_ID = 9900001
+LOAD_TEST_STATE_CODE = 'CA'
+DEFAULT_FIXTURES_FILE = os.path.join(settings.PROJECT_PATH, 'loadtest', 'test_variables.json')
+BATCH_SIZE = 1000
+
+
+def generate_load_test_we_vote_id(kind, number):
+    return '{prefix}{kind}{number}'.format(prefix=LOAD_TEST_WE_VOTE_ID_PREFIX, kind=kind, number=number)
+
+
+class Command(BaseCommand):
+    help = 'Creates seeded synthetic voters, an election with offices, candidates and measures, voter ballots, ' \
+           'organizations with positions and voter guides, friends, activity posts and campaigns for the ' \
+           'loadtest/ Locust scenarios, and writes their ids to loadtest/test_variables.json'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--voters', type=int, default=1000)
+        parser.add_argument('--offices', type=int, default=20)
+        parser.add_argument('--candidates_per_office', type=int, default=3)
+        parser.add_argument('--measures', type=int, default=10)
+        parser.add_argument('--organizations', type=int, default=200)
+        parser.add_argument('--positions_per_organization', type=int, default=30)
+        parser.add_argument('--positions_per_voter', type=int, default=3)
+        parser.add_argument('--friends_per_voter', type=int, default=10)
+        parser.add_argument('--organizations_followed_per_voter', type=int, default=5)
+        parser.add_argument('--campaigns', type=int, default=50)
+        parser.add_argument('--seed', type=int, default=42, help='Same seed, same fixtures')
+        parser.add_argument('--fixtures_file', type=str, default=DEFAULT_FIXTURES_FILE,
+                            help='Where to write the ids the Locust scenarios use')
+        parser.add_argument('--delete', action='store_true', help='Only delete the load test fixtures')
+        parser.add_argument('--allow_without_debug', action='store_true',
+                            help='Run even though SERVER_IN_DEBUG_MODE is off. Never point this at production.')
+
+    def handle(self, *args, **options):
+        if not settings.DEBUG and not options['allow_without_debug']:
+            raise CommandError('Load test fixtures are only for development and load test databases. '
+                               'Use --allow_without_debug if this really is one.')
+
+        with transaction.atomic():
+            deleted_count = self.delete_load_test_fixtures()
+        self.stdout.write('deleted {} existing load test rows'.format(deleted_count))
+        if options['delete']:
+            return
+
+        random.seed(options['seed'])
+        with transaction.atomic():
+            fixtures = self.create_load_test_fixtures(options)
+        # Positions were bulk created, so the signals that keep these counts up to date didn't run
+        for ballot_item_we_vote_id in fixtures['candidate_we_vote_id_list']:
+            PositionAggregateManager.update_position_aggregate_for_ballot_item(ballot_item_we_vote_id, CANDIDATE)
+        for ballot_item_we_vote_id in fixtures['measure_we_vote_id_list']:
+            PositionAggregateManager.update_position_aggregate_for_ballot_item(ballot_item_we_vote_id, MEASURE)
+
+        with open(options['fixtures_file'], 'w') as fixtures_file:
+            json.dump(fixtures, fixtures_file, indent=2)
+        self.stdout.write('wrote the ids of {} voters to {}'.format(
+            len(fixtures['voter_device_id_list']), options['fixtures_file']))
+
+    @staticmethod
+    def delete_load_test_fixtures():
+        prefix = LOAD_TEST_WE_VOTE_ID_PREFIX
+        election_id = LOAD_TEST_GOOGLE_CIVIC_ELECTION_ID
+        voter_id_list = list(Voter.objects.filter(we_vote_id__startswith=prefix).values_list('id', flat=True))
+        queryset_list = [
+            ActivityPost.objects.filter(we_vote_id__startswith=prefix),
+            CampaignXSupporter.objects.filter(campaignx_we_vote_id__startswith=prefix),
+            CampaignX.objects.filter(we_vote_id__startswith=prefix),
+            CurrentFriend.objects.filter(viewer_voter_we_vote_id__startswith=prefix),
+            FollowOrganization.objects.filter(organization_we_vote_id__startswith=prefix),
+            PositionAggregate.objects.filter(ballot_item_we_vote_id__startswith=prefix),
+            PositionForFriends.objects.filter(we_vote_id__startswith=prefix),
+            PositionEntered.objects.filter(we_vote_id__startswith=prefix),
+            VoterGuide.objects.filter(we_vote_id__startswith=prefix),
+            Organization.objects.filter(we_vote_id__startswith=prefix),
+            BallotItem.objects.filter(google_civic_election_id=str(election_id)),
+            VoterBallotSaved.objects.filter(google_civic_election_id=election_id),
+            CandidateToOfficeLink.objects.filter(candidate_we_vote_id__startswith=prefix),
+            CandidateCampaign.objects.filter(we_vote_id__startswith=prefix),
+            ContestMeasure.objects.filter(we_vote_id__startswith=prefix),
+            ContestOffice.objects.filter(we_vote_id__startswith=prefix),
+            Election.objects.filter(google_civic_election_id=str(election_id)),
+            VoterDeviceLink.objects.filter(voter_id__in=voter_id_list),
+            Voter.objects.filter(id__in=voter_id_list),
+        ]
+        deleted_count = 0
+        for queryset in queryset_list:
+            count, deleted_by_model = queryset.delete()
+            deleted_count += count
+        return deleted_count
+
+    @staticmethod
+    def create_load_test_fixtures(options):
+        election_id = LOAD_TEST_GOOGLE_CIVIC_ELECTION_ID
+        state_code = LOAD_TEST_STATE_CODE
+        election_date = date.today() + timedelta(days=30)
+        election_day_text = election_date.strftime('%Y-%m-%d')
+        election_date_as_integer = int(election_date.strftime('%Y%m%d'))
+
+        Election.objects.create(
+            google_civic_election_id=str(election_id),
+            google_civic_election_id_new=election_id,
+            election_name='Load Test Election',
+            election_day_text=election_day_text,
+            state_code=state_code,
+            include_in_list_for_voters=True,
+        )
+
+        office_list = []
+        candidate_list = []
+        candidate_to_office_link_list = []
+        for office_number in range(options['offices']):
+            office = ContestOffice(
+                we_vote_id=generate_load_test_we_vote_id('off', office_number),
+                office_name='Load Test Office ' + str(office_number),
+                google_civic_election_id=str(election_id),
+                google_civic_election_id_new=election_id,
+                state_code=state_code,
+            )
+            office_list.append(office)
+            for candidate_number in range(options['candidates_per_office']):
+                candidate_we_vote_id = generate_load_test_we_vote_id(
+                    'cand', office_number * options['candidates_per_office'] + candidate_number)
+                candidate_list.append(CandidateCampaign(
+                    we_vote_id=candidate_we_vote_id,
+                    candidate_name='Load Test Candidate ' + candidate_we_vote_id[len(LOAD_TEST_WE_VOTE_ID_PREFIX):],
+                    contest_office_we_vote_id=office.we_vote_id,
+                    contest_office_name=office.office_name,
+                    google_civic_election_id=str(election_id),
+                    google_civic_election_id_new=election_id,
+                    candidate_ultimate_election_date=election_date_as_integer,
+                    party=random.choice(['Democratic', 'Republican', 'Green', 'Libertarian', 'Nonpartisan']),
+                    state_code=state_code,
+                ))
+                candidate_to_office_link_list.append(CandidateToOfficeLink(
+                    candidate_we_vote_id=candidate_we_vote_id,
+                    contest_office_we_vote_id=office.we_vote_id,
+                    google_civic_election_id=election_id,
+                    state_code=state_code,
+                ))
+        office_list = ContestOffice.objects.bulk_create(office_list, batch_size=BATCH_SIZE)
+        office_id_by_we_vote_id = {office.we_vote_id: office.id for office in office_list}
+        for candidate in candidate_list:
+            candidate.contest_office_id = str(office_id_by_we_vote_id[candidate.contest_office_we_vote_id])
+        candidate_list = CandidateCampaign.objects.bulk_create(candidate_list, batch_size=BATCH_SIZE)
+        CandidateToOfficeLink.objects.bulk_create(candidate_to_office_link_list, batch_size=BATCH_SIZE)
+
+        measure_list = ContestMeasure.objects.bulk_create([
+            ContestMeasure(
+                we_vote_id=generate_load_test_we_vote_id('meas', measure_number),
+                measure_title='Load Test Measure ' + str(measure_number),
+                google_civic_election_id=str(election_id),
+                google_civic_election_id_new=election_id,
+                measure_ultimate_election_date=election_date_as_integer,
+                state_code=state_code,
+            ) for measure_number in range(options['measures'])], batch_size=BATCH_SIZE)
+
+        voter_list = Voter.objects.bulk_create([
+            Voter(
+                we_vote_id=generate_load_test_we_vote_id('voter', voter_number),
+                first_name='Load',
+                last_name='Tester' + str(voter_number),
+            ) for voter_number in range(options['voters'])], batch_size=BATCH_SIZE)
+        # Seeded, so the same fixtures get the same device ids. Not for real sign in sessions.
+        voter_device_id_list = [''.join(random.choice(string.ascii_letters + string.digits) for _ in range(88))
+                                for _ in voter_list]
+        VoterDeviceLink.objects.bulk_create([
+            VoterDeviceLink(voter_device_id=voter_device_id, voter_id=voter.id,
+                            google_civic_election_id=election_id, state_code=state_code)
+            for voter, voter_device_id in zip(voter_list, voter_device_id_list)], batch_size=BATCH_SIZE)
+
+        # Each voter has their own ballot with every office and measure on it
+        VoterBallotSaved.objects.bulk_create([
+            VoterBallotSaved(
+                voter_id=voter.id,
+                google_civic_election_id=election_id,
+                state_code=state_code,
+                election_description_text='Load Test Election',
+                election_date=election_date,
+                original_text_for_map_search='Oakland, CA 94612',
+            ) for voter in voter_list], batch_size=BATCH_SIZE)
+        ballot_item_list = []
+        for voter in voter_list:
+            local_ballot_order = 0
+            for office in office_list:
+                local_ballot_order += 1
+                ballot_item_list.append(BallotItem(
+                    voter_id=voter.id,
+                    google_civic_election_id=str(election_id),
+                    google_civic_election_id_new=election_id,
+                    state_code=state_code,
+                    local_ballot_order=local_ballot_order,
+                    contest_office_id=str(office.id),
+                    contest_office_we_vote_id=office.we_vote_id,
+                    ballot_item_display_name=office.office_name,
+                ))
+            for measure in measure_list:
+                local_ballot_order += 1
+                ballot_item_list.append(BallotItem(
+                    voter_id=voter.id,
+                    google_civic_election_id=str(election_id),
+                    google_civic_election_id_new=election_id,
+                    state_code=state_code,
+                    local_ballot_order=local_ballot_order,
+                    contest_measure_id=str(measure.id),
+                    contest_measure_we_vote_id=measure.we_vote_id,
+                    ballot_item_display_name=measure.measure_title,
+                ))
+        BallotItem.objects.bulk_create(ballot_item_list, batch_size=BATCH_SIZE)
+
+        organization_list = Organization.objects.bulk_create([
+            Organization(
+                we_vote_id=generate_load_test_we_vote_id('org', organization_number),
+                organization_name='Load Test Organization ' + str(organization_number),
+                organization_type=NONPROFIT,
+                state_served_code=state_code,
+            ) for organization_number in range(options['organizations'])], batch_size=BATCH_SIZE)
+        VoterGuide.objects.bulk_create([
+            VoterGuide(
+                we_vote_id=generate_load_test_we_vote_id('vg', organization_number),
+                organization_we_vote_id=organization.we_vote_id,
+                google_civic_election_id=election_id,
+                election_day_text=election_day_text,
+                state_code=state_code,
+                display_name=organization.organization_name,
+                voter_guide_owner_type=organization.organization_type,
+            ) for organization_number, organization in enumerate(organization_list)], batch_size=BATCH_SIZE)
+
+        # Some ballot items get many more endorsements than others, like in a real election
+        ballot_item_choice_list = [(CANDIDATE, candidate) for candidate in candidate_list] + \
+                                  [(MEASURE, measure) for measure in measure_list]
+        ballot_item_weight_list = [1.0 / (rank + 1) for rank in range(len(ballot_item_choice_list))]
+        stance_list = [SUPPORT, SUPPORT, SUPPORT, OPPOSE, INFORMATION_ONLY]
+
+        def ballot_item_position_fields(kind_of_ballot_item, ballot_item):
+            if kind_of_ballot_item == CANDIDATE:
+                return {
+                    'candidate_campaign_id': ballot_item.id,
+                    'candidate_campaign_we_vote_id': ballot_item.we_vote_id,
+                    'contest_office_we_vote_id': ballot_item.contest_office_we_vote_id,
+                    'ballot_item_display_name': ballot_item.candidate_name,
+                }
+            return {
+                'contest_measure_id': ballot_item.id,
+                'contest_measure_we_vote_id': ballot_item.we_vote_id,
+                'ballot_item_display_name': ballot_item.measure_title,
+            }
+
+        # dict.fromkeys drops repeated ballot items but, unlike a set, keeps the order, so --seed is reproducible
+        position_list = []
+        for organization in organization_list:
+            for kind_of_ballot_item, ballot_item in dict.fromkeys(random.choices(
+                    ballot_item_choice_list, weights=ballot_item_weight_list,
+                    k=options['positions_per_organization'])):
+                position_list.append(PositionEntered(
+                    we_vote_id=generate_load_test_we_vote_id('pos', len(position_list)),
+                    organization_id=organization.id,
+                    organization_we_vote_id=organization.we_vote_id,
+                    speaker_display_name=organization.organization_name,
+                    speaker_type=organization.organization_type,
+                    google_civic_election_id=str(election_id),
+                    google_civic_election_id_new=election_id,
+                    state_code=state_code,
+                    stance=random.choice(stance_list),
+                    statement_text='Load test endorsement',
+                    **ballot_item_position_fields(kind_of_ballot_item, ballot_item)))
+        PositionEntered.objects.bulk_create(position_list, batch_size=BATCH_SIZE)
+
+        friends_position_list = []
+        for voter in voter_list:
+            for kind_of_ballot_item, ballot_item in dict.fromkeys(random.choices(
+                    ballot_item_choice_list, weights=ballot_item_weight_list, k=options['positions_per_voter'])):
+                friends_position_list.append(PositionForFriends(
+                    we_vote_id=generate_load_test_we_vote_id('fpos', len(friends_position_list)),
+                    voter_id=voter.id,
+                    voter_we_vote_id=voter.we_vote_id,
+                    speaker_display_name=voter.first_name + ' ' + voter.last_name,
+                    google_civic_election_id=str(election_id),
+                    google_civic_election_id_new=election_id,
+                    state_code=state_code,
+                    stance=random.choice(stance_list),
+                    **ballot_item_position_fields(kind_of_ballot_item, ballot_item)))
+        PositionForFriends.objects.bulk_create(friends_position_list, batch_size=BATCH_SIZE)
+
+        friend_pair_set = set()
+        for voter_index in range(len(voter_list)):
+            for friend_index in random.sample(range(len(voter_list)),
+                                              min(options['friends_per_voter'], len(voter_list))):
+                if friend_index != voter_index:
+                    friend_pair_set.add((min(voter_index, friend_index), max(voter_index, friend_index)))
+        CurrentFriend.objects.bulk_create([
+            CurrentFriend(viewer_voter_we_vote_id=voter_list[viewer_index].we_vote_id,
+                          viewee_voter_we_vote_id=voter_list[viewee_index].we_vote_id)
+            for viewer_index, viewee_index in sorted(friend_pair_set)], batch_size=BATCH_SIZE)
+
+        follow_list = []
+        for voter in voter_list:
+            for organization in random.sample(organization_list,
+                                              min(options['organizations_followed_per_voter'],
+                                                  len(organization_list))):
+                follow_list.append(FollowOrganization(
+                    voter_id=voter.id,
+                    organization_id=organization.id,
+                    organization_we_vote_id=organization.we_vote_id,
+                    following_status=FOLLOWING,
+                ))
+        FollowOrganization.objects.bulk_create(follow_list, batch_size=BATCH_SIZE)
+
+        ActivityPost.objects.bulk_create([
+            ActivityPost(
+                we_vote_id=generate_load_test_we_vote_id('post', voter_number),
+                speaker_name=voter.first_name + ' ' + voter.last_name,
+                speaker_voter_we_vote_id=voter.we_vote_id,
+                statement_text='Load test post',
+                visibility_is_public=voter_number % 2 == 0,
+            ) for voter_number, voter in enumerate(voter_list)], batch_size=BATCH_SIZE)
+
+        campaignx_list = CampaignX.objects.bulk_create([
+            CampaignX(
+                we_vote_id=generate_load_test_we_vote_id('camp', campaign_number),
+                campaign_title='Load Test Campaign ' + str(campaign_number),
+                seo_friendly_path='load-test-campaign-' + str(campaign_number),
+                final_election_date_as_integer=election_date_as_integer,
+                in_draft_mode=False,
+                is_ok_to_promote_on_we_vote=True,
+                is_still_active=True,
+                state_code=state_code,
+            ) for campaign_number in range(options['campaigns'])], batch_size=BATCH_SIZE)
+        campaignx_supporter_list = []
+        for voter in voter_list:
+            for campaignx in random.sample(campaignx_list, min(2, len(campaignx_list))):
+                campaignx_supporter_list.append(CampaignXSupporter(
+                    campaignx_we_vote_id=campaignx.we_vote_id,
+                    campaign_supported=True,
+                    supporter_name=voter.first_name + ' ' + voter.last_name,
+                    voter_we_vote_id=voter.we_vote_id,
+                    visible_to_public=True,
+                ))
+        CampaignXSupporter.objects.bulk_create(campaignx_supporter_list, batch_size=BATCH_SIZE)
+
+        fixtures = {
+            'google_civic_election_id': str(election_id),
+            'state_code': state_code,
+            'voter_device_id': voter_device_id_list[0] if len(voter_device_id_list) else '',
+            'voter_device_id_list': voter_device_id_list,
+            'voter_we_vote_id_list': [voter.we_vote_id for voter in voter_list],
+            'office_we_vote_id_list': [office.we_vote_id for office in office_list],
+            'candidate_we_vote_id_list': [candidate.we_vote_id for candidate in candidate_list],
+            'measure_we_vote_id_list': [measure.we_vote_id for measure in measure_list],
+            'organization_we_vote_id_list': [organization.we_vote_id for organization in organization_list],
+            'campaignx_we_vote_id_list': [campaignx.we_vote_id for campaignx in campaignx_list],
+            'campaignx_seo_friendly_path_list': [campaignx.seo_friendly_path for campaignx in campaignx_list],
+        }
+        return fixtures
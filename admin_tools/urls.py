@@ -8,6 +8,8 @@ from . import views
 
 urlpatterns = [
     re_path(r'^$', views.admin_home_view, name='admin_home',),
+    re_path(r'^cache_metrics/$', views.cache_metrics_view, name='cache_metrics'),
+    re_path(r'^database_query_counts/$', views.database_query_counts_view, name='database_query_counts'),
     re_path(r'^data_cleanup/$', views.data_cleanup_view, name='data_cleanup'),
     re_path(r'^data_cleanup_organization_analysis/$',
         views.data_cleanup_organization_analysis_view, name='data_cleanup_organization_analysis'),
@@ -1,6 +1,7 @@
 # admin_tools/views.py
 # Brought to you by We Vote. Be good.
 # -*- coding: UTF-8 -*-
+import json
 import os
 
 from django.contrib import messages
@@ -8,7 +9,7 @@ from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.decorators import login_required
 from django.contrib.messages import get_messages
 from django.db.models import Q
-from django.http import HttpResponseRedirect
+from django.http import HttpResponse, HttpResponseRedirect
 from django.shortcuts import render
 from django.urls import reverse
 
@@ -16,10 +17,10 @@ import wevote_functions
 from ballot.models import BallotReturned, VoterBallotSaved
 from candidate.controllers import candidates_import_from_sample_file
 from candidate.models import CandidateCampaign, CandidateManager
-from config.base import get_environment_variable, LOGIN_URL, BASE_DIR, PROJECT_PATH
+from config.base import get_environment_variable, LOGIN_URL, BASE_DIR, CACHE_BACKEND, PROJECT_PATH
 from election.controllers import elections_import_from_sample_file
 from election.models import Election
-from email_outbound.models import EmailAddress
+from email_outbound.models import EmailAddress, SendGridApiCounterManager
 from follow.models import FollowOrganizationList
 from friend.models import CurrentFriend, FriendManager, SuggestedFriend
 from import_export_ctcl.models import CTCLApiCounterManager
@@ -43,6 +44,8 @@ from voter.models import Voter, VoterAddress, VoterAddressManager, VoterDeviceLi
     voter_has_authority, voter_setup
 from wevote_functions.functions import convert_to_int, delete_voter_api_device_id_cookie, generate_voter_device_id, \
     get_voter_api_device_id, positive_value_exists, set_voter_api_device_id, STATE_CODE_MAP
+from wevote_functions.functions_cache import fetch_cache_metrics
+from config.db_router import fetch_database_query_counts
 from wevote_functions.utils import get_node_version, get_postgres_version, get_python_version, get_git_commit_hash, \
     get_git_commit_date
 
@@ -1398,6 +1401,44 @@ def data_cleanup_voter_list_analysis_view(request):
     return response
 
 
+@login_required
+def cache_metrics_view(request):
+    """
+    Hit/miss counts for the shared API read cache, for the server process that answers this request
+    :param request:
+    :return:
+    """
+    authority_required = {'admin'}
+    if not voter_has_authority(request, authority_required):
+        return redirect_to_sign_in_page(request, authority_required)
+
+    json_data = {
+        'success':          True,
+        'cache_backend':    CACHE_BACKEND,
+        'cache_metrics':    fetch_cache_metrics(),
+    }
+    return HttpResponse(json.dumps(json_data), content_type='application/json')
+
+
+@login_required
+def database_query_counts_view(request):
+    """
+    Queries run per database alias through ReadonlyDatabaseRouterMiddleware, for the server process that answers
+    this request
+    :param request:
+    :return:
+    """
+    authority_required = {'admin'}
+    if not voter_has_authority(request, authority_required):
+        return redirect_to_sign_in_page(request, authority_required)
+
+    json_data = {
+        'success':                  True,
+        'database_query_counts':    fetch_database_query_counts(),
+    }
+    return HttpResponse(json.dumps(json_data), content_type='application/json')
+
+
 @login_required
 def data_voter_statistics_view(request):
     # admin, analytics_admin, partner_organization, political_data_manager, political_data_viewer, verified_volunteer
@@ -1929,9 +1970,9 @@ def statistics_summary_view(request):
     google_civic_api_counter_manager = GoogleCivicApiCounterManager()
     google_civic_daily_summary_list = google_civic_api_counter_manager.retrieve_daily_summaries(days_to_display=15)
 
-    # Statistics are not being stored currently DALE 2024-01-22
-    # sendgrid_api_counter_manager = SendGridApiCounterManager()
-    # sendgrid_daily_summary_list = sendgrid_api_counter_manager.retrieve_daily_summaries(days_to_display=15)
+    # Counted again now that SendGrid calls go through api_telemetry
+    sendgrid_api_counter_manager = SendGridApiCounterManager()
+    sendgrid_daily_summary_list = sendgrid_api_counter_manager.retrieve_daily_summaries(days_to_display=15)
 
     # vote_smart_api_counter_manager = VoteSmartApiCounterManager()
     # vote_smart_daily_summary_list = vote_smart_api_counter_manager.retrieve_daily_summaries()
@@ -1953,7 +1994,7 @@ def statistics_summary_view(request):
         'twitter_api_limits':               twitter_api_limits,
         'vote_usa_daily_summary_list':      vote_usa_daily_summary_list,
         # 'ballotpedia_daily_summary_list':   ballotpedia_daily_summary_list,
-        # 'sendgrid_daily_summary_list':      sendgrid_daily_summary_list,
+        'sendgrid_daily_summary_list':      sendgrid_daily_summary_list,
         # 'vote_smart_daily_summary_list':    vote_smart_daily_summary_list,
         # 'targetsmart_daily_summary_list':   targetsmart_daily_summary_list,
     }
@@ -2,11 +2,16 @@
 # Brought to you by We Vote. Be good.
 # -*- coding: UTF-8 -*-
 
+from .controllers_rollup import are_analytics_rollups_complete_for_date, \
+    fetch_organization_daily_counts_from_rollups, fetch_sitewide_daily_counts_from_rollups, \
+    fetch_voter_counts_from_rollups, rebuild_analytics_rollups_for_voter_list, \
+    retrieve_voter_we_vote_id_list_from_rollups, update_analytics_rollups
 from .models import AnalyticsAction, AnalyticsCountManager, AnalyticsManager, \
     ACTIONS_THAT_REQUIRE_ORGANIZATION_IDS
 from candidate.models import CandidateManager
-from config.base import get_environment_variable
-from datetime import date, datetime, timedelta
+from config.base import get_environment_variable, get_environment_variable_default
+from datetime import datetime, timedelta
+from django.db import connections
 from django.db.models import Q
 from django.utils.timezone import localtime, now
 from exception.models import print_to_log
@@ -27,11 +32,36 @@ from share.models import ShareManager
 from voter.models import VoterManager, VoterMetricsManager
 import wevote_functions.admin
 from wevote_functions.functions import convert_to_int, positive_value_exists
+from wevote_functions.functions_cache import CACHE_NAMESPACE_POLITICIAN_SEO_FRIENDLY_PATH, \
+    retrieve_results_through_cache
 from wevote_functions.functions_date import convert_date_to_date_as_integer
+from wevote_functions.functions_write_behind import WriteBehindBuffer
 
 logger = wevote_functions.admin.get_logger(__name__)
 
 WE_VOTE_API_KEY = get_environment_variable("WE_VOTE_API_KEY")
+# saveAnalyticsAction entries are validated and answered right away, and written to the analytics database in batches
+#  of ANALYTICS_ACTION_BUFFER_BATCH_SIZE, or every ANALYTICS_ACTION_BUFFER_MAX_DELAY_SECONDS, by a background thread.
+#  Set ANALYTICS_ACTION_BUFFER_ON to false to write each action before answering.
+ANALYTICS_ACTION_BUFFER_ON = \
+    str(get_environment_variable_default('ANALYTICS_ACTION_BUFFER_ON', True)).lower() not in ('false', '0', '')
+ANALYTICS_ACTION_BUFFER_BATCH_SIZE = \
+    convert_to_int(get_environment_variable_default('ANALYTICS_ACTION_BUFFER_BATCH_SIZE', 200))
+ANALYTICS_ACTION_BUFFER_MAX_DELAY_SECONDS = \
+    float(get_environment_variable_default('ANALYTICS_ACTION_BUFFER_MAX_DELAY_SECONDS', 2))
+
+
+def save_analytics_action_list(action_list):
+    # The buffer's thread keeps its own connection, so make sure it is still good before each batch
+    connections['analytics'].close_if_unusable_or_obsolete()
+    AnalyticsManager.save_action_list(action_list)
+
+
+analytics_action_buffer = WriteBehindBuffer(
+    'analytics_action',
+    save_analytics_action_list,
+    max_batch_size=ANALYTICS_ACTION_BUFFER_BATCH_SIZE,
+    max_delay_seconds=ANALYTICS_ACTION_BUFFER_MAX_DELAY_SECONDS)
 
 
 def augment_voter_analytics_action_entries_without_election_id(date_as_integer, through_date_as_integer):
@@ -801,6 +831,36 @@ def process_sitewide_voter_metrics(batch_process, batch_process_analytics_chunk)
     return results
 
 
+def retrieve_politician_we_vote_id_from_seo_friendly_path(seo_friendly_path):
+    """
+    The same few politician pages get most of the visits, so this lookup reads through the shared cache
+    :param seo_friendly_path:
+    :return:
+    """
+    def retrieve_politician_from_database():
+        status = ""
+        politician_we_vote_id = None
+        try:
+            politician_we_vote_id = Politician.objects.using('readonly') \
+                .filter(seo_friendly_path=seo_friendly_path) \
+                .values_list('we_vote_id', flat=True) \
+                .first()
+            if politician_we_vote_id is None:
+                status += "POLITICIAN_NOT_FOUND-FROM_SEO_FRIENDLY_PATH "
+        except Exception as e:
+            status += "POLITICIAN_NOT_FOUND-FROM_SEO_FRIENDLY_PATH: " + str(e) + " "
+        return {
+            'success':                  True,
+            'status':                   status,
+            'politician_found':         politician_we_vote_id is not None,
+            'politician_we_vote_id':    politician_we_vote_id,
+        }
+
+    return retrieve_results_through_cache(
+        CACHE_NAMESPACE_POLITICIAN_SEO_FRIENDLY_PATH, seo_friendly_path, 'politician_found',
+        retrieve_politician_from_database)
+
+
 def save_analytics_action_for_api(  # saveAnalyticsAction
         action_constant=0,
         voter_we_vote_id='',
@@ -874,39 +934,57 @@ def save_analytics_action_for_api(  # saveAnalyticsAction
 
     if positive_value_exists(seo_friendly_path) and not positive_value_exists(politician_we_vote_id):
         # Look up the politician_we_vote_id based on the seo_friendly_path
-        try:
-            queryset = Politician.objects.using('readonly').filter(seo_friendly_path=seo_friendly_path)
-            one_politician = queryset.first()
-            politician_we_vote_id = one_politician.we_vote_id
-        except Exception as e:
-            politician_we_vote_id = None
-            status += "POLITICIAN_NOT_FOUND-FROM_SEO_FRIENDLY_PATH: " + str(e) + " "
+        politician_results = retrieve_politician_we_vote_id_from_seo_friendly_path(seo_friendly_path)
+        politician_we_vote_id = politician_results['politician_we_vote_id']
+        status += politician_results['status']
 
-    save_results = analytics_manager.save_action(
-        action_constant,
-        voter_we_vote_id,
-        voter_id,
-        is_signed_in,
-        state_code,
-        organization_we_vote_id,
-        organization_id,
-        google_civic_election_id,
-        user_agent_string,
-        is_bot,
-        is_mobile,
-        is_desktop,
-        is_tablet,
-        ballot_item_we_vote_id,
-        voter_device_id,
-        politician_we_vote_id=politician_we_vote_id)
-    if save_results['action_saved']:
-        action = save_results['action']
+    if ANALYTICS_ACTION_BUFFER_ON:
+        action = analytics_manager.generate_action(
+            action_constant,
+            voter_we_vote_id,
+            voter_id,
+            is_signed_in,
+            state_code,
+            organization_we_vote_id,
+            organization_id,
+            google_civic_election_id,
+            user_agent_string,
+            is_bot,
+            is_mobile,
+            is_desktop,
+            is_tablet,
+            ballot_item_we_vote_id,
+            politician_we_vote_id=politician_we_vote_id)
+        analytics_action_buffer.add(action)
         date_as_integer = action.date_as_integer
-        status += save_results['status']
-        success = save_results['success']
+        status += "ACTION_BUFFERED "
+        success = True
     else:
-        status += "ACTION_VOTER_GUIDE_VISIT-NOT_SAVED "
-        success = False
+        save_results = analytics_manager.save_action(
+            action_constant,
+            voter_we_vote_id,
+            voter_id,
+            is_signed_in,
+            state_code,
+            organization_we_vote_id,
+            organization_id,
+            google_civic_election_id,
+            user_agent_string,
+            is_bot,
+            is_mobile,
+            is_desktop,
+            is_tablet,
+            ballot_item_we_vote_id,
+            voter_device_id,
+            politician_we_vote_id=politician_we_vote_id)
+        if save_results['action_saved']:
+            action = save_results['action']
+            date_as_integer = action.date_as_integer
+            status += save_results['status']
+            success = save_results['success']
+        else:
+            status += "ACTION_VOTER_GUIDE_VISIT-NOT_SAVED "
+            success = False
 
     results = {
         'status':                   status,
@@ -1031,15 +1109,25 @@ def calculate_organization_daily_metrics(organization_we_vote_id, limit_to_one_d
     position_metrics_manager = PositionMetricsManager()
     follow_organization_list = FollowOrganizationList()
 
-    date_as_integer = convert_to_int(date)
-    visitors_total = analytics_count_manager.fetch_visitors(google_civic_election_id_zero, organization_we_vote_id)
-    authenticated_visitors_total = analytics_count_manager.fetch_visitors(
-        google_civic_election_id_zero, organization_we_vote_id, 0, 0, limit_to_authenticated)
+    date_as_integer = convert_to_int(limit_to_one_date_as_integer)
+    if positive_value_exists(date_as_integer) and are_analytics_rollups_complete_for_date(date_as_integer):
+        status += "ORGANIZATION_DAILY_METRICS_FROM_ROLLUPS "
+        rollup_counts = fetch_organization_daily_counts_from_rollups(organization_we_vote_id, date_as_integer)
+        visitors_total = rollup_counts['visitors_total']
+        authenticated_visitors_total = rollup_counts['authenticated_visitors_total']
+        visitors_today = rollup_counts['visitors_today']
+        authenticated_visitors_today = rollup_counts['authenticated_visitors_today']
+    else:
+        visitors_total = analytics_count_manager.fetch_visitors(
+            google_civic_election_id_zero, organization_we_vote_id)
+        authenticated_visitors_total = analytics_count_manager.fetch_visitors(
+            google_civic_election_id_zero, organization_we_vote_id, 0, 0, limit_to_authenticated)
 
-    visitors_today = analytics_count_manager.fetch_visitors(
-        google_civic_election_id_zero, organization_we_vote_id, limit_to_one_date_as_integer)
-    authenticated_visitors_today = analytics_count_manager.fetch_visitors(
-        google_civic_election_id_zero, organization_we_vote_id, limit_to_one_date_as_integer, 0, limit_to_authenticated)
+        visitors_today = analytics_count_manager.fetch_visitors(
+            google_civic_election_id_zero, organization_we_vote_id, limit_to_one_date_as_integer)
+        authenticated_visitors_today = analytics_count_manager.fetch_visitors(
+            google_civic_election_id_zero, organization_we_vote_id, limit_to_one_date_as_integer, 0,
+            limit_to_authenticated)
 
     new_visitors_today = None
     voter_guide_entrants_today = None
@@ -1095,28 +1183,41 @@ def calculate_sitewide_daily_metrics(limit_to_one_date_as_integer):
     date_as_integer_zero = 0
     limit_to_one_date_as_integer = convert_to_int(limit_to_one_date_as_integer)
     count_through_this_date_as_integer = limit_to_one_date_as_integer
-
-    visitors_total = analytics_count_manager.fetch_visitors(
-        google_civic_election_id_zero, organization_we_vote_id_empty, date_as_integer_zero,
-        count_through_this_date_as_integer)
-    visitors_today = analytics_count_manager.fetch_visitors(
-        google_civic_election_id_zero, organization_we_vote_id_empty, limit_to_one_date_as_integer)
-    new_visitors_today = None
     voter_guide_entrants_today = None
     welcome_page_entrants_today = None
     friend_entrants_today = None
-    authenticated_visitors_total = analytics_count_manager.fetch_visitors(
-        google_civic_election_id_zero, organization_we_vote_id_empty,
-        date_as_integer_zero, count_through_this_date_as_integer, limit_to_authenticated)
-    authenticated_visitors_today = analytics_count_manager.fetch_visitors(
-        google_civic_election_id_zero, organization_we_vote_id_empty,
-        limit_to_one_date_as_integer, date_as_integer_zero, limit_to_authenticated)
-    ballot_views_today = analytics_count_manager.fetch_ballot_views(
-        google_civic_election_id_zero, limit_to_one_date_as_integer)
-    voter_guides_viewed_total = analytics_count_manager.fetch_voter_guides_viewed(
-        google_civic_election_id_zero, date_as_integer_zero, count_through_this_date_as_integer)
-    voter_guides_viewed_today = analytics_count_manager.fetch_voter_guides_viewed(
-        google_civic_election_id_zero, limit_to_one_date_as_integer)
+
+    if are_analytics_rollups_complete_for_date(limit_to_one_date_as_integer):
+        # Read the counts from the rollup tables, instead of scanning every AnalyticsAction entry up to this date
+        status += "SITEWIDE_DAILY_METRICS_FROM_ROLLUPS "
+        rollup_counts = fetch_sitewide_daily_counts_from_rollups(limit_to_one_date_as_integer)
+        visitors_total = rollup_counts['visitors_total']
+        visitors_today = rollup_counts['visitors_today']
+        new_visitors_today = rollup_counts['new_visitors_today']
+        authenticated_visitors_total = rollup_counts['authenticated_visitors_total']
+        authenticated_visitors_today = rollup_counts['authenticated_visitors_today']
+        ballot_views_today = rollup_counts['ballot_views_today']
+        voter_guides_viewed_total = rollup_counts['voter_guides_viewed_total']
+        voter_guides_viewed_today = rollup_counts['voter_guides_viewed_today']
+    else:
+        visitors_total = analytics_count_manager.fetch_visitors(
+            google_civic_election_id_zero, organization_we_vote_id_empty, date_as_integer_zero,
+            count_through_this_date_as_integer)
+        visitors_today = analytics_count_manager.fetch_visitors(
+            google_civic_election_id_zero, organization_we_vote_id_empty, limit_to_one_date_as_integer)
+        new_visitors_today = None
+        authenticated_visitors_total = analytics_count_manager.fetch_visitors(
+            google_civic_election_id_zero, organization_we_vote_id_empty,
+            date_as_integer_zero, count_through_this_date_as_integer, limit_to_authenticated)
+        authenticated_visitors_today = analytics_count_manager.fetch_visitors(
+            google_civic_election_id_zero, organization_we_vote_id_empty,
+            limit_to_one_date_as_integer, date_as_integer_zero, limit_to_authenticated)
+        ballot_views_today = analytics_count_manager.fetch_ballot_views(
+            google_civic_election_id_zero, limit_to_one_date_as_integer)
+        voter_guides_viewed_total = analytics_count_manager.fetch_voter_guides_viewed(
+            google_civic_election_id_zero, date_as_integer_zero, count_through_this_date_as_integer)
+        voter_guides_viewed_today = analytics_count_manager.fetch_voter_guides_viewed(
+            google_civic_election_id_zero, limit_to_one_date_as_integer)
 
     issues_followed_total = follow_metrics_manager.fetch_issues_followed(
         voter_we_vote_id_empty, date_as_integer_zero, count_through_this_date_as_integer)
@@ -1260,10 +1361,11 @@ def calculate_sitewide_election_metrics(google_civic_election_id):
     return results
 
 
-def calculate_sitewide_voter_metrics_for_one_voter(voter_we_vote_id):
+def calculate_sitewide_voter_metrics_for_one_voter(voter_we_vote_id, use_rollups=False):
     """
     This voter's statistics across their entire history on We Vote
     :param voter_we_vote_id:
+    :param use_rollups: Read the AnalyticsAction counts from the rollup tables (which must be up-to-date)
     :return:
     """
     status = ""
@@ -1288,12 +1390,23 @@ def calculate_sitewide_voter_metrics_for_one_voter(voter_we_vote_id):
         signed_in_with_email = voter.signed_in_with_email()
         signed_in_with_sms_phone_number = voter.signed_in_with_sms_phone_number()
 
-    actions_count = analytics_count_manager.fetch_voter_action_count(voter_we_vote_id)
+    if use_rollups:
+        rollup_counts = fetch_voter_counts_from_rollups(voter_we_vote_id)
+        actions_count = rollup_counts['actions_count']
+        voter_guides_viewed = rollup_counts['voter_guides_viewed']
+        ballot_visited = rollup_counts['ballot_visited']
+        welcome_visited = rollup_counts['welcome_visited']
+        days_visited = rollup_counts['days_visited']
+        last_action_date = rollup_counts['last_action_date']
+    else:
+        actions_count = analytics_count_manager.fetch_voter_action_count(voter_we_vote_id)
+        voter_guides_viewed = analytics_count_manager.fetch_voter_voter_guides_viewed(voter_we_vote_id)
+        ballot_visited = analytics_count_manager.fetch_voter_ballot_visited(voter_we_vote_id)
+        welcome_visited = analytics_count_manager.fetch_voter_welcome_visited(voter_we_vote_id)
+        days_visited = analytics_count_manager.fetch_voter_days_visited(voter_we_vote_id)
+        last_action_date = analytics_count_manager.fetch_voter_last_action_date(voter_we_vote_id)
     seconds_on_site = None
     elections_viewed = None
-    voter_guides_viewed = analytics_count_manager.fetch_voter_voter_guides_viewed(voter_we_vote_id)
-    ballot_visited = analytics_count_manager.fetch_voter_ballot_visited(voter_we_vote_id)
-    welcome_visited = analytics_count_manager.fetch_voter_welcome_visited(voter_we_vote_id)
     entered_full_address = voter_metrics_manager.fetch_voter_entered_full_address(voter_id)
     issues_followed = follow_metrics_manager.fetch_issues_followed(voter_we_vote_id)
     organizations_followed = follow_metrics_manager.fetch_voter_organizations_followed(voter_id)
@@ -1304,8 +1417,6 @@ def calculate_sitewide_voter_metrics_for_one_voter(voter_we_vote_id):
     comments_entered_friends_only = position_metrics_manager.fetch_voter_comments_entered_friends_only(
         voter_we_vote_id)
     comments_entered_public = position_metrics_manager.fetch_voter_comments_entered_public(voter_we_vote_id)
-    days_visited = analytics_count_manager.fetch_voter_days_visited(voter_we_vote_id)
-    last_action_date = analytics_count_manager.fetch_voter_last_action_date(voter_we_vote_id)
 
     success = True
 
@@ -1375,6 +1486,8 @@ def delete_analytics_info_for_voter(voter_to_delete_we_vote_id):
 
         status += " DELETE_ANALYTICS_ACTION, moved: " + str(analytics_action_deleted) + \
                   ", not moved: " + str(analytics_action_not_deleted) + " "
+        rebuild_results = rebuild_analytics_rollups_for_voter_list([voter_to_delete_we_vote_id])
+        status += rebuild_results['status']
     else:
         status += " " + analytics_action_list_results['status']
 
@@ -1442,6 +1555,8 @@ def move_analytics_info_to_another_voter(from_voter_we_vote_id, to_voter_we_vote
 
         status += " MOVE_ANALYTICS_ACTION, moved: " + str(analytics_action_moved) + \
                   ", not moved: " + str(analytics_action_not_moved) + " "
+        rebuild_results = rebuild_analytics_rollups_for_voter_list([from_voter_we_vote_id, to_voter_we_vote_id])
+        status += rebuild_results['status']
     else:
         status += " " + analytics_action_list_results['status']
 
@@ -1618,6 +1733,9 @@ def save_sitewide_daily_metrics(date_as_integer, through_date_as_integer=0):
         date_as_integer_list = date_as_integer_results['date_as_integer_list']
 
     sitewide_daily_metrics_saved_count = 0
+    if len(date_as_integer_list):
+        # Once for all the dates, so each calculate_sitewide_daily_metrics can read the rollups
+        update_analytics_rollups()
     for one_date_as_integer in date_as_integer_list:
         results = calculate_sitewide_daily_metrics(one_date_as_integer)
         status += results['status']
@@ -1674,11 +1792,19 @@ def save_sitewide_voter_metrics(look_for_changes_since_this_date_as_integer, thr
     voter_we_vote_id_list_found = False
 
     analytics_manager = AnalyticsManager()
-    voter_list_results = analytics_manager.retrieve_voter_we_vote_id_list_with_changes_since(
-        look_for_changes_since_this_date_as_integer, through_date_as_integer)
-    if voter_list_results['voter_we_vote_id_list_found']:
-        voter_we_vote_id_list = voter_list_results['voter_we_vote_id_list']
+    update_analytics_rollups()
+    use_rollups = are_analytics_rollups_complete_for_date(through_date_as_integer)
+    if use_rollups:
+        status += "SITEWIDE_VOTER_METRICS_FROM_ROLLUPS "
+        voter_we_vote_id_list = [one_id for one_id in retrieve_voter_we_vote_id_list_from_rollups(
+            look_for_changes_since_this_date_as_integer, through_date_as_integer) if positive_value_exists(one_id)]
         voter_we_vote_id_list_found = True
+    else:
+        voter_list_results = analytics_manager.retrieve_voter_we_vote_id_list_with_changes_since(
+            look_for_changes_since_this_date_as_integer, through_date_as_integer)
+        if voter_list_results['voter_we_vote_id_list_found']:
+            voter_we_vote_id_list = voter_list_results['voter_we_vote_id_list']
+            voter_we_vote_id_list_found = True
 
     if positive_value_exists(voter_we_vote_id_list_found):
         # Remove the voter_we_vote_id's that have been updated already today
@@ -1698,7 +1824,7 @@ def save_sitewide_voter_metrics(look_for_changes_since_this_date_as_integer, thr
 
     if positive_value_exists(voter_we_vote_id_list_found):
         for voter_we_vote_id in voter_we_vote_id_list:
-            results = calculate_sitewide_voter_metrics_for_one_voter(voter_we_vote_id)
+            results = calculate_sitewide_voter_metrics_for_one_voter(voter_we_vote_id, use_rollups=use_rollups)
             status += results['status']
             if positive_value_exists(results['success']):
                 sitewide_voter_metrics_values = results['sitewide_voter_metrics_values']
@@ -0,0 +1,374 @@
+# analytics/controllers_rollup.py
+# Brought to you by We Vote. Be good.
+# -*- coding: UTF-8 -*-
+
+from datetime import timedelta
+from django.db import transaction
+from django.db.models import Max, Sum
+from django.utils.timezone import localtime, now
+from .models import AnalyticsAction, AnalyticsHourlyActionCount, AnalyticsRollupWatermark, \
+    AnalyticsVoterDailyRollup, AnalyticsVoterFirstVisit, AnalyticsVoterGuideDailyRollup, \
+    ACTION_BALLOT_VISIT, ACTION_VOTER_GUIDE_VISIT, ACTION_WELCOME_VISIT
+from config.base import get_environment_variable_default
+import wevote_functions.admin
+from wevote_functions.functions import convert_to_int, positive_value_exists
+from wevote_functions.functions_date import convert_date_to_date_as_integer
+
+logger = wevote_functions.admin.get_logger(__name__)
+
+# AnalyticsAction entries are folded into the rollup tables in id order, ANALYTICS_ROLLUP_CHUNK_SIZE at a time.
+#  Entries younger than ANALYTICS_ROLLUP_LAG_SECONDS are left for the next pass, so a batch still being written
+#  (with lower ids) isn't skipped over.
+ANALYTICS_ROLLUP_CHUNK_SIZE = convert_to_int(get_environment_variable_default('ANALYTICS_ROLLUP_CHUNK_SIZE', 5000))
+ANALYTICS_ROLLUP_LAG_SECONDS = convert_to_int(get_environment_variable_default('ANALYTICS_ROLLUP_LAG_SECONDS', 30))
+ANALYTICS_ROLLUP_WATERMARK_NAME = 'analytics_action'
+ANALYTICS_ACTION_ROLLUP_FIELD_LIST = [
+    'id', 'action_constant', 'date_as_integer', 'exact_time', 'voter_we_vote_id', 'organization_we_vote_id',
+    'is_signed_in']
+
+
+def aggregate_analytics_action_list(action_list):
+    """
+    Add up AnalyticsAction values() dicts (ANALYTICS_ACTION_ROLLUP_FIELD_LIST) by rollup row
+    :param action_list:
+    :return: dicts of rollup values by each rollup table's unique key
+    """
+    hourly_action_counts = {}
+    voter_daily_values = {}
+    voter_guide_daily_values = {}
+    voter_first_visit_values = {}
+    for one_action in action_list:
+        date_as_integer = convert_to_int(one_action['date_as_integer'])
+        if not positive_value_exists(date_as_integer):
+            continue
+        if one_action['exact_time'] is not None and positive_value_exists(one_action['action_constant']):
+            hourly_key = (date_as_integer, localtime(one_action['exact_time']).hour, one_action['action_constant'])
+            hourly_action_counts[hourly_key] = hourly_action_counts.get(hourly_key, 0) + 1
+
+        voter_we_vote_id = one_action['voter_we_vote_id']
+        if not positive_value_exists(voter_we_vote_id):
+            continue
+        is_signed_in = bool(one_action['is_signed_in'])
+        voter_daily = voter_daily_values.setdefault((date_as_integer, voter_we_vote_id), {
+            'action_count':         0,
+            'ballot_visit_count':   0,
+            'welcome_visit_count':  0,
+            'is_signed_in':         False,
+            'last_action_time':     None,
+        })
+        voter_daily['action_count'] += 1
+        if one_action['action_constant'] == ACTION_BALLOT_VISIT:
+            voter_daily['ballot_visit_count'] += 1
+        elif one_action['action_constant'] == ACTION_WELCOME_VISIT:
+            voter_daily['welcome_visit_count'] += 1
+        voter_daily['is_signed_in'] = voter_daily['is_signed_in'] or is_signed_in
+        voter_daily['last_action_time'] = latest_time(voter_daily['last_action_time'], one_action['exact_time'])
+
+        if one_action['action_constant'] == ACTION_VOTER_GUIDE_VISIT and \
+                positive_value_exists(one_action['organization_we_vote_id']):
+            voter_guide_daily = voter_guide_daily_values.setdefault(
+                (date_as_integer, one_action['organization_we_vote_id'], voter_we_vote_id),
+                {'visit_count': 0, 'is_signed_in': False})
+            voter_guide_daily['visit_count'] += 1
+            voter_guide_daily['is_signed_in'] = voter_guide_daily['is_signed_in'] or is_signed_in
+
+        voter_first_visit = voter_first_visit_values.setdefault(
+            (voter_we_vote_id,), {'first_date_as_integer': date_as_integer, 'first_signed_in_date_as_integer': None})
+        voter_first_visit['first_date_as_integer'] = min(voter_first_visit['first_date_as_integer'], date_as_integer)
+        if is_signed_in:
+            voter_first_visit['first_signed_in_date_as_integer'] = earliest_date_as_integer(
+                voter_first_visit['first_signed_in_date_as_integer'], date_as_integer)
+
+    return {
+        'hourly_action_counts':     hourly_action_counts,
+        'voter_daily_values':       voter_daily_values,
+        'voter_guide_daily_values': voter_guide_daily_values,
+        'voter_first_visit_values': voter_first_visit_values,
+    }
+
+
+def earliest_date_as_integer(date_as_integer_a, date_as_integer_b):
+    if not positive_value_exists(date_as_integer_a):
+        return date_as_integer_b
+    if not positive_value_exists(date_as_integer_b):
+        return date_as_integer_a
+    return min(date_as_integer_a, date_as_integer_b)
+
+
+def latest_time(time_a, time_b):
+    if time_a is None:
+        return time_b
+    if time_b is None:
+        return time_a
+    return max(time_a, time_b)
+
+
+def merge_voter_daily_values(existing_values, new_values):
+    return {
+        'action_count':         existing_values['action_count'] + new_values['action_count'],
+        'ballot_visit_count':   existing_values['ballot_visit_count'] + new_values['ballot_visit_count'],
+        'welcome_visit_count':  existing_values['welcome_visit_count'] + new_values['welcome_visit_count'],
+        'is_signed_in':         existing_values['is_signed_in'] or new_values['is_signed_in'],
+        'last_action_time':     latest_time(existing_values['last_action_time'], new_values['last_action_time']),
+    }
+
+
+def merge_voter_guide_daily_values(existing_values, new_values):
+    return {
+        'visit_count':  existing_values['visit_count'] + new_values['visit_count'],
+        'is_signed_in': existing_values['is_signed_in'] or new_values['is_signed_in'],
+    }
+
+
+def merge_voter_first_visit_values(existing_values, new_values):
+    return {
+        'first_date_as_integer': earliest_date_as_integer(
+            existing_values['first_date_as_integer'], new_values['first_date_as_integer']),
+        'first_signed_in_date_as_integer': earliest_date_as_integer(
+            existing_values['first_signed_in_date_as_integer'], new_values['first_signed_in_date_as_integer']),
+    }
+
+
+def save_rollup_values(model, key_field_list, values_by_key, merge_function):
+    """
+    Add values_by_key to the rollup rows already saved (merge_function(existing, new)), and save them all
+    with one upsert. Only call this while holding the watermark lock, so no one else changes these rows meanwhile.
+    """
+    if not values_by_key:
+        return 0
+    value_field_list = list(next(iter(values_by_key.values())).keys())
+    existing_query = model.objects.using('analytics').all()
+    for key_position, key_field in enumerate(key_field_list):
+        existing_query = existing_query.filter(**{
+            key_field + '__in': {one_key[key_position] for one_key in values_by_key}})
+    for existing_values in existing_query.values(*key_field_list, *value_field_list):
+        one_key = tuple(existing_values[key_field] for key_field in key_field_list)
+        if one_key in values_by_key:
+            values_by_key[one_key] = merge_function(existing_values, values_by_key[one_key])
+
+    rollup_list = [model(**dict(zip(key_field_list, one_key)), **one_values)
+                   for one_key, one_values in values_by_key.items()]
+    model.objects.using('analytics').bulk_create(
+        rollup_list, batch_size=1000, update_conflicts=True, unique_fields=key_field_list,
+        update_fields=value_field_list)
+    return len(rollup_list)
+
+
+def save_aggregated_analytics_actions(aggregated, include_hourly_action_counts=True):
+    if include_hourly_action_counts:
+        hourly_values_by_key = {one_key: {'action_count': action_count}
+                                for one_key, action_count in aggregated['hourly_action_counts'].items()}
+        save_rollup_values(
+            AnalyticsHourlyActionCount, ['date_as_integer', 'hour', 'action_constant'], hourly_values_by_key,
+            lambda existing_values, new_values: {
+                'action_count': existing_values['action_count'] + new_values['action_count']})
+    save_rollup_values(
+        AnalyticsVoterDailyRollup, ['date_as_integer', 'voter_we_vote_id'],
+        aggregated['voter_daily_values'], merge_voter_daily_values)
+    save_rollup_values(
+        AnalyticsVoterGuideDailyRollup, ['date_as_integer', 'organization_we_vote_id', 'voter_we_vote_id'],
+        aggregated['voter_guide_daily_values'], merge_voter_guide_daily_values)
+    save_rollup_values(
+        AnalyticsVoterFirstVisit, ['voter_we_vote_id'],
+        aggregated['voter_first_visit_values'], merge_voter_first_visit_values)
+
+
+def lock_analytics_rollup_watermark():
+    """
+    Call inside transaction.atomic(using='analytics')
+    :return: The watermark, locked until the transaction ends, or None if another process is folding right now
+    """
+    AnalyticsRollupWatermark.objects.using('analytics').get_or_create(name=ANALYTICS_ROLLUP_WATERMARK_NAME)
+    return AnalyticsRollupWatermark.objects.using('analytics') \
+        .select_for_update(skip_locked=True) \
+        .filter(name=ANALYTICS_ROLLUP_WATERMARK_NAME) \
+        .first()
+
+
+def fold_one_chunk_of_analytics_actions(chunk_size=ANALYTICS_ROLLUP_CHUNK_SIZE):
+    status = ""
+    success = True
+    actions_folded = 0
+    caught_up = False
+    try:
+        with transaction.atomic(using='analytics'):
+            watermark = lock_analytics_rollup_watermark()
+            if watermark is None:
+                status += "ANALYTICS_ROLLUP_ALREADY_RUNNING "
+                caught_up = True
+            else:
+                cutoff_time = now() - timedelta(seconds=ANALYTICS_ROLLUP_LAG_SECONDS)
+                action_list = list(AnalyticsAction.objects.using('analytics')
+                                   .filter(id__gt=watermark.last_analytics_action_id, exact_time__lte=cutoff_time)
+                                   .order_by('id')
+                                   .values(*ANALYTICS_ACTION_ROLLUP_FIELD_LIST)[:chunk_size])
+                save_aggregated_analytics_actions(aggregate_analytics_action_list(action_list))
+                actions_folded = len(action_list)
+                if actions_folded:
+                    watermark.last_analytics_action_id = action_list[-1]['id']
+                caught_up = actions_folded < chunk_size
+                if caught_up:
+                    watermark.rolled_up_through_time = cutoff_time
+                watermark.save()
+    except Exception as e:
+        success = False
+        status += "ANALYTICS_ROLLUP_FOLD_FAILED: " + str(e) + " "
+        logger.error(status)
+
+    results = {
+        'success':          success,
+        'status':           status,
+        'actions_folded':   actions_folded,
+        'caught_up':        caught_up,
+    }
+    return results
+
+
+def update_analytics_rollups(max_chunks=20):
+    """
+    Fold the AnalyticsAction entries saved since the watermark into the rollup tables. Run every few minutes by the
+    update_analytics_rollups management command, and once at the start of the metrics batch processes which read
+    the rollups. A calculation for a day the rollups haven't caught up with counts AnalyticsAction entries instead.
+    :param max_chunks: Stop after this many chunks (the first run works through all the history)
+    :return:
+    """
+    status = ""
+    success = True
+    actions_folded = 0
+    caught_up = False
+    for chunk_number in range(max(1, max_chunks)):
+        results = fold_one_chunk_of_analytics_actions()
+        status += results['status']
+        actions_folded += results['actions_folded']
+        caught_up = results['caught_up']
+        if not results['success']:
+            success = False
+            break
+        if caught_up:
+            break
+
+    results = {
+        'success':          success,
+        'status':           status,
+        'actions_folded':   actions_folded,
+        'caught_up':        caught_up,
+    }
+    return results
+
+
+def are_analytics_rollups_complete_for_date(date_as_integer):
+    """
+    The rollups can answer for date_as_integer once every action through the end of that day has been folded in.
+    For today, or 0 ("all time"), every action old enough to fold must be in, since the AnalyticsAction counts
+    they stand in for are as of now.
+    """
+    watermark_values = AnalyticsRollupWatermark.objects.using('analytics') \
+        .filter(name=ANALYTICS_ROLLUP_WATERMARK_NAME) \
+        .values_list('rolled_up_through_time', 'last_analytics_action_id') \
+        .first()
+    if watermark_values is None or watermark_values[0] is None:
+        # Still working through the history for the first time
+        return False
+    rolled_up_through_time, last_analytics_action_id = watermark_values
+    date_as_integer = convert_to_int(date_as_integer)
+    if positive_value_exists(date_as_integer) and \
+            convert_date_to_date_as_integer(localtime(rolled_up_through_time)) > date_as_integer:
+        # The last time the rollups caught up was after that day ended
+        return True
+    return not AnalyticsAction.objects.using('analytics') \
+        .filter(id__gt=last_analytics_action_id,
+                exact_time__lte=now() - timedelta(seconds=ANALYTICS_ROLLUP_LAG_SECONDS)) \
+        .exists()
+
+
+def rebuild_analytics_rollups_for_voter_list(voter_we_vote_id_list):
+    """
+    After AnalyticsAction entries are moved to another voter or deleted, rebuild those voters' rollup rows from
+    the entries already folded in. (AnalyticsHourlyActionCount counts actions when they happened, and is left as is.)
+    """
+    status = ""
+    success = True
+    voter_we_vote_id_list = [one_id for one_id in voter_we_vote_id_list if positive_value_exists(one_id)]
+    if not voter_we_vote_id_list:
+        return {'success': success, 'status': status}
+    try:
+        with transaction.atomic(using='analytics'):
+            AnalyticsRollupWatermark.objects.using('analytics').get_or_create(name=ANALYTICS_ROLLUP_WATERMARK_NAME)
+            # Wait for any fold in progress, so the rebuilt rows and the watermark agree
+            watermark = AnalyticsRollupWatermark.objects.using('analytics') \
+                .select_for_update() \
+                .get(name=ANALYTICS_ROLLUP_WATERMARK_NAME)
+            for model in [AnalyticsVoterDailyRollup, AnalyticsVoterGuideDailyRollup, AnalyticsVoterFirstVisit]:
+                model.objects.using('analytics').filter(voter_we_vote_id__in=voter_we_vote_id_list).delete()
+            action_list = AnalyticsAction.objects.using('analytics') \
+                .filter(voter_we_vote_id__in=voter_we_vote_id_list,
+                        id__lte=watermark.last_analytics_action_id) \
+                .values(*ANALYTICS_ACTION_ROLLUP_FIELD_LIST)
+            save_aggregated_analytics_actions(
+                aggregate_analytics_action_list(action_list), include_hourly_action_counts=False)
+            status += "ANALYTICS_ROLLUPS_REBUILT_FOR_VOTERS "
+    except Exception as e:
+        success = False
+        status += "ANALYTICS_ROLLUPS_NOT_REBUILT_FOR_VOTERS: " + str(e) + " "
+    return {'success': success, 'status': status}
+
+
+def fetch_sitewide_daily_counts_from_rollups(date_as_integer):
+    voter_daily_query = AnalyticsVoterDailyRollup.objects.using('analytics').filter(date_as_integer=date_as_integer)
+    first_visit_query = AnalyticsVoterFirstVisit.objects.using('analytics')
+    voter_guide_query = AnalyticsVoterGuideDailyRollup.objects.using('analytics')
+    return {
+        'visitors_total':               first_visit_query.filter(first_date_as_integer__lte=date_as_integer).count(),
+        'visitors_today':               voter_daily_query.count(),
+        'new_visitors_today':           first_visit_query.filter(first_date_as_integer=date_as_integer).count(),
+        'authenticated_visitors_total': first_visit_query.filter(
+            first_signed_in_date_as_integer__lte=date_as_integer).count(),
+        'authenticated_visitors_today': voter_daily_query.filter(is_signed_in=True).count(),
+        'ballot_views_today':           voter_daily_query.filter(ballot_visit_count__gt=0).count(),
+        'voter_guides_viewed_total':    voter_guide_query.filter(date_as_integer__lte=date_as_integer)
+        .values('organization_we_vote_id').distinct().count(),
+        'voter_guides_viewed_today':    voter_guide_query.filter(date_as_integer=date_as_integer)
+        .values('organization_we_vote_id').distinct().count(),
+    }
+
+
+def fetch_organization_daily_counts_from_rollups(organization_we_vote_id, date_as_integer):
+    # Totals are through date_as_integer, which is as far as are_analytics_rollups_complete_for_date checked
+    organization_query = AnalyticsVoterGuideDailyRollup.objects.using('analytics') \
+        .filter(organization_we_vote_id__iexact=organization_we_vote_id, date_as_integer__lte=date_as_integer)
+    today_query = organization_query.filter(date_as_integer=date_as_integer)
+    return {
+        'visitors_total':               organization_query.values('voter_we_vote_id').distinct().count(),
+        'authenticated_visitors_total': organization_query.filter(is_signed_in=True)
+        .values('voter_we_vote_id').distinct().count(),
+        'visitors_today':               today_query.values('voter_we_vote_id').distinct().count(),
+        'authenticated_visitors_today': today_query.filter(is_signed_in=True)
+        .values('voter_we_vote_id').distinct().count(),
+    }
+
+
+def fetch_voter_counts_from_rollups(voter_we_vote_id):
+    voter_daily_query = AnalyticsVoterDailyRollup.objects.using('analytics') \
+        .filter(voter_we_vote_id__iexact=voter_we_vote_id)
+    totals = voter_daily_query.aggregate(
+        actions_count=Sum('action_count'),
+        ballot_visited=Sum('ballot_visit_count'),
+        welcome_visited=Sum('welcome_visit_count'),
+        last_action_date=Max('last_action_time'))
+    return {
+        'actions_count':        totals['actions_count'] or 0,
+        'ballot_visited':       totals['ballot_visited'] or 0,
+        'welcome_visited':      totals['welcome_visited'] or 0,
+        'days_visited':         voter_daily_query.count(),
+        'last_action_date':     totals['last_action_date'],
+        'voter_guides_viewed':  AnalyticsVoterGuideDailyRollup.objects.using('analytics')
+        .filter(voter_we_vote_id__iexact=voter_we_vote_id)
+        .values('organization_we_vote_id').distinct().count(),
+    }
+
+
+def retrieve_voter_we_vote_id_list_from_rollups(date_as_integer, through_date_as_integer):
+    return list(AnalyticsVoterDailyRollup.objects.using('analytics')
+                .filter(date_as_integer__gte=date_as_integer, date_as_integer__lte=through_date_as_integer)
+                .values_list('voter_we_vote_id', flat=True)
+                .distinct())
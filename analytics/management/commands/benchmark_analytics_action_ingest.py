@@ -0,0 +1,60 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from analytics.controllers import save_analytics_action_list
+from analytics.models import ACTION_BALLOT_VISIT, AnalyticsAction, AnalyticsManager
+from wevote_functions.functions_write_behind import WriteBehindBuffer
+
+# Every AnalyticsAction this command saves has this voter_we_vote_id, so they can all be deleted afterwards
+BENCHMARK_VOTER_WE_VOTE_ID = 'wvbenchmarkanalyticsvoter'
+
+
+class Command(BaseCommand):
+    help = 'Compares saving saveAnalyticsAction entries one row at a time with the batched write-behind buffer, ' \
+           'against the analytics database. The benchmark rows are deleted at the end.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--actions', type=int, default=2000,
+                            help='Number of actions to save each way')
+        parser.add_argument('--batch_size', type=int, default=200,
+                            help='Actions per INSERT for the buffer (ANALYTICS_ACTION_BUFFER_BATCH_SIZE)')
+        parser.add_argument('--skip_per_row', action='store_true',
+                            help='Only time the batched inserts')
+
+    def handle(self, *args, **options):
+        action_count = options['actions']
+        analytics_manager = AnalyticsManager()
+        try:
+            if not options['skip_per_row']:
+                start_time = time.monotonic()
+                for action_number in range(action_count):
+                    analytics_manager.save_action(
+                        ACTION_BALLOT_VISIT, BENCHMARK_VOTER_WE_VOTE_ID, action_number, False, 'CA', '', 0, 0,
+                        'benchmark', False, False, True, False)
+                self.write_timing('one row at a time', action_count, time.monotonic() - start_time)
+
+            write_behind_buffer = WriteBehindBuffer(
+                'benchmark_analytics_action', save_analytics_action_list,
+                max_batch_size=options['batch_size'], max_buffered_items=action_count)
+            start_time = time.monotonic()
+            for action_number in range(action_count):
+                write_behind_buffer.add(analytics_manager.generate_action(
+                    ACTION_BALLOT_VISIT, BENCHMARK_VOTER_WE_VOTE_ID, action_number, False, 'CA', '', 0, 0,
+                    'benchmark', False, False, True, False))
+            accepted_seconds = time.monotonic() - start_time
+            write_behind_buffer.stop()
+            self.write_timing('batched (accepted)', action_count, accepted_seconds)
+            self.write_timing('batched (written)', action_count, time.monotonic() - start_time)
+            metrics = write_behind_buffer.fetch_metrics()
+            if metrics['dropped'] or metrics['flush_failures']:
+                self.stdout.write('{failures} failed batches, {dropped} actions dropped'.format(
+                    failures=metrics['flush_failures'], dropped=metrics['dropped']))
+        finally:
+            AnalyticsAction.objects.using('analytics').filter(
+                voter_we_vote_id=BENCHMARK_VOTER_WE_VOTE_ID).delete()
+
+    def write_timing(self, label, action_count, elapsed_seconds):
+        self.stdout.write('{label}: {count} actions in {seconds:.2f}s ({rate:.1f} per second)'.format(
+            label=label, count=action_count, seconds=elapsed_seconds,
+            rate=action_count / elapsed_seconds if elapsed_seconds else 0))
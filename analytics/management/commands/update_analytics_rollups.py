@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from analytics.controllers_rollup import update_analytics_rollups
+
+
+class Command(BaseCommand):
+    help = 'Folds AnalyticsAction entries saved since the last run into the metrics rollup tables. Schedule it ' \
+           'every few minutes. The first run works through all of the history, which can take a while.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--max_chunks', type=int, default=100000,
+                            help='Stop after this many chunks of ANALYTICS_ROLLUP_CHUNK_SIZE actions')
+
+    def handle(self, *args, **options):
+        results = update_analytics_rollups(max_chunks=options['max_chunks'])
+        self.stdout.write('actions folded: {actions_folded}, caught up: {caught_up} {status}'.format(
+            actions_folded=results['actions_folded'], caught_up=results['caught_up'], status=results['status']))
@@ -648,6 +648,55 @@ class AnalyticsManager(models.Manager):
         }
         return results
 
+    @staticmethod
+    def generate_action(
+            action_constant,
+            voter_we_vote_id,
+            voter_id,
+            is_signed_in,
+            state_code,
+            organization_we_vote_id,
+            organization_id,
+            google_civic_election_id,
+            user_agent_string,
+            is_bot,
+            is_mobile,
+            is_desktop,
+            is_tablet,
+            ballot_item_we_vote_id="",
+            politician_we_vote_id=None):
+        """
+        An unsaved AnalyticsAction with the same values create_action_type1 / create_action_type2 would save, for
+        save_action_list. date_as_integer is filled in now, since bulk_create doesn't call save().
+        """
+        action = AnalyticsAction(
+            action_constant=action_constant,
+            voter_we_vote_id=voter_we_vote_id,
+            voter_id=voter_id,
+            is_signed_in=is_signed_in,
+            state_code=state_code,
+            organization_we_vote_id=organization_we_vote_id,
+            politician_we_vote_id=politician_we_vote_id,
+            google_civic_election_id=google_civic_election_id,
+            ballot_item_we_vote_id=ballot_item_we_vote_id,
+            user_agent=user_agent_string,
+            is_bot=is_bot,
+            is_mobile=is_mobile,
+            is_desktop=is_desktop,
+            is_tablet=is_tablet
+        )
+        if action_constant in ACTIONS_THAT_REQUIRE_ORGANIZATION_IDS:
+            action.organization_id = organization_id
+        action.generate_date_as_integer()
+        return action
+
+    @staticmethod
+    def save_action_list(action_list, batch_size=500):
+        """
+        Save many AnalyticsAction entries (from generate_action) in a few INSERT statements
+        """
+        return AnalyticsAction.objects.using('analytics').bulk_create(action_list, batch_size=batch_size)
+
     @staticmethod
     def create_action_type2(
             action_constant,
@@ -1740,6 +1789,80 @@ class AnalyticsProcessed(models.Model):
     kind_of_process = models.CharField(max_length=50, null=True, unique=False)
 
 
+class AnalyticsRollupWatermark(models.Model):
+    """
+    How far the incremental rollups (see analytics/controllers_rollup.py) have read into AnalyticsAction.
+    Every AnalyticsAction with an id up to last_analytics_action_id has been folded into the rollup tables.
+    """
+    name = models.CharField(max_length=50, null=False, unique=True)
+    last_analytics_action_id = models.BigIntegerField(default=0)
+    # Every action saved before this time has been folded in, so days before this are complete in the rollups
+    rolled_up_through_time = models.DateTimeField(null=True)
+    date_last_updated = models.DateTimeField(null=True, auto_now=True)
+
+
+class AnalyticsHourlyActionCount(models.Model):
+    """
+    How many times each action was taken, by hour (Pacific Time, like date_as_integer)
+    """
+    date_as_integer = models.PositiveIntegerField(verbose_name="YYYYMMDD of the action", null=False)
+    hour = models.PositiveSmallIntegerField(null=False)
+    action_constant = models.PositiveSmallIntegerField(null=False)
+    action_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['date_as_integer', 'hour', 'action_constant'], name='hourly_action_count_unique'),
+        ]
+
+
+class AnalyticsVoterDailyRollup(models.Model):
+    """
+    One row per voter per day they took any action, so daily visitor counts don't re-scan AnalyticsAction
+    """
+    date_as_integer = models.PositiveIntegerField(verbose_name="YYYYMMDD of the action", null=False, db_index=True)
+    voter_we_vote_id = models.CharField(max_length=255, null=False, db_index=True)
+    action_count = models.PositiveIntegerField(default=0)
+    ballot_visit_count = models.PositiveIntegerField(default=0)
+    welcome_visit_count = models.PositiveIntegerField(default=0)
+    # At least one action this day was taken while signed in
+    is_signed_in = models.BooleanField(default=False)
+    last_action_time = models.DateTimeField(null=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['date_as_integer', 'voter_we_vote_id'], name='voter_daily_rollup_unique'),
+        ]
+
+
+class AnalyticsVoterGuideDailyRollup(models.Model):
+    """
+    One row per voter per organization voter guide per day (ACTION_VOTER_GUIDE_VISIT)
+    """
+    date_as_integer = models.PositiveIntegerField(verbose_name="YYYYMMDD of the action", null=False, db_index=True)
+    organization_we_vote_id = models.CharField(max_length=255, null=False, db_index=True)
+    voter_we_vote_id = models.CharField(max_length=255, null=False, db_index=True)
+    visit_count = models.PositiveIntegerField(default=0)
+    is_signed_in = models.BooleanField(default=False)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['date_as_integer', 'organization_we_vote_id', 'voter_we_vote_id'],
+                name='voter_guide_daily_rollup_unique'),
+        ]
+
+
+class AnalyticsVoterFirstVisit(models.Model):
+    """
+    The first day we saw each voter (and saw them signed in), for the "all time" visitor counts
+    """
+    voter_we_vote_id = models.CharField(max_length=255, null=False, unique=True)
+    first_date_as_integer = models.PositiveIntegerField(null=False, db_index=True)
+    first_signed_in_date_as_integer = models.PositiveIntegerField(null=True, db_index=True)
+
+
 class OrganizationDailyMetrics(models.Model):
     """
     This is a summary of the organization activity on one day.
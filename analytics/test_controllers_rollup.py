@@ -0,0 +1,61 @@
+# analytics/test_controllers_rollup.py
+# Brought to you by We Vote. Be good.
+# -*- coding: UTF-8 -*-
+
+from datetime import datetime, timezone
+from django.test import SimpleTestCase
+from .controllers_rollup import aggregate_analytics_action_list, merge_voter_daily_values, \
+    merge_voter_first_visit_values
+from .models import ACTION_BALLOT_VISIT, ACTION_VOTER_GUIDE_VISIT
+
+
+def generate_action(action_id, action_constant, date_as_integer, voter_we_vote_id, is_signed_in=False,
+                    organization_we_vote_id=None, hour=12):
+    return {
+        'id':                       action_id,
+        'action_constant':          action_constant,
+        'date_as_integer':          date_as_integer,
+        'exact_time':               datetime(2024, 11, 5, hour, tzinfo=timezone.utc),
+        'voter_we_vote_id':         voter_we_vote_id,
+        'organization_we_vote_id':  organization_we_vote_id,
+        'is_signed_in':             is_signed_in,
+    }
+
+
+class AnalyticsRollupTests(SimpleTestCase):
+
+    def test_aggregate_analytics_action_list(self):
+        aggregated = aggregate_analytics_action_list([
+            generate_action(1, ACTION_BALLOT_VISIT, 20241105, 'wvvoter1'),
+            generate_action(2, ACTION_BALLOT_VISIT, 20241105, 'wvvoter1', is_signed_in=True),
+            generate_action(3, ACTION_VOTER_GUIDE_VISIT, 20241105, 'wvvoter2', organization_we_vote_id='wvorg1'),
+            generate_action(4, ACTION_VOTER_GUIDE_VISIT, 20241104, 'wvvoter2', organization_we_vote_id='wvorg1'),
+            generate_action(5, ACTION_BALLOT_VISIT, 20241105, ''),
+        ])
+        voter1_daily = aggregated['voter_daily_values'][(20241105, 'wvvoter1')]
+        self.assertEqual(voter1_daily['action_count'], 2)
+        self.assertEqual(voter1_daily['ballot_visit_count'], 2)
+        self.assertTrue(voter1_daily['is_signed_in'])
+        self.assertEqual(len(aggregated['voter_daily_values']), 3)
+        self.assertEqual(aggregated['voter_guide_daily_values'][(20241105, 'wvorg1', 'wvvoter2')]['visit_count'], 1)
+        self.assertEqual(aggregated['voter_first_visit_values'][('wvvoter2',)]['first_date_as_integer'], 20241104)
+        self.assertEqual(
+            aggregated['voter_first_visit_values'][('wvvoter1',)]['first_signed_in_date_as_integer'], 20241105)
+        # Actions without a voter are still counted by hour
+        self.assertEqual(sum(aggregated['hourly_action_counts'].values()), 5)
+
+    def test_merge_with_existing_rollups(self):
+        merged = merge_voter_daily_values(
+            {'action_count': 3, 'ballot_visit_count': 1, 'welcome_visit_count': 0, 'is_signed_in': True,
+             'last_action_time': datetime(2024, 11, 5, 9, tzinfo=timezone.utc)},
+            {'action_count': 2, 'ballot_visit_count': 0, 'welcome_visit_count': 1, 'is_signed_in': False,
+             'last_action_time': datetime(2024, 11, 5, 10, tzinfo=timezone.utc)})
+        self.assertEqual(merged['action_count'], 5)
+        self.assertEqual(merged['welcome_visit_count'], 1)
+        self.assertTrue(merged['is_signed_in'])
+        self.assertEqual(merged['last_action_time'].hour, 10)
+
+        merged = merge_voter_first_visit_values(
+            {'first_date_as_integer': 20241101, 'first_signed_in_date_as_integer': None},
+            {'first_date_as_integer': 20241105, 'first_signed_in_date_as_integer': 20241105})
+        self.assertEqual(merged, {'first_date_as_integer': 20241101, 'first_signed_in_date_as_integer': 20241105})
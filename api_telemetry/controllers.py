@@ -0,0 +1,175 @@
+# api_telemetry/controllers.py
+# Brought to you by We Vote. Be good.
+# -*- coding: UTF-8 -*-
+
+"""
+Counts of the calls we make to outside APIs (CTCL, Google Civic, Twitter, SendGrid...). record_api_call only adds
+the call to an in-process buffer. Every API_TELEMETRY_FLUSH_SECONDS a background thread adds up what is waiting by
+(provider, kind_of_action, google_civic_election_id, minute) and saves one ApiCallMinuteCount row per key, so a bulk
+import making thousands of calls a minute writes a handful of rows instead of one row per call.
+retrieve_api_call_summaries adds the rows up by day, week or month for the admin pages.
+"""
+
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+from django.db import connections
+from django.db.models import Max, Sum
+from django.db.models.functions import TruncDay, TruncMonth, TruncWeek
+from django.utils.timezone import now
+from config.base import get_environment_variable_default
+from .models import ApiCallMinuteCount
+import wevote_functions.admin
+from wevote_functions.functions import convert_to_int, positive_value_exists
+from wevote_functions.functions_write_behind import WriteBehindBuffer
+
+logger = wevote_functions.admin.get_logger(__name__)
+
+API_TELEMETRY_FLUSH_SECONDS = float(get_environment_variable_default('API_TELEMETRY_FLUSH_SECONDS', 60))
+API_CALL_SUMMARY_PERIOD_DAY = 'day'
+API_CALL_SUMMARY_PERIOD_WEEK = 'week'
+API_CALL_SUMMARY_PERIOD_MONTH = 'month'
+# How to group the minutes for each period, and how far back to look
+API_CALL_SUMMARY_PERIODS = {
+    API_CALL_SUMMARY_PERIOD_DAY:    (TruncDay, timedelta(days=365)),
+    API_CALL_SUMMARY_PERIOD_WEEK:   (TruncWeek, timedelta(days=2 * 365)),
+    API_CALL_SUMMARY_PERIOD_MONTH:  (TruncMonth, timedelta(days=3 * 365)),
+}
+
+
+def generate_api_call_key(provider, kind_of_action, google_civic_election_id, minute_of_call):
+    return provider, kind_of_action or '', convert_to_int(google_civic_election_id), minute_of_call
+
+
+def aggregate_api_call_list(api_call_list):
+    """
+    :param api_call_list: (key, call_count, failure_count, item_count, latency_ms or None) tuples from record_api_call
+    :return: dict of key -> the values for its ApiCallMinuteCount
+    """
+    values_by_key = {}
+    for one_key, call_count, failure_count, item_count, latency_ms in api_call_list:
+        values = values_by_key.get(one_key)
+        if values is None:
+            values = {'call_count': 0, 'failure_count': 0, 'item_count': 0, 'timed_call_count': 0,
+                      'total_latency_ms': 0, 'maximum_latency_ms': 0}
+            values_by_key[one_key] = values
+        values['call_count'] += call_count
+        values['failure_count'] += failure_count
+        values['item_count'] += item_count
+        if latency_ms is not None:
+            values['timed_call_count'] += 1
+            values['total_latency_ms'] += latency_ms
+            values['maximum_latency_ms'] = max(values['maximum_latency_ms'], latency_ms)
+    return values_by_key
+
+
+def save_api_call_list(api_call_list):
+    # The buffer's thread keeps its own connection, so make sure it is still good before each batch
+    connections['default'].close_if_unusable_or_obsolete()
+    ApiCallMinuteCount.objects.bulk_create([
+        ApiCallMinuteCount(
+            provider=provider,
+            kind_of_action=kind_of_action,
+            google_civic_election_id=google_civic_election_id,
+            minute_of_call=minute_of_call,
+            **values)
+        for (provider, kind_of_action, google_civic_election_id, minute_of_call), values
+        in aggregate_api_call_list(api_call_list).items()])
+
+
+api_call_buffer = WriteBehindBuffer(
+    'api_call_telemetry',
+    save_api_call_list,
+    max_batch_size=10000,
+    max_delay_seconds=API_TELEMETRY_FLUSH_SECONDS,
+    max_buffered_items=100000)
+
+
+def record_api_call(provider, kind_of_action='', google_civic_election_id=0, success=True, latency_seconds=None,
+                    item_count=0, call_count=1):
+    """
+    Count one call to an outside API. Never raises, since counting must not break the call it is counting.
+    :param provider: One of the API_PROVIDER_* constants
+    :param kind_of_action:
+    :param google_civic_election_id:
+    :param success:
+    :param latency_seconds: How long the call took, if it was timed
+    :param item_count: For APIs which take many items per call
+    :param call_count: 0 to record a failure found out about after the call was counted
+    :return:
+    """
+    try:
+        minute_of_call = now().replace(second=0, microsecond=0)
+        api_call_buffer.add((
+            generate_api_call_key(provider, kind_of_action, google_civic_election_id, minute_of_call),
+            call_count,
+            0 if success else 1,
+            convert_to_int(item_count),
+            int(latency_seconds * 1000) if latency_seconds is not None else None,
+        ))
+    except Exception as e:
+        logger.error("record_api_call: " + str(e))
+
+
+@contextmanager
+def api_call_timer(provider, kind_of_action='', google_civic_election_id=0, item_count=0):
+    """
+    Times the calls made inside the with block, and counts them as one call (failed if the block raises)
+    """
+    start_time = time.monotonic()
+    success = False
+    try:
+        yield
+        success = True
+    finally:
+        record_api_call(provider, kind_of_action, google_civic_election_id=google_civic_election_id, success=success,
+                        latency_seconds=time.monotonic() - start_time, item_count=item_count)
+
+
+def retrieve_api_call_summaries(provider, period=API_CALL_SUMMARY_PERIOD_DAY, kind_of_action='',
+                                google_civic_election_id=0, periods_to_display=30):
+    """
+    Calls to one provider added up by day, week or month, most recent first. Periods without calls are left out.
+    Calls still waiting in a server's buffer (up to API_TELEMETRY_FLUSH_SECONDS) aren't included yet.
+    :return: list of dicts with date_string (the first day of the period), count, total_count, succeeding_count,
+      failing_count, item_count, average_latency_ms and maximum_latency_ms
+    """
+    summary_list = []
+    trunc_function, look_back = API_CALL_SUMMARY_PERIODS.get(period, API_CALL_SUMMARY_PERIODS['day'])
+    try:
+        queryset = ApiCallMinuteCount.objects.using('readonly') \
+            .filter(provider=provider, minute_of_call__gte=now() - look_back)
+        if positive_value_exists(kind_of_action):
+            queryset = queryset.filter(kind_of_action=kind_of_action)
+        if positive_value_exists(google_civic_election_id):
+            queryset = queryset.filter(google_civic_election_id=convert_to_int(google_civic_election_id))
+        period_list = queryset \
+            .annotate(period_start=trunc_function('minute_of_call')) \
+            .values('period_start') \
+            .annotate(
+                total_count=Sum('call_count'),
+                failing_count=Sum('failure_count'),
+                item_count=Sum('item_count'),
+                timed_call_count=Sum('timed_call_count'),
+                total_latency_ms=Sum('total_latency_ms'),
+                maximum_latency_ms=Max('maximum_latency_ms')) \
+            .order_by('-period_start')[:periods_to_display]
+        for one_period in period_list:
+            total_count = one_period['total_count'] or 0
+            failing_count = one_period['failing_count'] or 0
+            summary_list.append({
+                'date_string':          one_period['period_start'].date(),
+                'count':                total_count,
+                'total_count':          total_count,
+                'succeeding_count':     max(total_count - failing_count, 0),
+                'failing_count':        failing_count,
+                'item_count':           one_period['item_count'] or 0,
+                'average_latency_ms':
+                    one_period['total_latency_ms'] // one_period['timed_call_count']
+                    if one_period['timed_call_count'] else None,
+                'maximum_latency_ms':
+                    one_period['maximum_latency_ms'] if one_period['timed_call_count'] else None,
+            })
+    except Exception as e:
+        logger.error("retrieve_api_call_summaries: " + str(e))
+    return summary_list
@@ -0,0 +1,42 @@
+# api_telemetry/models.py
+# Brought to you by We Vote. Be good.
+# -*- coding: UTF-8 -*-
+
+from django.db import models
+
+API_PROVIDER_BALLOTPEDIA = 'BALLOTPEDIA'
+API_PROVIDER_CTCL = 'CTCL'
+API_PROVIDER_GOOGLE_CIVIC = 'GOOGLE_CIVIC'
+API_PROVIDER_OPEN_PEOPLE = 'OPEN_PEOPLE'
+API_PROVIDER_SENDGRID = 'SENDGRID'
+API_PROVIDER_SNOVIO = 'SNOVIO'
+API_PROVIDER_TARGETSMART = 'TARGETSMART'
+API_PROVIDER_TWITTER = 'TWITTER'
+API_PROVIDER_VOTE_SMART = 'VOTE_SMART'
+API_PROVIDER_VOTE_USA = 'VOTE_USA'
+
+
+class ApiCallMinuteCount(models.Model):
+    """
+    The calls one server process made to a provider's API, for one kind of action and election, during one minute.
+    Each process saves its own rows every time it flushes, so several rows can share a key, and the summaries add
+    them up. This replaces saving one *ApiCounter row per call.
+    """
+    provider = models.CharField(max_length=50, null=False)
+    kind_of_action = models.CharField(max_length=50, default='', blank=True)
+    google_civic_election_id = models.PositiveIntegerField(default=0, db_index=True)
+    # The start of the minute the calls were made in
+    minute_of_call = models.DateTimeField(null=False)
+    call_count = models.PositiveIntegerField(default=0)
+    failure_count = models.PositiveIntegerField(default=0)
+    # For the APIs which take many items per call (ex/ emails looked up in one SnovIO call)
+    item_count = models.PositiveIntegerField(default=0)
+    # Only some calls are timed, so the average latency is total_latency_ms / timed_call_count
+    timed_call_count = models.PositiveIntegerField(default=0)
+    total_latency_ms = models.BigIntegerField(default=0)
+    maximum_latency_ms = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['provider', 'minute_of_call'], name='api_call_provider_minute'),
+        ]
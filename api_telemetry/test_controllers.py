@@ -0,0 +1,29 @@
+# api_telemetry/test_controllers.py
+# Brought to you by We Vote. Be good.
+# -*- coding: UTF-8 -*-
+
+from datetime import datetime, timezone
+from django.test import SimpleTestCase
+from .controllers import aggregate_api_call_list, generate_api_call_key
+from .models import API_PROVIDER_CTCL, API_PROVIDER_SENDGRID
+
+
+class ApiTelemetryTests(SimpleTestCase):
+
+    def test_aggregate_api_call_list(self):
+        minute_of_call = datetime(2024, 11, 5, 12, 30, tzinfo=timezone.utc)
+        ctcl_key = generate_api_call_key(API_PROVIDER_CTCL, 'voterinfo', '4000', minute_of_call)
+        sendgrid_key = generate_api_call_key(API_PROVIDER_SENDGRID, 'mail-send', 0, minute_of_call)
+        values_by_key = aggregate_api_call_list([
+            (ctcl_key, 1, 0, 0, 200),
+            (ctcl_key, 1, 1, 0, 900),
+            (ctcl_key, 1, 0, 0, None),
+            # A failure found out about after the call was counted
+            (ctcl_key, 0, 1, 0, None),
+            (sendgrid_key, 1, 0, 250, 40),
+        ])
+        self.assertEqual(ctcl_key, (API_PROVIDER_CTCL, 'voterinfo', 4000, minute_of_call))
+        self.assertEqual(values_by_key[ctcl_key], {
+            'call_count': 3, 'failure_count': 2, 'item_count': 0, 'timed_call_count': 2,
+            'total_latency_ms': 1100, 'maximum_latency_ms': 900})
+        self.assertEqual(values_by_key[sendgrid_key]['item_count'], 250)
@@ -2,75 +2,71 @@
 # Brought to you by We Vote. Be good.
 # -*- coding: UTF-8 -*-
 
+import gzip
+
 from django.http import HttpResponse
 
 import wevote_functions.admin
 from config.base import get_environment_variable
-from googlebot_site_map.views_admin import log_request, get_googlebot_map_file_body, get_googlebot_map_xml_body
-from politician.models import Politician
+from googlebot_site_map.controllers import SITE_MAP_KIND_HTML, SITE_MAP_KIND_XML, retrieve_site_map_file_path
+from googlebot_site_map.views_admin import get_site_map_shard_number, log_request
 
 logger = wevote_functions.admin.get_logger(__name__)
 
 WE_VOTE_SERVER_ROOT_URL = get_environment_variable("WE_VOTE_SERVER_ROOT_URL")
+EMPTY_SITE_MAP_XML = '<?xml version="1.0" encoding="UTF-8"?>\n' \
+    '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n</urlset>'
+
+
+def site_map_file_response(request, file_path, content_type):
+    # The files are stored gzipped, so crawlers which accept gzip get them as they are
+    with open(file_path, 'rb') as site_map_file:
+        body = site_map_file.read()
+    if 'gzip' in request.headers.get('accept-encoding', ''):
+        response = HttpResponse(body, content_type=content_type)
+        response['Content-Encoding'] = 'gzip'
+    else:
+        response = HttpResponse(gzip.decompress(body), content_type=content_type)
+    response['Vary'] = 'Accept-Encoding'
+    return response
 
 
 # To test XML queries from Chrome try the "Tabbed Postman - REST Client"
 # https://chromewebstore.google.com/detail/tabbed-postman-rest-clien/coohjcphdfgbiolnekdpbcijmhambjff?hl=en-US&utm_source=ext_sidebar
 # Add a header "content-type" "application/xml", put in the URL and press Send
 # Test url is https://wevotedeveloper.com:8000/apis/v1/googlebotSiteMap/sitemap_index.xml
-def xml_for_n_maps(n):
-    xml = '<?xml version="1.0" encoding="UTF-8"?>\n'
-    xml += '<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">'
-    for i in range(n):
-        xml += '  <sitemap>'
-        xml += '    <loc>https://wevote.us/map%s.xml</loc>' % (i)
-        xml += '  </sitemap>'
-    xml += '</sitemapindex>'
-    return xml
-
-
-# Test url is https://wevotedeveloper.com:8000/apis/v1/googlebotSiteMap/map1.xml
 def get_sitemap_index_xml(request):
     log_request(request)
 
     try:
-        politician_count = Politician.objects.using('readonly').all().count()
-        float_n = politician_count / 40000
-        if float_n < 1:
-            n = 1
-        else:
-            n = int(float_n) + 1
-
-        xml = xml_for_n_maps(n)
+        return site_map_file_response(request, retrieve_site_map_file_path(SITE_MAP_KIND_XML), 'application/xml')
     except Exception as e:
-        logger.error('googlebot_site_map get_sitemap_index_xml threw ', e)
-        xml = "error"
-
-    return HttpResponse(xml)
+        logger.error('googlebot_site_map get_sitemap_index_xml threw ' + str(e))
+        return HttpResponse("error")
 
 
 def get_sitemap_text_file(request):
     log_request(request)
 
-    # print(request)
-    html = "<html><body>"
     try:
-        html += get_googlebot_map_file_body(request)
+        file_path = retrieve_site_map_file_path(SITE_MAP_KIND_HTML, get_site_map_shard_number(request))
+        if file_path is None:
+            return HttpResponse("<html><body></body></html>", status=404)
+        return site_map_file_response(request, file_path, 'text/html')
     except Exception as e:
-        logger.error('googlebost_site_map get_sitemap_text_file threw ', e)
-    html += "</html></body><br>"
-    return HttpResponse(html)
+        logger.error('googlebot_site_map get_sitemap_text_file threw ' + str(e))
+        return HttpResponse("<html><body></body></html>")
 
 
+# Test url is https://wevotedeveloper.com:8000/apis/v1/googlebotSiteMap/map1.xml
 def get_sitemap_xml_file(request):
     log_request(request)
 
-    # print(request)
-    xml = '<?xml version="1.0" encoding="UTF-8"?>\n'
-    xml += '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
     try:
-        xml += get_googlebot_map_xml_body(request)
+        file_path = retrieve_site_map_file_path(SITE_MAP_KIND_XML, get_site_map_shard_number(request))
+        if file_path is None:
+            return HttpResponse(EMPTY_SITE_MAP_XML, content_type='application/xml', status=404)
+        return site_map_file_response(request, file_path, 'application/xml')
     except Exception as e:
-        logger.error('get_sitemap_xml_file get_googlebot_map_xml_body threw ', e)
-    xml += "</urlset>"
-    return HttpResponse(xml)
+        logger.error('get_sitemap_xml_file threw ' + str(e))
+        return HttpResponse(EMPTY_SITE_MAP_XML, content_type='application/xml')
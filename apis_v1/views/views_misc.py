@@ -8,9 +8,11 @@ import sys
 from office.controllers import office_retrieve_for_api
 from quick_info.controllers import quick_info_retrieve_for_api
 from search.controllers import search_all_for_api
+from search.models import SEARCH_RESULTS_LIMIT_DEFAULT
 import wevote_functions.admin
 from voter.models import VoterDeviceLinkManager
-from wevote_functions.functions import generate_voter_device_id, get_voter_device_id, positive_value_exists
+from wevote_functions.functions import convert_to_int, generate_voter_device_id, get_voter_device_id, \
+    positive_value_exists
 
 logger = wevote_functions.admin.get_logger(__name__)
 
@@ -120,7 +122,9 @@ def search_all_view(request):  # searchAll
     search_scope_list = request.GET.getlist('search_scope_list[]')
     search_scope_list = list(filter(None, search_scope_list))
     # search_scope_list options
-    # PN = POLITICIAN_NAME
+    # PN = POLITICIAN_NAME, CN = CANDIDATE_NAME, ON = ORGANIZATION_NAME, MN = MEASURE_NAME
+    offset = convert_to_int(request.GET.get('offset', 0))
+    limit = convert_to_int(request.GET.get('limit', SEARCH_RESULTS_LIMIT_DEFAULT))
 
     if not positive_value_exists(text_from_search_field):
         status = 'MISSING_TEXT_FROM_SEARCH_FIELD'
@@ -136,7 +140,9 @@ def search_all_view(request):  # searchAll
     results = search_all_for_api(
         text_from_search_field=text_from_search_field,
         voter_device_id=voter_device_id,
-        search_scope_list=search_scope_list)
+        search_scope_list=search_scope_list,
+        offset=offset,
+        limit=limit)
     # results = search_all_elastic_for_api(text_from_search_field, voter_device_id)  #
     status = "UNABLE_TO_FIND_ANY_SEARCH_RESULTS "
     search_results = []
@@ -152,6 +158,9 @@ def search_all_view(request):  # searchAll
         'text_from_search_field':   text_from_search_field,
         'voter_device_id':          voter_device_id,
         'search_results':           search_results,
+        'search_results_total':     results['search_results_total'],
+        'offset':                   results['offset'],
+        'limit':                    results['limit'],
     }
     return HttpResponse(json.dumps(json_data), content_type='application/json')
 
@@ -3,50 +3,74 @@
 # -*- coding: UTF-8 -*-
 import json
 
-from django.http import HttpResponse
+from django.http import HttpResponse, StreamingHttpResponse
 
 import wevote_functions.admin
-from config.base import get_environment_variable
-from retrieve_tables.controllers_master import fast_load_status_retrieve, retrieve_sql_tables_as_csv, \
-    get_total_row_count
+from config.base import get_environment_variable, get_environment_variable_default
+from retrieve_tables.controllers_master import fast_load_status_retrieve, retrieve_sql_table_as_gzip_csv_file, \
+    get_total_row_count, stream_file_and_close
 from retrieve_tables.controllers_master import fast_load_status_update
-from wevote_functions.functions import get_voter_api_device_id
+from wevote_functions.functions import convert_to_int, positive_value_exists
 
 logger = wevote_functions.admin.get_logger(__name__)
 
 WE_VOTE_SERVER_ROOT_URL = get_environment_variable("WE_VOTE_SERVER_ROOT_URL")
+RETRIEVE_SQL_TABLES_ON = positive_value_exists(get_environment_variable_default('RETRIEVE_SQL_TABLES_ON', False))
 
 
 def retrieve_sql_tables(request):  # retrieveSQLTables
     """
     Retrieve the SQL tables that would otherwise be synchronized via the "Sync Data with Master We Vote Servers" menu
+    The table (or the start..end id range of it) is streamed back as a gzip compressed, pipe delimited CSV file,
+    with the highest id in the table in the X-Max-Id header.  Errors come back as JSON.
     :param request:
     :return:
     """
     table_name = request.GET.get('table_name', 'bad_table_param_error')
-    start = request.GET.get('start', '')
-    end = request.GET.get('end', '')
-    voter_api_device_id = get_voter_api_device_id(request)
-
-    # print("retrieveSQLTables voter_api_device_id: ", voter_api_device_id)
-    # DALE 2024-08-30 TURNING OFF DUE TO SERVER OVERLOAD
-    # json_data = retrieve_sql_tables_as_csv(voter_api_device_id, table_name, start, end)
-
-    # Temporary solution
-    status = ''
-    status += "Retrieving SQL tables: " + table_name + " " + start + " " + end + ""
-    status += "TURNED OFF DUE TO SERVER OVERLOAD Please contact Dale for more information. "
-    json_data = {
-        'success': False,
-        'status': status,
-    }
+    start = convert_to_int(request.GET.get('start', 0))
+    end = convert_to_int(request.GET.get('end', 0))
+    changed_since = request.GET.get('changed_since', '')
+    since_id = convert_to_int(request.GET.get('since_id', 0))
 
-    return HttpResponse(json.dumps(json_data), content_type='application/json')
+    if not RETRIEVE_SQL_TABLES_ON:
+        # DALE 2024-08-30 TURNED OFF DUE TO SERVER OVERLOAD, set RETRIEVE_SQL_TABLES_ON on a process server
+        status = ''
+        status += "Retrieving SQL tables: " + table_name + " " + str(start) + " " + str(end) + ""
+        status += "TURNED OFF DUE TO SERVER OVERLOAD Please contact Dale for more information. "
+        json_data = {
+            'success': False,
+            'status': status,
+        }
+        return HttpResponse(json.dumps(json_data), content_type='application/json')
+
+    results = retrieve_sql_table_as_gzip_csv_file(
+        table_name, start=start, end=end, changed_since=changed_since, since_id=since_id)
+    if not results['success']:
+        json_data = {
+            'success': False,
+            'status': results['status'],
+        }
+        # 503 tells the developer's server to try again in a little while. A JSON answer with a 200 tells it
+        #  not to retry, since the table can't be exported (an unknown table, or an error other than a timeout).
+        return HttpResponse(json.dumps(json_data), content_type='application/json',
+                            status=503 if results['server_busy'] else 200)
+
+    response = StreamingHttpResponse(stream_file_and_close(results['csv_gzip_file']), content_type='application/gzip')
+    response['X-Max-Id'] = str(results['max_id'])
+    return response
 
 
 def retrieve_sql_tables_row_count(request):  # retrieveSQLTablesRowCount
+    row_count = get_total_row_count()
+    if row_count is None:
+        json_data = {
+            'success': False,
+            'status': "RETRIEVE_SQL_TABLES_ALL_CONNECTIONS_IN_USE ",
+        }
+        # Same as retrieveSQLTables: 503 tells the developer's server to try again in a little while
+        return HttpResponse(json.dumps(json_data), content_type='application/json', status=503)
     json_data = {
-        'rowCount': str(get_total_row_count())
+        'rowCount': str(row_count)
     }
     return HttpResponse(json.dumps(json_data), content_type='application/json')
 
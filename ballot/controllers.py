@@ -5,6 +5,7 @@
 from .models import BallotItemListManager, BallotItemManager, BallotReturnedListManager, BallotReturnedManager, \
     CANDIDATE, find_best_previously_stored_ballot_returned, OFFICE, MEASURE, \
     VoterBallotSaved, VoterBallotSavedManager
+from .controllers_ballot_politician_index import retrieve_politician_we_vote_ids_from_ballot_politician_index
 from candidate.models import CandidateListManager
 from config.base import get_environment_variable
 from datetime import datetime, timedelta
@@ -16,7 +17,7 @@ from import_export_google_civic.controllers import \
     refresh_voter_ballot_items_from_google_civic_from_voter_ballot_saved, \
     voter_ballot_items_retrieve_from_google_civic_for_api
 from measure.models import ContestMeasureListManager, ContestMeasureManager
-from office.models import ContestOfficeManager, ContestOfficeListManager
+from office.models import ContestOfficeListManager
 from polling_location.models import PollingLocationManager
 import pytz
 from voter.models import BALLOT_ADDRESS, VoterAddress, VoterAddressManager, VoterDeviceLinkManager, VoterManager
@@ -2692,7 +2693,8 @@ def retrieve_politician_we_vote_ids_voter_can_vote_for(
         voter_id=0,
         polling_location_we_vote_id=''):
     """
-
+    The politicians on this map point's ballot (or the voter's own ballot) in the upcoming elections, read from
+    BallotPoliticianIndex
     :param voter_device_id:
     :param voter_id:
     :param polling_location_we_vote_id:
@@ -2701,14 +2703,10 @@ def retrieve_politician_we_vote_ids_voter_can_vote_for(
 
     status = ""
     success = True
-    ballot_item_list_manager = BallotItemListManager()
-    candidate_list_object = CandidateListManager()
     election_manager = ElectionManager()
 
-    ballot_item_list = []
     politician_we_vote_id_list_found = False
     politician_we_vote_id_list = []
-    results = {}
 
     upcoming_google_civic_election_id_list = []
     upcoming_results = election_manager.retrieve_upcoming_google_civic_election_id_list(
@@ -2716,57 +2714,23 @@ def retrieve_politician_we_vote_ids_voter_can_vote_for(
     )
     if upcoming_results['upcoming_google_civic_election_id_list_found']:
         upcoming_google_civic_election_id_list = upcoming_results['upcoming_google_civic_election_id_list']
-    try:
-        if positive_value_exists(polling_location_we_vote_id):
-            results = ballot_item_list_manager.retrieve_all_ballot_items_for_polling_location(
-                polling_location_we_vote_id=polling_location_we_vote_id,
-                google_civic_election_id_list=upcoming_google_civic_election_id_list,
-                ignore_ballot_item_order=True,
-                read_only=True)
-            success = results['success']
-            status += results['status']
-            ballot_item_list = results['ballot_item_list']
-        elif positive_value_exists(voter_id):
-            results = ballot_item_list_manager.retrieve_all_ballot_items_for_voter(
-                voter_id=voter_id,
-                google_civic_election_id_list=upcoming_google_civic_election_id_list,
-                ignore_ballot_item_order=True,
-                read_only=True)
-            success = results['success']
-            status += results['status']
-            ballot_item_list = results['ballot_item_list']
-        else:
-            success = False
-            status += "MISSING_POLLING_LOCATION_AND_VOTER_ID "
-    except Exception as e:
-        status += 'FAILED voter_ballot_items_retrieve. ' \
-                  '{error} [type: {error_type}]'.format(error=e, error_type=type(e))
-        handle_exception(e, logger=logger, exception_message=status)
+    if positive_value_exists(polling_location_we_vote_id):
+        ballot_key = (polling_location_we_vote_id, 0)
+    elif positive_value_exists(voter_id):
+        ballot_key = ('', convert_to_int(voter_id))
+    else:
+        ballot_key = None
         success = False
+        status += "MISSING_POLLING_LOCATION_AND_VOTER_ID "
 
     if success:
-        status += "LOOKING_FOR_POLITICIANS-BALLOT_ITEM_LIST_FOUND "
-        office_we_vote_id_list = []
-        measure_we_vote_id_list = []
-        for ballot_item in ballot_item_list:
-            if positive_value_exists(ballot_item.contest_office_we_vote_id):
-                if ballot_item.contest_office_we_vote_id not in office_we_vote_id_list:
-                    office_we_vote_id_list.append(ballot_item.contest_office_we_vote_id)
-            elif positive_value_exists(ballot_item.contest_measure_we_vote_id):
-                if ballot_item.contest_measure_we_vote_id not in measure_we_vote_id_list:
-                    measure_we_vote_id_list.append(ballot_item.contest_measure_we_vote_id)
-
-        if len(office_we_vote_id_list) > 0:
-            results = candidate_list_object.retrieve_candidate_we_vote_id_list_from_office_list(
-                contest_office_we_vote_id_list=office_we_vote_id_list
-            )
-            candidate_we_vote_id_list = results['candidate_we_vote_id_list']
-            if len(candidate_we_vote_id_list) > 0:
-                results = candidate_list_object.retrieve_politician_we_vote_id_list_from_candidate_we_vote_id_list(
-                    candidate_we_vote_id_list=candidate_we_vote_id_list)
-                politician_we_vote_id_list = results['politician_we_vote_id_list']
-                if len(politician_we_vote_id_list) > 0:
-                    politician_we_vote_id_list_found = True
+        status += "LOOKING_FOR_POLITICIANS-BALLOT_POLITICIAN_INDEX "
+        results = retrieve_politician_we_vote_ids_from_ballot_politician_index(
+            [ballot_key], upcoming_google_civic_election_id_list)
+        success = results['success']
+        status += results['status']
+        politician_we_vote_id_list = results['politician_we_vote_id_list']
+        politician_we_vote_id_list_found = results['politician_we_vote_id_list_found']
 
     results = {
         'status':                           status,
@@ -2859,15 +2823,26 @@ def generate_ballot_item_list_from_object_list(
     status = ''
     success = True
 
-    contest_office_manager = ContestOfficeManager()
-    candidate_list_object = CandidateListManager()
-
     # Loop through measures to make sure we have full measure data needed
     contest_measure_we_vote_id_list = []
+    contest_office_we_vote_id_list = []
     for ballot_item in ballot_item_object_list:
         if ballot_item.contest_measure_we_vote_id and \
                 ballot_item.contest_measure_we_vote_id not in contest_measure_we_vote_id_list:
             contest_measure_we_vote_id_list.append(ballot_item.contest_measure_we_vote_id)
+        if ballot_item.contest_office_we_vote_id and \
+                ballot_item.contest_office_we_vote_id not in contest_office_we_vote_id_list:
+            contest_office_we_vote_id_list.append(ballot_item.contest_office_we_vote_id)
+
+    # Retrieve all offices, candidates, candidate-to-office links and elections for this ballot with
+    #  a constant number of queries, no matter how long the ballot is
+    office_results = retrieve_offices_and_candidates_for_ballot(contest_office_we_vote_id_list)
+    status += office_results['status']
+    candidate_list_by_office_we_vote_id = office_results['candidate_list_by_office_we_vote_id']
+    candidate_to_office_link_list_by_candidate_we_vote_id = \
+        office_results['candidate_to_office_link_list_by_candidate_we_vote_id']
+    election_dict = office_results['election_dict']
+    office_dict = office_results['office_dict']
 
     measure_results_dict = {}
     if len(contest_measure_we_vote_id_list) > 0:
@@ -2892,38 +2867,32 @@ def generate_ballot_item_list_from_object_list(
             office_we_vote_id = ballot_item.contest_office_we_vote_id
             primary_party = ""
             race_office_level = ""
-            if positive_value_exists(office_we_vote_id):
-                office_results = contest_office_manager.retrieve_contest_office_from_we_vote_id(
-                    office_we_vote_id, read_only=True)
-                if office_results['contest_office_found']:
-                    contest_office = office_results['contest_office']
-                    office_id = contest_office.id
-                    office_name = contest_office.office_name
-                    primary_party = contest_office.primary_party
-                    race_office_level = contest_office.ballotpedia_race_office_level
+            if positive_value_exists(office_we_vote_id) and office_we_vote_id in office_dict:
+                contest_office = office_dict[office_we_vote_id]
+                office_id = contest_office.id
+                office_name = contest_office.office_name
+                primary_party = contest_office.primary_party
+                race_office_level = contest_office.ballotpedia_race_office_level
+            candidates_to_display = []
             try:
-                results = candidate_list_object.retrieve_all_candidates_for_office(
-                    office_we_vote_id=office_we_vote_id, read_only=True)
-
-                candidates_to_display = []
-                if results['candidate_list_found']:
-                    candidate_list = results['candidate_list']
-                    for candidate in candidate_list:
-                        candidate_dict_results = generate_candidate_dict_from_candidate_object(
-                            candidate=candidate,
-                            google_civic_election_id=google_civic_election_id,
-                            office_id=office_id,
-                            office_name=office_name,
-                            office_we_vote_id=office_we_vote_id,
-                        )
-                        if candidate_dict_results['success']:
-                            candidate_dict = candidate_dict_results['candidate_dict']
-                            candidates_to_display.append(candidate_dict)
+                for candidate in candidate_list_by_office_we_vote_id.get(office_we_vote_id, []):
+                    candidate_dict_results = generate_candidate_dict_from_candidate_object(
+                        candidate=candidate,
+                        candidate_to_office_link_list_from_multiple_candidates=
+                        candidate_to_office_link_list_by_candidate_we_vote_id.get(candidate.we_vote_id, []),
+                        election_dict=election_dict,
+                        google_civic_election_id=google_civic_election_id,
+                        office_dict=office_dict,
+                        office_id=office_id,
+                        office_name=office_name,
+                        office_we_vote_id=office_we_vote_id,
+                    )
+                    if candidate_dict_results['success']:
+                        candidate_dict = candidate_dict_results['candidate_dict']
+                        candidates_to_display.append(candidate_dict)
             except Exception as e:
-                status += 'FAILED retrieve_all_candidates_for_office. ' + str(e) + " "
+                status += 'FAILED generate_candidate_dict_from_candidate_object. ' + str(e) + " "
                 candidates_to_display = []
-                if hasattr(results, 'status'):
-                    status += results['status'] + " "
 
             if len(candidates_to_display):
                 one_ballot_item = {
@@ -3007,6 +2976,95 @@ def generate_ballot_item_list_from_object_list(
     return results
 
 
+def retrieve_offices_and_candidates_for_ballot(contest_office_we_vote_id_list=[], read_only=True):
+    """
+    Bulk retrieve everything generate_ballot_item_list_from_object_list needs for the offices on one ballot.
+    The number of queries does not depend on the number of offices or candidates.
+    :param contest_office_we_vote_id_list:
+    :param read_only:
+    :return:
+    """
+    candidate_list_by_office_we_vote_id = {}
+    candidate_to_office_link_list_by_candidate_we_vote_id = {}
+    election_dict = {}
+    office_dict = {}
+    status = ''
+    success = True
+
+    if not positive_value_exists(len(contest_office_we_vote_id_list)):
+        results = {
+            'status':                                   status,
+            'success':                                  success,
+            'candidate_list_by_office_we_vote_id':      candidate_list_by_office_we_vote_id,
+            'candidate_to_office_link_list_by_candidate_we_vote_id':
+                candidate_to_office_link_list_by_candidate_we_vote_id,
+            'election_dict':                            election_dict,
+            'office_dict':                              office_dict,
+        }
+        return results
+
+    # Candidates for every office on this ballot
+    candidate_list_manager = CandidateListManager()
+    results = candidate_list_manager.retrieve_all_candidates_for_office_list(
+        office_we_vote_id_list=contest_office_we_vote_id_list, read_only=read_only)
+    if not results['success']:
+        status += results['status']
+        success = False
+    candidate_list = results['candidate_list']
+    candidate_list_by_office_we_vote_id = results['candidate_list_by_office_we_vote_id']
+
+    # Every office link for these candidates (a candidate can be in more than one race), for contest_office_list
+    office_we_vote_id_list = list(contest_office_we_vote_id_list)
+    election_id_list = []
+    if len(candidate_list) > 0:
+        results = candidate_list_manager.retrieve_candidate_to_office_link_list(
+            candidate_we_vote_id_list=[candidate.we_vote_id for candidate in candidate_list],
+            read_only=read_only)
+        if not results['success']:
+            status += results['status']
+            success = False
+        for candidate_to_office_link in results['candidate_to_office_link_list']:
+            candidate_to_office_link_list_by_candidate_we_vote_id.setdefault(
+                candidate_to_office_link.candidate_we_vote_id, []).append(candidate_to_office_link)
+            if positive_value_exists(candidate_to_office_link.contest_office_we_vote_id) and \
+                    candidate_to_office_link.contest_office_we_vote_id not in office_we_vote_id_list:
+                office_we_vote_id_list.append(candidate_to_office_link.contest_office_we_vote_id)
+            election_id_integer = convert_to_int(candidate_to_office_link.google_civic_election_id)
+            if positive_value_exists(election_id_integer) and election_id_integer not in election_id_list:
+                election_id_list.append(election_id_integer)
+
+    office_list_manager = ContestOfficeListManager()
+    results = office_list_manager.retrieve_offices(
+        retrieve_from_this_office_we_vote_id_list=office_we_vote_id_list,
+        return_list_of_objects=True,
+        read_only=read_only)
+    if results['office_list_found']:
+        for one_office in results['office_list_objects']:
+            if positive_value_exists(one_office.we_vote_id):
+                office_dict[one_office.we_vote_id] = one_office
+    elif not results['success']:
+        status += results['status']
+        success = False
+
+    if len(election_id_list) > 0:
+        election_manager = ElectionManager()
+        results = election_manager.retrieve_elections_by_google_civic_election_id_list(
+            google_civic_election_id_list=election_id_list, read_only=read_only)
+        for one_election in results['election_list']:
+            election_dict[convert_to_int(one_election.google_civic_election_id)] = one_election
+
+    results = {
+        'status':                                   status,
+        'success':                                  success,
+        'candidate_list_by_office_we_vote_id':      candidate_list_by_office_we_vote_id,
+        'candidate_to_office_link_list_by_candidate_we_vote_id':
+            candidate_to_office_link_list_by_candidate_we_vote_id,
+        'election_dict':                            election_dict,
+        'office_dict':                              office_dict,
+    }
+    return results
+
+
 def ballot_item_highlights_retrieve_for_api(starting_year):  # ballotItemHighlightsRetrieve
     from candidate.controllers import retrieve_candidate_list_for_all_prior_elections_this_year, \
         retrieve_candidate_list_for_all_upcoming_elections
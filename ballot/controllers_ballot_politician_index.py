@@ -0,0 +1,369 @@
+# ballot/controllers_ballot_politician_index.py
+# Brought to you by We Vote. Be good.
+# -*- coding: UTF-8 -*-
+
+"""
+Which politicians can be voted for on each ballot, precomputed in BallotPoliticianIndex. One row per map point ballot
+(polling_location_we_vote_id) and per voter's own ballot (voter_id), holding the politician we_vote_ids by upcoming
+election. Saving or deleting a BallotItem or a CandidateToOfficeLink, or linking a CandidateCampaign to another
+politician, calls queue_ballot_politician_index_update, and a background thread rebuilds each ballot waiting, a few
+hundred ballots per set of queries. The update_ballot_politician_index management command rebuilds every upcoming
+ballot (run nightly), which also catches changes made with queryset.update().
+"""
+
+import json
+from django.db import connections
+from django.db.models import Q
+from django.utils.timezone import now
+from candidate.models import CandidateCampaign, CandidateToOfficeLink
+from config.base import get_environment_variable_default
+from election.models import ElectionManager
+from .models import BallotItem, BallotPoliticianIndex, VoterBallotSaved
+import wevote_functions.admin
+from wevote_functions.functions import convert_to_int, positive_value_exists
+from wevote_functions.functions_write_behind import WriteBehindBuffer
+
+logger = wevote_functions.admin.get_logger(__name__)
+
+BALLOT_POLITICIAN_INDEX_MAX_DELAY_SECONDS = \
+    float(get_environment_variable_default('BALLOT_POLITICIAN_INDEX_MAX_DELAY_SECONDS', 5))
+# Ballots rebuilt per set of queries
+BALLOT_POLITICIAN_INDEX_BATCH_SIZE = 500
+KIND_OF_CHANGE_BALLOT = 'BALLOT'
+KIND_OF_CHANGE_OFFICE = 'OFFICE'
+
+
+def generate_ballot_key_list_for_ballot_item(polling_location_we_vote_id='', voter_id=0):
+    """
+    The ballots a ballot item shows up on: retrieve_all_ballot_items_for_polling_location looks ballot items up by
+    polling_location_we_vote_id alone, and retrieve_all_ballot_items_for_voter by voter_id alone
+    :return: list of (polling_location_we_vote_id, 0) and ('', voter_id) keys
+    """
+    ballot_key_list = []
+    if positive_value_exists(polling_location_we_vote_id):
+        ballot_key_list.append((polling_location_we_vote_id, 0))
+    if positive_value_exists(voter_id):
+        ballot_key_list.append(('', convert_to_int(voter_id)))
+    return ballot_key_list
+
+
+def combine_politician_we_vote_ids_by_ballot(
+        ballot_key_list, ballot_item_list, candidate_to_office_link_list, candidate_politician_list):
+    """
+    :param ballot_key_list: Every ballot being rebuilt, so ballots without any politicians are stored as empty
+    :param ballot_item_list: (polling_location_we_vote_id, voter_id, google_civic_election_id,
+      contest_office_we_vote_id) tuples
+    :param candidate_to_office_link_list: (contest_office_we_vote_id, candidate_we_vote_id) tuples
+    :param candidate_politician_list: (candidate_we_vote_id, politician_we_vote_id) tuples
+    :return: dict of ballot key -> {google_civic_election_id (str): sorted list of politician we_vote_ids}
+    """
+    candidate_we_vote_ids_by_office = {}
+    for contest_office_we_vote_id, candidate_we_vote_id in candidate_to_office_link_list:
+        candidate_we_vote_ids_by_office.setdefault(contest_office_we_vote_id, set()).add(candidate_we_vote_id)
+    politician_we_vote_ids_by_candidate = {}
+    for candidate_we_vote_id, politician_we_vote_id in candidate_politician_list:
+        if positive_value_exists(politician_we_vote_id):
+            politician_we_vote_ids_by_candidate.setdefault(candidate_we_vote_id, set()).add(politician_we_vote_id)
+
+    ballot_key_set = set(ballot_key_list)
+    politician_sets_by_ballot = {ballot_key: {} for ballot_key in ballot_key_set}
+    for polling_location_we_vote_id, voter_id, google_civic_election_id, contest_office_we_vote_id \
+            in ballot_item_list:
+        politician_we_vote_id_set = set()
+        for candidate_we_vote_id in candidate_we_vote_ids_by_office.get(contest_office_we_vote_id, ()):
+            politician_we_vote_id_set.update(politician_we_vote_ids_by_candidate.get(candidate_we_vote_id, ()))
+        for ballot_key in generate_ballot_key_list_for_ballot_item(polling_location_we_vote_id, voter_id):
+            if ballot_key in ballot_key_set:
+                politician_sets_by_ballot[ballot_key].setdefault(str(google_civic_election_id), set()).update(
+                    politician_we_vote_id_set)
+    return {
+        ballot_key: {
+            google_civic_election_id: sorted(politician_we_vote_id_set)
+            for google_civic_election_id, politician_we_vote_id_set in politician_sets.items()
+            if politician_we_vote_id_set}
+        for ballot_key, politician_sets in politician_sets_by_ballot.items()}
+
+
+def calculate_politician_we_vote_ids_by_ballot(ballot_key_list, google_civic_election_id_list, read_only=False):
+    """
+    Walk ballot items -> offices -> candidates -> politicians for many ballots at once, in three queries
+    :param ballot_key_list: (polling_location_we_vote_id, 0) and ('', voter_id) keys
+    :param google_civic_election_id_list: Only ballot items in these elections
+    :param read_only: False when rebuilding after a change, so a lagging replica can't hide the change
+    :return: dict of ballot key -> {google_civic_election_id (str): sorted list of politician we_vote_ids}
+    """
+    database_name = 'readonly' if read_only else 'default'
+    polling_location_we_vote_id_list = [ballot_key[0] for ballot_key in ballot_key_list if ballot_key[0]]
+    voter_id_list = [ballot_key[1] for ballot_key in ballot_key_list if not ballot_key[0]]
+    ballot_item_list = []
+    if len(google_civic_election_id_list) and (len(polling_location_we_vote_id_list) or len(voter_id_list)):
+        ballot_item_list = list(
+            BallotItem.objects.using(database_name)
+            .filter(Q(polling_location_we_vote_id__in=polling_location_we_vote_id_list) |
+                    Q(voter_id__in=voter_id_list),
+                    google_civic_election_id__in=[str(one_id) for one_id in google_civic_election_id_list])
+            .exclude(Q(contest_office_we_vote_id__isnull=True) | Q(contest_office_we_vote_id=''))
+            .values_list('polling_location_we_vote_id', 'voter_id', 'google_civic_election_id',
+                         'contest_office_we_vote_id')
+            .distinct())
+
+    candidate_to_office_link_list = []
+    contest_office_we_vote_id_list = list(set(ballot_item[3] for ballot_item in ballot_item_list))
+    if len(contest_office_we_vote_id_list):
+        candidate_to_office_link_list = list(
+            CandidateToOfficeLink.objects.using(database_name)
+            .filter(contest_office_we_vote_id__in=contest_office_we_vote_id_list)
+            .values_list('contest_office_we_vote_id', 'candidate_we_vote_id'))
+
+    candidate_politician_list = []
+    candidate_we_vote_id_list = list(set(link[1] for link in candidate_to_office_link_list))
+    if len(candidate_we_vote_id_list):
+        candidate_politician_list = list(
+            CandidateCampaign.objects.using(database_name)
+            .filter(we_vote_id__in=candidate_we_vote_id_list)
+            .exclude(Q(politician_we_vote_id__isnull=True) | Q(politician_we_vote_id=''))
+            .values_list('we_vote_id', 'politician_we_vote_id'))
+
+    return combine_politician_we_vote_ids_by_ballot(
+        ballot_key_list, ballot_item_list, candidate_to_office_link_list, candidate_politician_list)
+
+
+def retrieve_ballot_politician_index_election_id_list():
+    # Every upcoming election, not just the ones listed for voters, so an election can be listed without a rebuild
+    results = ElectionManager().retrieve_upcoming_google_civic_election_id_list()
+    return results['upcoming_google_civic_election_id_list']
+
+
+def update_ballot_politician_index(ballot_key_list, google_civic_election_id_list=None):
+    """
+    Recalculate the politicians on these ballots from the primary database, and store them
+    :param ballot_key_list: (polling_location_we_vote_id, 0) and ('', voter_id) keys
+    :param google_civic_election_id_list: The upcoming elections, if the caller already has them
+    :return:
+    """
+    status = ""
+    success = True
+    updated_count = 0
+    ballot_key_list = list(set(ballot_key_list))
+    try:
+        if google_civic_election_id_list is None:
+            google_civic_election_id_list = retrieve_ballot_politician_index_election_id_list()
+        politician_we_vote_ids_by_ballot = calculate_politician_we_vote_ids_by_ballot(
+            ballot_key_list, google_civic_election_id_list)
+
+        polling_location_we_vote_id_list = [ballot_key[0] for ballot_key in ballot_key_list if ballot_key[0]]
+        voter_id_list = [ballot_key[1] for ballot_key in ballot_key_list if not ballot_key[0]]
+        existing_index_by_ballot = {}
+        for ballot_politician_index in BallotPoliticianIndex.objects.filter(
+                Q(polling_location_we_vote_id__in=polling_location_we_vote_id_list) |
+                Q(polling_location_we_vote_id__isnull=True, voter_id__in=voter_id_list)):
+            existing_index_by_ballot[ballot_politician_index.fetch_ballot_key()] = ballot_politician_index
+
+        date_last_calculated = now()
+        index_to_update_list = []
+        index_to_create_list = []
+        for ballot_key, politician_we_vote_ids_by_election in politician_we_vote_ids_by_ballot.items():
+            politician_we_vote_ids_json = json.dumps(politician_we_vote_ids_by_election, sort_keys=True)
+            ballot_politician_index = existing_index_by_ballot.get(ballot_key)
+            if ballot_politician_index is None:
+                index_to_create_list.append(BallotPoliticianIndex(
+                    polling_location_we_vote_id=ballot_key[0] or None,
+                    voter_id=ballot_key[1],
+                    politician_we_vote_ids_json=politician_we_vote_ids_json,
+                    date_last_calculated=date_last_calculated))
+            else:
+                ballot_politician_index.politician_we_vote_ids_json = politician_we_vote_ids_json
+                ballot_politician_index.date_last_calculated = date_last_calculated
+                index_to_update_list.append(ballot_politician_index)
+        if len(index_to_update_list):
+            BallotPoliticianIndex.objects.bulk_update(
+                index_to_update_list, ['politician_we_vote_ids_json', 'date_last_calculated'])
+        if len(index_to_create_list):
+            # Another server may have indexed the same new ballot a moment ago, from the same data
+            BallotPoliticianIndex.objects.bulk_create(index_to_create_list, ignore_conflicts=True)
+        updated_count = len(index_to_update_list) + len(index_to_create_list)
+        status += "BALLOT_POLITICIAN_INDEX_UPDATED "
+    except Exception as e:
+        success = False
+        status += "BALLOT_POLITICIAN_INDEX_NOT_UPDATED: " + str(e) + " "
+        logger.error(status)
+    return {
+        'success':          success,
+        'status':           status,
+        'updated_count':    updated_count,
+    }
+
+
+def retrieve_ballot_key_list_for_offices(contest_office_we_vote_id_list, google_civic_election_id_list):
+    ballot_key_set = set()
+    ballot_item_query = BallotItem.objects \
+        .filter(contest_office_we_vote_id__in=contest_office_we_vote_id_list,
+                google_civic_election_id__in=[str(one_id) for one_id in google_civic_election_id_list]) \
+        .values_list('polling_location_we_vote_id', 'voter_id') \
+        .distinct()
+    for polling_location_we_vote_id, voter_id in ballot_item_query.iterator():
+        ballot_key_set.update(generate_ballot_key_list_for_ballot_item(polling_location_we_vote_id, voter_id))
+    return list(ballot_key_set)
+
+
+def update_ballot_politician_index_for_change_list(change_list):
+    # The buffer's thread keeps its own connection, so make sure it is still good before each batch
+    connections['default'].close_if_unusable_or_obsolete()
+    ballot_key_set = set()
+    contest_office_we_vote_id_set = set()
+    for kind_of_change, changed_value in change_list:
+        if kind_of_change == KIND_OF_CHANGE_OFFICE:
+            contest_office_we_vote_id_set.add(changed_value)
+        else:
+            ballot_key_set.add(changed_value)
+    google_civic_election_id_list = retrieve_ballot_politician_index_election_id_list()
+    if len(contest_office_we_vote_id_set) and len(google_civic_election_id_list):
+        # An office on a statewide ballot can be on thousands of map point ballots
+        ballot_key_set.update(retrieve_ballot_key_list_for_offices(
+            list(contest_office_we_vote_id_set), google_civic_election_id_list))
+
+    ballot_key_list = sorted(ballot_key_set)
+    for start in range(0, len(ballot_key_list), BALLOT_POLITICIAN_INDEX_BATCH_SIZE):
+        # update_ballot_politician_index logs its own failures, which the nightly rebuild will pick up, so one bad
+        #  batch isn't retried over and over
+        update_ballot_politician_index(
+            ballot_key_list[start:start + BALLOT_POLITICIAN_INDEX_BATCH_SIZE],
+            google_civic_election_id_list=google_civic_election_id_list)
+
+
+ballot_politician_index_buffer = WriteBehindBuffer(
+    'ballot_politician_index',
+    update_ballot_politician_index_for_change_list,
+    max_batch_size=2000,
+    max_delay_seconds=BALLOT_POLITICIAN_INDEX_MAX_DELAY_SECONDS,
+    max_buffered_items=50000)
+
+
+def queue_ballot_politician_index_update(polling_location_we_vote_id='', voter_id=0, contest_office_we_vote_id=''):
+    """
+    Rebuild the index for the ballots this ballot item is on, or for every upcoming ballot with this office, soon.
+    Never raises, since it is called from the save signals.
+    """
+    try:
+        for ballot_key in generate_ballot_key_list_for_ballot_item(polling_location_we_vote_id, voter_id):
+            ballot_politician_index_buffer.add((KIND_OF_CHANGE_BALLOT, ballot_key))
+        if positive_value_exists(contest_office_we_vote_id):
+            ballot_politician_index_buffer.add((KIND_OF_CHANGE_OFFICE, contest_office_we_vote_id))
+    except Exception as e:
+        logger.error("queue_ballot_politician_index_update: " + str(e))
+
+
+def queue_ballot_politician_index_update_for_candidate(candidate_we_vote_id):
+    """
+    Rebuild the index for every upcoming ballot with one of this candidate's offices, soon.
+    Never raises, since it is called from the save signals.
+    """
+    if not positive_value_exists(candidate_we_vote_id):
+        return
+    try:
+        contest_office_we_vote_id_list = CandidateToOfficeLink.objects \
+            .filter(candidate_we_vote_id=candidate_we_vote_id) \
+            .values_list('contest_office_we_vote_id', flat=True) \
+            .distinct()
+        for contest_office_we_vote_id in contest_office_we_vote_id_list:
+            queue_ballot_politician_index_update(contest_office_we_vote_id=contest_office_we_vote_id)
+    except Exception as e:
+        logger.error("queue_ballot_politician_index_update_for_candidate: " + str(e))
+
+
+def retrieve_politician_we_vote_ids_from_ballot_politician_index(ballot_key_list, google_civic_election_id_list):
+    """
+    The politicians on these ballots in these elections, from BallotPoliticianIndex. Ballots which haven't been
+    indexed yet are calculated from the replica, and queued so the next request finds them indexed.
+    :param ballot_key_list: (polling_location_we_vote_id, 0) and ('', voter_id) keys
+    :param google_civic_election_id_list:
+    :return:
+    """
+    status = ""
+    success = True
+    politician_we_vote_id_set = set()
+    ballot_key_list = list(set(ballot_key_list))
+    election_id_string_list = [str(one_id) for one_id in google_civic_election_id_list]
+    try:
+        politician_we_vote_ids_by_ballot = {}
+        polling_location_we_vote_id_list = [ballot_key[0] for ballot_key in ballot_key_list if ballot_key[0]]
+        voter_id_list = [ballot_key[1] for ballot_key in ballot_key_list if not ballot_key[0]]
+        if len(ballot_key_list) and len(election_id_string_list):
+            for ballot_politician_index in BallotPoliticianIndex.objects.using('readonly').filter(
+                    Q(polling_location_we_vote_id__in=polling_location_we_vote_id_list) |
+                    Q(polling_location_we_vote_id__isnull=True, voter_id__in=voter_id_list)):
+                politician_we_vote_ids_by_ballot[ballot_politician_index.fetch_ballot_key()] = \
+                    ballot_politician_index.politician_we_vote_ids_by_election()
+
+            missing_ballot_key_list = [
+                ballot_key for ballot_key in ballot_key_list if ballot_key not in politician_we_vote_ids_by_ballot]
+            if len(missing_ballot_key_list):
+                status += "BALLOT_POLITICIAN_INDEX_MISSING "
+                politician_we_vote_ids_by_ballot.update(calculate_politician_we_vote_ids_by_ballot(
+                    missing_ballot_key_list, google_civic_election_id_list, read_only=True))
+                for polling_location_we_vote_id, voter_id in missing_ballot_key_list:
+                    queue_ballot_politician_index_update(polling_location_we_vote_id, voter_id)
+
+        for politician_we_vote_ids_by_election in politician_we_vote_ids_by_ballot.values():
+            for google_civic_election_id in election_id_string_list:
+                politician_we_vote_id_set.update(politician_we_vote_ids_by_election.get(google_civic_election_id, []))
+    except Exception as e:
+        success = False
+        status += "BALLOT_POLITICIAN_INDEX_RETRIEVE_FAILED: " + str(e) + " "
+        logger.error(status)
+
+    politician_we_vote_id_list = sorted(politician_we_vote_id_set)
+    return {
+        'success':                          success,
+        'status':                           status,
+        'politician_we_vote_id_list':       politician_we_vote_id_list,
+        'politician_we_vote_id_list_found': len(politician_we_vote_id_list) > 0,
+    }
+
+
+def what_voter_can_vote_for_from_saved_ballots(voter_id):
+    """
+    The politicians on the ballots this voter has already looked at for upcoming elections. Unlike
+    what_voter_can_vote_for, it never looks up an address or prepares a ballot, so it costs the same handful of
+    queries for every voter, and the campaign lists can use it.
+    :param voter_id:
+    :return:
+    """
+    status = ""
+    voter_id = convert_to_int(voter_id)
+    if not positive_value_exists(voter_id):
+        return {
+            'status':                                       "VALID_VOTER_ID_MISSING ",
+            'success':                                      False,
+            'voter_can_vote_for_politician_we_vote_ids':    [],
+        }
+
+    upcoming_results = ElectionManager().retrieve_upcoming_google_civic_election_id_list(
+        require_include_in_list_for_voters=True)
+    google_civic_election_id_list = upcoming_results['upcoming_google_civic_election_id_list']
+    ballot_key_list = []
+    if len(google_civic_election_id_list):
+        polling_location_we_vote_id_source_query = VoterBallotSaved.objects.using('readonly') \
+            .filter(voter_id=voter_id, google_civic_election_id__in=google_civic_election_id_list) \
+            .values_list('polling_location_we_vote_id_source', flat=True)
+        for polling_location_we_vote_id_source in polling_location_we_vote_id_source_query:
+            # The same choice what_voter_can_vote_for makes with the voter_ballot_saved it prepares
+            if positive_value_exists(polling_location_we_vote_id_source):
+                ballot_key_list.append((polling_location_we_vote_id_source, 0))
+            else:
+                ballot_key_list.append(('', voter_id))
+    if not len(ballot_key_list):
+        return {
+            'status':                                       "NO_UPCOMING_VOTER_BALLOT_SAVED ",
+            'success':                                      True,
+            'voter_can_vote_for_politician_we_vote_ids':    [],
+        }
+
+    results = retrieve_politician_we_vote_ids_from_ballot_politician_index(
+        ballot_key_list, google_civic_election_id_list)
+    status += results['status']
+    return {
+        'status':                                       status,
+        'success':                                      results['success'],
+        'voter_can_vote_for_politician_we_vote_ids':    results['politician_we_vote_id_list'],
+    }
@@ -0,0 +1,73 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from ballot.models import BallotReturnedManager, BallotReturnedSpatialIndex, calculate_distance_in_miles, \
+    DISTANCE_LIMIT_IN_MILES, fetch_ballot_returned_spatial_index
+
+
+class Command(BaseCommand):
+    help = 'Times the closest map point search with the spatial index against a distance calculation on every map point'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--map_points', type=int, default=100000,
+                            help='Number of synthetic map points spread across the continental US')
+        parser.add_argument('--searches', type=int, default=200, help='Number of voter addresses to search for')
+        parser.add_argument('--google_civic_election_id', type=int, default=0,
+                            help='Also time the database query and the index against this election\'s map points')
+        parser.add_argument('--state_code', type=str, default='')
+
+    def handle(self, *args, **options):
+        random.seed(42)
+        map_point_list = [(ballot_returned_id, random.uniform(25.0, 49.0), random.uniform(-124.0, -67.0))
+                          for ballot_returned_id in range(options['map_points'])]
+        search_list = [(random.uniform(25.0, 49.0), random.uniform(-124.0, -67.0))
+                       for _ in range(options['searches'])]
+
+        t0 = time.perf_counter()
+        spatial_index = BallotReturnedSpatialIndex(map_point_list)
+        build_seconds = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        full_scan_results = []
+        for latitude, longitude in search_list:
+            closest = (None, None)
+            for ballot_returned_id, map_point_latitude, map_point_longitude in map_point_list:
+                distance = calculate_distance_in_miles(latitude, longitude, map_point_latitude, map_point_longitude)
+                if distance <= DISTANCE_LIMIT_IN_MILES and (closest[1] is None or distance < closest[1]):
+                    closest = (ballot_returned_id, distance)
+            full_scan_results.append(closest)
+        full_scan_seconds = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        index_results = [spatial_index.find_closest(latitude, longitude) for latitude, longitude in search_list]
+        index_seconds = time.perf_counter() - t0
+
+        mismatches = sum(1 for full_scan, indexed in zip(full_scan_results, index_results)
+                         if full_scan[0] != indexed[0])
+        self.stdout.write('{} map points, {} searches (index built in {:.3f} s)'.format(
+            len(map_point_list), len(search_list), build_seconds))
+        self.stdout.write('  distance to every map point: {:>9.3f} ms/search'.format(
+            full_scan_seconds * 1000 / max(len(search_list), 1)))
+        self.stdout.write('  spatial index:               {:>9.3f} ms/search'.format(
+            index_seconds * 1000 / max(len(search_list), 1)))
+        self.stdout.write('  results that differ:         {}'.format(mismatches))
+
+        google_civic_election_id = options['google_civic_election_id']
+        if not google_civic_election_id:
+            return
+        state_code = options['state_code']
+        spatial_index = fetch_ballot_returned_spatial_index(google_civic_election_id, state_code=state_code)
+        self.stdout.write('Election {} {}: {} map points'.format(
+            google_civic_election_id, state_code, spatial_index.map_point_count))
+        for label, retrieve_function in [
+                ('database distance query', BallotReturnedManager.retrieve_closest_map_point_ballot_returned_from_database),
+                ('spatial index', BallotReturnedManager.retrieve_closest_map_point_ballot_returned)]:
+            t0 = time.perf_counter()
+            for latitude, longitude in search_list:
+                retrieve_function(latitude=latitude, longitude=longitude,
+                                  google_civic_election_id=google_civic_election_id, state_code=state_code)
+            elapsed = time.perf_counter() - t0
+            self.stdout.write('  {:<28} {:>9.3f} ms/search'.format(
+                label + ':', elapsed * 1000 / max(len(search_list), 1)))
@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand
+
+from ballot.controllers_ballot_politician_index import BALLOT_POLITICIAN_INDEX_BATCH_SIZE, \
+    generate_ballot_key_list_for_ballot_item, retrieve_ballot_politician_index_election_id_list, \
+    update_ballot_politician_index
+from ballot.models import BallotItem, BallotPoliticianIndex
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds BallotPoliticianIndex for every ballot with offices in an upcoming election (run nightly), and ' \
+           'removes the rows for ballots which no longer have any'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch_size', type=int, default=BALLOT_POLITICIAN_INDEX_BATCH_SIZE,
+                            help='Ballots rebuilt per set of queries')
+
+    def handle(self, *args, **options):
+        batch_size = max(1, options['batch_size'])
+        google_civic_election_id_list = retrieve_ballot_politician_index_election_id_list()
+        ballot_key_set = set()
+        if len(google_civic_election_id_list):
+            ballot_item_query = BallotItem.objects \
+                .filter(google_civic_election_id__in=[str(one_id) for one_id in google_civic_election_id_list]) \
+                .exclude(contest_office_we_vote_id__isnull=True).exclude(contest_office_we_vote_id='') \
+                .values_list('polling_location_we_vote_id', 'voter_id').distinct()
+            for polling_location_we_vote_id, voter_id in ballot_item_query.iterator():
+                ballot_key_set.update(generate_ballot_key_list_for_ballot_item(polling_location_we_vote_id, voter_id))
+
+        ballot_key_list = sorted(ballot_key_set)
+        failed_count = 0
+        for start in range(0, len(ballot_key_list), batch_size):
+            results = update_ballot_politician_index(
+                ballot_key_list[start:start + batch_size],
+                google_civic_election_id_list=google_civic_election_id_list)
+            if not results['success']:
+                failed_count += 1
+
+        stale_id_list = [
+            ballot_politician_index_id for ballot_politician_index_id, polling_location_we_vote_id, voter_id in
+            BallotPoliticianIndex.objects.values_list('id', 'polling_location_we_vote_id', 'voter_id').iterator()
+            if ((polling_location_we_vote_id, 0) if polling_location_we_vote_id else ('', voter_id))
+            not in ballot_key_set]
+        deleted_count = 0
+        for start in range(0, len(stale_id_list), 1000):
+            chunk_deleted_count, _ = BallotPoliticianIndex.objects.filter(
+                id__in=stale_id_list[start:start + 1000]).delete()
+            deleted_count += chunk_deleted_count
+        self.stdout.write('rebuilt {count} ballots ({failed} batches failed), removed {deleted} stale '
+                          'rows'.format(count=len(ballot_key_list), failed=failed_count, deleted=deleted_count))
@@ -2,16 +2,22 @@
 # Brought to you by We Vote. Be good.
 # -*- coding: UTF-8 -*-
 
+import json
+import math
 import sys
+import threading
+import time
 from datetime import date, datetime
 
 from django.db import models
 from django.db.models import F, Q, Count, FloatField, ExpressionWrapper, Func
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
 from geopy.exc import GeocoderQuotaExceeded
 from geopy.geocoders import get_geocoder_for_service
 
 import wevote_functions.admin
-from candidate.models import CandidateCampaign
+from candidate.models import CandidateCampaign, CandidateToOfficeLink
 from config.base import get_environment_variable
 from election.models import ElectionManager
 from exception.models import handle_exception, handle_record_found_more_than_one_exception
@@ -39,6 +45,11 @@ GEOCODE_TIMEOUT = 10
 RADIUS_OF_EARTH_IN_MILES = 3958.756
 DEG_TO_RADS = 0.0174533
 DISTANCE_LIMIT_IN_MILES = 25
+MILES_PER_DEGREE_OF_LATITUDE = RADIUS_OF_EARTH_IN_MILES * DEG_TO_RADS
+# Map points are bucketed into grid cells of this many degrees, so a 25-mile search only has to look at a few cells
+SPATIAL_INDEX_CELL_SIZE_IN_DEGREES = 0.5
+# Other API workers don't hear about map point imports in this process, so rebuild indexes at least this often
+SPATIAL_INDEX_MAXIMUM_AGE_IN_SECONDS = 600
 
 logger = wevote_functions.admin.get_logger(__name__)
 
@@ -55,6 +66,198 @@ class ACos(Func):
     function = 'ACOS'
 
 
+def calculate_distance_in_miles(latitude1, longitude1, latitude2, longitude2):
+    """
+    The same approximate great circle distance that find_closest_ballot_returned used to calculate in the database
+    :return:
+    """
+    lat_rads1 = latitude1 * DEG_TO_RADS
+    lat_rads2 = latitude2 * DEG_TO_RADS
+    cosine = (math.sin(lat_rads1) * math.sin(lat_rads2)) + \
+        (math.cos(lat_rads1) * math.cos(lat_rads2) * math.cos((longitude1 * DEG_TO_RADS) - (longitude2 * DEG_TO_RADS)))
+    # Rounding can push the cosine of two identical points just past 1
+    return RADIUS_OF_EARTH_IN_MILES * math.acos(max(-1.0, min(1.0, cosine)))
+
+
+def calculate_bounding_box(latitude, longitude, distance_in_miles=DISTANCE_LIMIT_IN_MILES):
+    """
+    Return (min_latitude, max_latitude, min_longitude, max_longitude) for a box that contains every point within
+    distance_in_miles of latitude/longitude
+    :return:
+    """
+    # Pad slightly so rounding never drops a point sitting right on the distance limit
+    latitude_delta = (distance_in_miles / MILES_PER_DEGREE_OF_LATITUDE) * 1.01
+    widest_latitude = min(abs(latitude) + latitude_delta, 89.0)
+    longitude_delta = latitude_delta / math.cos(widest_latitude * DEG_TO_RADS)
+    return latitude - latitude_delta, latitude + latitude_delta, longitude - longitude_delta, longitude + longitude_delta
+
+
+class BallotReturnedSpatialIndex(object):
+    """
+    Grid of map point (polling location) BallotReturned entries for one election and state, so we can find the
+    closest map point to a voter without calculating the distance to every BallotReturned row
+    """
+
+    def __init__(self, map_point_list=[]):
+        """
+        :param map_point_list: list of (ballot_returned_id, latitude, longitude)
+        """
+        self.grid = {}
+        # So a saved or deleted map point can be found in the grid without searching every cell
+        self.cell_by_ballot_returned_id = {}
+        self.map_point_count = 0
+        self.date_built = time.time()
+        for ballot_returned_id, latitude, longitude in map_point_list:
+            cell = self.cell_for_point(latitude, longitude)
+            self.grid.setdefault(cell, []).append((ballot_returned_id, latitude, longitude))
+            self.cell_by_ballot_returned_id[ballot_returned_id] = cell
+            self.map_point_count += 1
+
+    @staticmethod
+    def cell_for_point(latitude, longitude):
+        return (int(math.floor(latitude / SPATIAL_INDEX_CELL_SIZE_IN_DEGREES)),
+                int(math.floor(longitude / SPATIAL_INDEX_CELL_SIZE_IN_DEGREES)))
+
+    def is_expired(self):
+        return time.time() - self.date_built > SPATIAL_INDEX_MAXIMUM_AGE_IN_SECONDS
+
+    def remove_map_point(self, ballot_returned_id):
+        cell = self.cell_by_ballot_returned_id.pop(ballot_returned_id, None)
+        if cell is None:
+            return
+        # Replace the cell's list instead of changing it, since find_closest may be reading it in another thread
+        self.grid[cell] = [map_point for map_point in self.grid.get(cell, []) if map_point[0] != ballot_returned_id]
+        self.map_point_count -= 1
+
+    def update_map_point(self, ballot_returned_id, latitude, longitude):
+        self.remove_map_point(ballot_returned_id)
+        if latitude is None or longitude is None:
+            return
+        cell = self.cell_for_point(latitude, longitude)
+        self.grid[cell] = self.grid.get(cell, []) + [(ballot_returned_id, latitude, longitude)]
+        self.cell_by_ballot_returned_id[ballot_returned_id] = cell
+        self.map_point_count += 1
+
+    def find_closest(self, latitude, longitude, distance_limit_in_miles=DISTANCE_LIMIT_IN_MILES):
+        """
+        :return: (ballot_returned_id, distance_in_miles), or (None, None) if no map point is within the limit
+        """
+        closest_ballot_returned_id = None
+        closest_distance = None
+        if not self.map_point_count:
+            return closest_ballot_returned_id, closest_distance
+        min_latitude, max_latitude, min_longitude, max_longitude = \
+            calculate_bounding_box(latitude, longitude, distance_limit_in_miles)
+        min_cell_latitude, min_cell_longitude = self.cell_for_point(min_latitude, min_longitude)
+        max_cell_latitude, max_cell_longitude = self.cell_for_point(max_latitude, max_longitude)
+        for cell_latitude in range(min_cell_latitude, max_cell_latitude + 1):
+            for cell_longitude in range(min_cell_longitude, max_cell_longitude + 1):
+                for ballot_returned_id, map_point_latitude, map_point_longitude in \
+                        self.grid.get((cell_latitude, cell_longitude), []):
+                    if not (min_latitude <= map_point_latitude <= max_latitude) or \
+                            not (min_longitude <= map_point_longitude <= max_longitude):
+                        continue
+                    distance = calculate_distance_in_miles(
+                        latitude, longitude, map_point_latitude, map_point_longitude)
+                    if distance > distance_limit_in_miles:
+                        continue
+                    if closest_distance is None or distance < closest_distance:
+                        closest_ballot_returned_id = ballot_returned_id
+                        closest_distance = distance
+        return closest_ballot_returned_id, closest_distance
+
+
+# Process-wide cache of BallotReturnedSpatialIndex, keyed by (google_civic_election_id, lower case state_code)
+ballot_returned_spatial_index_dict = {}
+ballot_returned_spatial_index_lock = threading.Lock()
+
+
+def fetch_ballot_returned_spatial_index(google_civic_election_id, state_code='', read_only=True):
+    google_civic_election_id = convert_to_int(google_civic_election_id)
+    state_code = state_code.lower() if positive_value_exists(state_code) else ''
+    index_key = (google_civic_election_id, state_code)
+    spatial_index = ballot_returned_spatial_index_dict.get(index_key)
+    if spatial_index is not None and not spatial_index.is_expired():
+        return spatial_index
+
+    if 'test' in sys.argv:
+        ballot_returned_query = BallotReturned.objects.all()
+    elif positive_value_exists(read_only):
+        ballot_returned_query = BallotReturned.objects.using('readonly').all()
+    else:
+        ballot_returned_query = BallotReturned.objects.all()
+    # Limit this query to entries stored for map points
+    ballot_returned_query = ballot_returned_query.exclude(
+        Q(polling_location_we_vote_id__isnull=True) | Q(polling_location_we_vote_id=""))
+    ballot_returned_query = ballot_returned_query.filter(
+        google_civic_election_id=google_civic_election_id,
+        latitude__isnull=False,
+        longitude__isnull=False)
+    if positive_value_exists(state_code):
+        # This search for normalized_state is NOT redundant because some elections are in many states
+        ballot_returned_query = ballot_returned_query.filter(normalized_state__iexact=state_code)
+    spatial_index = BallotReturnedSpatialIndex(
+        ballot_returned_query.values_list('id', 'latitude', 'longitude').iterator(chunk_size=10000))
+
+    with ballot_returned_spatial_index_lock:
+        ballot_returned_spatial_index_dict[index_key] = spatial_index
+    return spatial_index
+
+
+def update_ballot_returned_spatial_index(ballot_returned, deleted=False):
+    """
+    Bring the cached indexes for this BallotReturned's election up to date with it, without rebuilding them
+    :param ballot_returned:
+    :param deleted:
+    :return:
+    """
+    google_civic_election_id = convert_to_int(ballot_returned.google_civic_election_id)
+    state_code = ballot_returned.normalized_state.lower() \
+        if positive_value_exists(ballot_returned.normalized_state) else ''
+    is_map_point = not deleted and positive_value_exists(ballot_returned.polling_location_we_vote_id)
+    try:
+        # Saved values may still be strings, as they were assigned
+        latitude = float(ballot_returned.latitude) if ballot_returned.latitude is not None else None
+        longitude = float(ballot_returned.longitude) if ballot_returned.longitude is not None else None
+    except (TypeError, ValueError):
+        invalidate_ballot_returned_spatial_index(google_civic_election_id)
+        return
+    with ballot_returned_spatial_index_lock:
+        for index_key, spatial_index in ballot_returned_spatial_index_dict.items():
+            if index_key[0] != google_civic_election_id:
+                continue
+            if is_map_point and index_key[1] in ('', state_code):
+                spatial_index.update_map_point(ballot_returned.id, latitude, longitude)
+            else:
+                # Also covers a map point moved to another state
+                spatial_index.remove_map_point(ballot_returned.id)
+
+
+def remove_from_ballot_returned_spatial_index(google_civic_election_id, ballot_returned_id):
+    google_civic_election_id = convert_to_int(google_civic_election_id)
+    with ballot_returned_spatial_index_lock:
+        for index_key, spatial_index in ballot_returned_spatial_index_dict.items():
+            if index_key[0] == google_civic_election_id:
+                spatial_index.remove_map_point(ballot_returned_id)
+
+
+def invalidate_ballot_returned_spatial_index(google_civic_election_id=0):
+    """
+    Drop the cached indexes for one election (or all elections), so they are rebuilt on the next search.
+    For changes to many map points at once, like an import with queryset.update().
+    :param google_civic_election_id:
+    :return:
+    """
+    google_civic_election_id = convert_to_int(google_civic_election_id)
+    with ballot_returned_spatial_index_lock:
+        if positive_value_exists(google_civic_election_id):
+            for index_key in list(ballot_returned_spatial_index_dict.keys()):
+                if index_key[0] == google_civic_election_id:
+                    del ballot_returned_spatial_index_dict[index_key]
+        else:
+            ballot_returned_spatial_index_dict.clear()
+
+
 class BallotItem(models.Model):
     """
     This is a generated table with ballot item data from a variety of sources, including Google Civic
@@ -157,6 +360,78 @@ class BallotItem(models.Model):
         return candidates_list_temp
 
 
+@receiver(post_save, sender=BallotItem)
+@receiver(post_delete, sender=BallotItem)
+def change_ballot_item_signal(sender, instance, **kwargs):
+    if positive_value_exists(instance.contest_office_we_vote_id):
+        from ballot.controllers_ballot_politician_index import queue_ballot_politician_index_update
+        queue_ballot_politician_index_update(
+            polling_location_we_vote_id=instance.polling_location_we_vote_id, voter_id=instance.voter_id)
+
+
+@receiver(post_save, sender=CandidateToOfficeLink)
+@receiver(post_delete, sender=CandidateToOfficeLink)
+def change_candidate_to_office_link_signal(sender, instance, **kwargs):
+    from ballot.controllers_ballot_politician_index import queue_ballot_politician_index_update
+    queue_ballot_politician_index_update(contest_office_we_vote_id=instance.contest_office_we_vote_id)
+
+
+@receiver(post_init, sender=CandidateCampaign)
+def load_candidate_politician_signal(sender, instance, **kwargs):
+    # Read from __dict__, so a candidate loaded without politician_we_vote_id (with .only()) doesn't query for it
+    instance.politician_we_vote_id_when_loaded = instance.__dict__.get('politician_we_vote_id')
+
+
+@receiver(post_save, sender=CandidateCampaign)
+def save_candidate_politician_signal(sender, instance, **kwargs):
+    # Most candidate saves don't change the politician, so only rebuild the ballots when it was changed
+    politician_we_vote_id = instance.__dict__.get('politician_we_vote_id')
+    if politician_we_vote_id != getattr(instance, 'politician_we_vote_id_when_loaded', politician_we_vote_id):
+        from ballot.controllers_ballot_politician_index import queue_ballot_politician_index_update_for_candidate
+        queue_ballot_politician_index_update_for_candidate(instance.we_vote_id)
+    instance.politician_we_vote_id_when_loaded = politician_we_vote_id
+
+
+@receiver(post_delete, sender=CandidateCampaign)
+def delete_candidate_politician_signal(sender, instance, **kwargs):
+    if positive_value_exists(instance.__dict__.get('politician_we_vote_id')):
+        from ballot.controllers_ballot_politician_index import queue_ballot_politician_index_update_for_candidate
+        queue_ballot_politician_index_update_for_candidate(instance.we_vote_id)
+
+
+class BallotPoliticianIndex(models.Model):
+    """
+    The politicians running for the offices on one ballot, by upcoming election, so "which politicians can this
+    voter vote for" reads one row instead of walking ballot items, offices and candidates.
+    See ballot/controllers_ballot_politician_index.py for how it is kept current.
+    """
+    # A map point's ballot, with voter_id 0, or a voter's own ballot, with no polling_location_we_vote_id
+    polling_location_we_vote_id = models.CharField(max_length=255, default=None, null=True, unique=True)
+    voter_id = models.IntegerField(default=0, null=False, db_index=True)
+    # {google_civic_election_id: [politician_we_vote_id, ...]}
+    politician_we_vote_ids_json = models.TextField(null=True, blank=True)
+    date_last_calculated = models.DateTimeField(null=True, auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['voter_id'], condition=Q(polling_location_we_vote_id__isnull=True),
+                name='ballot_politician_index_voter'),
+        ]
+
+    def fetch_ballot_key(self):
+        if positive_value_exists(self.polling_location_we_vote_id):
+            return self.polling_location_we_vote_id, 0
+        return '', self.voter_id
+
+    def politician_we_vote_ids_by_election(self):
+        try:
+            return json.loads(self.politician_we_vote_ids_json) \
+                if positive_value_exists(self.politician_we_vote_ids_json) else {}
+        except ValueError:
+            return {}
+
+
 class BallotItemManager(models.Manager):
 
     @staticmethod
@@ -1862,6 +2137,9 @@ class BallotReturned(models.Model):
             models.Index(
                 fields=['we_vote_id'],
                 name='ballot_returned_we_vote_id'),
+            models.Index(
+                fields=['google_civic_election_id', 'latitude', 'longitude'],
+                name='ballot_returned_election_geo'),
         ]
 
     # We override the save function, so we can auto-generate we_vote_id
@@ -1896,6 +2174,16 @@ class BallotReturned(models.Model):
             return ""
 
 
+@receiver(post_save, sender=BallotReturned)
+def save_ballot_returned_signal(sender, instance, **kwargs):
+    update_ballot_returned_spatial_index(instance)
+
+
+@receiver(post_delete, sender=BallotReturned)
+def delete_ballot_returned_signal(sender, instance, **kwargs):
+    update_ballot_returned_spatial_index(instance, deleted=True)
+
+
 class BallotReturnedEmpty(models.Model):
     """
     This keeps track of polling locations we asked for a ballot for, but it came back empty
@@ -2735,89 +3023,44 @@ class BallotReturnedManager(models.Manager):
             status += 'GEOCODER_FOUND_LOCATION '
             address = location.address
             # address has format "line_1, state zip, USA"
-
-            if 'test' in sys.argv:
-                ballot_returned_query = BallotReturned.objects.all()
-            elif positive_value_exists(read_only):
-                ballot_returned_query = BallotReturned.objects.using('readonly').all()
-            else:
-                ballot_returned_query = BallotReturned.objects.all()
-            # Limit this query to entries stored for map points
-            ballot_returned_query = ballot_returned_query.exclude(
-                Q(polling_location_we_vote_id__isnull=True) | Q(polling_location_we_vote_id=""))
             if positive_value_exists(address) and "," in address:
                 raw_state_code = address.split(', ')
                 if positive_value_exists(raw_state_code):
                     state_code = raw_state_code[-2][:2]
-            if positive_value_exists(state_code):
-                # This search for normalized_state is NOT redundant because some elections are in many states
-                ballot_returned_query = ballot_returned_query.filter(normalized_state__iexact=state_code)
-
-            try:
-                lat_rads_ploc = location.latitude * DEG_TO_RADS
-                lon_rads_ploc = location.longitude * DEG_TO_RADS
-                ballot_returned_query = ballot_returned_query.annotate(
-                    # Calculate the approximate great circle distance between two coordinates
-                    # https://medium.com/@petehouston/calculate-distance-of-two-locations-on-earth-using-python-1501b1944d97
-                    distance=ExpressionWrapper(
-                         (RADIUS_OF_EARTH_IN_MILES * (
-                             ACos(
-                                 (Sin(F('latitude') * DEG_TO_RADS) *
-                                  Sin(lat_rads_ploc)) +
-                                 (Cos(F('latitude') * DEG_TO_RADS) *
-                                  Cos(lat_rads_ploc) *
-                                  Cos((F('longitude') * DEG_TO_RADS) - lon_rads_ploc))
-                             )
-                           )),
-                         output_field=FloatField()))
-            except Exception as e:
-                status += "EXCEPTION_IN_ANNOTATE_CALCULATION1-" + str(e) + ' '
 
             # Do not return ballots more than 25 miles away
-            ballot_returned_query = ballot_returned_query.filter(distance__lte=DISTANCE_LIMIT_IN_MILES)
-
-            ballot_returned_query = ballot_returned_query.order_by('distance')
-
             if positive_value_exists(google_civic_election_id):
                 status += "SEARCHING_BY_GOOGLE_CIVIC_ID "
-                ballot_returned_query = ballot_returned_query.filter(google_civic_election_id=google_civic_election_id)
-                try:
-                    ballot = ballot_returned_query.first()
-                    if ballot == None:
-                        status += "BALLOT_RETURNED_QUERY_FIRST_FAILED_HAS_LOCATION_AND_POSITIVE_GOOGLE_CIVIC_ID__BALLOT_NONE "
-                    else:
-                        status += "SUBSTITUTED_BALLOT_DISTANCE1: " + str(ballot.distance) + " "
-                        # print('===== 1 ===== ballot.distance', ballot.distance, ballot.latitude, ballot.longitude,
-                        #       text_for_map_search)
-                except Exception as e:
-                    ballot = None
-                    status += "BALLOT_RETURNED_QUERY_FIRST_FAILED_HAS_LOCATION_AND_POSITIVE_GOOGLE_CIVIC_ID: " + str(e) + ' '
-                # ballot_returned_list = list(ballot_returned_query)
-                # if len(ballot_returned_list):
-                #     ballot = ballot_returned_list[0]
+                results = self.retrieve_closest_map_point_ballot_returned(
+                    latitude=location.latitude,
+                    longitude=location.longitude,
+                    google_civic_election_id=google_civic_election_id,
+                    state_code=state_code,
+                    read_only=read_only)
+                status += results['status']
+                ballot = results['ballot_returned']
+                if ballot is None:
+                    status += "BALLOT_RETURNED_QUERY_FIRST_FAILED_HAS_LOCATION_AND_POSITIVE_GOOGLE_CIVIC_ID__BALLOT_NONE "
+                else:
+                    status += "SUBSTITUTED_BALLOT_DISTANCE1: " + str(ballot.distance) + " "
             else:
                 # If we have an active election coming up, including today
                 # fetch_next_upcoming_election_in_this_state returns next election with ballot items
                 status += "FETCH_NEXT_UPCOMING_ELECTION_IN_THIS_STATE "
                 upcoming_google_civic_election_id = self.fetch_next_upcoming_election_in_this_state(state_code)
                 if positive_value_exists(upcoming_google_civic_election_id):
-                    ballot_returned_query_without_election_id = ballot_returned_query
-                    ballot_returned_query = ballot_returned_query.filter(
-                        google_civic_election_id=upcoming_google_civic_election_id)
-                    try:
-                        ballot = ballot_returned_query.first()
-                        if ballot == None:
-                            status += "BALLOT_RETURNED_QUERY_FIRST_FAILED_HAS_LOCATION_AND_POSITIVE_UPCOMING_GOOGLE_CIVIC_ID__BALLOT_NONE "
-                        else:
-                            status += "SUBSTITUTED_BALLOT_DISTANCE2: " + str(ballot.distance) + " "
-                            # print('===== 2 ===== ballot.distance', ballot.distance, ballot.latitude, ballot.longitude,
-                            #       text_for_map_search)
-                    except Exception as e:
-                        ballot = None
-                        status += "BALLOT_RETURNED_QUERY_FIRST_FAILED_HAS_LOCATION_AND_POSITIVE_UPCOMING_GOOGLE_CIVIC_ID: " + str(e) + ' '
-                    # ballot_returned_list = list(ballot_returned_query)
-                    # if len(ballot_returned_list):
-                    #     ballot = ballot_returned_list[0]
+                    results = self.retrieve_closest_map_point_ballot_returned(
+                        latitude=location.latitude,
+                        longitude=location.longitude,
+                        google_civic_election_id=upcoming_google_civic_election_id,
+                        state_code=state_code,
+                        read_only=read_only)
+                    status += results['status']
+                    ballot = results['ballot_returned']
+                    if ballot is None:
+                        status += "BALLOT_RETURNED_QUERY_FIRST_FAILED_HAS_LOCATION_AND_POSITIVE_UPCOMING_GOOGLE_CIVIC_ID__BALLOT_NONE "
+                    else:
+                        status += "SUBSTITUTED_BALLOT_DISTANCE2: " + str(ballot.distance) + " "
                     # What if this is a National election, but there aren't any races in the state the voter is in?
                     # We want to find the *next* upcoming election
                     if ballot is None:
@@ -2827,29 +3070,22 @@ class BallotReturnedManager(models.Manager):
                         safety_valve_count = 0
                         while ballot_not_found and more_elections_exist and safety_valve_count < 20:
                             safety_valve_count += 1
-                            # Reset ballot_returned_query
-                            ballot_returned_query = ballot_returned_query_without_election_id
                             skip_these_elections.append(upcoming_google_civic_election_id)
                             upcoming_google_civic_election_id = self.fetch_next_upcoming_election_in_this_state(
                                 state_code, skip_these_elections)
                             if positive_value_exists(upcoming_google_civic_election_id):
-                                ballot_returned_query = ballot_returned_query.filter(
-                                    google_civic_election_id=upcoming_google_civic_election_id)
-                                try:
-                                    ballot = ballot_returned_query.first()
-                                    if ballot == None:
-                                        status += "BALLOT_RETURNED_QUERY_FIRST_FAILED_BALLOT_NONE_POSITIVE_UPCOMING_GOOGLE_CIVIC_ID__BALLOT_NONE "
-                                    else:
-                                        status += "SUBSTITUTED_BALLOT_DISTANCE3: " + str(ballot.distance) + " "
-                                        # print('===== 3 ===== ballot.distance', ballot.distance, ballot.latitude,
-                                        #       ballot.longitude, text_for_map_search)
-                                except Exception as e:
-                                    ballot = None
-                                    status += "BALLOT_RETURNED_QUERY_FIRST_FAILED_BALLOT_NONE_POSITIVE_UPCOMING_GOOGLE_CIVIC_ID: " + str(e) + ' '
-                                # ballot_returned_list = list(ballot_returned_query)
-                                # if len(ballot_returned_list):
-                                #     ballot = ballot_returned_list[0]
-                                if ballot is not None:
+                                results = self.retrieve_closest_map_point_ballot_returned(
+                                    latitude=location.latitude,
+                                    longitude=location.longitude,
+                                    google_civic_election_id=upcoming_google_civic_election_id,
+                                    state_code=state_code,
+                                    read_only=read_only)
+                                status += results['status']
+                                ballot = results['ballot_returned']
+                                if ballot is None:
+                                    status += "BALLOT_RETURNED_QUERY_FIRST_FAILED_BALLOT_NONE_POSITIVE_UPCOMING_GOOGLE_CIVIC_ID__BALLOT_NONE "
+                                else:
+                                    status += "SUBSTITUTED_BALLOT_DISTANCE3: " + str(ballot.distance) + " "
                                     ballot_not_found = False
                             else:
                                 more_elections_exist = False
@@ -2881,56 +3117,20 @@ class BallotReturnedManager(models.Manager):
             if location is not None and positive_value_exists(google_civic_election_id):
                 # If here, then the geocoder successfully found the address
                 status += 'GEOCODER_FOUND_LOCATION-ATTEMPT2 '
-                address = location.address
-                # address has format "line_1, state zip, USA"
-
-                if 'test' in sys.argv:
-                    ballot_returned_query = BallotReturned.objects.all()
-                elif positive_value_exists(read_only):
-                    ballot_returned_query = BallotReturned.objects.using('readonly').all()
-                else:
-                    ballot_returned_query = BallotReturned.objects.all()
-                # Limit this query to entries stored for map points
-                ballot_returned_query = ballot_returned_query.exclude(
-                    Q(polling_location_we_vote_id__isnull=True) | Q(polling_location_we_vote_id=""))
-
-                try:
-                    lat_rads_ploc = location.latitude * DEG_TO_RADS
-                    lon_rads_ploc = location.longitude * DEG_TO_RADS
-                    ballot_returned_query = ballot_returned_query.annotate(
-                        # Calculate the approximate great circle distance between two coordinates
-                        # https://medium.com/@petehouston/calculate-distance-of-two-locations-on-earth-using-python-1501b1944d97
-                        distance=ExpressionWrapper(
-                            (RADIUS_OF_EARTH_IN_MILES * (
-                                ACos(
-                                    (Sin(F('latitude') * DEG_TO_RADS) *
-                                     Sin(lat_rads_ploc)) +
-                                    (Cos(F('latitude') * DEG_TO_RADS) *
-                                     Cos(lat_rads_ploc) *
-                                     Cos((F('longitude') * DEG_TO_RADS) - lon_rads_ploc))
-                                )
-                            )),
-                            output_field=FloatField()))
-                except Exception as e:
-                    status += "EXCEPTION_IN_ANNOTATE_CALCULATION2-" + str(e) + ' '
 
                 # Do not return ballots more than 25 miles away
-                ballot_returned_query = ballot_returned_query.filter(distance__lte=DISTANCE_LIMIT_IN_MILES)
-
-                ballot_returned_query = ballot_returned_query.order_by('distance')
-
                 status += "SEARCHING_BY_GOOGLE_CIVIC_ID-ATTEMPT2 "
-                ballot_returned_query = ballot_returned_query.filter(
-                    google_civic_election_id=google_civic_election_id)
-                try:
-                    ballot_returned = ballot_returned_query.first()
+                results = self.retrieve_closest_map_point_ballot_returned(
+                    latitude=location.latitude,
+                    longitude=location.longitude,
+                    google_civic_election_id=google_civic_election_id,
+                    read_only=read_only)
+                status += results['status']
+                ballot_returned = results['ballot_returned']
+                if ballot_returned is None:
+                    status += "BALLOT_RETURNED_QUERY_FIRST_FAILED_HAS_BALLOT_LOCATION_AND_POSITIVE_GOOGLE_CIVIC_ID "
+                else:
                     status += "SUBSTITUTED_BALLOT_DISTANCE4: " + str(ballot_returned.distance) + " "
-                except Exception as e:
-                    ballot_returned = None
-                    status += "BALLOT_RETURNED_QUERY_FIRST_FAILED_HAS_BALLOT_LOCATION_AND_POSITIVE_GOOGLE_CIVIC_ID: " + str(e) + ' '
-                # ballot_returned_list = list(ballot_returned_query)
-                # if len(ballot_returned_list):
-                #     ballot_returned = ballot_returned_list[0]
                 if ballot_returned is not None:
                     ballot_returned_found = True
                     status += 'BALLOT_RETURNED_FOUND-ATTEMPT2 '
@@ -2944,6 +3144,140 @@ class BallotReturnedManager(models.Manager):
             'ballot_returned':          ballot_returned,
         }
 
+    @staticmethod
+    def retrieve_closest_map_point_ballot_returned(
+            latitude=None,
+            longitude=None,
+            google_civic_election_id=0,
+            state_code='',
+            read_only=True):
+        """
+        Find the map point (polling location) BallotReturned closest to this latitude/longitude for one election,
+        no more than DISTANCE_LIMIT_IN_MILES away. Uses the in-process spatial index for (election, state), and falls
+        back to calculating distances in the database if the index can't be used.
+        The ballot_returned returned has a "distance" attribute in miles.
+        :param latitude:
+        :param longitude:
+        :param google_civic_election_id:
+        :param state_code:
+        :param read_only:
+        :return:
+        """
+        ballot_returned = None
+        status = ""
+        success = True
+        try:
+            spatial_index = fetch_ballot_returned_spatial_index(
+                google_civic_election_id, state_code=state_code, read_only=read_only)
+            ballot_returned_id, distance = spatial_index.find_closest(latitude, longitude)
+            status += "SPATIAL_INDEX_SEARCHED-" + str(spatial_index.map_point_count) + " "
+            if ballot_returned_id is not None:
+                if 'test' in sys.argv:
+                    ballot_returned = BallotReturned.objects.filter(id=ballot_returned_id).first()
+                elif positive_value_exists(read_only):
+                    ballot_returned = BallotReturned.objects.using('readonly').filter(id=ballot_returned_id).first()
+                else:
+                    ballot_returned = BallotReturned.objects.filter(id=ballot_returned_id).first()
+                if ballot_returned is not None:
+                    ballot_returned.distance = distance
+                else:
+                    # The map point was deleted by another process since the index was built
+                    status += "SPATIAL_INDEX_OUT_OF_DATE "
+                    remove_from_ballot_returned_spatial_index(google_civic_election_id, ballot_returned_id)
+                    results = BallotReturnedManager.retrieve_closest_map_point_ballot_returned_from_database(
+                        latitude=latitude,
+                        longitude=longitude,
+                        google_civic_election_id=google_civic_election_id,
+                        state_code=state_code,
+                        read_only=read_only)
+                    status += results['status']
+                    success = results['success']
+                    ballot_returned = results['ballot_returned']
+        except Exception as e:
+            status += "SPATIAL_INDEX_SEARCH_FAILED: " + str(e) + " "
+            results = BallotReturnedManager.retrieve_closest_map_point_ballot_returned_from_database(
+                latitude=latitude,
+                longitude=longitude,
+                google_civic_election_id=google_civic_election_id,
+                state_code=state_code,
+                read_only=read_only)
+            status += results['status']
+            success = results['success']
+            ballot_returned = results['ballot_returned']
+
+        return {
+            'success':                  success,
+            'status':                   status,
+            'ballot_returned_found':    ballot_returned is not None,
+            'ballot_returned':          ballot_returned,
+        }
+
+    @staticmethod
+    def retrieve_closest_map_point_ballot_returned_from_database(
+            latitude=None,
+            longitude=None,
+            google_civic_election_id=0,
+            state_code='',
+            read_only=True):
+        """
+        Same as retrieve_closest_map_point_ballot_returned, calculating the great circle distance in the database.
+        A bounding box on latitude/longitude keeps the calculation off rows that can't be within the distance limit.
+        :return:
+        """
+        ballot_returned = None
+        status = ""
+        success = True
+        if 'test' in sys.argv:
+            ballot_returned_query = BallotReturned.objects.all()
+        elif positive_value_exists(read_only):
+            ballot_returned_query = BallotReturned.objects.using('readonly').all()
+        else:
+            ballot_returned_query = BallotReturned.objects.all()
+        # Limit this query to entries stored for map points
+        ballot_returned_query = ballot_returned_query.exclude(
+            Q(polling_location_we_vote_id__isnull=True) | Q(polling_location_we_vote_id=""))
+        ballot_returned_query = ballot_returned_query.filter(google_civic_election_id=google_civic_election_id)
+        if positive_value_exists(state_code):
+            # This search for normalized_state is NOT redundant because some elections are in many states
+            ballot_returned_query = ballot_returned_query.filter(normalized_state__iexact=state_code)
+
+        try:
+            min_latitude, max_latitude, min_longitude, max_longitude = calculate_bounding_box(latitude, longitude)
+            ballot_returned_query = ballot_returned_query.filter(
+                latitude__gte=min_latitude,
+                latitude__lte=max_latitude,
+                longitude__gte=min_longitude,
+                longitude__lte=max_longitude)
+            lat_rads_ploc = latitude * DEG_TO_RADS
+            lon_rads_ploc = longitude * DEG_TO_RADS
+            ballot_returned_query = ballot_returned_query.annotate(
+                # Calculate the approximate great circle distance between two coordinates
+                # https://medium.com/@petehouston/calculate-distance-of-two-locations-on-earth-using-python-1501b1944d97
+                distance=ExpressionWrapper(
+                    (RADIUS_OF_EARTH_IN_MILES * (
+                        ACos(
+                            (Sin(F('latitude') * DEG_TO_RADS) *
+                             Sin(lat_rads_ploc)) +
+                            (Cos(F('latitude') * DEG_TO_RADS) *
+                             Cos(lat_rads_ploc) *
+                             Cos((F('longitude') * DEG_TO_RADS) - lon_rads_ploc))
+                        )
+                    )),
+                    output_field=FloatField()))
+            # Do not return ballots more than 25 miles away
+            ballot_returned_query = ballot_returned_query.filter(distance__lte=DISTANCE_LIMIT_IN_MILES)
+            ballot_returned = ballot_returned_query.order_by('distance').first()
+        except Exception as e:
+            success = False
+            status += "CLOSEST_MAP_POINT_DATABASE_QUERY_FAILED: " + str(e) + " "
+
+        return {
+            'success':                  success,
+            'status':                   status,
+            'ballot_returned_found':    ballot_returned is not None,
+            'ballot_returned':          ballot_returned,
+        }
+
     @staticmethod
     def should_election_search_data_be_saved(google_civic_election_id):
         if not positive_value_exists(google_civic_election_id):
@@ -3755,7 +4089,8 @@ class VoterBallotSaved(models.Model):
     This is a table with a meta data about a voter's various elections they have looked at and might return to
     """
     # The unique id of the voter for which this ballot was retrieved
-    voter_id = models.IntegerField(verbose_name="the voter unique id", default=0, null=False, blank=False)
+    voter_id = models.IntegerField(verbose_name="the voter unique id", default=0, null=False, blank=False,
+                                   db_index=True)
 
     # The unique ID of this election. (Provided by Google Civic)
     google_civic_election_id = models.PositiveIntegerField(
@@ -0,0 +1,56 @@
+# ballot/test_controllers_ballot_politician_index.py
+# Brought to you by We Vote. Be good.
+# -*- coding: UTF-8 -*-
+
+from unittest import mock
+from django.test import SimpleTestCase
+from . import controllers_ballot_politician_index
+from .controllers_ballot_politician_index import combine_politician_we_vote_ids_by_ballot, \
+    generate_ballot_key_list_for_ballot_item, queue_ballot_politician_index_update, \
+    queue_ballot_politician_index_update_for_candidate
+
+
+class BallotPoliticianIndexTests(SimpleTestCase):
+
+    def test_generate_ballot_key_list_for_ballot_item(self):
+        self.assertEqual(generate_ballot_key_list_for_ballot_item('wvploc1', 0), [('wvploc1', 0)])
+        self.assertEqual(generate_ballot_key_list_for_ballot_item(None, '7'), [('', 7)])
+        self.assertEqual(generate_ballot_key_list_for_ballot_item('', 0), [])
+
+    def test_combine_politician_we_vote_ids_by_ballot(self):
+        ballot_item_list = [
+            ('wvploc1', 0, '1000', 'wvoff1'),
+            ('wvploc1', 0, '1000', 'wvoff2'),
+            ('wvploc1', 0, '1001', 'wvoff3'),
+            (None, 7, '1000', 'wvoff2'),
+            ('wvploc9', 0, '1000', 'wvoff1'),
+        ]
+        candidate_to_office_link_list = [
+            ('wvoff1', 'wvcand1'), ('wvoff1', 'wvcand2'), ('wvoff2', 'wvcand3'), ('wvoff3', 'wvcand4')]
+        # wvcand2 and wvcand3 are the same politician, and wvcand4 isn't linked to a politician yet
+        candidate_politician_list = [('wvcand1', 'wvpol1'), ('wvcand2', 'wvpol2'), ('wvcand3', 'wvpol2')]
+        politician_we_vote_ids_by_ballot = combine_politician_we_vote_ids_by_ballot(
+            [('wvploc1', 0), ('', 7), ('wvploc2', 0)], ballot_item_list, candidate_to_office_link_list,
+            candidate_politician_list)
+        self.assertEqual(politician_we_vote_ids_by_ballot, {
+            ('wvploc1', 0): {'1000': ['wvpol1', 'wvpol2']},
+            ('', 7): {'1000': ['wvpol2']},
+            ('wvploc2', 0): {},
+        })
+
+    @mock.patch.object(controllers_ballot_politician_index.ballot_politician_index_buffer, 'add')
+    def test_queue_ballot_politician_index_update(self, buffer_add):
+        queue_ballot_politician_index_update(polling_location_we_vote_id='wvploc1', voter_id=0)
+        queue_ballot_politician_index_update(contest_office_we_vote_id='wvoff1')
+        self.assertEqual([one_call.args[0] for one_call in buffer_add.call_args_list],
+                         [('BALLOT', ('wvploc1', 0)), ('OFFICE', 'wvoff1')])
+
+    @mock.patch.object(controllers_ballot_politician_index.ballot_politician_index_buffer, 'add')
+    @mock.patch.object(controllers_ballot_politician_index.CandidateToOfficeLink, 'objects')
+    def test_queue_ballot_politician_index_update_for_candidate(self, link_objects, buffer_add):
+        link_objects.filter.return_value.values_list.return_value.distinct.return_value = ['wvoff1', 'wvoff2']
+        queue_ballot_politician_index_update_for_candidate('wvcand1')
+        queue_ballot_politician_index_update_for_candidate('')
+        link_objects.filter.assert_called_once_with(candidate_we_vote_id='wvcand1')
+        self.assertEqual([one_call.args[0] for one_call in buffer_add.call_args_list],
+                         [('OFFICE', 'wvoff1'), ('OFFICE', 'wvoff2')])
@@ -1,9 +1,15 @@
 from unittest import mock
 from collections import namedtuple
 
+from django.db import connections
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 
-from ballot.models import BallotReturned, BallotReturnedManager
+from ballot.controllers import generate_ballot_item_list_from_object_list
+from ballot.models import BallotItem, BallotReturned, BallotReturnedManager, fetch_ballot_returned_spatial_index, \
+    invalidate_ballot_returned_spatial_index
+from candidate.models import CandidateCampaign, CandidateToOfficeLink
+from office.models import ContestOffice
 
 
 Location = namedtuple('Location', ['address', 'latitude', 'longitude'])
@@ -100,3 +106,88 @@ class BallotTestCase(TestCase):
             self.assertFalse(result['geocoder_quota_exceeded'])
             self.assertTrue(result['ballot_returned_found'])
             self.assertEqual(result['ballot_returned'], ballot_in_jackson)
+
+    def test_do_not_return_ballot_more_than_25_miles_away(self):
+        """ The closest map point in the state is about 300 miles from Biloxi, so no ballot should be returned. """
+        with mock.patch('ballot.models.get_geocoder_for_service') as mock_geopy:
+            google_client = mock_geopy('google')()
+            google_client.geocode.return_value = Location(address='Biloxi, MS 39530, USA',
+                                                          latitude=30.3960318, longitude=-88.8853078)
+
+            result = self.ballot_manager.find_closest_ballot_returned('Biloxi, MS', google_civic_election_id=4184)
+            self.assertFalse(result['geocoder_quota_exceeded'])
+            self.assertFalse(result['ballot_returned_found'])
+            self.assertIsNone(result['ballot_returned'])
+
+    def test_map_point_save_updates_spatial_index(self):
+        """ Saving or deleting a map point changes the cached index in place, instead of dropping it. """
+        invalidate_ballot_returned_spatial_index(4184)
+        spatial_index = fetch_ballot_returned_spatial_index(4184, state_code='MS')
+        self.assertEqual(spatial_index.map_point_count, 1)
+        self.assertEqual(spatial_index.find_closest(30.3960318, -88.8853078), (None, None))
+
+        ballot_in_biloxi = BallotReturned.objects.create(**{'google_civic_election_id': 4184,
+                                                            'latitude': 30.4010000,
+                                                            'longitude': -88.8900000,
+                                                            'normalized_state': 'MS',
+                                                            'polling_location_we_vote_id': 'wv01ploc43199',
+                                                            })
+        self.assertIs(fetch_ballot_returned_spatial_index(4184, state_code='MS'), spatial_index)
+        self.assertEqual(spatial_index.map_point_count, 2)
+        self.assertEqual(spatial_index.find_closest(30.3960318, -88.8853078)[0], ballot_in_biloxi.id)
+
+        ballot_in_biloxi.delete()
+        self.assertEqual(spatial_index.map_point_count, 1)
+        self.assertEqual(spatial_index.find_closest(30.3960318, -88.8853078), (None, None))
+
+
+class BallotItemListQueryCountTestCase(TestCase):
+    databases = ["default", "readonly"]
+
+    @staticmethod
+    def create_ballot_item_list(number_of_offices, candidates_per_office=3):
+        ballot_item_list = []
+        for office_number in range(number_of_offices):
+            office_we_vote_id = 'wvtestoff{}'.format(office_number)
+            ContestOffice.objects.create(
+                we_vote_id=office_we_vote_id,
+                office_name='Office {}'.format(office_number),
+                google_civic_election_id=4184,
+                state_code='MS')
+            for candidate_number in range(candidates_per_office):
+                candidate_we_vote_id = 'wvtestcand{}x{}'.format(office_number, candidate_number)
+                CandidateCampaign.objects.create(
+                    we_vote_id=candidate_we_vote_id,
+                    candidate_name='Candidate {} {}'.format(office_number, candidate_number),
+                    google_civic_election_id=4184,
+                    state_code='MS')
+                CandidateToOfficeLink.objects.create(
+                    candidate_we_vote_id=candidate_we_vote_id,
+                    contest_office_we_vote_id=office_we_vote_id,
+                    google_civic_election_id=4184,
+                    state_code='MS')
+            ballot_item_list.append(BallotItem(
+                ballot_item_display_name='Office {}'.format(office_number),
+                contest_office_we_vote_id=office_we_vote_id,
+                google_civic_election_id=4184,
+                local_ballot_order=office_number))
+        return ballot_item_list
+
+    @staticmethod
+    def count_queries(ballot_item_list):
+        with CaptureQueriesContext(connections['default']) as default_queries, \
+                CaptureQueriesContext(connections['readonly']) as readonly_queries:
+            results = generate_ballot_item_list_from_object_list(
+                ballot_item_object_list=ballot_item_list, google_civic_election_id=4184)
+        return len(default_queries) + len(readonly_queries), results
+
+    def test_query_count_does_not_grow_with_ballot_length(self):
+        ballot_item_list = self.create_ballot_item_list(60)
+        short_ballot_query_count, short_results = self.count_queries(ballot_item_list[:2])
+        long_ballot_query_count, long_results = self.count_queries(ballot_item_list)
+
+        self.assertEqual(len(short_results['ballot_item_list']), 2)
+        self.assertEqual(len(long_results['ballot_item_list']), 60)
+        self.assertEqual(len(long_results['ballot_item_list'][59]['candidate_list']), 3)
+        self.assertEqual(short_ballot_query_count, long_ballot_query_count)
+        self.assertLessEqual(long_ballot_query_count, 6)
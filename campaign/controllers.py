@@ -132,13 +132,13 @@ def campaignx_list_retrieve_for_api(  # campaignListRetrieve
     site_owner_organization_we_vote_id = results['organization_we_vote_id']
 
     voter_can_vote_for_politician_we_vote_ids = []
-    # TODO: Creates excessive slow-down. We need a more optimized solution.
-    # if voter_can_vote_for_politicians_list_returned:
-    #     # We need to know all the politicians this voter can vote for so we can figure out
-    #     #  if the voter can vote for any politicians in the election
-    #     from ballot.controllers import what_voter_can_vote_for
-    #     results = what_voter_can_vote_for(request=request, voter_device_id=voter_device_id)
-    #     voter_can_vote_for_politician_we_vote_ids = results['voter_can_vote_for_politician_we_vote_ids']
+    if voter_can_vote_for_politicians_list_returned:
+        # We need to know all the politicians this voter can vote for so we can figure out
+        #  if the voter can vote for any politicians in the election. what_voter_can_vote_for prepares a ballot,
+        #  which was too slow here, so we read the ballots the voter has already looked at from the precomputed index
+        from ballot.controllers_ballot_politician_index import what_voter_can_vote_for_from_saved_ballots
+        results = what_voter_can_vote_for_from_saved_ballots(voter_id=voter.id)
+        voter_can_vote_for_politician_we_vote_ids = results['voter_can_vote_for_politician_we_vote_ids']
 
     visible_on_this_site_campaignx_we_vote_id_list = []
     campaignx_manager = CampaignXManager()
@@ -434,6 +434,7 @@ def campaignx_retrieve_for_api(  # campaignRetrieve & campaignRetrieveAsOwner (N
     campaignx_dict = {}
     campaignx_error_dict = copy.deepcopy(CAMPAIGNX_ERROR_DICT)
     campaignx_error_dict['seo_friendly_path'] = seo_friendly_path
+    voter_id = 0
     voter_signed_in_with_email = False
     voter_we_vote_id = ''
 
@@ -442,6 +443,7 @@ def campaignx_retrieve_for_api(  # campaignRetrieve & campaignRetrieveAsOwner (N
     voter_results = voter_manager.retrieve_voter_from_voter_device_id(voter_device_id, read_only=True)
     if voter_results['voter_found']:
         voter = voter_results['voter']
+        voter_id = voter.id
         voter_signed_in_with_email = voter.signed_in_with_email()
         voter_we_vote_id = voter.we_vote_id
     if positive_value_exists(as_owner):
@@ -486,11 +488,10 @@ def campaignx_retrieve_for_api(  # campaignRetrieve & campaignRetrieveAsOwner (N
     if hasattr(campaignx, 'we_vote_id'):
         # We need to know all the politicians this voter can vote for, so we can figure out
         #  if the voter can vote for any politicians in the election
-        # May 6, 2023: TURNED OFF BECAUSE TOO TIME CONSUMING FOR NOW. Perhaps pre-calculate?
-        # from ballot.controllers import what_voter_can_vote_for
-        # results = what_voter_can_vote_for(request=request, voter_device_id=voter_device_id)
-        # voter_can_vote_for_politician_we_vote_ids = results['voter_can_vote_for_politician_we_vote_ids']
-        voter_can_vote_for_politician_we_vote_ids = []
+        # May 6, 2023: what_voter_can_vote_for was too time consuming here, so we read the pre-calculated index
+        from ballot.controllers_ballot_politician_index import what_voter_can_vote_for_from_saved_ballots
+        results = what_voter_can_vote_for_from_saved_ballots(voter_id=voter_id)
+        voter_can_vote_for_politician_we_vote_ids = results['voter_can_vote_for_politician_we_vote_ids']
 
         generate_results = generate_campaignx_dict_from_campaignx_object(
             campaignx=campaignx,
@@ -32,6 +32,7 @@ from wevote_functions.functions import add_period_to_middle_name_initial, add_pe
 from wevote_functions.functions_date import convert_date_to_we_vote_date_string, \
     convert_we_vote_date_string_to_date_as_integer, get_current_date_as_integer, get_current_year_as_integer, \
     DATE_FORMAT_YMD_HMS, DATE_FORMAT_YMD
+from wevote_functions.functions_sync import process_request_from_master_in_batches, SYNC_IMPORT_COUNT_KEYS
 from wevote_functions.utils import staticUserAgent
 from .models import CandidateListManager, CandidateCampaign, CandidateManager, \
     CANDIDATE_UNIQUE_ATTRIBUTES_TO_BE_CLEARED, CANDIDATE_UNIQUE_IDENTIFIERS, \
@@ -335,34 +336,34 @@ def candidates_import_from_sample_file():
     return candidates_import_from_structured_json(structured_json)
 
 
-def candidates_import_from_master_server(
-        request, google_civic_election_id='', state_code=''):  # Consumes candidatesSyncOut
+def candidates_import_from_master_server(  # Consumes candidatesSyncOut
+        request, google_civic_election_id='', state_code='', changed_since='', since_id=0):
     """
-    Get the json data, and either create new entries or update existing
+    Get the json data, and either create new entries or update existing. The master server streams the candidates,
+    and we import them a batch at a time as they arrive.
     :param request:
     :param google_civic_election_id:
     :param state_code:
+    :param changed_since: Only pull candidates updated on the master server on or after this date
+    :param since_id: Resume a pull which was cut off, from the last_id it returned
     :return:
     """
+    get_params = {
+        "key": WE_VOTE_API_KEY,  # This comes from an environment variable
+        "google_civic_election_id": str(google_civic_election_id),
+        "state_code": state_code,
+    }
+    if positive_value_exists(changed_since):
+        get_params['changed_since'] = changed_since
+    if positive_value_exists(since_id):
+        get_params['since_id'] = since_id
 
-    import_results, structured_json = process_request_from_master(
+    # results = filter_candidates_structured_json_for_local_duplicates(structured_json)
+    import_results = process_request_from_master_in_batches(
         request, "Loading Candidates from We Vote Master servers",
-        CANDIDATES_SYNC_URL,
-        {
-            "key": WE_VOTE_API_KEY,  # This comes from an environment variable
-            "google_civic_election_id": str(google_civic_election_id),
-            "state_code": state_code,
-        }
-    )
-
-    if import_results['success']:
-        # results = filter_candidates_structured_json_for_local_duplicates(structured_json)
-        # filtered_structured_json = results['structured_json']
-        # duplicates_removed = results['duplicates_removed']
-        # import_results = candidates_import_from_structured_json(filtered_structured_json)
-        import_results = candidates_import_from_structured_json(structured_json)
-        # import_results['duplicates_removed'] = duplicates_removed
-        import_results['duplicates_removed'] = 0
+        CANDIDATES_SYNC_URL, get_params, candidates_import_from_structured_json)
+    for count_key in SYNC_IMPORT_COUNT_KEYS:
+        import_results.setdefault(count_key, 0)
 
     import2_results, structured_json = process_request_from_master(
         request, "Loading Candidate to Office Links from We Vote Master servers",
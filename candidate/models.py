@@ -7,12 +7,16 @@ import re
 from django.core.exceptions import ValidationError
 from django.db import models
 from django.db.models import Count, Q
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
 
 import wevote_functions.admin
 from election.models import Election, ElectionManager
 from exception.models import handle_exception, handle_record_found_more_than_one_exception
 from image.models import ORGANIZATION_ENDORSEMENTS_IMAGE_NAME
 from office.models import ContestOffice, ContestOfficeManager
+from wevote_functions.functions_cache import CACHE_NAMESPACE_CANDIDATE, invalidate_cache_key, \
+    retrieve_results_through_cache
 from wevote_functions.functions import add_period_to_middle_name_initial, add_period_to_name_prefix_and_suffix, \
     candidate_party_display, convert_to_int, \
     display_full_name_with_correct_capitalization, extract_instagram_handle_from_text_string, \
@@ -305,6 +309,75 @@ class CandidateListManager(models.Manager):
         }
         return results
 
+    @staticmethod
+    def retrieve_all_candidates_for_office_list(office_we_vote_id_list=[], read_only=False):
+        """
+        Same as retrieve_all_candidates_for_office, but for many offices with two queries total.
+        candidate_list_by_office_we_vote_id holds each office's candidates, in twitter_followers_count order.
+        :param office_we_vote_id_list:
+        :param read_only:
+        :return:
+        """
+        candidate_list = []
+        candidate_list_by_office_we_vote_id = {}
+        status = ""
+        success = True
+
+        if not positive_value_exists(len(office_we_vote_id_list)):
+            status += 'RETRIEVE_ALL_CANDIDATES_FOR_OFFICE_LIST-MISSING_OFFICE_WE_VOTE_ID_LIST '
+            results = {
+                'success':                              False,
+                'status':                               status,
+                'candidate_list_found':                 False,
+                'candidate_list':                       candidate_list,
+                'candidate_list_by_office_we_vote_id':  candidate_list_by_office_we_vote_id,
+            }
+            return results
+
+        office_we_vote_id_list_by_candidate_we_vote_id = {}
+        try:
+            if positive_value_exists(read_only):
+                link_query = CandidateToOfficeLink.objects.using('readonly').all()
+            else:
+                link_query = CandidateToOfficeLink.objects.all()
+            link_query = link_query.filter(contest_office_we_vote_id__in=office_we_vote_id_list)
+            for candidate_we_vote_id, contest_office_we_vote_id in \
+                    link_query.values_list('candidate_we_vote_id', 'contest_office_we_vote_id'):
+                if positive_value_exists(candidate_we_vote_id):
+                    office_we_vote_id_list_by_candidate_we_vote_id.setdefault(candidate_we_vote_id, []).append(
+                        contest_office_we_vote_id)
+
+            if len(office_we_vote_id_list_by_candidate_we_vote_id):
+                if positive_value_exists(read_only):
+                    candidate_query = CandidateCampaign.objects.using('readonly').all()
+                else:
+                    candidate_query = CandidateCampaign.objects.all()
+                candidate_query = candidate_query.filter(
+                    we_vote_id__in=list(office_we_vote_id_list_by_candidate_we_vote_id.keys()))
+                candidate_query = candidate_query.exclude(do_not_display_on_ballot=True)
+                candidate_query = candidate_query.order_by('-twitter_followers_count')
+                candidate_list = list(candidate_query)
+        except Exception as e:
+            handle_exception(e, logger=logger)
+            status += 'FAILED retrieve_all_candidates_for_office_list ' + str(e) + ' '
+            success = False
+
+        for candidate in candidate_list:
+            for contest_office_we_vote_id in office_we_vote_id_list_by_candidate_we_vote_id.get(candidate.we_vote_id, []):
+                candidate_list_by_office_we_vote_id.setdefault(contest_office_we_vote_id, []).append(candidate)
+
+        candidate_list_found = len(candidate_list) > 0
+        if candidate_list_found:
+            status += 'RETRIEVE_ALL_CANDIDATES_FOR_OFFICE_LIST-CANDIDATES_RETRIEVED '
+        results = {
+            'success':                              success,
+            'status':                               status,
+            'candidate_list_found':                 candidate_list_found,
+            'candidate_list':                       candidate_list,
+            'candidate_list_by_office_we_vote_id':  candidate_list_by_office_we_vote_id,
+        }
+        return results
+
     @staticmethod
     def retrieve_candidate_list(
             candidate_id_list=None,
@@ -3023,6 +3096,16 @@ def mimic_google_civic_initials(name):
     return modified_name
 
 
+@receiver(post_save, sender=CandidateCampaign)
+def save_candidate_campaign_cache_signal(sender, instance, **kwargs):
+    invalidate_cache_key(CACHE_NAMESPACE_CANDIDATE, instance.we_vote_id)
+
+
+@receiver(post_delete, sender=CandidateCampaign)
+def delete_candidate_campaign_cache_signal(sender, instance, **kwargs):
+    invalidate_cache_key(CACHE_NAMESPACE_CANDIDATE, instance.we_vote_id)
+
+
 class CandidateManager(models.Manager):
 
     def __unicode__(self):
@@ -3037,6 +3120,11 @@ class CandidateManager(models.Manager):
     def retrieve_candidate_from_we_vote_id(we_vote_id, read_only=False):
         candidate_id = 0
         candidate_manager = CandidateManager()
+        if positive_value_exists(read_only):
+            # Read-only lookups are served from the shared cache, which is cleared when the candidate is saved
+            return retrieve_results_through_cache(
+                CACHE_NAMESPACE_CANDIDATE, we_vote_id, 'candidate_found',
+                lambda: candidate_manager.retrieve_candidate(candidate_id, we_vote_id, read_only=read_only))
         return candidate_manager.retrieve_candidate(candidate_id, we_vote_id, read_only=read_only)
 
     @staticmethod
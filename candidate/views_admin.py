@@ -61,6 +61,8 @@ from wevote_functions.functions import convert_to_int, \
     extract_state_from_ocd_division_id
 from wevote_functions.functions_date import convert_we_vote_date_string_to_date_as_integer, \
     get_current_year_as_integer, generate_localized_datetime_from_obj, DATE_FORMAT_YMD, DATE_FORMAT_DAY_TWO_DIGIT
+from wevote_functions.functions_sync import filter_sync_out_queryset_for_cursor, is_sync_out_streaming_request, \
+    stream_sync_out_response
 from wevote_settings.constants import ELECTION_YEARS_AVAILABLE
 from wevote_settings.models import RemoteRequestHistory, \
     RETRIEVE_POSSIBLE_GOOGLE_LINKS, RETRIEVE_POSSIBLE_TWITTER_HANDLES
@@ -82,6 +84,103 @@ from .models import CandidateCampaign, CandidateListManager, CandidateChangeLog,
 CANDIDATES_SYNC_URL = get_environment_variable("CANDIDATES_SYNC_URL")  # candidatesSyncOut
 WE_VOTE_SERVER_ROOT_URL = get_environment_variable("WE_VOTE_SERVER_ROOT_URL")
 WEB_APP_ROOT_URL = get_environment_variable("WEB_APP_ROOT_URL")
+CANDIDATE_SYNC_OUT_FIELD_LIST = (
+    'ballot_guide_official_statement',
+    'ballotpedia_candidate_id',
+    'ballotpedia_candidate_name',
+    'ballotpedia_candidate_url',
+    'ballotpedia_candidate_summary',
+    'ballotpedia_election_id',
+    'ballotpedia_image_id',
+    'ballotpedia_office_id',
+    'ballotpedia_page_title',
+    'ballotpedia_person_id',
+    'ballotpedia_photo_url',
+    'ballotpedia_profile_image_url_https',
+    'ballotpedia_race_id',
+    'birth_day_text',
+    'candidate_contact_form_url',
+    'candidate_email',
+    'candidate_gender',
+    'candidate_is_incumbent',
+    'candidate_is_top_ticket',
+    'candidate_name',
+    'candidate_participation_status',
+    'candidate_phone',
+    'candidate_twitter_handle',
+    'candidate_twitter_handle2',
+    'candidate_twitter_handle3',
+    'candidate_ultimate_election_date',
+    'candidate_url',
+    'candidate_year',
+    'contest_office_name',
+    'contest_office_we_vote_id',
+    'crowdpac_candidate_id',
+    'ctcl_uuid',
+    'do_not_display_on_ballot',
+    'facebook_profile_image_url_https',
+    'facebook_url',
+    'facebook_url_is_broken',
+    'google_civic_candidate_name',
+    'google_civic_candidate_name2',
+    'google_civic_candidate_name3',
+    'google_civic_election_id',
+    'google_plus_url',
+    'instagram_followers_count',
+    'instagram_handle',
+    'is_battleground_race',
+    'linkedin_url',
+    'linkedin_photo_url',
+    'maplight_id',
+    'ocd_division_id',
+    'order_on_ballot',
+    'other_source_url',
+    'other_source_photo_url',
+    'party',
+    'photo_url',
+    'photo_url_from_ctcl',
+    'photo_url_from_maplight',
+    'photo_url_from_vote_smart',
+    'photo_url_from_vote_usa',
+    'politician_we_vote_id',
+    'profile_image_type_currently_active',
+    'state_code',
+    'twitter_description',
+    'twitter_followers_count',
+    'twitter_location',
+    'twitter_name',
+    'twitter_profile_background_image_url_https',
+    'twitter_profile_banner_url_https',
+    'twitter_profile_image_url_https',
+    'twitter_url',
+    'twitter_user_id',
+    'vote_smart_id',
+    'vote_usa_office_id',
+    'vote_usa_politician_id',
+    'vote_usa_profile_image_url_https',
+    'we_vote_hosted_profile_facebook_image_url_large',
+    'we_vote_hosted_profile_facebook_image_url_medium',
+    'we_vote_hosted_profile_facebook_image_url_tiny',
+    'we_vote_hosted_profile_image_url_large',
+    'we_vote_hosted_profile_image_url_medium',
+    'we_vote_hosted_profile_image_url_tiny',
+    'we_vote_hosted_profile_twitter_image_url_large',
+    'we_vote_hosted_profile_twitter_image_url_medium',
+    'we_vote_hosted_profile_twitter_image_url_tiny',
+    'we_vote_hosted_profile_uploaded_image_url_large',
+    'we_vote_hosted_profile_uploaded_image_url_medium',
+    'we_vote_hosted_profile_uploaded_image_url_tiny',
+    'we_vote_hosted_profile_vote_usa_image_url_large',
+    'we_vote_hosted_profile_vote_usa_image_url_medium',
+    'we_vote_hosted_profile_vote_usa_image_url_tiny',
+    'we_vote_id',
+    'wikipedia_page_id',
+    'wikipedia_page_title',
+    'wikipedia_photo_url',
+    'withdrawal_date',
+    'withdrawn_from_election',
+    'youtube_url',
+)
 
 logger = wevote_functions.admin.get_logger(__name__)
 
@@ -162,106 +261,15 @@ def candidates_sync_out_view(request):  # candidatesSyncOut
                     final_filters |= item
 
                 queryset = queryset.filter(final_filters)
+        if is_sync_out_streaming_request(request):
+            queryset = filter_sync_out_queryset_for_cursor(
+                request, queryset, changed_since_field_name='date_last_updated')
+            return stream_sync_out_response(queryset, CANDIDATE_SYNC_OUT_FIELD_LIST)
+
         candidate_dict_list = []
         try:
             # Fix made related to: https://wevoteusa.atlassian.net/browse/WV-366
-            candidate_dict_list = queryset.values(
-                'ballot_guide_official_statement',
-                'ballotpedia_candidate_id',
-                'ballotpedia_candidate_name',
-                'ballotpedia_candidate_url',
-                'ballotpedia_candidate_summary',
-                'ballotpedia_election_id',
-                'ballotpedia_image_id',
-                'ballotpedia_office_id',
-                'ballotpedia_page_title',
-                'ballotpedia_person_id',
-                'ballotpedia_photo_url',
-                'ballotpedia_profile_image_url_https',
-                'ballotpedia_race_id',
-                'birth_day_text',
-                'candidate_contact_form_url',
-                'candidate_email',
-                'candidate_gender',
-                'candidate_is_incumbent',
-                'candidate_is_top_ticket',
-                'candidate_name',
-                'candidate_participation_status',
-                'candidate_phone',
-                'candidate_twitter_handle',
-                'candidate_twitter_handle2',
-                'candidate_twitter_handle3',
-                'candidate_ultimate_election_date',
-                'candidate_url',
-                'candidate_year',
-                'contest_office_name',
-                'contest_office_we_vote_id',
-                'crowdpac_candidate_id',
-                'ctcl_uuid',
-                'do_not_display_on_ballot',
-                'facebook_profile_image_url_https',
-                'facebook_url',
-                'facebook_url_is_broken',
-                'google_civic_candidate_name',
-                'google_civic_candidate_name2',
-                'google_civic_candidate_name3',
-                'google_civic_election_id',
-                'google_plus_url',
-                'instagram_followers_count',
-                'instagram_handle',
-                'is_battleground_race',
-                'linkedin_url',
-                'linkedin_photo_url',
-                'maplight_id',
-                'ocd_division_id',
-                'order_on_ballot',
-                'other_source_url',
-                'other_source_photo_url',
-                'party',
-                'photo_url',
-                'photo_url_from_ctcl',
-                'photo_url_from_maplight',
-                'photo_url_from_vote_smart',
-                'photo_url_from_vote_usa',
-                'politician_we_vote_id',
-                'profile_image_type_currently_active',
-                'state_code',
-                'twitter_description',
-                'twitter_followers_count',
-                'twitter_location',
-                'twitter_name',
-                'twitter_profile_background_image_url_https',
-                'twitter_profile_banner_url_https',
-                'twitter_profile_image_url_https',
-                'twitter_url',
-                'twitter_user_id',
-                'vote_smart_id',
-                'vote_usa_office_id',
-                'vote_usa_politician_id',
-                'vote_usa_profile_image_url_https',
-                'we_vote_hosted_profile_facebook_image_url_large',
-                'we_vote_hosted_profile_facebook_image_url_medium',
-                'we_vote_hosted_profile_facebook_image_url_tiny',
-                'we_vote_hosted_profile_image_url_large',
-                'we_vote_hosted_profile_image_url_medium',
-                'we_vote_hosted_profile_image_url_tiny',
-                'we_vote_hosted_profile_twitter_image_url_large',
-                'we_vote_hosted_profile_twitter_image_url_medium',
-                'we_vote_hosted_profile_twitter_image_url_tiny',
-                'we_vote_hosted_profile_uploaded_image_url_large',
-                'we_vote_hosted_profile_uploaded_image_url_medium',
-                'we_vote_hosted_profile_uploaded_image_url_tiny',
-                'we_vote_hosted_profile_vote_usa_image_url_large',
-                'we_vote_hosted_profile_vote_usa_image_url_medium',
-                'we_vote_hosted_profile_vote_usa_image_url_tiny',
-                'we_vote_id',
-                'wikipedia_page_id',
-                'wikipedia_page_title',
-                'wikipedia_photo_url',
-                'withdrawal_date',
-                'withdrawn_from_election',
-                'youtube_url',
-            )
+            candidate_dict_list = queryset.values(*CANDIDATE_SYNC_OUT_FIELD_LIST)
         except Exception as e:
             status += "ERROR_CONVERTING_TO_DICT: " + str(e) + " "
 
@@ -321,7 +329,11 @@ def candidates_import_from_master_server_view(request):
     google_civic_election_id = convert_to_int(request.GET.get('google_civic_election_id', 0))
     state_code = request.GET.get('state_code', '')
 
-    results = candidates_import_from_master_server(request, google_civic_election_id, state_code)
+    changed_since = request.GET.get('changed_since', '')
+    since_id = convert_to_int(request.GET.get('since_id', 0))
+
+    results = candidates_import_from_master_server(
+        request, google_civic_election_id, state_code, changed_since=changed_since, since_id=since_id)
 
     if not results['success']:
         messages.add_message(request, messages.ERROR, results['status'])
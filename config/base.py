@@ -4,6 +4,7 @@
 
 import json
 import os
+import sys
 
 from django.core.exceptions import ImproperlyConfigured
 
@@ -127,6 +128,7 @@ INSTALLED_APPS = (
     'admin_tools',
     'analytics',
     'api_internal_cache',
+    'api_telemetry',
     'apis_v1',
     'apple',
     'aws',
@@ -206,8 +208,21 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'wevote_social.middleware.SocialMiddleware',
+    'config.db_router.ReadonlyDatabaseRouterMiddleware',
+    'voter.middleware.VoterIdentityMiddleware',
 ]
 
+# Read-only API GET requests read from the 'readonly' replica (see config/db_router.py)
+# Set READONLY_API_DATABASE_ROUTER_ON to false to send all reads to 'default' unless a query says .using('readonly')
+READONLY_API_DATABASE_ROUTER_ON = get_environment_variable_default('READONLY_API_DATABASE_ROUTER_ON', True)
+if str(READONLY_API_DATABASE_ROUTER_ON).lower() in ('false', '0', ''):
+    DATABASE_ROUTERS = []
+else:
+    DATABASE_ROUTERS = ['config.db_router.ReadonlyApiRouter']
+# Add the X-Query-Count header to every response, for the loadtest/ queries-per-request report
+API_QUERY_COUNT_HEADER_ON = \
+    str(get_environment_variable_default('API_QUERY_COUNT_HEADER_ON', False)).lower() not in ('false', '0', '')
+
 AUTHENTICATION_BACKENDS = (
     'social_core.backends.facebook.FacebookOAuth2',
     'social_core.backends.google.GoogleOAuth2',
@@ -425,6 +440,28 @@ SENDGRID_API_KEY = get_environment_variable("SENDGRID_API_KEY")
 #     ADMINS = [[email.split('@')[0], email] for email in ADMIN_EMAIL_ADDRESSES.split()]
 
 
+# Shared cache for the API read tier (see wevote_functions/functions_cache.py)
+#  Local development:  "django.core.cache.backends.locmem.LocMemCache" (the default)
+#  Production:         "django.core.cache.backends.redis.RedisCache" with CACHE_LOCATION "redis://host:6379/0", or
+#                      "django.core.cache.backends.memcached.PyMemcacheCache" with CACHE_LOCATION "host:11211"
+# Invalidations only reach every process through Redis or Memcached, so with the local memory cache the read-through
+#  caches and read-your-own-writes routing stay off, unless CACHE_IS_SHARED says this is the only process
+#  (a local runserver).
+CACHE_BACKEND = get_environment_variable_default('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache')
+CACHE_LOCATION = get_environment_variable_default('CACHE_LOCATION', 'wevote-api-read-cache')
+CACHE_IS_SHARED = str(get_environment_variable_default('CACHE_IS_SHARED', False)).lower() not in ('false', '0', '')
+if 'test' in sys.argv:
+    # The test database is rolled back between tests without any save signals, so cached rows would outlive it
+    CACHE_BACKEND = 'django.core.cache.backends.dummy.DummyCache'
+CACHES = {
+    'default': {
+        'BACKEND':  CACHE_BACKEND,
+        'LOCATION': CACHE_LOCATION,
+        'KEY_PREFIX': get_environment_variable_default('CACHE_KEY_PREFIX', ''),
+    },
+}
+
+
 # ########## Logging configurations ###########
 #   LOG_STREAM          Boolean     True will turn on stream handler and write to command line.
 #   LOG_FILE            String      Path to file to write to. Make sure executing
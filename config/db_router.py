@@ -0,0 +1,209 @@
+# config/db_router.py
+# Brought to you by We Vote. Be good.
+# -*- coding: UTF-8 -*-
+
+"""
+Send the reads made while answering read-only API requests to the 'readonly' replica.
+
+ReadonlyDatabaseRouterMiddleware decides per request whether it can be served from the replica:
+  - only GET requests to /apis/v1/
+  - not API endpoints that write (names with a write verb, or listed in API_NAMES_THAT_WRITE_ON_GET)
+  - not for a voter_device_id that wrote within the last READ_YOUR_OWN_WRITES_SECONDS, so voters see their own changes
+  - only when the cache is shared by every process (Redis or Memcached), since the voter's next request may be
+    answered by another worker, which has to see the marker this one left
+If a routed request writes anyway (seen by the router, or by an INSERT, UPDATE or DELETE reaching the primary, which
+also catches writes made with .using('default')), the rest of that request reads from the primary again.
+Queries that already use .using('readonly') or .using('analytics') are not changed.
+With API_QUERY_COUNT_HEADER_ON, each response says how many queries it took in the X-Query-Count header
+(the loadtest/ reports use it).
+"""
+
+import re
+import threading
+from contextlib import ExitStack
+from django.conf import settings
+from django.db import connections
+import wevote_functions.admin
+from wevote_functions.functions import positive_value_exists
+from wevote_functions.functions_cache import get_cache, is_cache_shared
+
+logger = wevote_functions.admin.get_logger(__name__)
+
+READONLY_DATABASE_ALIAS = 'readonly'
+PRIMARY_DATABASE_ALIAS = 'default'
+READ_YOUR_OWN_WRITES_SECONDS = 5
+QUERY_COUNT_HEADER_NAME = 'X-Query-Count'
+WRITE_SQL_REGEX = re.compile(r'^\s*(INSERT|UPDATE|DELETE)\b', re.IGNORECASE)
+API_PATH_PREFIX = '/apis/v1/'
+# API names containing one of these words change data, even when called with GET
+API_NAME_WRITE_VERB_REGEX = re.compile(
+    r'(Save|Create|Delete|Update|Follow|Ignore|Dislike|Stop|SignIn|SignOut|Merge|Split|Send|Verify|Response|'
+    r'Cancel|Refund|Webhook|WithStripe|Clear|Repair|Process|Disconnect|Action|Oauth|Validate|Plan|Coupon|Link)')
+# "Retrieve" API names that also create or repair data as they go
+API_NAMES_THAT_WRITE_ON_GET = {
+    'ballotItemOptionsRetrieve',
+    'fastLoadStatusRetrieve',
+    'twitterIdentityRetrieve',
+    'twitterSignInRetrieve',
+    'voterAddressRetrieve',
+    'voterBallotItemsRetrieve',
+    'voterBallotItemsRetrieveFromGoogleCivic',
+    'voterEmailAddressRetrieve',
+    'voterFacebookSignInRetrieve',
+    'voterRetrieve',
+    'voterSMSPhoneNumberRetrieve',
+}
+
+request_state = threading.local()
+
+# Per-alias query counts for this process, so we can see how much load moved off the primary
+database_query_counts = {}
+database_query_counts_lock = threading.Lock()
+
+
+def is_request_routed_to_readonly():
+    return getattr(request_state, 'routed_to_readonly', False)
+
+
+def fetch_database_query_counts():
+    with database_query_counts_lock:
+        return dict(database_query_counts)
+
+
+def reset_database_query_counts():
+    with database_query_counts_lock:
+        database_query_counts.clear()
+
+
+def generate_read_your_own_writes_cache_key(voter_device_id):
+    return 'wv:db_router:recent_write:' + voter_device_id
+
+
+def is_api_name_read_only(api_name):
+    if not positive_value_exists(api_name):
+        return False
+    if api_name in API_NAMES_THAT_WRITE_ON_GET:
+        return False
+    return not API_NAME_WRITE_VERB_REGEX.search(api_name)
+
+
+def record_write_for_this_request():
+    """
+    Called by the router for every write, and for every write statement sent to the primary. Reads for the rest
+    of this request go to the primary, and this voter's reads stay on the primary for READ_YOUR_OWN_WRITES_SECONDS.
+    :return:
+    """
+    if getattr(request_state, 'write_recorded', False):
+        return
+    request_state.write_recorded = True
+    request_state.routed_to_readonly = False
+    voter_device_id = getattr(request_state, 'voter_device_id', '')
+    if positive_value_exists(voter_device_id):
+        try:
+            get_cache().set(generate_read_your_own_writes_cache_key(voter_device_id), True,
+                            timeout=READ_YOUR_OWN_WRITES_SECONDS)
+        except Exception as e:
+            logger.error("record_write_for_this_request: " + str(e))
+
+
+class ReadonlyApiRouter(object):
+    """
+    Reads go to the 'readonly' alias while ReadonlyDatabaseRouterMiddleware has routed this request there.
+    Returning None everywhere else keeps Django's default behavior.
+    """
+
+    def db_for_read(self, model, **hints):
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db:
+            # Follow related objects to the database the instance came from
+            return instance._state.db
+        if is_request_routed_to_readonly():
+            return READONLY_DATABASE_ALIAS
+        return None
+
+    def db_for_write(self, model, **hints):
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db and instance._state.db != READONLY_DATABASE_ALIAS:
+            database_alias = instance._state.db
+        else:
+            # Never write to the replica, even when saving an object that was read from it
+            database_alias = PRIMARY_DATABASE_ALIAS
+        if database_alias == PRIMARY_DATABASE_ALIAS:
+            record_write_for_this_request()
+        return database_alias
+
+    def allow_relation(self, obj1, obj2, **hints):
+        primary_and_replica = {PRIMARY_DATABASE_ALIAS, READONLY_DATABASE_ALIAS}
+        if obj1._state.db in primary_and_replica and obj2._state.db in primary_and_replica:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return None
+
+
+class ReadonlyDatabaseRouterMiddleware(object):
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.readonly_database_exists = READONLY_DATABASE_ALIAS in settings.DATABASES
+        self.query_count_header_on = getattr(settings, 'API_QUERY_COUNT_HEADER_ON', False)
+
+    @staticmethod
+    def count_queries(execute, sql, params, many, context):
+        database_alias = context['connection'].alias
+        with database_query_counts_lock:
+            database_query_counts[database_alias] = database_query_counts.get(database_alias, 0) + 1
+        request_state.query_count = getattr(request_state, 'query_count', 0) + 1
+        if database_alias != READONLY_DATABASE_ALIAS and WRITE_SQL_REGEX.match(sql):
+            # Writes with an explicit .using('default') (and raw SQL) never ask the router
+            record_write_for_this_request()
+        return execute(sql, params, many, context)
+
+    @staticmethod
+    def get_voter_device_id_without_reading_body(request):
+        # Unlike get_voter_api_device_id, don't touch request.POST here: the views may still need to read the body
+        voter_device_id = request.headers.get('x-header-deviceid', '')
+        if not positive_value_exists(voter_device_id):
+            voter_device_id = request.GET.get('voter_device_id', '')
+        if not positive_value_exists(voter_device_id):
+            voter_device_id = request.COOKIES.get('voter_api_device_id', '')
+        return voter_device_id
+
+    def should_route_to_readonly(self, request):
+        if not self.readonly_database_exists or request.method != 'GET':
+            return False
+        if not is_cache_shared():
+            # Another worker couldn't see that this voter just wrote, and would answer from the lagging replica
+            return False
+        if not request.path.startswith(API_PATH_PREFIX):
+            return False
+        api_name = request.path[len(API_PATH_PREFIX):].strip('/').split('/')[0]
+        if not is_api_name_read_only(api_name):
+            return False
+        voter_device_id = request_state.voter_device_id
+        if positive_value_exists(voter_device_id):
+            try:
+                if get_cache().get(generate_read_your_own_writes_cache_key(voter_device_id)):
+                    return False
+            except Exception as e:
+                logger.error("ReadonlyDatabaseRouterMiddleware: " + str(e))
+                return False
+        return True
+
+    def __call__(self, request):
+        request_state.write_recorded = False
+        request_state.routed_to_readonly = False
+        request_state.query_count = 0
+        request_state.voter_device_id = self.get_voter_device_id_without_reading_body(request)
+        request_state.routed_to_readonly = self.should_route_to_readonly(request)
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(self.count_queries))
+                response = self.get_response(request)
+            if self.query_count_header_on and response is not None:
+                response[QUERY_COUNT_HEADER_NAME] = str(request_state.query_count)
+        finally:
+            request_state.routed_to_readonly = False
+            request_state.voter_device_id = ''
+        return response
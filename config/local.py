@@ -17,6 +17,7 @@ DEBUG = get_environment_variable('SERVER_IN_DEBUG_MODE')
 # Multiple Databases
 # See https://docs.djangoproject.com/en/1.10/topics/db/multi-db/#defining-your-databases
 # August 2017: Not setting DATABASE_ROUTERS at this time, instead going with ".using('readonly')" on individual queries
+# DATABASE_ROUTERS (set in base.py) now also sends read-only API GET requests to 'readonly', see config/db_router.py
 
 DATABASES = {
     'default': {
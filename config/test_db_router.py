@@ -0,0 +1,76 @@
+# config/test_db_router.py
+# Brought to you by We Vote. Be good.
+# -*- coding: UTF-8 -*-
+
+from types import SimpleNamespace
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+from .db_router import ReadonlyApiRouter, ReadonlyDatabaseRouterMiddleware, is_api_name_read_only, \
+    is_request_routed_to_readonly, QUERY_COUNT_HEADER_NAME
+
+
+@override_settings(CACHE_IS_SHARED=True)
+class ReadonlyDatabaseRouterTests(SimpleTestCase):
+
+    def setUp(self):
+        self.router = ReadonlyApiRouter()
+        self.routed_during_request = None
+
+    def get_response(self, request):
+        self.routed_during_request = is_request_routed_to_readonly()
+        self.read_database_during_request = self.router.db_for_read(None)
+        return None
+
+    def test_api_name_read_only(self):
+        self.assertTrue(is_api_name_read_only('positionListForBallotItem'))
+        self.assertTrue(is_api_name_read_only('candidateRetrieve'))
+        self.assertFalse(is_api_name_read_only('voterRetrieve'))
+        self.assertFalse(is_api_name_read_only('positionSave'))
+        self.assertFalse(is_api_name_read_only('organizationFollow'))
+        self.assertFalse(is_api_name_read_only(''))
+
+    def test_middleware_routes_read_only_api_get(self):
+        middleware = ReadonlyDatabaseRouterMiddleware(self.get_response)
+        middleware(RequestFactory().get('/apis/v1/positionListForBallotItem/'))
+        self.assertTrue(self.routed_during_request)
+        self.assertEqual(self.read_database_during_request, 'readonly')
+        self.assertFalse(is_request_routed_to_readonly())
+
+        middleware(RequestFactory().post('/apis/v1/positionListForBallotItem/'))
+        self.assertFalse(self.routed_during_request)
+        middleware(RequestFactory().get('/apis/v1/voterRetrieve/'))
+        self.assertFalse(self.routed_during_request)
+        middleware(RequestFactory().get('/admin/'))
+        self.assertFalse(self.routed_during_request)
+
+    def test_writes_go_to_default_and_end_routing(self):
+        def get_response_that_writes(request):
+            self.assertEqual(self.router.db_for_write(None), 'default')
+            self.routed_during_request = is_request_routed_to_readonly()
+            return None
+        middleware = ReadonlyDatabaseRouterMiddleware(get_response_that_writes)
+        middleware(RequestFactory().get('/apis/v1/positionListForBallotItem/'))
+        self.assertFalse(self.routed_during_request)
+
+    @override_settings(API_QUERY_COUNT_HEADER_ON=True)
+    def test_query_count_header(self):
+        middleware = ReadonlyDatabaseRouterMiddleware(lambda request: HttpResponse())
+        response = middleware(RequestFactory().get('/apis/v1/positionListForBallotItem/'))
+        self.assertEqual(response[QUERY_COUNT_HEADER_NAME], '0')
+
+    def test_write_statements_to_the_primary_end_routing(self):
+        def get_response_that_writes_with_using(request):
+            for sql in ('SELECT 1', 'UPDATE "voter_voter" SET "is_admin" = false'):
+                ReadonlyDatabaseRouterMiddleware.count_queries(
+                    lambda *args: None, sql, None, False, {'connection': SimpleNamespace(alias='default')})
+            self.routed_during_request = is_request_routed_to_readonly()
+            return None
+        middleware = ReadonlyDatabaseRouterMiddleware(get_response_that_writes_with_using)
+        middleware(RequestFactory().get('/apis/v1/positionListForBallotItem/'))
+        self.assertFalse(self.routed_during_request)
+
+    @override_settings(CACHE_IS_SHARED=False)
+    def test_not_routed_without_a_shared_cache(self):
+        middleware = ReadonlyDatabaseRouterMiddleware(self.get_response)
+        middleware(RequestFactory().get('/apis/v1/positionListForBallotItem/'))
+        self.assertFalse(self.routed_during_request)
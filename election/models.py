@@ -6,9 +6,13 @@ from datetime import datetime
 
 from django.db import models
 from django.db.models import Q
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
 
 import wevote_functions.admin
 from wevote_functions.functions import convert_to_int, extract_state_from_ocd_division_id, positive_value_exists
+from wevote_functions.functions_cache import CACHE_NAMESPACE_ELECTION, invalidate_cache_key, \
+    retrieve_results_through_cache
 from wevote_functions.functions_date import convert_date_as_integer_to_date, convert_date_to_date_as_integer, \
     convert_date_to_we_vote_date_string
 
@@ -165,6 +169,16 @@ class Election(models.Model):
                 return []
 
 
+@receiver(post_save, sender=Election)
+def save_election_cache_signal(sender, instance, **kwargs):
+    invalidate_cache_key(CACHE_NAMESPACE_ELECTION, instance.google_civic_election_id)
+
+
+@receiver(post_delete, sender=Election)
+def delete_election_cache_signal(sender, instance, **kwargs):
+    invalidate_cache_key(CACHE_NAMESPACE_ELECTION, instance.google_civic_election_id)
+
+
 class ElectionManager(models.Manager):
 
     @staticmethod
@@ -594,6 +608,29 @@ class ElectionManager(models.Manager):
             read_only=True,
             ctcl_uuid='',
             vote_usa_election_id=''):
+        if positive_value_exists(read_only) and positive_value_exists(google_civic_election_id) \
+                and not positive_value_exists(election_id) and not positive_value_exists(ctcl_uuid) \
+                and not positive_value_exists(vote_usa_election_id):
+            # Read-only lookups by google_civic_election_id alone are served from the shared cache, which is
+            #  cleared when the election is saved
+            return retrieve_results_through_cache(
+                CACHE_NAMESPACE_ELECTION, convert_to_int(google_civic_election_id), 'election_found',
+                lambda: ElectionManager.retrieve_election_from_database(
+                    google_civic_election_id=google_civic_election_id, read_only=read_only))
+        return ElectionManager.retrieve_election_from_database(
+            google_civic_election_id=google_civic_election_id,
+            election_id=election_id,
+            read_only=read_only,
+            ctcl_uuid=ctcl_uuid,
+            vote_usa_election_id=vote_usa_election_id)
+
+    @staticmethod
+    def retrieve_election_from_database(
+            google_civic_election_id=0,
+            election_id=0,
+            read_only=True,
+            ctcl_uuid='',
+            vote_usa_election_id=''):
         google_civic_election_id = convert_to_int(google_civic_election_id)
 
         election = None
@@ -6,6 +6,7 @@ from .controllers import election_refresh_statistics, election_remote_retrieve,
 from .models import Election
 from admin_tools.views import redirect_to_sign_in_page
 from analytics.models import AnalyticsManager
+from api_telemetry.models import ApiCallMinuteCount
 from ballot.models import BallotItem, BallotItemListManager, \
     BallotReturned, BallotReturnedListManager, BallotReturnedManager, \
     VoterBallotSaved, VoterBallotSavedManager
@@ -51,6 +52,8 @@ from voter_guide.models import VoterGuide, VoterGuidePossibility, \
 import wevote_functions.admin
 from wevote_functions.functions import convert_to_int, positive_value_exists, \
     STATE_CODE_MAP, STATE_GEOGRAPHIC_CENTER
+from wevote_functions.functions_cache import CACHE_NAMESPACE_CANDIDATE, CACHE_NAMESPACE_CONTEST_OFFICE, \
+    invalidate_cache_namespace
 from wevote_functions.functions_date import convert_we_vote_date_string_to_date, generate_localized_datetime_from_obj, DATE_FORMAT_YMD, DATE_FORMAT_DAY_TWO_DIGIT
 from wevote_settings.constants import ELECTION_YEARS_AVAILABLE
 from wevote_settings.models import RemoteRequestHistoryManager
@@ -2294,6 +2297,8 @@ def election_migration_view(request):
             else:
                 CandidateCampaign.objects.filter(google_civic_election_id=from_election_id)\
                     .update(google_civic_election_id=to_election_id)
+            # queryset.update() doesn't send save signals, so clear every cached candidate
+            invalidate_cache_namespace(CACHE_NAMESPACE_CANDIDATE)
             status += 'CANDIDATES_UPDATED '
     except Exception as e:
         error = True
@@ -2433,6 +2438,7 @@ def election_migration_view(request):
             else:
                 ContestOffice.objects.filter(google_civic_election_id=from_election_id)\
                     .update(google_civic_election_id=to_election_id)  # Cannot be readonly
+            invalidate_cache_namespace(CACHE_NAMESPACE_CONTEST_OFFICE)
             status += 'OFFICES_UPDATED '
     except Exception as e:
         error = True
@@ -2729,6 +2735,19 @@ def election_migration_view(request):
                 error = True
                 status += "COULD_NOT_UPDATE_ALL_VOTE_SMART_API_COUNTER_MONTHLY " + str(e) + ' '
 
+    # ########################################
+    # ApiCallMinuteCount
+    if not positive_value_exists(from_state_code):  # Only move if we are NOT moving just one state
+        api_call_minute_count_query = ApiCallMinuteCount.objects.filter(google_civic_election_id=from_election_id)
+        api_call_minute_count = api_call_minute_count_query.count()
+        if positive_value_exists(change_now) and positive_value_exists(api_call_minute_count):
+            try:
+                ApiCallMinuteCount.objects.filter(google_civic_election_id=from_election_id)\
+                    .update(google_civic_election_id=to_election_id)
+            except Exception as e:
+                error = True
+                status += "COULD_NOT_UPDATE_ALL_API_CALL_MINUTE_COUNTS " + str(e) + ' '
+
     # ########################################
     # We Vote Images
     from_election_we_vote_image_count = 0
@@ -0,0 +1,419 @@
+# email_outbound/controllers_email_queue.py
+# Brought to you by We Vote. Be good.
+# -*- coding: UTF-8 -*-
+
+"""
+Outbound email queue. With EMAIL_OUTBOUND_QUEUE_ON, EmailManager.send_scheduled_email only marks EmailScheduled
+entries QUEUED_TO_SEND, and "python manage.py send_queued_emails" workers claim them (SELECT ... FOR UPDATE SKIP
+LOCKED, so any number of workers can run at once) and send them to SendGrid. Emails with the same sender and body
+go out in one API call, with a personalization (to, subject and List-Unsubscribe headers) per recipient.
+Delivery is at least once: a worker stopped between the API call and marking its emails SENT leaves them BEING_SENT,
+and they are queued again after EMAIL_BEING_SENT_TIMEOUT_MINUTES.
+"""
+
+import random
+import time
+from datetime import timedelta
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils.timezone import now
+from api_telemetry.controllers import record_api_call
+from api_telemetry.models import API_PROVIDER_SENDGRID
+from config.base import get_environment_variable_default
+from .models import BEING_SENT, EmailScheduled, QUEUED_TO_SEND, SEND_FAILED, SENDGRID_API_KEY, SENDGRID_API_URL, \
+    SENT
+import wevote_functions.admin
+from wevote_functions.functions import convert_to_int, positive_value_exists
+from wevote_functions.functions_cache import CACHE_KEY_PREFIX, get_cache, is_cache_shared
+from wevote_functions.functions_http_fetch import RETRY_STATUS_CODES, get_pooled_session
+
+logger = wevote_functions.admin.get_logger(__name__)
+
+EMAIL_OUTBOUND_BATCH_SIZE = convert_to_int(get_environment_variable_default('EMAIL_OUTBOUND_BATCH_SIZE', 100))
+# Shared by all the workers through Redis or Memcached, or counted from EmailScheduled without one. 0 for no limit.
+EMAIL_OUTBOUND_MAX_PER_MINUTE = convert_to_int(get_environment_variable_default('EMAIL_OUTBOUND_MAX_PER_MINUTE', 600))
+EMAIL_OUTBOUND_MAX_SEND_ATTEMPTS = \
+    convert_to_int(get_environment_variable_default('EMAIL_OUTBOUND_MAX_SEND_ATTEMPTS', 5))
+# A worker which hasn't finished with an email in this time has stopped, so the email is queued again
+EMAIL_BEING_SENT_TIMEOUT_MINUTES = 10
+# The most personalizations SendGrid accepts in one mail/send request
+SENDGRID_MAXIMUM_PERSONALIZATIONS = 1000
+# A failed email waits 1, 2, 4, 8... minutes (up to an hour) before the next attempt
+SEND_RETRY_BASE_SECONDS = 60
+SEND_RETRY_MAXIMUM_SECONDS = 3600
+WE_VOTE_FROM_EMAIL = 'info@wevote.us'
+
+
+def generate_list_unsubscribe_headers(email_scheduled):
+    headers = {}
+    list_unsubscribe_value_list = []
+    if positive_value_exists(email_scheduled.list_unsubscribe_mailto):
+        list_unsubscribe_value_list.append("<mailto:{list_unsubscribe_mailto}>".format(
+            list_unsubscribe_mailto=email_scheduled.list_unsubscribe_mailto))
+    if positive_value_exists(email_scheduled.list_unsubscribe_url):
+        list_unsubscribe_value_list.append(
+            "<{list_unsubscribe_url}>".format(list_unsubscribe_url=email_scheduled.list_unsubscribe_url))
+    if list_unsubscribe_value_list:
+        headers['List-Unsubscribe'] = ", ".join(list_unsubscribe_value_list)
+    if positive_value_exists(email_scheduled.list_unsubscribe_url):
+        headers['List-Unsubscribe-Post'] = "List-Unsubscribe=One-Click"
+    return headers
+
+
+def generate_sendgrid_content_key(email_scheduled):
+    # Emails with the same key can share one mail/send request
+    return (email_scheduled.sender_voter_name or '',
+            email_scheduled.message_text or '',
+            email_scheduled.message_html or '')
+
+
+def generate_sendgrid_payload(email_scheduled_list):
+    """
+    The SendGrid v3 mail/send request body for emails which all have the same generate_sendgrid_content_key
+    """
+    first_email_scheduled = email_scheduled_list[0]
+    if positive_value_exists(first_email_scheduled.sender_voter_name):
+        from_name = "{sender_voter_name} via We Vote".format(
+            sender_voter_name=first_email_scheduled.sender_voter_name)
+    else:
+        from_name = "We Vote"
+
+    personalization_list = []
+    for email_scheduled in email_scheduled_list:
+        personalization = {
+            'to': [{'email': email_scheduled.recipient_voter_email}],
+            'subject': email_scheduled.subject or '',
+        }
+        headers = generate_list_unsubscribe_headers(email_scheduled)
+        if headers:
+            personalization['headers'] = headers
+        personalization_list.append(personalization)
+
+    # SendGrid rejects empty content, and wants text/plain before text/html
+    content_list = []
+    if positive_value_exists(first_email_scheduled.message_text):
+        content_list.append({'type': 'text/plain', 'value': first_email_scheduled.message_text})
+    if positive_value_exists(first_email_scheduled.message_html):
+        content_list.append({'type': 'text/html', 'value': first_email_scheduled.message_html})
+
+    return {
+        'personalizations': personalization_list,
+        'from':             {'email': WE_VOTE_FROM_EMAIL, 'name': from_name},
+        'reply_to':         {'email': WE_VOTE_FROM_EMAIL, 'name': 'We Vote'},
+        'content':          content_list,
+    }
+
+
+def group_email_scheduled_list_for_sendgrid(email_scheduled_list):
+    """
+    :return: lists of emails which can each be sent with one mail/send request
+    """
+    email_scheduled_list_by_content_key = {}
+    for email_scheduled in email_scheduled_list:
+        email_scheduled_list_by_content_key.setdefault(
+            generate_sendgrid_content_key(email_scheduled), []).append(email_scheduled)
+    group_list = []
+    for one_content_list in email_scheduled_list_by_content_key.values():
+        for start_index in range(0, len(one_content_list), SENDGRID_MAXIMUM_PERSONALIZATIONS):
+            group_list.append(one_content_list[start_index:start_index + SENDGRID_MAXIMUM_PERSONALIZATIONS])
+    return group_list
+
+
+def post_sendgrid_payload(payload, api_url='', timeout=30):
+    """
+    One mail/send request, on this thread's keep-alive session. Not retried here: the queue decides when to try again.
+    :return: results with status_code (0 if there was no response) and retry_after_seconds
+    """
+    status = ""
+    status_code = 0
+    retry_after_seconds = 0
+    start_time = time.monotonic()
+    try:
+        response = get_pooled_session().post(
+            api_url or SENDGRID_API_URL,
+            json=payload,
+            headers={'Authorization': 'Bearer ' + str(SENDGRID_API_KEY)},
+            timeout=timeout)
+        status_code = response.status_code
+        retry_after_seconds = convert_to_int(response.headers.get('Retry-After', 0))
+        if not 200 <= status_code < 300:
+            status += "SENDGRID_STATUS_CODE: " + str(status_code) + " " + response.text[:500] + " "
+    except Exception as e:
+        status += "SENDGRID_REQUEST_FAILED: " + str(e) + " "
+    record_api_call(
+        API_PROVIDER_SENDGRID, 'mail-send', success=200 <= status_code < 300,
+        latency_seconds=time.monotonic() - start_time, item_count=len(payload.get('personalizations', [])))
+
+    results = {
+        'success':              200 <= status_code < 300,
+        'status':               status,
+        'status_code':          status_code,
+        'retry_after_seconds':  retry_after_seconds,
+    }
+    return results
+
+
+def generate_send_retry_delay_seconds(send_attempts, retry_after_seconds=0):
+    if positive_value_exists(retry_after_seconds):
+        return min(retry_after_seconds, SEND_RETRY_MAXIMUM_SECONDS)
+    delay_seconds = min(SEND_RETRY_BASE_SECONDS * (2 ** max(0, send_attempts - 1)), SEND_RETRY_MAXIMUM_SECONDS)
+    return delay_seconds * random.uniform(0.75, 1.25)
+
+
+def fetch_email_send_count_this_minute():
+    """
+    Emails sent this minute, plus the ones other workers have claimed and are sending now
+    """
+    minute_start = now().replace(second=0, microsecond=0)
+    return EmailScheduled.objects \
+        .filter(Q(send_status=SENT, date_sent__gte=minute_start) | Q(send_status=BEING_SENT)) \
+        .count()
+
+
+def acquire_email_send_slots(count, max_per_minute=None):
+    """
+    Takes up to count sends from this minute's budget. With a shared cache (Redis or Memcached) the budget is a
+    counter every worker updates. Without one (local memory or dummy cache), a per-process counter would let each
+    worker send the whole limit, so the budget is counted from EmailScheduled instead. That count doesn't reserve
+    anything, so workers claiming at the same moment can go over the limit by up to one batch each.
+    :return: the number of emails which may be sent now
+    """
+    if max_per_minute is None:
+        max_per_minute = EMAIL_OUTBOUND_MAX_PER_MINUTE
+    if not positive_value_exists(max_per_minute) or count <= 0:
+        return max(count, 0)
+    if not is_cache_shared():
+        try:
+            return max(0, min(count, max_per_minute - fetch_email_send_count_this_minute()))
+        except Exception as e:
+            logger.error("acquire_email_send_slots: " + str(e))
+            return 0
+    cache_key = '{prefix}:email_outbound_sent:{minute}'.format(prefix=CACHE_KEY_PREFIX, minute=int(time.time() // 60))
+    try:
+        cache = get_cache()
+        cache.add(cache_key, 0, timeout=120)
+        sent_this_minute = cache.incr(cache_key, count)
+        over_limit_count = sent_this_minute - max_per_minute
+        if over_limit_count <= 0:
+            return count
+        granted_count = max(0, count - over_limit_count)
+        cache.decr(cache_key, count - granted_count)
+        return granted_count
+    except Exception as e:
+        # Better to send without the shared limit than to stop sending. SendGrid's own 429s still slow us down.
+        logger.error("acquire_email_send_slots: " + str(e))
+        return count
+
+
+def release_email_send_slots(count):
+    # Give back the part of acquire_email_send_slots' grant which wasn't used. Only the cache counter holds a grant.
+    if count <= 0 or not is_cache_shared():
+        return
+    cache_key = '{prefix}:email_outbound_sent:{minute}'.format(prefix=CACHE_KEY_PREFIX, minute=int(time.time() // 60))
+    try:
+        get_cache().decr(cache_key, count)
+    except Exception:
+        pass
+
+
+def requeue_stalled_email_scheduled():
+    """
+    Queue again the emails left BEING_SENT by a worker which stopped
+    """
+    stalled_before = now() - timedelta(minutes=EMAIL_BEING_SENT_TIMEOUT_MINUTES)
+    return EmailScheduled.objects \
+        .filter(send_status=BEING_SENT, send_attempts__gt=0, date_last_changed__lt=stalled_before) \
+        .update(send_status=QUEUED_TO_SEND, date_next_send_attempt=now(), date_last_changed=now())
+
+
+def claim_email_scheduled_batch(batch_size, email_scheduled_id_list=None):
+    """
+    Claim the next emails due to be sent, and mark them BEING_SENT. Rows claimed by another worker are skipped.
+    :param batch_size:
+    :param email_scheduled_id_list: Claim these emails (whether or not they are queued) instead of the queue
+    :return: list of EmailScheduled, with send_attempts already counting this attempt
+    """
+    if batch_size <= 0:
+        return []
+    time_now = now()
+    with transaction.atomic():
+        queryset = EmailScheduled.objects.select_for_update(skip_locked=True) \
+            .filter(Q(date_next_send_attempt__isnull=True) | Q(date_next_send_attempt__lte=time_now))
+        if email_scheduled_id_list is not None:
+            queryset = queryset.filter(id__in=email_scheduled_id_list) \
+                .exclude(send_status__in=[BEING_SENT, SENT, SEND_FAILED])
+        else:
+            queryset = queryset.filter(send_status=QUEUED_TO_SEND)
+        email_scheduled_list = list(queryset.order_by('date_next_send_attempt', 'id')[:batch_size])
+        if email_scheduled_list:
+            # update() doesn't set auto_now fields, and date_last_changed is what requeue_stalled_email_scheduled uses
+            EmailScheduled.objects.filter(id__in=[email_scheduled.id for email_scheduled in email_scheduled_list]) \
+                .update(send_status=BEING_SENT, send_attempts=F('send_attempts') + 1, date_last_changed=time_now)
+    for email_scheduled in email_scheduled_list:
+        email_scheduled.send_status = BEING_SENT
+        email_scheduled.send_attempts += 1
+    return email_scheduled_list
+
+
+def mark_email_scheduled_list_sent(email_scheduled_list):
+    if not email_scheduled_list:
+        return
+    time_now = now()
+    EmailScheduled.objects.filter(id__in=[email_scheduled.id for email_scheduled in email_scheduled_list]) \
+        .update(send_status=SENT, date_sent=time_now, date_next_send_attempt=None, last_send_error=None,
+                date_last_changed=time_now)
+
+
+def mark_email_scheduled_list_failed(email_scheduled_list, error_text, retry_after_seconds=0, permanent=False):
+    """
+    Queue the emails to be tried again later, or mark them SEND_FAILED once they are out of attempts
+    :return: number of emails marked SEND_FAILED
+    """
+    time_now = now()
+    failed_count = 0
+    for email_scheduled in email_scheduled_list:
+        email_scheduled.last_send_error = error_text[:1000]
+        email_scheduled.date_last_changed = time_now
+        if permanent or email_scheduled.send_attempts >= EMAIL_OUTBOUND_MAX_SEND_ATTEMPTS:
+            email_scheduled.send_status = SEND_FAILED
+            email_scheduled.date_next_send_attempt = None
+            failed_count += 1
+        else:
+            email_scheduled.send_status = QUEUED_TO_SEND
+            email_scheduled.date_next_send_attempt = time_now + timedelta(
+                seconds=generate_send_retry_delay_seconds(email_scheduled.send_attempts, retry_after_seconds))
+    if email_scheduled_list:
+        EmailScheduled.objects.bulk_update(
+            email_scheduled_list,
+            ['send_status', 'date_next_send_attempt', 'last_send_error', 'date_last_changed'])
+    return failed_count
+
+
+def send_claimed_email_scheduled_list(email_scheduled_list, api_url=''):
+    """
+    Send emails already claimed with claim_email_scheduled_batch, and record how each one went
+    """
+    status = ""
+    metrics = {'api_calls': 0, 'sent': 0, 'retried': 0, 'failed': 0, 'throttled': 0}
+
+    def send_one_group(one_group, split_on_bad_request):
+        post_results = post_sendgrid_payload(generate_sendgrid_payload(one_group), api_url=api_url)
+        metrics['api_calls'] += 1
+        if post_results['success']:
+            mark_email_scheduled_list_sent(one_group)
+            metrics['sent'] += len(one_group)
+            return ""
+        status_code = post_results['status_code']
+        if status_code == 400 and split_on_bad_request and len(one_group) > 1:
+            # One bad address fails the whole request, so find it by sending the others one at a time
+            return "".join(send_one_group([email_scheduled], False) for email_scheduled in one_group)
+        # Other 4xx responses (bad api key, forbidden sender) may be fixed, so they are retried like 429 and 5xx
+        permanent = status_code == 400
+        if status_code == 429:
+            metrics['throttled'] += 1
+        failed_count = mark_email_scheduled_list_failed(
+            one_group, post_results['status'], post_results['retry_after_seconds'], permanent=permanent)
+        metrics['failed'] += failed_count
+        metrics['retried'] += len(one_group) - failed_count
+        if status_code in RETRY_STATUS_CODES:
+            return "SENDGRID_WILL_RETRY: " + str(status_code) + " "
+        return post_results['status']
+
+    for one_group in group_email_scheduled_list_for_sendgrid(email_scheduled_list):
+        try:
+            status += send_one_group(one_group, True)
+        except Exception as e:
+            status += "SEND_CLAIMED_EMAIL_GROUP_FAILED: " + str(e) + " "
+            failed_count = mark_email_scheduled_list_failed(one_group, str(e))
+            metrics['failed'] += failed_count
+            metrics['retried'] += len(one_group) - failed_count
+
+    results = {
+        'success':  metrics['sent'] == len(email_scheduled_list),
+        'status':   status,
+        'metrics':  metrics,
+    }
+    return results
+
+
+def send_email_scheduled_list(email_scheduled_list, api_url=''):
+    """
+    Send these emails now (not through the queue), batching the ones which share a body
+    """
+    email_scheduled_id_list = [email_scheduled.id for email_scheduled in email_scheduled_list]
+    claimed_list = claim_email_scheduled_batch(
+        len(email_scheduled_id_list), email_scheduled_id_list=email_scheduled_id_list)
+    if not claimed_list:
+        results = {
+            'success':  False,
+            'status':   "NO_EMAILS_CLAIMED_TO_SEND ",
+            'metrics':  {'api_calls': 0, 'sent': 0, 'retried': 0, 'failed': 0, 'throttled': 0},
+        }
+        return results
+    return send_claimed_email_scheduled_list(claimed_list, api_url=api_url)
+
+
+def drain_email_queue(batch_size=None, max_batches=0, api_url='', max_per_minute=None, email_scheduled_id_list=None):
+    """
+    Send queued emails until none are due, max_batches have been sent, or this minute's send limit is used up
+    :param batch_size: Emails claimed at a time
+    :param max_batches: 0 for no limit
+    :param api_url: Send somewhere other than SENDGRID_API_URL (the benchmark's fake server)
+    :param max_per_minute: Override EMAIL_OUTBOUND_MAX_PER_MINUTE. 0 for no limit.
+    :param email_scheduled_id_list: Send these emails instead of the queue
+    :return: results with emails_sent, emails_retried, emails_failed, api_calls and rate_limited (stop for now)
+    """
+    status = ""
+    if batch_size is None:
+        batch_size = EMAIL_OUTBOUND_BATCH_SIZE
+    batch_size = max(1, batch_size)
+    if max_per_minute is None:
+        max_per_minute = EMAIL_OUTBOUND_MAX_PER_MINUTE
+    metrics = {'api_calls': 0, 'sent': 0, 'retried': 0, 'failed': 0, 'throttled': 0}
+    rate_limited = False
+    batch_count = 0
+
+    try:
+        requeued_count = requeue_stalled_email_scheduled()
+        if requeued_count:
+            status += "REQUEUED_STALLED_EMAILS: " + str(requeued_count) + " "
+    except Exception as e:
+        status += "REQUEUE_STALLED_EMAILS_FAILED: " + str(e) + " "
+
+    while not positive_value_exists(max_batches) or batch_count < max_batches:
+        granted_count = acquire_email_send_slots(batch_size, max_per_minute=max_per_minute)
+        if granted_count <= 0:
+            rate_limited = True
+            break
+        try:
+            email_scheduled_list = claim_email_scheduled_batch(
+                granted_count, email_scheduled_id_list=email_scheduled_id_list)
+        except Exception as e:
+            status += "CLAIM_EMAIL_BATCH_FAILED: " + str(e) + " "
+            email_scheduled_list = []
+        if positive_value_exists(max_per_minute):
+            release_email_send_slots(granted_count - len(email_scheduled_list))
+        if not email_scheduled_list:
+            break
+        batch_count += 1
+        send_results = send_claimed_email_scheduled_list(email_scheduled_list, api_url=api_url)
+        status += send_results['status']
+        for metric_name, metric_value in send_results['metrics'].items():
+            metrics[metric_name] += metric_value
+        if granted_count < batch_size or send_results['metrics']['throttled']:
+            # Out of this minute's budget, or SendGrid asked us to slow down
+            rate_limited = True
+            break
+
+    status += "EMAIL_QUEUE_DRAINED sent: {sent} retried: {retried} failed: {failed} api_calls: {api_calls} ".format(
+        **metrics)
+    results = {
+        'success':          True,
+        'status':           status,
+        'emails_sent':      metrics['sent'],
+        'emails_retried':   metrics['retried'],
+        'emails_failed':    metrics['failed'],
+        'api_calls':        metrics['api_calls'],
+        'rate_limited':     rate_limited,
+    }
+    return results
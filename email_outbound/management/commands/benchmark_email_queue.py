@@ -0,0 +1,71 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from email_outbound.controllers_email_queue import drain_email_queue, generate_sendgrid_payload, \
+    post_sendgrid_payload
+from email_outbound.models import EmailScheduled, TO_BE_PROCESSED
+from wevote_functions.fake_json_provider_server import FakeJsonProviderServer
+
+# Every EmailScheduled this command creates has this sender, so they can all be deleted afterwards
+BENCHMARK_SENDER_VOTER_WE_VOTE_ID = 'wvbenchmarkemailsender'
+
+
+class Command(BaseCommand):
+    help = 'Compares one SendGrid call per email with the batched email queue, against a local fake SendGrid, so ' \
+           'the throughput can be measured without sending real email. The benchmark rows are deleted at the end.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--emails', type=int, default=1000,
+                            help='Number of emails to send each way')
+        parser.add_argument('--distinct_bodies', type=int, default=1,
+                            help='Number of different message bodies. Emails with the same body share API calls.')
+        parser.add_argument('--latency', type=float, default=0.1,
+                            help='Seconds the fake SendGrid takes to answer each request')
+        parser.add_argument('--batch_size', type=int, default=500,
+                            help='Emails claimed at a time (EMAIL_OUTBOUND_BATCH_SIZE)')
+        parser.add_argument('--skip_one_at_a_time', action='store_true',
+                            help='Only time the batched queue')
+
+    def handle(self, *args, **options):
+        email_count = options['emails']
+        distinct_bodies = max(1, options['distinct_bodies'])
+        try:
+            # TO_BE_PROCESSED, so a send_queued_emails worker running against this database leaves them alone
+            email_scheduled_list = EmailScheduled.objects.bulk_create([
+                EmailScheduled(
+                    subject='Benchmark email ' + str(email_number),
+                    message_text='Benchmark message ' + str(email_number % distinct_bodies),
+                    message_html='<p>Benchmark message ' + str(email_number % distinct_bodies) + '</p>',
+                    sender_voter_we_vote_id=BENCHMARK_SENDER_VOTER_WE_VOTE_ID,
+                    recipient_voter_email='benchmark' + str(email_number) + '@example.com',
+                    list_unsubscribe_url='https://wevote.us/unsubscribe/benchmark' + str(email_number),
+                    send_status=TO_BE_PROCESSED,
+                ) for email_number in range(email_count)])
+            email_scheduled_id_list = [email_scheduled.id for email_scheduled in email_scheduled_list]
+
+            with FakeJsonProviderServer(response_text='', latency_seconds=options['latency'],
+                                        success_status_code=202) as server:
+                if not options['skip_one_at_a_time']:
+                    start_time = time.monotonic()
+                    for email_scheduled in email_scheduled_list:
+                        post_sendgrid_payload(generate_sendgrid_payload([email_scheduled]), api_url=server.url)
+                    self.write_timing('one call per email', email_count, server.request_count,
+                                      time.monotonic() - start_time)
+
+                request_count_before = server.request_count
+                start_time = time.monotonic()
+                results = drain_email_queue(
+                    batch_size=options['batch_size'], api_url=server.url, max_per_minute=0,
+                    email_scheduled_id_list=email_scheduled_id_list)
+                self.write_timing('batched queue', results['emails_sent'], server.request_count - request_count_before,
+                                  time.monotonic() - start_time)
+                if results['emails_sent'] != email_count:
+                    self.stdout.write(results['status'])
+        finally:
+            EmailScheduled.objects.filter(sender_voter_we_vote_id=BENCHMARK_SENDER_VOTER_WE_VOTE_ID).delete()
+
+    def write_timing(self, label, email_count, api_call_count, elapsed_seconds):
+        self.stdout.write('{label}: {count} emails in {calls} API calls, {seconds:.2f}s ({rate:.1f} per second)'.format(
+            label=label, count=email_count, calls=api_call_count, seconds=elapsed_seconds,
+            rate=email_count / elapsed_seconds if elapsed_seconds else 0))
@@ -0,0 +1,58 @@
+import signal
+import threading
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+import wevote_functions.admin
+from email_outbound.controllers_email_queue import EMAIL_OUTBOUND_BATCH_SIZE, drain_email_queue
+
+logger = wevote_functions.admin.get_logger(__name__)
+
+# Start a worker (with EMAIL_OUTBOUND_QUEUE_ON, nothing else sends the queued emails) with
+#      python manage.py send_queued_emails
+#
+# Workers claim EmailScheduled rows with SELECT ... FOR UPDATE SKIP LOCKED, and share EMAIL_OUTBOUND_MAX_PER_MINUTE
+#  through the cache, so any number of them, on any number of servers, can run at once.
+
+
+class Command(BaseCommand):
+    help = 'Sends the EmailScheduled entries queued by the API (send_status QUEUED_TO_SEND) through SendGrid, ' \
+           'many recipients per API call'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true',
+                            help='Send what is due now, then stop')
+        parser.add_argument('--batch_size', type=int, default=EMAIL_OUTBOUND_BATCH_SIZE,
+                            help='Emails claimed at a time (EMAIL_OUTBOUND_BATCH_SIZE)')
+        parser.add_argument('--poll_seconds', type=float, default=5,
+                            help='Wait between looks for new emails when the queue is empty')
+
+    def handle(self, *args, **options):
+        stop_requested = threading.Event()
+
+        def request_stop(signum, frame):
+            # Let the current batch finish, so its emails are marked SENT instead of waiting to be queued again
+            stop_requested.set()
+
+        signal.signal(signal.SIGTERM, request_stop)
+        signal.signal(signal.SIGINT, request_stop)
+
+        total_sent = 0
+        while not stop_requested.is_set():
+            try:
+                results = drain_email_queue(batch_size=options['batch_size'])
+                total_sent += results['emails_sent']
+                if results['emails_sent'] or results['emails_retried'] or results['emails_failed']:
+                    logger.info('send_queued_emails: ' + results['status'])
+            except Exception as e:
+                logger.error('send_queued_emails exception: ' + str(e))
+                connections.close_all()
+                results = {'rate_limited': False}
+            if options['once']:
+                break
+            # When rate limited, the next minute's budget is at most a minute away
+            stop_requested.wait(min(options['poll_seconds'], 60) if not results['rate_limited'] else 5)
+
+        connections.close_all()
+        self.stdout.write('sent {count} emails'.format(count=total_sent))
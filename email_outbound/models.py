@@ -2,12 +2,14 @@
 # Brought to you by We Vote. Be good.
 # -*- coding: UTF-8 -*-
 
-from datetime import date, timedelta
 from django.apps import apps
 from django.db import models
 from django.core.mail import EmailMultiAlternatives, get_connection
-from config.base import get_environment_variable
-from wevote_functions.functions import convert_to_int, extract_email_addresses_from_string, generate_random_string, \
+from django.utils.timezone import now
+from api_telemetry.controllers import record_api_call, retrieve_api_call_summaries
+from api_telemetry.models import API_PROVIDER_SENDGRID
+from config.base import get_environment_variable, get_environment_variable_default
+from wevote_functions.functions import extract_email_addresses_from_string, generate_random_string, \
     positive_value_exists
 from wevote_settings.models import fetch_next_we_vote_id_email_integer, fetch_site_unique_id_prefix
 
@@ -52,18 +54,27 @@ ASSEMBLY_STATUS_CHOICES = (
 )
 WAITING_FOR_VERIFICATION = 'WAITING_FOR_VERIFICATION'
 
+QUEUED_TO_SEND = 'QUEUED_TO_SEND'
 BEING_SENT = 'BEING_SENT'
 SENT = 'SENT'
+SEND_FAILED = 'SEND_FAILED'
 SEND_STATUS_CHOICES = (
     (TO_BE_PROCESSED,  'Message to be processed'),
+    (QUEUED_TO_SEND, 'Message waiting for the send_queued_emails worker'),
     (BEING_SENT, 'Message being sent'),
     (SENT, 'Message sent'),
+    (SEND_FAILED, 'Message could not be sent'),
 )
 
 EMAIL_SECRET_KEY_LENGTH = 12
 SUBSCRIPTION_SECRET_KEY_LENGTH = 48
 
 SENDGRID_API_KEY = get_environment_variable("SENDGRID_API_KEY", no_exception=True)
+SENDGRID_API_URL = get_environment_variable_default("SENDGRID_API_URL", "https://api.sendgrid.com/v3/mail/send")
+# With the queue on, API requests only mark EmailScheduled entries QUEUED_TO_SEND, and
+#  "python manage.py send_queued_emails" sends them. With it off, they are sent during the request.
+EMAIL_OUTBOUND_QUEUE_ON = \
+    str(get_environment_variable_default("EMAIL_OUTBOUND_QUEUE_ON", False)).lower() not in ('false', '0', '')
 
 EMAIL_HOST = get_environment_variable("EMAIL_HOST", no_exception=True)
 EMAIL_HOST_USER = get_environment_variable("EMAIL_HOST_USER", no_exception=True)
@@ -172,6 +183,18 @@ class EmailScheduled(models.Model):
     email_outbound_description_id = models.PositiveIntegerField(
         verbose_name="the internal id of EmailOutboundDescription", default=0, null=False)
     date_last_changed = models.DateTimeField(verbose_name='date last changed', null=True, auto_now=True)
+    # Used by the outbound queue (see email_outbound/controllers_email_queue.py)
+    send_attempts = models.PositiveSmallIntegerField(default=0)
+    date_next_send_attempt = models.DateTimeField(null=True, blank=True)
+    date_sent = models.DateTimeField(null=True, blank=True)
+    last_send_error = models.TextField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['send_status', 'date_next_send_attempt'],
+                name='email_scheduled_queue_index'),
+        ]
 
 
 class EmailManager(models.Manager):
@@ -975,6 +998,13 @@ class EmailManager(models.Manager):
         return results
 
     def send_scheduled_email(self, email_scheduled):
+        """
+        Send email_scheduled now, or with EMAIL_OUTBOUND_QUEUE_ON, queue it for the send_queued_emails worker.
+        email_scheduled_sent is True only once the email has gone to SendGrid. A queued email returns
+        email_scheduled_sent False and email_scheduled_queued True, and the worker sets send_status when it is sent.
+        :param email_scheduled:
+        :return:
+        """
         success = True
         status = ""
 
@@ -999,7 +1029,9 @@ class EmailManager(models.Manager):
 
         if success:
             send_via_sendgrid = True
-            if send_via_sendgrid:
+            if EMAIL_OUTBOUND_QUEUE_ON:
+                return self.queue_scheduled_email(email_scheduled)
+            elif send_via_sendgrid:
                 return self.send_scheduled_email_via_sendgrid(email_scheduled)
             else:
                 return self.send_scheduled_email_via_smtp(email_scheduled)
@@ -1019,15 +1051,35 @@ class EmailManager(models.Manager):
             }
             return results
 
+    @staticmethod
+    def queue_scheduled_email(email_scheduled):
+        status = ""
+        try:
+            email_scheduled.send_status = QUEUED_TO_SEND
+            email_scheduled.date_next_send_attempt = now()
+            email_scheduled.save()
+            status += "EMAIL_QUEUED_TO_SEND "
+            email_scheduled_queued = True
+        except Exception as e:
+            status += "ERROR_COULD_NOT_QUEUE_EMAIL: " + str(e) + ' '
+            email_scheduled_queued = False
+
+        results = {
+            'success':                  email_scheduled_queued,
+            'status':                   status,
+            'email_scheduled_sent':     False,
+            'email_scheduled_queued':   email_scheduled_queued,
+        }
+        return results
+
     @staticmethod
     def send_scheduled_email_via_sendgrid(email_scheduled):
         """
-        Send a single scheduled email
+        Send a single scheduled email, on this thread's keep-alive session
         :param email_scheduled:
         :return:
         """
-        from sendgrid import SendGridAPIClient
-        from sendgrid.helpers.mail import Content, From, Header, Mail, MimeType, Subject, To, ReplyTo
+        from email_outbound.controllers_email_queue import generate_sendgrid_payload, post_sendgrid_payload
         status = ""
         success = True
         email_scheduled_sent = False
@@ -1043,57 +1095,13 @@ class EmailManager(models.Manager):
             return results
 
         try:
-            message = Mail()
-            if positive_value_exists(email_scheduled.sender_voter_name):
-                message.from_email = From(
-                    'info@wevote.us',
-                    "{sender_voter_name} via We Vote".format(sender_voter_name=email_scheduled.sender_voter_name))
-            else:
-                message.from_email = From('info@wevote.us', 'We Vote')
-            message.reply_to = ReplyTo('info@wevote.us', 'We Vote')
-            message.to = To(email_scheduled.recipient_voter_email, email_scheduled.recipient_voter_email, p=0)
-            try:
-                if email_scheduled.list_unsubscribe_mailto or email_scheduled.list_unsubscribe_url:
-                    list_unsubscribe_text = ''
-                    if email_scheduled.list_unsubscribe_mailto:
-                        list_unsubscribe_text += \
-                            "<mailto:{list_unsubscribe_mailto}>" \
-                            "".format(list_unsubscribe_mailto=email_scheduled.list_unsubscribe_mailto)
-                        if email_scheduled.list_unsubscribe_url:
-                            list_unsubscribe_text += ", "
-                    if email_scheduled.list_unsubscribe_url:
-                        list_unsubscribe_text += \
-                            "<{list_unsubscribe_url}>" \
-                            "".format(list_unsubscribe_url=email_scheduled.list_unsubscribe_url)
-                    message.add_header(
-                        Header(key="List-Unsubscribe", value=list_unsubscribe_text)
-                    )
-                    if email_scheduled.list_unsubscribe_url:
-                        message.add_header(
-                            Header(key="List-Unsubscribe-Post", value="List-Unsubscribe=One-Click")
-                        )
-            except Exception as e:
-                status += "SEND_SCHEDULED_ADD_HEADER_ERROR: " + str(e) + " "
-                print(status)
-            message.subject = Subject(email_scheduled.subject)
-            message.content = Content(
-                MimeType.text,
-                email_scheduled.message_text)
-            message.content = Content(
-                MimeType.html,
-                email_scheduled.message_html)
-            try:
-                sendgrid_client = SendGridAPIClient(SENDGRID_API_KEY)
-                response = sendgrid_client.send(message)
-                # print(response.status_code)
-                # print(response.body)
-                # print(response.headers)
+            post_results = post_sendgrid_payload(generate_sendgrid_payload([email_scheduled]))
+            if post_results['success']:
                 status += "SENDING_VIA_SENDGRID "
                 email_scheduled_sent = True
-            except Exception as e:
-                status += "ERROR_COULD_NOT_SEND_VIA_SENDGRID: " + str(e) + ' '
+            else:
+                status += "ERROR_COULD_NOT_SEND_VIA_SENDGRID: " + post_results['status']
                 print(status)
-                email_scheduled_sent = False
         except Exception as e:
             status += "ERROR_COULD_NOT_BE_PREPARED_FOR_SENDGRID: " + str(e) + ' '
             print(status)
@@ -1196,17 +1204,30 @@ class EmailManager(models.Manager):
     @staticmethod
     def send_scheduled_email_list(messages_to_send):
         """
-        Take in a list of scheduled_email_id's, and send them
+        Take in a list of scheduled_email_id's, and send them (or with EMAIL_OUTBOUND_QUEUE_ON, queue them)
         :param messages_to_send:
         :return:
         """
-        success = False
+        from email_outbound.controllers_email_queue import send_email_scheduled_list
+        success = True
         status = ""
+        email_scheduled_list = list(EmailScheduled.objects.filter(id__in=messages_to_send or []))
+        at_least_one_email_found = len(email_scheduled_list) > 0
+        if not at_least_one_email_found:
+            status += "NO_SCHEDULED_EMAILS_FOUND "
+        elif EMAIL_OUTBOUND_QUEUE_ON:
+            EmailScheduled.objects.filter(id__in=[email_scheduled.id for email_scheduled in email_scheduled_list])\
+                .update(send_status=QUEUED_TO_SEND, date_next_send_attempt=now(), date_last_changed=now())
+            status += "EMAILS_QUEUED_TO_SEND: " + str(len(email_scheduled_list)) + " "
+        else:
+            send_results = send_email_scheduled_list(email_scheduled_list)
+            success = send_results['success']
+            status += send_results['status']
 
         results = {
             'success':                  success,
             'status':                   status,
-            'at_least_one_email_found': True,
+            'at_least_one_email_found': at_least_one_email_found,
         }
         return results
 
@@ -1383,23 +1404,17 @@ class SendGridApiCounterMonthlySummary(models.Model):
 class SendGridApiCounterManager(models.Manager):
 
     @staticmethod
-    def create_counter_entry(kind_of_action, number_of_items_sent_in_query=0):
+    def create_counter_entry(
+            kind_of_action, number_of_items_sent_in_query=0, call_succeeded=True, latency_seconds=None):
         """
-        Create an entry that records that a call to the SendGrid Api was made.
+        Record that a call to the SendGrid Api was made.
         """
-        try:
-            number_of_items_sent_in_query = convert_to_int(number_of_items_sent_in_query)
-
-            # TODO: We need to work out the timezone questions
-            SendGridApiCounter.objects.create(
-                kind_of_action=kind_of_action,
-                number_of_items_sent_in_query=number_of_items_sent_in_query,
-            )
-            success = True
-            status = 'ENTRY_SAVED'
-        except Exception:
-            success = False
-            status = 'SOME_ERROR'
+        # Counted in memory, and saved with the other calls made this minute by api_telemetry
+        record_api_call(
+            API_PROVIDER_SENDGRID, kind_of_action, item_count=number_of_items_sent_in_query,
+            success=call_succeeded, latency_seconds=latency_seconds)
+        success = True
+        status = 'ENTRY_RECORDED'
 
         results = {
             'success':                  success,
@@ -1409,38 +1424,5 @@ class SendGridApiCounterManager(models.Manager):
 
     @staticmethod
     def retrieve_daily_summaries(kind_of_action='', days_to_display=30):
-        # Start with today and cycle backwards in time
-        daily_summaries = []
-        day_on_stage = date.today()  # TODO: We need to work out the timezone questions
-        number_found = 0
-        maximum_attempts = 365
-        attempt_count = 0
-
-        try:
-            while number_found <= days_to_display and attempt_count <= maximum_attempts:
-                attempt_count += 1
-                counter_queryset = SendGridApiCounter.objects.using('readonly').all()
-                if positive_value_exists(kind_of_action):
-                    counter_queryset = counter_queryset.filter(kind_of_action=kind_of_action)
-
-                # Find the number of these entries on that particular day
-                counter_queryset = counter_queryset.filter(
-                    datetime_of_action__year=day_on_stage.year,
-                    datetime_of_action__month=day_on_stage.month,
-                    datetime_of_action__day=day_on_stage.day)
-                api_call_count = counter_queryset.count()
-
-                # If any api calls were found on that date, pass it out for display
-                if positive_value_exists(api_call_count):
-                    daily_summary = {
-                        'date_string': day_on_stage,
-                        'count': api_call_count,
-                    }
-                    daily_summaries.append(daily_summary)
-                    number_found += 1
-
-                day_on_stage -= timedelta(days=1)
-        except Exception:
-            pass
-
-        return daily_summaries
+        return retrieve_api_call_summaries(
+            API_PROVIDER_SENDGRID, kind_of_action=kind_of_action, periods_to_display=days_to_display)
@@ -0,0 +1,66 @@
+# email_outbound/test_controllers_email_queue.py
+# Brought to you by We Vote. Be good.
+# -*- coding: UTF-8 -*-
+
+from unittest import mock
+from django.test import SimpleTestCase
+from . import controllers_email_queue
+from .controllers_email_queue import SEND_RETRY_MAXIMUM_SECONDS, acquire_email_send_slots, \
+    generate_send_retry_delay_seconds, generate_sendgrid_payload, group_email_scheduled_list_for_sendgrid, \
+    post_sendgrid_payload
+from .models import EmailScheduled
+from wevote_functions.fake_json_provider_server import FakeJsonProviderServer
+
+
+def generate_email_scheduled(email_number, message_text='Hello', sender_voter_name='Pat'):
+    return EmailScheduled(
+        subject='Subject ' + str(email_number),
+        message_text=message_text,
+        message_html='',
+        sender_voter_name=sender_voter_name,
+        recipient_voter_email='voter' + str(email_number) + '@example.com',
+        list_unsubscribe_url='https://wevote.us/unsubscribe/' + str(email_number),
+    )
+
+
+class EmailQueueTests(SimpleTestCase):
+
+    def test_group_and_generate_sendgrid_payload(self):
+        email_scheduled_list = [generate_email_scheduled(number) for number in range(3)] + \
+            [generate_email_scheduled(3, message_text='Different')]
+        group_list = group_email_scheduled_list_for_sendgrid(email_scheduled_list)
+        self.assertEqual(sorted(len(one_group) for one_group in group_list), [1, 3])
+
+        payload = generate_sendgrid_payload(group_list[0])
+        self.assertEqual(len(payload['personalizations']), 3)
+        self.assertEqual(payload['personalizations'][1]['subject'], 'Subject 1')
+        self.assertEqual(payload['personalizations'][1]['headers']['List-Unsubscribe'],
+                         '<https://wevote.us/unsubscribe/1>')
+        self.assertEqual(payload['from']['name'], 'Pat via We Vote')
+        # The empty html body is left out
+        self.assertEqual(payload['content'], [{'type': 'text/plain', 'value': 'Hello'}])
+
+    def test_generate_send_retry_delay_seconds(self):
+        self.assertEqual(generate_send_retry_delay_seconds(1, retry_after_seconds=120), 120)
+        self.assertLessEqual(generate_send_retry_delay_seconds(1), 75)
+        self.assertLessEqual(generate_send_retry_delay_seconds(20), SEND_RETRY_MAXIMUM_SECONDS * 1.25)
+
+    @mock.patch.object(controllers_email_queue, 'fetch_email_send_count_this_minute', return_value=550)
+    def test_acquire_email_send_slots_without_shared_cache(self, fetch_email_send_count_this_minute):
+        # The test settings use the dummy cache, so the limit is counted from EmailScheduled
+        self.assertEqual(acquire_email_send_slots(100, max_per_minute=600), 50)
+        self.assertEqual(acquire_email_send_slots(10, max_per_minute=600), 10)
+        self.assertEqual(acquire_email_send_slots(100, max_per_minute=500), 0)
+        self.assertEqual(acquire_email_send_slots(100, max_per_minute=0), 100)
+        self.assertEqual(fetch_email_send_count_this_minute.call_count, 3)
+
+    def test_post_sendgrid_payload(self):
+        payload = generate_sendgrid_payload([generate_email_scheduled(1)])
+        with FakeJsonProviderServer(response_text='', success_status_code=202) as server:
+            results = post_sendgrid_payload(payload, api_url=server.url)
+            self.assertTrue(results['success'])
+            self.assertEqual(results['status_code'], 202)
+        with FakeJsonProviderServer(failures_before_success=1) as server:
+            results = post_sendgrid_payload(payload, api_url=server.url)
+            self.assertFalse(results['success'])
+            self.assertEqual(results['status_code'], 503)
@@ -9,6 +9,7 @@ from .models import ACCEPTED, CurrentFriend, FriendInvitationVoterLink, FriendMa
     FRIEND_INVITATIONS_PROCESSED, \
     FRIEND_INVITATIONS_SENT_BY_ME, FRIEND_INVITATIONS_SENT_TO_ME, FRIEND_INVITATIONS_WAITING_FOR_VERIFICATION, \
     IGNORE_SUGGESTION, MutualFriend, SuggestedFriend, SUGGESTED_FRIEND_LIST, UNFRIEND_CURRENT_FRIEND
+from .controllers_mutual_friend_graph import update_mutual_friend_graph
 from config.base import get_environment_variable
 from email_outbound.controllers import schedule_email_with_email_outbound_description, schedule_verification_email
 from email_outbound.models import EmailAddress, EmailManager, EMAIL_SECRET_KEY_LENGTH, \
@@ -2682,78 +2683,14 @@ def friend_lists_all_for_api(voter_device_id,  # friendListsAll
     return results
 
 
-def generate_mutual_friends_for_all_voters():
-    total_mutual_friends_created_count = 0
-    total_mutual_friends_updated_count = 0
-    total_mutual_friends_update_suppressed_count = 0
-    status = ""
-    success = False
-
-    current_friend_queryset = CurrentFriend.objects.all()
-    current_friend_queryset = current_friend_queryset.order_by('-date_last_changed')
-    current_friend_list = list(current_friend_queryset)
-    # Loop through them CurrentFriend list
-    for one_current_friend in current_friend_list:
-        generate_results = generate_mutual_friends_for_current_friend(current_friend=one_current_friend)
-        status += generate_results['status']
-        mutual_friends_created_count = generate_results['mutual_friends_created_count']
-        mutual_friends_updated_count = generate_results['mutual_friends_updated_count']
-        mutual_friends_update_suppressed_count = generate_results['mutual_friends_update_suppressed_count']
-        if positive_value_exists(mutual_friends_created_count):
-            total_mutual_friends_created_count += mutual_friends_created_count
-        if positive_value_exists(mutual_friends_updated_count):
-            total_mutual_friends_updated_count += mutual_friends_updated_count
-        if positive_value_exists(mutual_friends_update_suppressed_count):
-            total_mutual_friends_update_suppressed_count += mutual_friends_update_suppressed_count
-
-    suggested_friend_queryset = SuggestedFriend.objects.all()
-    suggested_friend_queryset = suggested_friend_queryset.order_by('-date_last_changed')
-    suggested_friend_list = list(suggested_friend_queryset)
-    # Loop through them SuggestedFriend list
-    for one_suggested_friend in suggested_friend_list:
-        generate_results = generate_mutual_friends_for_suggested_friend(suggested_friend=one_suggested_friend)
-        status += generate_results['status']
-        mutual_friends_created_count = generate_results['mutual_friends_created_count']
-        mutual_friends_updated_count = generate_results['mutual_friends_updated_count']
-        mutual_friends_update_suppressed_count = generate_results['mutual_friends_update_suppressed_count']
-        if positive_value_exists(mutual_friends_created_count):
-            total_mutual_friends_created_count += mutual_friends_created_count
-        if positive_value_exists(mutual_friends_updated_count):
-            total_mutual_friends_updated_count += mutual_friends_updated_count
-        if positive_value_exists(mutual_friends_update_suppressed_count):
-            total_mutual_friends_update_suppressed_count += mutual_friends_update_suppressed_count
-
-    queryset = FriendInvitationVoterLink.objects.all()
-    queryset = queryset.filter(deleted=False)
-    queryset = queryset.order_by('-date_last_changed')
-    friend_invitation_voter_link_list = list(queryset)
-    # Loop through them SuggestedFriend list
-    for one_friend_invitation_voter_link in friend_invitation_voter_link_list:
-        generate_results = generate_mutual_friends_for_friend_invitation_voter_link(
-            friend_invitation_voter_link=one_friend_invitation_voter_link)
-        status += generate_results['status']
-        mutual_friends_created_count = generate_results['mutual_friends_created_count']
-        mutual_friends_updated_count = generate_results['mutual_friends_updated_count']
-        mutual_friends_update_suppressed_count = generate_results['mutual_friends_update_suppressed_count']
-        if positive_value_exists(mutual_friends_created_count):
-            total_mutual_friends_created_count += mutual_friends_created_count
-        if positive_value_exists(mutual_friends_updated_count):
-            total_mutual_friends_updated_count += mutual_friends_updated_count
-        if positive_value_exists(mutual_friends_update_suppressed_count):
-            total_mutual_friends_update_suppressed_count += mutual_friends_update_suppressed_count
-
-    if positive_value_exists(total_mutual_friends_created_count):
-        status += "created: " + str(total_mutual_friends_created_count) + " "
-    if positive_value_exists(total_mutual_friends_updated_count):
-        status += "updated: " + str(total_mutual_friends_updated_count) + " "
-    if positive_value_exists(total_mutual_friends_update_suppressed_count):
-        status += "update_suppressed: " + str(total_mutual_friends_update_suppressed_count) + " "
-
-    results = {
-        'success':                          success,
-        'status':                           status,
-    }
-    return results
+def generate_mutual_friends_for_all_voters(incremental=False):
+    """
+    Recalculate every MutualFriend entry, plus the mutual friend counts and preview lists, from one in-memory copy
+    of the friend graph. With incremental=True, only the voters near a friendship changed since the last run.
+    :param incremental:
+    :return:
+    """
+    return update_mutual_friend_graph(incremental=incremental)
 
 
 def generate_mutual_friends_for_one_voter(voter_we_vote_id='', update_existing_data=False):
@@ -0,0 +1,452 @@
+# friend/controllers_mutual_friend_graph.py
+# Brought to you by We Vote. Be good.
+# -*- coding: UTF-8 -*-
+
+import json
+import time
+from datetime import datetime, timezone
+from django.db.models import Q
+from django.utils.timezone import localtime, now
+from voter.models import Voter
+from wevote_settings.models import WeVoteSettingsManager
+from .models import CurrentFriend, CurrentFriendDeleted, FriendInvitationVoterLink, MutualFriend, SuggestedFriend
+import wevote_functions.admin
+from wevote_functions.functions import positive_value_exists
+
+logger = wevote_functions.admin.get_logger(__name__)
+
+MUTUAL_FRIEND_GRAPH_LAST_RUN_SETTING = 'mutual_friend_graph_last_run_timestamp'
+MUTUAL_FRIEND_GRAPH_CHUNK_SIZE = 500
+MUTUAL_FRIEND_PREVIEW_LIST_MAXIMUM = 8
+
+# The tables which store mutual_friend_count and mutual_friend_preview_list_serialized for a pair of voters:
+#  (model, first voter field, second voter field, extra filters)
+MUTUAL_FRIEND_SOURCE_TABLE_LIST = [
+    (CurrentFriend, 'viewer_voter_we_vote_id', 'viewee_voter_we_vote_id', {}),
+    (SuggestedFriend, 'viewer_voter_we_vote_id', 'viewee_voter_we_vote_id', {}),
+    (FriendInvitationVoterLink, 'sender_voter_we_vote_id', 'recipient_voter_we_vote_id', {'deleted': False}),
+]
+
+MUTUAL_FRIEND_UPDATE_FIELD_LIST = [
+    'mutual_friend_display_name',
+    'mutual_friend_display_name_exists',
+    'mutual_friend_we_vote_hosted_profile_image_url_medium',
+    'mutual_friend_profile_image_exists',
+    'viewer_to_mutual_friend_friend_count',
+    'viewee_to_mutual_friend_friend_count',
+]
+
+
+class FriendGraph:
+    """
+    Every CurrentFriend relationship, held in memory as one set of friend indexes per voter, so the friends two
+    voters have in common is one set intersection instead of two queries.
+    """
+
+    def __init__(self, friend_pair_list=None):
+        self.voter_index_by_we_vote_id = {}
+        self.voter_we_vote_id_list = []
+        self.friend_index_set_list = []
+        for first_voter_we_vote_id, second_voter_we_vote_id in friend_pair_list or []:
+            self.add_friendship(first_voter_we_vote_id, second_voter_we_vote_id)
+
+    def add_friendship(self, first_voter_we_vote_id, second_voter_we_vote_id):
+        if not positive_value_exists(first_voter_we_vote_id) or not positive_value_exists(second_voter_we_vote_id) \
+                or first_voter_we_vote_id == second_voter_we_vote_id:
+            return
+        first_index = self.fetch_voter_index(first_voter_we_vote_id, create=True)
+        second_index = self.fetch_voter_index(second_voter_we_vote_id, create=True)
+        self.friend_index_set_list[first_index].add(second_index)
+        self.friend_index_set_list[second_index].add(first_index)
+
+    def fetch_voter_index(self, voter_we_vote_id, create=False):
+        voter_index = self.voter_index_by_we_vote_id.get(voter_we_vote_id)
+        if voter_index is None and create:
+            voter_index = len(self.voter_we_vote_id_list)
+            self.voter_index_by_we_vote_id[voter_we_vote_id] = voter_index
+            self.voter_we_vote_id_list.append(voter_we_vote_id)
+            self.friend_index_set_list.append(set())
+        return voter_index
+
+    def fetch_friend_index_set(self, voter_we_vote_id):
+        voter_index = self.fetch_voter_index(voter_we_vote_id)
+        return self.friend_index_set_list[voter_index] if voter_index is not None else set()
+
+    def fetch_mutual_friend_count(self, first_voter_we_vote_id, second_voter_we_vote_id):
+        return len(self.fetch_friend_index_set(first_voter_we_vote_id) &
+                   self.fetch_friend_index_set(second_voter_we_vote_id))
+
+    def fetch_mutual_friend_we_vote_id_set(self, first_voter_we_vote_id, second_voter_we_vote_id):
+        mutual_friend_index_set = \
+            self.fetch_friend_index_set(first_voter_we_vote_id) & self.fetch_friend_index_set(second_voter_we_vote_id)
+        return {self.voter_we_vote_id_list[voter_index] for voter_index in mutual_friend_index_set}
+
+    def fetch_neighborhood_we_vote_id_set(self, voter_we_vote_id_list):
+        """
+        The voters passed in, plus all of their friends
+        """
+        neighborhood_we_vote_id_set = set(voter_we_vote_id_list)
+        for voter_we_vote_id in voter_we_vote_id_list:
+            for voter_index in self.fetch_friend_index_set(voter_we_vote_id):
+                neighborhood_we_vote_id_set.add(self.voter_we_vote_id_list[voter_index])
+        return neighborhood_we_vote_id_set
+
+
+def generate_mutual_friend_pair_key(first_voter_we_vote_id, second_voter_we_vote_id):
+    # The "direction" of a friendship doesn't matter, so both directions share one key
+    if first_voter_we_vote_id <= second_voter_we_vote_id:
+        return first_voter_we_vote_id, second_voter_we_vote_id
+    return second_voter_we_vote_id, first_voter_we_vote_id
+
+
+def generate_mutual_friend_preview_list_serialized(mutual_friend_value_list):
+    """
+    The same preview list as generate_mutual_friend_preview_list_serialized_for_two_voters, built from
+    MutualFriend values we already have in memory
+    :param mutual_friend_value_list: dicts with the MutualFriend fields
+    :return: None when there are no mutual friends with a name or photo to show
+    """
+    preview_candidate_list = [
+        one_value for one_value in mutual_friend_value_list
+        if one_value['mutual_friend_display_name_exists'] or one_value['mutual_friend_profile_image_exists']]
+    preview_candidate_list.sort(key=lambda one_value: (
+        -((one_value['viewer_to_mutual_friend_friend_count'] or 0) +
+          (one_value['viewee_to_mutual_friend_friend_count'] or 0)),
+        one_value['mutual_friend_voter_we_vote_id']))
+    mutual_friend_preview_list = []
+    for one_value in preview_candidate_list[:MUTUAL_FRIEND_PREVIEW_LIST_MAXIMUM]:
+        mutual_friend_preview_list.append({
+            "friend_display_name":      one_value['mutual_friend_display_name'],
+            "friend_photo_url_medium":  one_value['mutual_friend_we_vote_hosted_profile_image_url_medium'],
+        })
+    if len(mutual_friend_preview_list) > 0:
+        return json.dumps(mutual_friend_preview_list)
+    return None
+
+
+def load_friend_graph():
+    friend_pair_list = CurrentFriend.objects.using('readonly') \
+        .values_list('viewer_voter_we_vote_id', 'viewee_voter_we_vote_id') \
+        .iterator(chunk_size=10000)
+    return FriendGraph(friend_pair_list)
+
+
+def retrieve_mutual_friend_voter_display_dict(voter_we_vote_id_list):
+    """
+    Name and profile photo for each voter, retrieved in bulk
+    :return: dict with voter_we_vote_id as key
+    """
+    voter_display_dict = {}
+    voter_we_vote_id_list = list(voter_we_vote_id_list)
+    for start_index in range(0, len(voter_we_vote_id_list), MUTUAL_FRIEND_GRAPH_CHUNK_SIZE):
+        voter_list = Voter.objects.using('readonly') \
+            .filter(we_vote_id__in=voter_we_vote_id_list[start_index:start_index + MUTUAL_FRIEND_GRAPH_CHUNK_SIZE]) \
+            .only('we_vote_id', 'first_name', 'last_name', 'twitter_name', 'twitter_screen_name', 'email',
+                  'we_vote_hosted_profile_image_url_medium')
+        for voter in voter_list:
+            display_name = voter.get_full_name(real_name_only=True)
+            profile_image_url_medium = voter.we_vote_hosted_profile_image_url_medium
+            voter_display_dict[voter.we_vote_id] = {
+                'mutual_friend_display_name':   display_name if positive_value_exists(display_name) else None,
+                'mutual_friend_display_name_exists': positive_value_exists(display_name),
+                'mutual_friend_we_vote_hosted_profile_image_url_medium':
+                    profile_image_url_medium if positive_value_exists(profile_image_url_medium) else None,
+                'mutual_friend_profile_image_exists': positive_value_exists(profile_image_url_medium),
+            }
+    return voter_display_dict
+
+
+def retrieve_mutual_friend_entries_for_pair_keys(pair_key_set):
+    """
+    :return: dict with (pair_key, mutual_friend_voter_we_vote_id) as key, and the list of MutualFriend entries
+      (more than one if duplicates were saved) as value
+    """
+    voter_we_vote_id_set = set()
+    for pair_key in pair_key_set:
+        voter_we_vote_id_set.update(pair_key)
+    existing_entries_dict = {}
+    queryset = MutualFriend.objects.filter(
+        viewer_voter_we_vote_id__in=voter_we_vote_id_set, viewee_voter_we_vote_id__in=voter_we_vote_id_set)
+    for mutual_friend in queryset:
+        pair_key = generate_mutual_friend_pair_key(
+            mutual_friend.viewer_voter_we_vote_id, mutual_friend.viewee_voter_we_vote_id)
+        if pair_key in pair_key_set:
+            existing_entries_dict.setdefault(
+                (pair_key, mutual_friend.mutual_friend_voter_we_vote_id), []).append(mutual_friend)
+    return existing_entries_dict
+
+
+def update_mutual_friends_for_pair_keys(pair_key_set, friend_graph, voter_display_dict, counts):
+    """
+    Bring the MutualFriend entries for these pairs of voters in line with friend_graph, with one bulk create, one
+    bulk update and one delete
+    :return: dict with pair_key as key, and (mutual_friend_count, mutual_friend_preview_list_serialized) as value
+    """
+    mutual_friend_we_vote_id_set_by_pair = {
+        pair_key: friend_graph.fetch_mutual_friend_we_vote_id_set(*pair_key) for pair_key in pair_key_set}
+    missing_voter_we_vote_id_set = set()
+    for mutual_friend_we_vote_id_set in mutual_friend_we_vote_id_set_by_pair.values():
+        missing_voter_we_vote_id_set.update(mutual_friend_we_vote_id_set - voter_display_dict.keys())
+    if missing_voter_we_vote_id_set:
+        voter_display_dict.update(retrieve_mutual_friend_voter_display_dict(missing_voter_we_vote_id_set))
+        # Remember voters who couldn't be found, so we don't look for them again
+        for voter_we_vote_id in missing_voter_we_vote_id_set - voter_display_dict.keys():
+            voter_display_dict[voter_we_vote_id] = None
+
+    existing_entries_dict = retrieve_mutual_friend_entries_for_pair_keys(pair_key_set)
+    mutual_friend_create_list = []
+    mutual_friend_update_list = []
+    mutual_friend_delete_id_list = []
+    pair_results_dict = {}
+    for pair_key, mutual_friend_we_vote_id_set in mutual_friend_we_vote_id_set_by_pair.items():
+        mutual_friend_value_list = []
+        for mutual_friend_we_vote_id in mutual_friend_we_vote_id_set:
+            voter_display_values = voter_display_dict.get(mutual_friend_we_vote_id)
+            existing_entry_list = existing_entries_dict.pop((pair_key, mutual_friend_we_vote_id), [])
+            if voter_display_values is None:
+                # Like generate_mutual_friends_for_two_voters, we can't store a mutual friend we can't retrieve
+                continue
+            if existing_entry_list:
+                mutual_friend = existing_entry_list[0]
+                mutual_friend_delete_id_list += [duplicate.id for duplicate in existing_entry_list[1:]]
+            else:
+                mutual_friend = MutualFriend(
+                    viewer_voter_we_vote_id=pair_key[0],
+                    viewee_voter_we_vote_id=pair_key[1],
+                    mutual_friend_voter_we_vote_id=mutual_friend_we_vote_id)
+            new_values = dict(voter_display_values)
+            new_values['viewer_to_mutual_friend_friend_count'] = friend_graph.fetch_mutual_friend_count(
+                mutual_friend.viewer_voter_we_vote_id, mutual_friend_we_vote_id)
+            new_values['viewee_to_mutual_friend_friend_count'] = friend_graph.fetch_mutual_friend_count(
+                mutual_friend.viewee_voter_we_vote_id, mutual_friend_we_vote_id)
+            change_to_save = False
+            for field_name, new_value in new_values.items():
+                if getattr(mutual_friend, field_name) != new_value:
+                    setattr(mutual_friend, field_name, new_value)
+                    change_to_save = True
+            if not existing_entry_list:
+                mutual_friend_create_list.append(mutual_friend)
+            elif change_to_save:
+                mutual_friend_update_list.append(mutual_friend)
+            new_values['mutual_friend_voter_we_vote_id'] = mutual_friend_we_vote_id
+            mutual_friend_value_list.append(new_values)
+        pair_results_dict[pair_key] = (
+            len(mutual_friend_we_vote_id_set), generate_mutual_friend_preview_list_serialized(mutual_friend_value_list))
+    # Whatever is left is no longer a mutual friend of that pair
+    for existing_entry_list in existing_entries_dict.values():
+        mutual_friend_delete_id_list += [mutual_friend.id for mutual_friend in existing_entry_list]
+
+    if mutual_friend_create_list:
+        MutualFriend.objects.bulk_create(mutual_friend_create_list, batch_size=MUTUAL_FRIEND_GRAPH_CHUNK_SIZE)
+        counts['mutual_friends_created_count'] += len(mutual_friend_create_list)
+    if mutual_friend_update_list:
+        MutualFriend.objects.bulk_update(
+            mutual_friend_update_list, MUTUAL_FRIEND_UPDATE_FIELD_LIST, batch_size=MUTUAL_FRIEND_GRAPH_CHUNK_SIZE)
+        counts['mutual_friends_updated_count'] += len(mutual_friend_update_list)
+    if mutual_friend_delete_id_list:
+        MutualFriend.objects.filter(id__in=mutual_friend_delete_id_list).delete()
+        counts['mutual_friends_deleted_count'] += len(mutual_friend_delete_id_list)
+    return pair_results_dict
+
+
+def update_mutual_friend_source_entry_list(
+        model, first_field_name, second_field_name, entry_list, friend_graph, voter_display_dict, pair_results_dict,
+        counts):
+    """
+    Update mutual_friend_count and mutual_friend_preview_list_serialized on one chunk of CurrentFriend,
+    SuggestedFriend or FriendInvitationVoterLink entries. pair_results_dict is shared across chunks and tables, so
+    a pair of voters found in more than one table is only calculated once.
+    """
+    new_pair_key_set = set()
+    for entry in entry_list:
+        pair_key = generate_mutual_friend_pair_key(
+            getattr(entry, first_field_name), getattr(entry, second_field_name))
+        if pair_key not in pair_results_dict:
+            new_pair_key_set.add(pair_key)
+    if new_pair_key_set:
+        pair_results_dict.update(
+            update_mutual_friends_for_pair_keys(new_pair_key_set, friend_graph, voter_display_dict, counts))
+
+    mutual_friend_count_last_updated = localtime(now()).date()  # We Vote uses Pacific Time
+    entry_update_list = []
+    for entry in entry_list:
+        mutual_friend_count, mutual_friend_preview_list_serialized = pair_results_dict[
+            generate_mutual_friend_pair_key(getattr(entry, first_field_name), getattr(entry, second_field_name))]
+        change_to_save = False
+        if not positive_value_exists(mutual_friend_count) and entry.mutual_friend_count is None:
+            pass
+        elif entry.mutual_friend_count != mutual_friend_count:
+            entry.mutual_friend_count = mutual_friend_count
+            entry.mutual_friend_count_last_updated = mutual_friend_count_last_updated
+            change_to_save = True
+        if entry.mutual_friend_preview_list_serialized != mutual_friend_preview_list_serialized or \
+                entry.mutual_friend_preview_list_update_needed:
+            entry.mutual_friend_preview_list_serialized = mutual_friend_preview_list_serialized
+            entry.mutual_friend_preview_list_update_needed = False
+            change_to_save = True
+        if change_to_save:
+            entry_update_list.append(entry)
+    if entry_update_list:
+        model.objects.bulk_update(
+            entry_update_list,
+            ['mutual_friend_count', 'mutual_friend_count_last_updated', 'mutual_friend_preview_list_serialized',
+             'mutual_friend_preview_list_update_needed'],
+            batch_size=MUTUAL_FRIEND_GRAPH_CHUNK_SIZE)
+        counts['source_entries_updated_count'] += len(entry_update_list)
+
+
+def retrieve_mutual_friend_source_entry_chunks(model, first_field_name, second_field_name, extra_filters,
+                                               voter_we_vote_id_list=None):
+    """
+    Yield the entries of one source table in chunks, ordered by id. With voter_we_vote_id_list, only the entries
+    involving one of those voters.
+    """
+    field_name_list = ['id', first_field_name, second_field_name, 'mutual_friend_count',
+                       'mutual_friend_count_last_updated', 'mutual_friend_preview_list_serialized',
+                       'mutual_friend_preview_list_update_needed']
+    if voter_we_vote_id_list is None:
+        voter_filter_list = [Q()]
+    else:
+        voter_we_vote_id_list = list(voter_we_vote_id_list)
+        voter_filter_list = []
+        for start_index in range(0, len(voter_we_vote_id_list), MUTUAL_FRIEND_GRAPH_CHUNK_SIZE):
+            voter_chunk = voter_we_vote_id_list[start_index:start_index + MUTUAL_FRIEND_GRAPH_CHUNK_SIZE]
+            voter_filter_list.append(
+                Q(**{first_field_name + '__in': voter_chunk}) | Q(**{second_field_name + '__in': voter_chunk}))
+    entry_id_already_seen_set = set()
+    for voter_filter in voter_filter_list:
+        last_entry_id = 0
+        while True:
+            entry_list = list(
+                model.objects.filter(voter_filter, id__gt=last_entry_id, **extra_filters)
+                .exclude(**{first_field_name + '__isnull': True})
+                .exclude(**{second_field_name + '__isnull': True})
+                .only(*field_name_list)
+                .order_by('id')[:MUTUAL_FRIEND_GRAPH_CHUNK_SIZE])
+            if not entry_list:
+                break
+            last_entry_id = entry_list[-1].id
+            entry_list = [entry for entry in entry_list if entry.id not in entry_id_already_seen_set]
+            entry_id_already_seen_set.update(entry.id for entry in entry_list)
+            if entry_list:
+                yield entry_list
+
+
+def retrieve_voter_we_vote_ids_with_friend_changes_since(since_time):
+    changed_voter_we_vote_id_set = set()
+    # Deleted CurrentFriend entries are only found through CurrentFriendDeleted
+    change_table_list = MUTUAL_FRIEND_SOURCE_TABLE_LIST + [
+        (CurrentFriendDeleted, 'viewer_voter_we_vote_id', 'viewee_voter_we_vote_id', {})]
+    for model, first_field_name, second_field_name, extra_filters in change_table_list:
+        # Include deleted invitations here, since deleting one can change what the other tables show
+        changed_pair_list = model.objects.using('readonly') \
+            .filter(date_last_changed__gte=since_time) \
+            .values_list(first_field_name, second_field_name)
+        for first_voter_we_vote_id, second_voter_we_vote_id in changed_pair_list:
+            if positive_value_exists(first_voter_we_vote_id):
+                changed_voter_we_vote_id_set.add(first_voter_we_vote_id)
+            if positive_value_exists(second_voter_we_vote_id):
+                changed_voter_we_vote_id_set.add(second_voter_we_vote_id)
+    return changed_voter_we_vote_id_set
+
+
+def delete_mutual_friends_for_pairs_not_in_set(pair_key_set, counts):
+    """
+    After a full run, remove the MutualFriend entries for pairs of voters that no longer appear in any source table
+    """
+    last_mutual_friend_id = 0
+    while True:
+        value_list = list(
+            MutualFriend.objects.filter(id__gt=last_mutual_friend_id)
+            .values_list('id', 'viewer_voter_we_vote_id', 'viewee_voter_we_vote_id')
+            .order_by('id')[:MUTUAL_FRIEND_GRAPH_CHUNK_SIZE * 10])
+        if not value_list:
+            break
+        last_mutual_friend_id = value_list[-1][0]
+        mutual_friend_delete_id_list = [
+            mutual_friend_id for mutual_friend_id, viewer_voter_we_vote_id, viewee_voter_we_vote_id in value_list
+            if not positive_value_exists(viewer_voter_we_vote_id) or
+            not positive_value_exists(viewee_voter_we_vote_id) or
+            generate_mutual_friend_pair_key(viewer_voter_we_vote_id, viewee_voter_we_vote_id) not in pair_key_set]
+        if mutual_friend_delete_id_list:
+            MutualFriend.objects.filter(id__in=mutual_friend_delete_id_list).delete()
+            counts['mutual_friends_deleted_count'] += len(mutual_friend_delete_id_list)
+
+
+def update_mutual_friend_graph(incremental=False):
+    """
+    Recalculate the MutualFriend table, and mutual_friend_count / mutual_friend_preview_list_serialized on the
+    CurrentFriend, SuggestedFriend and FriendInvitationVoterLink tables, from one in-memory copy of the friend graph.
+    With incremental=True, only the pairs of voters near a friendship that changed since the last run are
+    recalculated. Unfriending is found through the CurrentFriendDeleted entry saved when a CurrentFriend entry is
+    deleted. Name and photo changes are only picked up for the pairs recalculated, so a full run is still needed
+    now and then.
+    :param incremental:
+    :return:
+    """
+    status = ""
+    success = True
+    counts = {
+        'mutual_friends_created_count':     0,
+        'mutual_friends_updated_count':     0,
+        'mutual_friends_deleted_count':     0,
+        'source_entries_updated_count':     0,
+    }
+    we_vote_settings_manager = WeVoteSettingsManager()
+    run_start_timestamp = int(time.time())
+
+    voter_we_vote_id_list = None
+    if positive_value_exists(incremental):
+        last_run_timestamp = we_vote_settings_manager.fetch_setting(MUTUAL_FRIEND_GRAPH_LAST_RUN_SETTING)
+        if positive_value_exists(last_run_timestamp):
+            # Start a minute early, in case a change was being saved while the last run started
+            since_time = datetime.fromtimestamp(int(last_run_timestamp) - 60, tz=timezone.utc)
+            voter_we_vote_id_list = retrieve_voter_we_vote_ids_with_friend_changes_since(since_time)
+            status += "MUTUAL_FRIEND_GRAPH_INCREMENTAL-CHANGED_VOTERS: " + str(len(voter_we_vote_id_list)) + " "
+        else:
+            status += "MUTUAL_FRIEND_GRAPH_NO_LAST_RUN-FULL_RUN "
+
+    pair_results_dict = {}
+    try:
+        friend_graph = load_friend_graph()
+        if voter_we_vote_id_list is not None:
+            # A friendship change between two voters changes the mutual friends of every pair including either
+            #  voter, and the friend counts stored for them as the mutual friend of their own friends
+            voter_we_vote_id_list = friend_graph.fetch_neighborhood_we_vote_id_set(voter_we_vote_id_list)
+        voter_display_dict = {}
+        if voter_we_vote_id_list is None or len(voter_we_vote_id_list) > 0:
+            for model, first_field_name, second_field_name, extra_filters in MUTUAL_FRIEND_SOURCE_TABLE_LIST:
+                for entry_list in retrieve_mutual_friend_source_entry_chunks(
+                        model, first_field_name, second_field_name, extra_filters,
+                        voter_we_vote_id_list=voter_we_vote_id_list):
+                    update_mutual_friend_source_entry_list(
+                        model, first_field_name, second_field_name, entry_list, friend_graph, voter_display_dict,
+                        pair_results_dict, counts)
+        if voter_we_vote_id_list is None:
+            delete_mutual_friends_for_pairs_not_in_set(pair_results_dict.keys(), counts)
+        we_vote_settings_manager.save_setting(MUTUAL_FRIEND_GRAPH_LAST_RUN_SETTING, run_start_timestamp)
+        # The next incremental run starts a minute before this one, so older deletions have been handled
+        CurrentFriendDeleted.objects.filter(
+            date_last_changed__lt=datetime.fromtimestamp(run_start_timestamp - 60, tz=timezone.utc)).delete()
+    except Exception as e:
+        success = False
+        status += "MUTUAL_FRIEND_GRAPH_FAILED: " + str(e) + " "
+        logger.error("update_mutual_friend_graph failed: " + str(e))
+
+    status += "pairs: " + str(len(pair_results_dict)) + " "
+    if positive_value_exists(counts['mutual_friends_created_count']):
+        status += "created: " + str(counts['mutual_friends_created_count']) + " "
+    if positive_value_exists(counts['mutual_friends_updated_count']):
+        status += "updated: " + str(counts['mutual_friends_updated_count']) + " "
+    if positive_value_exists(counts['mutual_friends_deleted_count']):
+        status += "deleted: " + str(counts['mutual_friends_deleted_count']) + " "
+    if positive_value_exists(counts['source_entries_updated_count']):
+        status += "friend_entries_updated: " + str(counts['source_entries_updated_count']) + " "
+
+    results = {
+        'success':      success,
+        'status':       status,
+        'pair_count':   len(pair_results_dict),
+    }
+    results.update(counts)
+    return results
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from friend.controllers_mutual_friend_graph import update_mutual_friend_graph
+
+
+class Command(BaseCommand):
+    help = 'Recalculates the MutualFriend table, and the mutual friend counts and preview lists on CurrentFriend, ' \
+           'SuggestedFriend and FriendInvitationVoterLink, from one in-memory copy of the friend graph.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--incremental', action='store_true',
+                            help='Only recalculate the voters near a friendship changed since the last run')
+
+    def handle(self, *args, **options):
+        results = update_mutual_friend_graph(incremental=options['incremental'])
+        self.stdout.write('success: {success} {status}'.format(success=results['success'], status=results['status']))
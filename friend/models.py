@@ -6,6 +6,8 @@ import json
 import psycopg2
 from django.db import models
 from django.db.models import Q
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
 from config.base import get_environment_variable
 from email_outbound.models import EmailManager
 from voter.models import VoterManager
@@ -97,6 +99,24 @@ class CurrentFriend(models.Model):
             return ""
 
 
+class CurrentFriendDeleted(models.Model):
+    """
+    One entry for each CurrentFriend entry deleted, so the incremental mutual friend update can find the voters
+    whose friendship ended. Entries are removed once a mutual friend update has run after them.
+    """
+    viewer_voter_we_vote_id = models.CharField(max_length=255, null=True, blank=True, unique=False)
+    viewee_voter_we_vote_id = models.CharField(max_length=255, null=True, blank=True, unique=False)
+    date_last_changed = models.DateTimeField(null=True, auto_now=True, db_index=True)
+
+
+@receiver(post_delete, sender=CurrentFriend)
+def delete_current_friend_signal(sender, instance, **kwargs):
+    # Also sent for each entry removed by a queryset delete(), like the ones used when merging or deleting voters
+    CurrentFriendDeleted.objects.create(
+        viewer_voter_we_vote_id=instance.viewer_voter_we_vote_id,
+        viewee_voter_we_vote_id=instance.viewee_voter_we_vote_id)
+
+
 class FriendInvitationEmailLink(models.Model):
     """
     Created when voter 1) invites via email (and the email isn't recognized or linked to voter).
@@ -0,0 +1,43 @@
+# friend/test_controllers_mutual_friend_graph.py
+# Brought to you by We Vote. Be good.
+# -*- coding: UTF-8 -*-
+
+import json
+from django.test import SimpleTestCase
+from .controllers_mutual_friend_graph import FriendGraph, generate_mutual_friend_pair_key, \
+    generate_mutual_friend_preview_list_serialized
+
+
+def generate_mutual_friend_values(mutual_friend_voter_we_vote_id, display_name, viewer_count, viewee_count):
+    return {
+        'mutual_friend_voter_we_vote_id':                           mutual_friend_voter_we_vote_id,
+        'mutual_friend_display_name':                               display_name,
+        'mutual_friend_display_name_exists':                        display_name is not None,
+        'mutual_friend_we_vote_hosted_profile_image_url_medium':    None,
+        'mutual_friend_profile_image_exists':                       False,
+        'viewer_to_mutual_friend_friend_count':                     viewer_count,
+        'viewee_to_mutual_friend_friend_count':                     viewee_count,
+    }
+
+
+class MutualFriendGraphTests(SimpleTestCase):
+
+    def test_friend_graph(self):
+        friend_graph = FriendGraph([
+            ('wvA', 'wvB'), ('wvA', 'wvC'), ('wvB', 'wvC'), ('wvC', 'wvD'), ('wvB', 'wvD'),
+            ('wvA', 'wvA'), ('wvE', None)])
+        self.assertEqual(friend_graph.fetch_mutual_friend_we_vote_id_set('wvA', 'wvD'), {'wvB', 'wvC'})
+        self.assertEqual(friend_graph.fetch_mutual_friend_we_vote_id_set('wvD', 'wvA'), {'wvB', 'wvC'})
+        self.assertEqual(friend_graph.fetch_mutual_friend_count('wvB', 'wvC'), 2)
+        self.assertEqual(friend_graph.fetch_mutual_friend_count('wvA', 'wvUnknown'), 0)
+        self.assertEqual(friend_graph.fetch_neighborhood_we_vote_id_set(['wvA']), {'wvA', 'wvB', 'wvC'})
+        self.assertEqual(generate_mutual_friend_pair_key('wvD', 'wvA'), ('wvA', 'wvD'))
+
+    def test_preview_list(self):
+        self.assertIsNone(generate_mutual_friend_preview_list_serialized(
+            [generate_mutual_friend_values('wvB', None, 5, 5)]))
+        preview_list = json.loads(generate_mutual_friend_preview_list_serialized(
+            [generate_mutual_friend_values('wvVoter' + str(number), 'Voter ' + str(number), number, 1)
+             for number in range(10)]))
+        self.assertEqual(len(preview_list), 8)
+        self.assertEqual(preview_list[0], {'friend_display_name': 'Voter 9', 'friend_photo_url_medium': None})
@@ -83,7 +83,9 @@ def generate_mutual_friends_for_all_voters_view(request):
     if not voter_has_authority(request, authority_required):
         return redirect_to_sign_in_page(request, authority_required)
 
-    results = generate_mutual_friends_for_all_voters()
+    incremental = positive_value_exists(request.GET.get('incremental', False))
+
+    results = generate_mutual_friends_for_all_voters(incremental=incremental)
     status += results['status']
     messages.add_message(request, messages.INFO, 'status: ' + str(status))
 
@@ -2,15 +2,174 @@
 # Brought to you by We Vote. Be good.
 # -*- coding: UTF-8 -*-
 
+import os
 import sys
+import threading
+from collections import OrderedDict
 from ipaddress import IPv4Address
 import geoip2.database
+import geoip2.errors
 import wevote_functions.admin
 from config.base import get_environment_variable_default
 from wevote_functions.functions import get_ip_from_headers, positive_value_exists
 
 logger = wevote_functions.admin.get_logger(__name__)
 
+GEOIP_LOCATION_CACHE_MAX_SIZE = 10000
+PRIVATE_IP_SUBSTITUTE = '73.158.32.221'  # Oakland
+
+# One memory-mapped reader is shared by every request in this worker process. It is re-opened when the .mmdb
+#  file on disk changes, so dropping a new GeoLite2-City.mmdb into place does not require a restart.
+geoip_reader = None
+geoip_reader_database_location = ''
+geoip_reader_file_modified = 0
+geoip_reader_lock = threading.Lock()
+# Bounded LRU of ip_address -> location fields. Cleared whenever the reader is re-opened.
+geoip_location_cache = OrderedDict()
+geoip_location_cache_lock = threading.Lock()
+
+
+def get_geoip_database_location():
+    return get_environment_variable_default('GEOLITE2_DATABASE_LOCATION', 'geoip2/city-db/GeoLite2-City.mmdb')
+
+
+def get_geoip_reader():
+    """
+    Return the process-wide geoip2 Reader, opening it on first use and re-opening it if the database file changed
+    :return:
+    """
+    global geoip_reader, geoip_reader_database_location, geoip_reader_file_modified
+    database_location = get_geoip_database_location()
+    try:
+        file_modified = os.path.getmtime(database_location)
+    except OSError:
+        file_modified = 0
+
+    reader = geoip_reader
+    if reader is not None and database_location == geoip_reader_database_location \
+            and file_modified == geoip_reader_file_modified:
+        return reader
+
+    with geoip_reader_lock:
+        # Another thread may have re-opened the reader while we waited for the lock
+        if geoip_reader is not None and database_location == geoip_reader_database_location \
+                and file_modified == geoip_reader_file_modified:
+            return geoip_reader
+        new_reader = geoip2.database.Reader(database_location, mode=geoip2.database.MODE_MMAP)
+        # We don't close the previous reader, since other threads may still be in the middle of a lookup with it.
+        #  Its memory map is released when the last of them lets go of it.
+        geoip_reader = new_reader
+        geoip_reader_database_location = database_location
+        geoip_reader_file_modified = file_modified
+        geoip_location_cache_clear()
+        return new_reader
+
+
+def geoip_location_cache_clear():
+    with geoip_location_cache_lock:
+        geoip_location_cache.clear()
+
+
+def geoip_location_fields_from_city_response(response):
+    """
+    Convert a geoip2 City response into the location fields returned by voterLocationRetrieveFromIP
+    :param response:
+    :return:
+    """
+    voter_location = ''
+    city = ''
+    region = ''  # could be state_code
+    postal_code = ''
+    country_code = ''
+    if response.city.name:
+        city = response.city.name
+        voter_location += city
+        if response.subdivisions.most_specific.iso_code or response.postal.code:
+            voter_location += ', '
+    if response.subdivisions.most_specific.iso_code:
+        region = response.subdivisions.most_specific.iso_code
+        voter_location += region
+        if response.postal.code:
+            voter_location += ' '
+    if response.postal.code:
+        postal_code = response.postal.code
+        voter_location += postal_code
+    if response.country.iso_code:
+        country_code = response.country.iso_code
+    return {
+        'voter_location_found': positive_value_exists(voter_location),
+        'voter_location':       voter_location,
+        'city':                 city,
+        'region':               region,
+        'postal_code':          postal_code,
+        'country_code':         country_code,
+    }
+
+
+def geoip_location_lookup(ip_address, use_cache=True):
+    """
+    Look up one IP address with the shared reader, reading through the LRU cache.
+    Raises geoip2.errors.AddressNotFoundError if the address is not in the database.
+    :param ip_address:
+    :param use_cache:
+    :return:
+    """
+    reader = get_geoip_reader()
+    if use_cache:
+        with geoip_location_cache_lock:
+            location_fields = geoip_location_cache.get(ip_address)
+            if location_fields is not None:
+                geoip_location_cache.move_to_end(ip_address)
+                return dict(location_fields)
+
+    location_fields = geoip_location_fields_from_city_response(reader.city(ip_address))
+
+    if use_cache:
+        with geoip_location_cache_lock:
+            geoip_location_cache[ip_address] = location_fields
+            while len(geoip_location_cache) > GEOIP_LOCATION_CACHE_MAX_SIZE:
+                geoip_location_cache.popitem(last=False)
+    return dict(location_fields)
+
+
+def voter_location_list_retrieve_from_ip_list(ip_address_list=[]):
+    """
+    Batch version of voterLocationRetrieveFromIP, for analytics backfills. Returns location fields keyed by
+    ip_address. Addresses that are invalid or not in the database come back with voter_location_found False.
+    :param ip_address_list:
+    :return:
+    """
+    status = ''
+    success = True
+    location_dict = {}
+    for ip_address in ip_address_list:
+        if ip_address in location_dict:
+            continue
+        location_fields = {
+            'voter_location_found': False,
+            'voter_location':       '',
+            'city':                 '',
+            'region':               '',
+            'postal_code':          '',
+            'country_code':         '',
+        }
+        try:
+            IPv4Address(ip_address)
+            location_fields = geoip_location_lookup(ip_address)
+        except (geoip2.errors.AddressNotFoundError, ValueError):
+            pass
+        except Exception as e:
+            status += "GEOIP_BATCH_LOOKUP_FAILED: " + str(e) + " "
+            success = False
+            break
+        location_dict[ip_address] = location_fields
+
+    return {
+        'success':          success,
+        'status':           status,
+        'location_dict':    location_dict,
+    }
+
 
 def voter_location_retrieve_from_ip_for_api(request, ip_address=''):
     """
@@ -53,18 +212,30 @@ def voter_location_retrieve_from_ip_for_api(request, ip_address=''):
 
 
     if valid_ip_address.is_private and 'test' not in sys.argv:
-        value = '73.158.32.221'
+        value = PRIVATE_IP_SUBSTITUTE
         try:
             if 'only_log_ip_substitution_once' not in sys.argv:
                 sys.argv.append('only_log_ip_substitution_once')
-                print("Detected a private IP address, so we are providing a valid Oakland IP address 73.158.32.221 for geolocation purposes...")
+                print("Detected a private IP address, so we are providing a valid Oakland IP address " +
+                      PRIVATE_IP_SUBSTITUTE + " for geolocation purposes...")
         except Exception as e:
             pass
 
+    location_fields = {
+        'voter_location_found': False,
+        'voter_location':       '',
+        'city':                 '',
+        'region':               '',
+        'postal_code':          '',
+        'country_code':         '',
+    }
     try:
-        database_location = get_environment_variable_default('GEOLITE2_DATABASE_LOCATION', 'geoip2/city-db/GeoLite2-City.mmdb')
-        reader = geoip2.database.Reader(database_location)
-        response = reader.city(value)
+        location_fields = geoip_location_lookup(value)
+        if location_fields['voter_location_found']:
+            status = 'LOCATION_FOUND'
+        else:
+            status = 'IP_FOUND_BUT_LOCATION_NOT_RETURNED'
+        success = True
 
     except geoip2.errors.AddressNotFoundError as e:
         if 'test' not in sys.argv:
@@ -86,36 +257,6 @@ def voter_location_retrieve_from_ip_for_api(request, ip_address=''):
 
         return response_content
 
-    voter_location = ''
-    city = ''
-    region = ''  # could be state_code
-    postal_code = ''
-    country_code = ''
-    success = True
-    voter_location_found = False
-    try:
-        if response.city.name:
-            city = response.city.name
-            voter_location += city
-            if response.subdivisions.most_specific.iso_code or response.postal.code:
-                voter_location += ', '
-        if response.subdivisions.most_specific.iso_code:
-            region = response.subdivisions.most_specific.iso_code
-            voter_location += region
-            if response.postal.code:
-                voter_location += ' '
-        if response.postal.code:
-            postal_code = response.postal.code
-            voter_location += postal_code
-        if response.country.iso_code:
-            country_code = response.country.iso_code
-        if positive_value_exists(voter_location):
-            status = 'LOCATION_FOUND'
-            voter_location_found = True
-        else:
-            status = 'IP_FOUND_BUT_LOCATION_NOT_RETURNED'
-            voter_location_found = False
-
     except Exception as e:
         logger.error("voter_location_retrieve_from_ip_for_api ip " + value + " parse error: " + str(e))
         status = str(e)
@@ -124,12 +265,12 @@ def voter_location_retrieve_from_ip_for_api(request, ip_address=''):
     response_content = {
         'success':              success,
         'status':               status,
-        'voter_location_found': voter_location_found,
-        'voter_location':       voter_location,
-        'city':                 city,
-        'region':               region,
-        'postal_code':          postal_code,
-        'country_code':         country_code,
+        'voter_location_found': location_fields['voter_location_found'],
+        'voter_location':       location_fields['voter_location'],
+        'city':                 location_fields['city'],
+        'region':               location_fields['region'],
+        'postal_code':          location_fields['postal_code'],
+        'country_code':         location_fields['country_code'],
         'ip_address':           value,
         'x_forwarded_for':      x_forwarded_for,
         'http_x_forwarded_for': http_x_forwarded_for,
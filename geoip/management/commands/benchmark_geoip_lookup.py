@@ -0,0 +1,55 @@
+import random
+import time
+
+import geoip2.database
+import geoip2.errors
+from django.core.management.base import BaseCommand
+
+from geoip.controllers import geoip_location_cache_clear, geoip_location_fields_from_city_response, \
+    geoip_location_lookup, get_geoip_database_location
+
+
+class Command(BaseCommand):
+    help = 'Compares opening a new GeoIP reader per lookup with the shared, pooled reader and its LRU cache'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lookups', type=int, default=2000, help='Number of lookups to time for each path')
+        parser.add_argument('--distinct', type=int, default=200, help='Number of distinct IP addresses to draw from')
+
+    def handle(self, *args, **options):
+        lookups = options['lookups']
+        random.seed(42)
+        ip_address_pool = ['{}.{}.{}.{}'.format(random.randint(1, 223), random.randint(0, 255),
+                                                random.randint(0, 255), random.randint(1, 254))
+                           for _ in range(options['distinct'])]
+        ip_address_list = [random.choice(ip_address_pool) for _ in range(lookups)]
+        database_location = get_geoip_database_location()
+
+        def per_request_reader_lookup(ip_address):
+            # The original path: open and parse the database for every lookup
+            reader = geoip2.database.Reader(database_location)
+            try:
+                return geoip_location_fields_from_city_response(reader.city(ip_address))
+            finally:
+                reader.close()
+
+        def pooled_reader_lookup(ip_address):
+            return geoip_location_lookup(ip_address, use_cache=False)
+
+        def pooled_cached_lookup(ip_address):
+            return geoip_location_lookup(ip_address)
+
+        geoip_location_cache_clear()
+        for label, lookup_function in [
+                ('reader per request', per_request_reader_lookup),
+                ('pooled reader', pooled_reader_lookup),
+                ('pooled reader + LRU', pooled_cached_lookup)]:
+            t0 = time.perf_counter()
+            for ip_address in ip_address_list:
+                try:
+                    lookup_function(ip_address)
+                except geoip2.errors.AddressNotFoundError:
+                    pass
+            elapsed = time.perf_counter() - t0
+            self.stdout.write('{:<22} {:>8.3f} s total, {:>9.1f} us/lookup'.format(
+                label, elapsed, elapsed * 1000000 / max(lookups, 1)))
@@ -1,3 +1,70 @@
-from django.test import TestCase
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+import geoip2.errors
+from django.test import SimpleTestCase
+
+import geoip.controllers
+from geoip.controllers import geoip_location_cache, geoip_location_cache_clear, geoip_location_lookup, \
+    get_geoip_reader, voter_location_list_retrieve_from_ip_list
+
+
+def generate_city_response(city_name, region, postal_code):
+    # The GeoLite2-City.mmdb database isn't in the repository, so the reader is replaced with one returning these
+    return SimpleNamespace(
+        city=SimpleNamespace(name=city_name),
+        subdivisions=SimpleNamespace(most_specific=SimpleNamespace(iso_code=region)),
+        postal=SimpleNamespace(code=postal_code),
+        country=SimpleNamespace(iso_code='US'))
+
+
+class FakeGeoIPReader:
+    city_response_dict = {
+        '69.181.21.132':    generate_city_response('San Francisco', 'CA', '94110'),
+        '73.158.32.221':    generate_city_response('Oakland', 'CA', '94612'),
+    }
+
+    def __init__(self, database_location, mode=None):
+        self.lookup_count = 0
+
+    def city(self, ip_address):
+        self.lookup_count += 1
+        if ip_address not in self.city_response_dict:
+            raise geoip2.errors.AddressNotFoundError(ip_address)
+        return self.city_response_dict[ip_address]
+
+
+@mock.patch.object(geoip.controllers.geoip2.database, 'Reader', FakeGeoIPReader)
+class GeoIPPooledReaderTests(SimpleTestCase):
+
+    def setUp(self):
+        geoip.controllers.geoip_reader = None
+        geoip_location_cache_clear()
+
+    def tearDown(self):
+        geoip.controllers.geoip_reader = None
+
+    def test_reader_is_shared(self):
+        self.assertIs(get_geoip_reader(), get_geoip_reader())
+
+    def test_lookup_is_cached_and_bounded(self):
+        original_max_size = geoip.controllers.GEOIP_LOCATION_CACHE_MAX_SIZE
+        geoip.controllers.GEOIP_LOCATION_CACHE_MAX_SIZE = 1
+        try:
+            self.assertEqual(geoip_location_lookup('69.181.21.132')['voter_location'], 'San Francisco, CA 94110')
+            geoip_location_lookup('69.181.21.132')
+            self.assertEqual(get_geoip_reader().lookup_count, 1)
+            self.assertIn('69.181.21.132', geoip_location_cache)
+            geoip_location_lookup('73.158.32.221')
+            self.assertEqual(list(geoip_location_cache.keys()), ['73.158.32.221'])
+        finally:
+            geoip.controllers.GEOIP_LOCATION_CACHE_MAX_SIZE = original_max_size
+
+    def test_batch_lookup(self):
+        results = voter_location_list_retrieve_from_ip_list(
+            ['69.181.21.132', 'not-an-ip', '69.181.21.132', '10.1.1.1'])
+        self.assertTrue(results['success'])
+        self.assertEqual(len(results['location_dict']), 3)
+        self.assertTrue(results['location_dict']['69.181.21.132']['voter_location_found'])
+        self.assertFalse(results['location_dict']['not-an-ip']['voter_location_found'])
+        self.assertFalse(results['location_dict']['10.1.1.1']['voter_location_found'])
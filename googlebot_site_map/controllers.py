@@ -0,0 +1,311 @@
+# googlebot_site_map/controllers.py
+# Brought to you by We Vote. Be good.
+# -*- coding: UTF-8 -*-
+
+"""
+The sitemap files served at /apis/v1/googlebotSiteMap/ are built ahead of time and kept gzipped on disk, one shard per
+POLITICIANS_PER_SITE_MAP politician ids, plus an index. Saving or deleting a Politician marks its shard changed in
+the shared cache, and a shard is rebuilt when it is requested (or by "python manage.py update_googlebot_site_map")
+after a change, or once it is SITE_MAP_MAXIMUM_AGE_SECONDS old, which also picks up changes made with
+queryset.update().
+"""
+
+import datetime
+import gzip
+import os
+import re
+import socket
+import threading
+import time
+from xml.sax.saxutils import escape
+from django.db import connections
+from django.db.models import Max
+from config.base import get_environment_variable_default
+from googlebot_site_map import supplemental_urls
+from googlebot_site_map.models import GooglebotRequest
+from politician.models import Politician
+import wevote_functions.admin
+from wevote_functions.functions import convert_to_int, positive_value_exists
+from wevote_functions.functions_cache import CACHE_KEY_PREFIX, get_cache
+from wevote_functions.functions_date import DATE_FORMAT_YMD
+
+logger = wevote_functions.admin.get_logger(__name__)
+
+GOOGLEBOT_SITE_MAP_DIRECTORY = get_environment_variable_default(
+    'GOOGLEBOT_SITE_MAP_DIRECTORY',
+    os.path.join(get_environment_variable_default("PATH_FOR_TEMP_FILES", "/tmp"), 'googlebot_site_map'))
+POLITICIANS_PER_SITE_MAP = 40000
+SITE_MAP_ROOT_URL = "https://wevote.us/"
+SITE_MAP_MAXIMUM_AGE_SECONDS = 24 * 60 * 60
+SITE_MAP_SHARD_COUNT_CACHE_SECONDS = 5 * 60
+# Longer than SITE_MAP_MAXIMUM_AGE_SECONDS, so a change is never forgotten before the shard is rebuilt
+SITE_MAP_SHARD_CHANGED_CACHE_SECONDS = 2 * SITE_MAP_MAXIMUM_AGE_SECONDS
+REVERSE_DNS_CACHE_SECONDS = 24 * 60 * 60
+SITE_MAP_KIND_HTML = 'html'
+SITE_MAP_KIND_XML = 'xml'
+
+# Requests in this process wait for one rebuild of a file, instead of all building it at once
+site_map_build_lock = threading.Lock()
+
+
+def generate_site_map_shard_number(politician_id):
+    return convert_to_int(politician_id) // POLITICIANS_PER_SITE_MAP
+
+
+def generate_site_map_shard_changed_cache_key(shard_number):
+    return '{prefix}:site_map_shard_changed:{shard_number}'.format(prefix=CACHE_KEY_PREFIX, shard_number=shard_number)
+
+
+def mark_site_map_shard_changed(politician_id):
+    try:
+        get_cache().set(generate_site_map_shard_changed_cache_key(generate_site_map_shard_number(politician_id)),
+                        time.time(), timeout=SITE_MAP_SHARD_CHANGED_CACHE_SECONDS)
+    except Exception as e:
+        logger.error("mark_site_map_shard_changed: " + str(e))
+
+
+def fetch_site_map_shard_changed_time(shard_number):
+    try:
+        return get_cache().get(generate_site_map_shard_changed_cache_key(shard_number)) or 0
+    except Exception as e:
+        logger.error("fetch_site_map_shard_changed_time: " + str(e))
+        return 0
+
+
+def fetch_site_map_shard_count(use_cache=True):
+    cache_key = '{prefix}:site_map_shard_count'.format(prefix=CACHE_KEY_PREFIX)
+    if use_cache:
+        try:
+            shard_count = get_cache().get(cache_key)
+            if positive_value_exists(shard_count):
+                return shard_count
+        except Exception as e:
+            logger.error("fetch_site_map_shard_count: " + str(e))
+    # By the highest id rather than the count, since the shards are id ranges and ids have gaps
+    maximum_politician_id = Politician.objects.using('readonly').aggregate(Max('id'))['id__max'] or 0
+    shard_count = generate_site_map_shard_number(maximum_politician_id) + 1
+    try:
+        get_cache().set(cache_key, shard_count, timeout=SITE_MAP_SHARD_COUNT_CACHE_SECONDS)
+    except Exception as e:
+        logger.error("fetch_site_map_shard_count: " + str(e))
+    return shard_count
+
+
+def generate_site_map_file_path(kind, shard_number):
+    return os.path.join(GOOGLEBOT_SITE_MAP_DIRECTORY, 'map{shard_number}.{kind}.gz'.format(
+        shard_number=shard_number, kind=kind))
+
+
+def generate_site_map_index_file_path(shard_count):
+    # The shard count is in the name, so a new shard means a new index
+    return os.path.join(GOOGLEBOT_SITE_MAP_DIRECTORY, 'sitemap_index_{shard_count}.xml.gz'.format(
+        shard_count=shard_count))
+
+
+def site_map_shard_exists(shard_number):
+    return shard_number is not None and 0 <= shard_number < fetch_site_map_shard_count()
+
+
+def remove_stale_site_map_files(shard_count):
+    """
+    Remove the indexes for smaller shard counts, and any shard files past the last shard
+    """
+    try:
+        file_name_list = os.listdir(GOOGLEBOT_SITE_MAP_DIRECTORY)
+    except OSError:
+        return 0
+    removed_count = 0
+    for file_name in file_name_list:
+        index_match = re.fullmatch(r'sitemap_index_(\d+)\.xml\.gz', file_name)
+        shard_match = re.fullmatch(r'map(\d+)\.(?:xml|html)\.gz', file_name)
+        if (index_match and int(index_match.group(1)) < shard_count) or \
+                (shard_match and int(shard_match.group(1)) >= shard_count):
+            try:
+                os.remove(os.path.join(GOOGLEBOT_SITE_MAP_DIRECTORY, file_name))
+                removed_count += 1
+            except OSError as e:
+                logger.error("remove_stale_site_map_files: " + str(e))
+    return removed_count
+
+
+def generate_site_map_url_xml(loc, lastmod):
+    return '  <url>\n    <loc>' + escape(loc) + '</loc>\n    <lastmod>' + lastmod + '</lastmod>\n  </url>\n'
+
+
+def retrieve_site_map_politician_path_list(shard_number):
+    """
+    Streams (seo_friendly_path, date_last_updated) for the politicians in one shard, without loading the models
+    """
+    return Politician.objects.using('readonly') \
+        .filter(id__gte=shard_number * POLITICIANS_PER_SITE_MAP,
+                id__lt=(shard_number + 1) * POLITICIANS_PER_SITE_MAP) \
+        .exclude(seo_friendly_path__isnull=True) \
+        .exclude(seo_friendly_path='') \
+        .order_by('id') \
+        .values_list('seo_friendly_path', 'date_last_updated') \
+        .iterator(chunk_size=2000)
+
+
+def generate_site_map_xml_lines(shard_number, politician_path_list):
+    today = datetime.date.today().strftime(DATE_FORMAT_YMD)
+    yield '<?xml version="1.0" encoding="UTF-8"?>\n'
+    yield '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
+    if shard_number == 0:
+        for loc in supplemental_urls.crawlable_urls:
+            yield generate_site_map_url_xml(loc, today)
+    for seo_friendly_path, date_last_updated in politician_path_list:
+        lastmod = date_last_updated.strftime(DATE_FORMAT_YMD) if date_last_updated else today
+        yield generate_site_map_url_xml(SITE_MAP_ROOT_URL + seo_friendly_path + "/-/", lastmod)
+    yield '</urlset>'
+
+
+def generate_site_map_html_lines(shard_number, politician_path_list):
+    yield '<html><body>'
+    if shard_number == 0:
+        for loc in supplemental_urls.crawlable_urls:
+            yield escape(loc) + '<br>'
+    for seo_friendly_path, date_last_updated in politician_path_list:
+        yield escape(SITE_MAP_ROOT_URL + seo_friendly_path + '/-/') + '<br>'
+    yield '</body></html>'
+
+
+def generate_site_map_index_xml_lines(shard_count):
+    yield '<?xml version="1.0" encoding="UTF-8"?>\n'
+    yield '<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
+    for shard_number in range(shard_count):
+        yield '  <sitemap>\n    <loc>' + SITE_MAP_ROOT_URL + 'map' + str(shard_number) + '.xml</loc>\n  </sitemap>\n'
+    yield '</sitemapindex>'
+
+
+def write_gzip_file(file_path, line_list):
+    # Written beside the old file and then renamed over it, so a request never reads a half written file
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+    temporary_file_path = file_path + '.' + str(os.getpid()) + '.' + str(threading.get_ident()) + '.tmp'
+    try:
+        with gzip.open(temporary_file_path, 'wt', encoding='utf-8', compresslevel=6) as gzip_file:
+            gzip_file.writelines(line_list)
+        os.replace(temporary_file_path, file_path)
+    finally:
+        if os.path.exists(temporary_file_path):
+            os.remove(temporary_file_path)
+
+
+def site_map_file_is_current(file_path, changed_time=0):
+    try:
+        file_modified_time = os.path.getmtime(file_path)
+    except OSError:
+        return False
+    return file_modified_time > changed_time and time.time() - file_modified_time < SITE_MAP_MAXIMUM_AGE_SECONDS
+
+
+def retrieve_site_map_file_path(kind, shard_number=None):
+    """
+    The path of a current gzipped sitemap file, building it first if it is missing or out of date
+    :param kind: SITE_MAP_KIND_XML or SITE_MAP_KIND_HTML
+    :param shard_number: None for the index
+    :return: None for a shard past the last one, so a crawler asking for any number can't fill the disk
+    """
+    if shard_number is None:
+        shard_count = fetch_site_map_shard_count()
+        file_path = generate_site_map_index_file_path(shard_count)
+        if not site_map_file_is_current(file_path):
+            with site_map_build_lock:
+                if not site_map_file_is_current(file_path):
+                    write_gzip_file(file_path, generate_site_map_index_xml_lines(shard_count))
+                    remove_stale_site_map_files(shard_count)
+        return file_path
+
+    if not site_map_shard_exists(shard_number):
+        return None
+    file_path = generate_site_map_file_path(kind, shard_number)
+    changed_time = fetch_site_map_shard_changed_time(shard_number)
+    if not site_map_file_is_current(file_path, changed_time):
+        with site_map_build_lock:
+            if not site_map_file_is_current(file_path, changed_time):
+                write_site_map_shard(kind, shard_number)
+    return file_path
+
+
+def write_site_map_shard(kind, shard_number):
+    politician_path_list = retrieve_site_map_politician_path_list(shard_number)
+    if kind == SITE_MAP_KIND_HTML:
+        line_list = generate_site_map_html_lines(shard_number, politician_path_list)
+    else:
+        line_list = generate_site_map_xml_lines(shard_number, politician_path_list)
+    write_gzip_file(generate_site_map_file_path(kind, shard_number), line_list)
+
+
+def update_site_map_files(rebuild_all=False):
+    """
+    Rebuild the sitemap index and every shard which has changed or is too old
+    :param rebuild_all: Rebuild every shard, changed or not
+    :return:
+    """
+    status = ""
+    success = True
+    shards_written = 0
+    try:
+        shard_count = fetch_site_map_shard_count(use_cache=False)
+        write_gzip_file(generate_site_map_index_file_path(shard_count), generate_site_map_index_xml_lines(shard_count))
+        remove_stale_site_map_files(shard_count)
+        for shard_number in range(shard_count):
+            changed_time = fetch_site_map_shard_changed_time(shard_number)
+            for kind in (SITE_MAP_KIND_XML, SITE_MAP_KIND_HTML):
+                if rebuild_all or not site_map_file_is_current(generate_site_map_file_path(kind, shard_number),
+                                                               changed_time):
+                    write_site_map_shard(kind, shard_number)
+                    shards_written += 1
+        status += "SITE_MAP_FILES_UPDATED shards: " + str(shard_count) + " written: " + str(shards_written) + " "
+    except Exception as e:
+        success = False
+        status += "SITE_MAP_FILES_UPDATE_FAILED: " + str(e) + " "
+
+    results = {
+        'success':          success,
+        'status':           status,
+        'shards_written':   shards_written,
+    }
+    return results
+
+
+def reverse_dns(ip):
+    """
+    The host name for ip, remembered in the shared cache for REVERSE_DNS_CACHE_SECONDS
+    """
+    if not positive_value_exists(ip) or ip == '127.0.0.1':
+        return 'localhost'
+    cache_key = '{prefix}:reverse_dns:{ip}'.format(prefix=CACHE_KEY_PREFIX, ip=ip)
+    try:
+        host = get_cache().get(cache_key)
+        if host is not None:
+            return host
+    except Exception as e:
+        logger.error("reverse_dns cache: " + str(e))
+    try:
+        host = socket.gethostbyaddr(ip)[0]
+    except (OSError, UnicodeError):
+        host = ''
+    try:
+        get_cache().set(cache_key, host, timeout=REVERSE_DNS_CACHE_SECONDS)
+    except Exception as e:
+        logger.error("reverse_dns cache: " + str(e))
+    return host
+
+
+def save_googlebot_request_list(googlebot_request_dict_list):
+    """
+    Looks up who made each crawler request, then saves them all with one INSERT
+    """
+    # The buffer's thread keeps its own connection, so make sure it is still good before each batch
+    connections['default'].close_if_unusable_or_obsolete()
+    googlebot_request_list = []
+    for googlebot_request_dict in googlebot_request_dict_list:
+        host = reverse_dns(googlebot_request_dict['remote_address'])
+        googlebot_request_list.append(GooglebotRequest(
+            request_url_type=googlebot_request_dict['request_url_type'],
+            remote_address=googlebot_request_dict['remote_address'],
+            remote_dns=host,
+            is_from_google=host.endswith(('.googlebot.com', '.google.com', '.googleusercontent.com')),
+            user_agent=googlebot_request_dict['user_agent'],
+        ))
+    GooglebotRequest.objects.bulk_create(googlebot_request_list)
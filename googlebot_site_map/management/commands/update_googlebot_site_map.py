@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from googlebot_site_map.controllers import update_site_map_files
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the gzipped googlebotSiteMap files (the index, and each shard of politicians which has ' \
+           'changed or is more than a day old), so crawlers never wait for one to be built'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true',
+                            help='Rebuild every shard, changed or not')
+
+    def handle(self, *args, **options):
+        results = update_site_map_files(rebuild_all=options['all'])
+        self.stdout.write('success: {success} {status}'.format(success=results['success'], status=results['status']))
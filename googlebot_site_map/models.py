@@ -3,6 +3,8 @@
 # -*- coding: UTF-8 -*-
 
 from django.db import models
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
 
 
 class GooglebotRequest(models.Model):
@@ -16,3 +18,11 @@ class GooglebotRequest(models.Model):
     remote_dns = models.CharField(
         verbose_name="Remote reverse DNS", max_length=255, null=True, blank=True)
     user_agent = models.TextField(null=True, blank=True)
+
+
+@receiver(post_save, sender='politician.Politician')
+@receiver(post_delete, sender='politician.Politician')
+def mark_site_map_shard_changed_on_politician_change(sender, instance, **kwargs):
+    # Imported here, since the controllers import the Politician model
+    from googlebot_site_map.controllers import mark_site_map_shard_changed
+    mark_site_map_shard_changed(instance.id)
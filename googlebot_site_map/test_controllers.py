@@ -0,0 +1,53 @@
+# googlebot_site_map/test_controllers.py
+# Brought to you by We Vote. Be good.
+# -*- coding: UTF-8 -*-
+
+import datetime
+import gzip
+import os
+import tempfile
+from unittest import mock
+from django.test import SimpleTestCase
+from . import controllers
+from .controllers import SITE_MAP_KIND_XML, generate_site_map_index_xml_lines, generate_site_map_xml_lines, \
+    remove_stale_site_map_files, retrieve_site_map_file_path, write_gzip_file
+
+
+class GooglebotSiteMapTests(SimpleTestCase):
+
+    def test_generate_site_map_xml_lines(self):
+        politician_path_list = [('jane-doe-&-co', datetime.datetime(2024, 10, 1, 8)), ('john-roe', None)]
+        xml = ''.join(generate_site_map_xml_lines(1, politician_path_list))
+        self.assertIn('<loc>https://wevote.us/jane-doe-&amp;-co/-/</loc>', xml)
+        self.assertIn('<lastmod>2024-10-01</lastmod>', xml)
+        self.assertEqual(xml.count('<url>'), 2)
+        self.assertTrue(xml.endswith('</urlset>'))
+
+        index_xml = ''.join(generate_site_map_index_xml_lines(3))
+        self.assertIn('<loc>https://wevote.us/map2.xml</loc>', index_xml)
+        self.assertEqual(index_xml.count('<sitemap>'), 3)
+
+    def test_write_gzip_file(self):
+        with tempfile.TemporaryDirectory() as directory:
+            file_path = os.path.join(directory, 'maps', 'map0.xml.gz')
+            write_gzip_file(file_path, iter(['<urlset>', '</urlset>']))
+            with gzip.open(file_path, 'rt', encoding='utf-8') as gzip_file:
+                self.assertEqual(gzip_file.read(), '<urlset></urlset>')
+            self.assertEqual(os.listdir(os.path.dirname(file_path)), ['map0.xml.gz'])
+
+    @mock.patch.object(controllers, 'write_site_map_shard')
+    @mock.patch.object(controllers, 'fetch_site_map_shard_count', return_value=2)
+    def test_retrieve_site_map_file_path_only_for_existing_shards(self, fetch_site_map_shard_count,
+                                                                    write_site_map_shard):
+        self.assertIsNone(retrieve_site_map_file_path(SITE_MAP_KIND_XML, 2))
+        self.assertIsNone(retrieve_site_map_file_path(SITE_MAP_KIND_XML, 99999999))
+        write_site_map_shard.assert_not_called()
+
+    def test_remove_stale_site_map_files(self):
+        with tempfile.TemporaryDirectory() as directory:
+            for file_name in ('sitemap_index_1.xml.gz', 'sitemap_index_2.xml.gz', 'map0.xml.gz', 'map1.html.gz',
+                              'map2.xml.gz', 'map77.html.gz'):
+                write_gzip_file(os.path.join(directory, file_name), iter(['']))
+            with mock.patch.object(controllers, 'GOOGLEBOT_SITE_MAP_DIRECTORY', directory):
+                self.assertEqual(remove_stale_site_map_files(2), 3)
+            self.assertEqual(sorted(os.listdir(directory)), ['map0.xml.gz', 'map1.html.gz', 'sitemap_index_2.xml.gz'])
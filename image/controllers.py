@@ -3,8 +3,10 @@
 # -*- coding: UTF-8 -*-
 
 import time
+from concurrent.futures import ThreadPoolExecutor
 
 import requests
+from django.db import connection
 from django.db.models import Q
 
 import wevote_functions.admin
@@ -12,7 +14,7 @@ from candidate.models import CandidateManager, PROFILE_IMAGE_TYPE_BALLOTPEDIA, P
     PROFILE_IMAGE_TYPE_LINKEDIN, \
     PROFILE_IMAGE_TYPE_TWITTER, PROFILE_IMAGE_TYPE_UNKNOWN, \
     PROFILE_IMAGE_TYPE_UPLOADED, PROFILE_IMAGE_TYPE_VOTE_USA, PROFILE_IMAGE_TYPE_WIKIPEDIA
-from config.base import get_environment_variable
+from config.base import get_environment_variable, get_environment_variable_default
 from import_export_facebook.models import FacebookManager
 from issue.models import IssueManager
 from organization.models import OrganizationManager
@@ -26,8 +28,8 @@ from voter.models import VoterManager, VoterDeviceLink, VoterDeviceLinkManager,
 from voter_guide.models import VoterGuideManager
 from wevote_functions.functions import positive_value_exists, convert_to_int
 from .functions import analyze_remote_url, analyze_image_file, analyze_image_in_memory, \
-    change_default_profile_image_if_needed
-from .models import WeVoteImageManager, WeVoteImage, \
+    change_default_profile_image_if_needed, fetch_image_bytes, generate_image_content_hash
+from .models import generate_image_variant_key, WeVoteImageManager, WeVoteImage, IMAGE_VARIANT_KEY_MASTER, \
     CHOSEN_FAVICON_NAME, CHOSEN_LOGO_NAME, CHOSEN_SOCIAL_SHARE_IMAGE_NAME, \
     FACEBOOK_PROFILE_IMAGE_NAME, FACEBOOK_BACKGROUND_IMAGE_NAME, \
     TWITTER_PROFILE_IMAGE_NAME, TWITTER_BACKGROUND_IMAGE_NAME, TWITTER_BANNER_IMAGE_NAME, MAPLIGHT_IMAGE_NAME, \
@@ -38,6 +40,10 @@ from .models import WeVoteImageManager, WeVoteImage, \
 
 logger = wevote_functions.admin.get_logger(__name__)
 HTTP_OK = 200
+# The large, medium and tiny versions of an image are resized and uploaded at the same time, on this many threads.
+#  Set to 1 to create them one after another.
+IMAGE_RESIZE_CONCURRENT_VERSIONS = \
+    convert_to_int(get_environment_variable_default("IMAGE_RESIZE_CONCURRENT_VERSIONS", 3))
 # These constants are used for "image_source" which is not a WeVoteImage table value, but gets used in the controller
 # to set the table values like: kind_of_image_twitter_profile and kind_of_image_facebook_profile
 # code. "other_source" is a database table value that is not given its own "kind_of_image..." table boolean
@@ -1072,8 +1078,9 @@ def cache_image_locally(
         else:
             we_vote_image_file_location = we_vote_image_file_name
 
-        image_stored_locally = we_vote_image_manager.store_image_locally(
-            analyze_source_images_results['image_url_https'], we_vote_image_file_name)
+        # The source image was downloaded into memory once, by analyze_source_images
+        image_bytes = analyze_image_url_results['image_bytes'] if 'image_bytes' in analyze_image_url_results else None
+        image_stored_locally = image_bytes is not None
 
         if not image_stored_locally:
             error_results = {
@@ -1091,10 +1098,19 @@ def cache_image_locally(
             return error_results
 
         status += " IMAGE_STORED_LOCALLY "
-        image_stored_to_aws = we_vote_image_manager.store_image_to_aws(
-            we_vote_image_file_name=we_vote_image_file_name,
-            we_vote_image_file_location=we_vote_image_file_location,
-            image_format=analyze_source_images_results['analyze_image_url_results']['image_format'])
+        # If we already stored these exact bytes (for this or another candidate, organization, voter...), use that file
+        content_hash = generate_image_content_hash(image_bytes)
+        image_content_results = we_vote_image_manager.retrieve_we_vote_image_content(
+            content_hash=content_hash, variant_key=IMAGE_VARIANT_KEY_MASTER)
+        if image_content_results['we_vote_image_content_found']:
+            we_vote_image_file_location = image_content_results['we_vote_image_content'].we_vote_image_file_location
+            image_stored_to_aws = True
+            status += " IMAGE_CONTENT_ALREADY_STORED "
+        else:
+            image_stored_to_aws = we_vote_image_manager.store_image_bytes_to_aws(
+                image_bytes=image_bytes,
+                we_vote_image_file_location=we_vote_image_file_location,
+                image_format=analyze_source_images_results['analyze_image_url_results']['image_format'])
         if not image_stored_to_aws:
             error_results = {
                 'success':                      success,
@@ -1112,13 +1128,23 @@ def cache_image_locally(
         we_vote_image_url = "https://{bucket_name}.s3.amazonaws.com/{we_vote_image_file_location}" \
                             "".format(bucket_name=AWS_STORAGE_BUCKET_NAME,
                                       we_vote_image_file_location=we_vote_image_file_location)
+        if not image_content_results['we_vote_image_content_found']:
+            save_content_results = we_vote_image_manager.save_we_vote_image_content(
+                content_hash=content_hash,
+                variant_key=IMAGE_VARIANT_KEY_MASTER,
+                image_width=image_width,
+                image_height=image_height,
+                we_vote_image_url=we_vote_image_url,
+                we_vote_image_file_location=we_vote_image_file_location)
+            status += save_content_results['status']
         # logger.error('(Ok) New image created in cache_image_locally we_vote_image_url: %s' % we_vote_image_url)
         save_aws_info = we_vote_image_manager.save_we_vote_image_aws_info(
             we_vote_image,
             we_vote_image_url=we_vote_image_url,
             we_vote_image_file_location=we_vote_image_file_location,
             we_vote_parent_image_id=we_vote_parent_image_id,
-            is_active_version=is_active_version)
+            is_active_version=is_active_version,
+            content_hash=content_hash)
         status += " IMAGE_STORED_TO_AWS " + save_aws_info['status'] + " "
         success = save_aws_info['success']
         if not success:
@@ -1428,20 +1454,82 @@ def analyze_source_images(
     return results
 
 
-def create_resized_images_for_all_organizations():
+def we_vote_image_has_medium_and_tiny_versions(we_vote_image):
+    # Only some of our kinds of images have medium or tiny sizes
+    return we_vote_image.kind_of_image_ballotpedia_profile or \
+        we_vote_image.kind_of_image_campaignx_photo or \
+        we_vote_image.kind_of_image_ctcl_profile or \
+        we_vote_image.kind_of_image_facebook_profile or \
+        we_vote_image.kind_of_image_linkedin_profile or \
+        we_vote_image.kind_of_image_organization_uploaded_profile or \
+        we_vote_image.kind_of_image_politician_uploaded_profile or \
+        we_vote_image.kind_of_image_maplight or \
+        we_vote_image.kind_of_image_twitter_profile or \
+        we_vote_image.kind_of_image_vote_smart or \
+        we_vote_image.kind_of_image_vote_usa_profile or \
+        we_vote_image.kind_of_image_voter_uploaded_profile or \
+        we_vote_image.kind_of_image_wikipedia_profile or \
+        we_vote_image.kind_of_image_other_source
+
+
+def retrieve_resized_version_index():
     """
-    Create resized images for all organizations
+    One query for every resized version we have, so the bulk jobs can tell which master images are already done
+    without asking the database about each one.
+    :return: set of (we_vote_parent_image_id, kind_of_image_key) for the large, medium and tiny versions
+    """
+    resized_version_index = set()
+    resized_image_queryset = WeVoteImage.objects.filter(we_vote_parent_image_id__gt=0).filter(
+        Q(kind_of_image_large=True) | Q(kind_of_image_medium=True) | Q(kind_of_image_tiny=True))
+    for we_vote_parent_image_id, is_large, is_medium, is_tiny in resized_image_queryset.values_list(
+            'we_vote_parent_image_id', 'kind_of_image_large', 'kind_of_image_medium', 'kind_of_image_tiny'):
+        if is_large:
+            resized_version_index.add((we_vote_parent_image_id, 'kind_of_image_large'))
+        if is_medium:
+            resized_version_index.add((we_vote_parent_image_id, 'kind_of_image_medium'))
+        if is_tiny:
+            resized_version_index.add((we_vote_parent_image_id, 'kind_of_image_tiny'))
+    return resized_version_index
+
+
+def is_every_resized_version_in_index(we_vote_image, resized_version_index):
+    if (we_vote_image.id, 'kind_of_image_large') not in resized_version_index:
+        return False
+    if we_vote_image_has_medium_and_tiny_versions(we_vote_image):
+        return (we_vote_image.id, 'kind_of_image_medium') in resized_version_index and \
+            (we_vote_image.id, 'kind_of_image_tiny') in resized_version_index
+    return True
+
+
+def create_resized_images_for_we_vote_image_list(we_vote_image_list):
+    """
+    Create the missing resized versions for each master image in we_vote_image_list. Masters whose versions are
+    all in the resized version index are skipped without any more queries.
+    :param we_vote_image_list:
     :return:
     """
-    time0 = log_and_time_cache_action(True, 0, 'create_resized_images_for_all_organizations')
     create_all_resized_images_results = []
-    we_vote_image_list = WeVoteImage.objects.all()
-    # TODO Limit this to organizations only
-
+    resized_version_index = retrieve_resized_version_index()
     for we_vote_image in we_vote_image_list:
+        if is_every_resized_version_in_index(we_vote_image, resized_version_index):
+            continue
         # Iterate through all cached images
         create_resized_images_results = create_resized_image_if_not_created(we_vote_image)
         create_all_resized_images_results.append(create_resized_images_results)
+    return create_all_resized_images_results
+
+
+def create_resized_images_for_all_organizations():
+    """
+    Create resized images for all organizations
+    :return:
+    """
+    time0 = log_and_time_cache_action(True, 0, 'create_resized_images_for_all_organizations')
+    # Only master images have resized versions
+    we_vote_image_list = WeVoteImage.objects.filter(kind_of_image_original=True)
+    # TODO Limit this to organizations only
+
+    create_all_resized_images_results = create_resized_images_for_we_vote_image_list(we_vote_image_list)
     log_and_time_cache_action(True, time0, 'create_resized_images_for_all_organizations')
     return create_all_resized_images_results
 
@@ -1452,14 +1540,11 @@ def create_resized_images_for_all_voters():
     :return:
     """
     time0 = log_and_time_cache_action(True, 0, 'create_resized_images_for_all_voters')
-    create_all_resized_images_results = []
-    we_vote_image_list = WeVoteImage.objects.all()
+    # Only master images have resized versions
+    we_vote_image_list = WeVoteImage.objects.filter(kind_of_image_original=True)
     # TODO Limit this to voters only
 
-    for we_vote_image in we_vote_image_list:
-        # Iterate through all cached images
-        create_resized_images_results = create_resized_image_if_not_created(we_vote_image)
-        create_all_resized_images_results.append(create_resized_images_results)
+    create_all_resized_images_results = create_resized_images_for_we_vote_image_list(we_vote_image_list)
     log_and_time_cache_action(False, time0, 'create_resized_images_for_all_voters')
     return create_all_resized_images_results
 
@@ -2624,149 +2709,91 @@ def create_resized_image_if_not_created(we_vote_image):
         representative_we_vote_id=we_vote_image.representative_we_vote_id,
         voter_we_vote_id=we_vote_image.voter_we_vote_id,
     )
+    cache_resized_image_kwargs = {
+        'campaignx_we_vote_id':                         we_vote_image.campaignx_we_vote_id,
+        'candidate_we_vote_id':                         we_vote_image.candidate_we_vote_id,
+        'facebook_user_id':                             we_vote_image.facebook_user_id,
+        'google_civic_election_id':                     we_vote_image.google_civic_election_id,
+        'image_format':                                 image_format,
+        'image_offset_x':                               we_vote_image.facebook_background_image_offset_x,
+        'image_offset_y':                               we_vote_image.facebook_background_image_offset_y,
+        'image_url_https':                              image_url_https,
+        'kind_of_image_ballotpedia_profile':            we_vote_image.kind_of_image_ballotpedia_profile,
+        'kind_of_image_campaignx_photo':                we_vote_image.kind_of_image_campaignx_photo,
+        'kind_of_image_ctcl_profile':                   we_vote_image.kind_of_image_ctcl_profile,
+        'kind_of_image_facebook_background':            we_vote_image.kind_of_image_facebook_background,
+        'kind_of_image_facebook_profile':               we_vote_image.kind_of_image_facebook_profile,
+        'kind_of_image_linkedin_profile':               we_vote_image.kind_of_image_linkedin_profile,
+        'kind_of_image_maplight':                       we_vote_image.kind_of_image_maplight,
+        'kind_of_image_organization_uploaded_profile':  we_vote_image.kind_of_image_organization_uploaded_profile,
+        'kind_of_image_other_source':                   we_vote_image.kind_of_image_other_source,
+        'kind_of_image_politician_uploaded_profile':    we_vote_image.kind_of_image_politician_uploaded_profile,
+        'kind_of_image_twitter_background':             we_vote_image.kind_of_image_twitter_background,
+        'kind_of_image_twitter_banner':                 we_vote_image.kind_of_image_twitter_banner,
+        'kind_of_image_twitter_profile':                we_vote_image.kind_of_image_twitter_profile,
+        'kind_of_image_vote_smart':                     we_vote_image.kind_of_image_vote_smart,
+        'kind_of_image_vote_usa_profile':               we_vote_image.kind_of_image_vote_usa_profile,
+        'kind_of_image_voter_uploaded_profile':         we_vote_image.kind_of_image_voter_uploaded_profile,
+        'kind_of_image_wikipedia_profile':              we_vote_image.kind_of_image_wikipedia_profile,
+        'maplight_id':                                  we_vote_image.maplight_id,
+        'organization_we_vote_id':                      we_vote_image.organization_we_vote_id,
+        'other_source':                                 we_vote_image.other_source,
+        'politician_we_vote_id':                        we_vote_image.politician_we_vote_id,
+        'representative_we_vote_id':                    we_vote_image.representative_we_vote_id,
+        'twitter_id':                                   we_vote_image.twitter_id,
+        'vote_smart_id':                                we_vote_image.vote_smart_id,
+        'voter_we_vote_id':                             we_vote_image.voter_we_vote_id,
+        'we_vote_parent_image_id':                      we_vote_image.id,
+        'content_hash':                                 we_vote_image.content_hash,
+    }
+
+    # Which versions to create: (results key, kind_of_image flag)
+    resized_version_list = []
     if not resized_version_exists_results['large_image_version_exists']:
-        # Large version does not exist so create resize image and cache it
-        cache_resized_image_locally_results = cache_resized_image_locally(
-            campaignx_we_vote_id=we_vote_image.campaignx_we_vote_id,
-            candidate_we_vote_id=we_vote_image.candidate_we_vote_id,
-            facebook_user_id=we_vote_image.facebook_user_id,
-            google_civic_election_id=we_vote_image.google_civic_election_id,
-            image_format=image_format,
-            image_offset_x=we_vote_image.facebook_background_image_offset_x,
-            image_offset_y=we_vote_image.facebook_background_image_offset_y,
-            image_url_https=image_url_https,
-            kind_of_image_ballotpedia_profile=we_vote_image.kind_of_image_ballotpedia_profile,
-            kind_of_image_campaignx_photo=we_vote_image.kind_of_image_campaignx_photo,
-            kind_of_image_ctcl_profile=we_vote_image.kind_of_image_ctcl_profile,
-            kind_of_image_facebook_background=we_vote_image.kind_of_image_facebook_background,
-            kind_of_image_facebook_profile=we_vote_image.kind_of_image_facebook_profile,
-            kind_of_image_large=True,
-            kind_of_image_linkedin_profile=we_vote_image.kind_of_image_linkedin_profile,
-            kind_of_image_maplight=we_vote_image.kind_of_image_maplight,
-            kind_of_image_organization_uploaded_profile=we_vote_image.kind_of_image_organization_uploaded_profile,
-            kind_of_image_other_source=we_vote_image.kind_of_image_other_source,
-            kind_of_image_politician_uploaded_profile=we_vote_image.kind_of_image_politician_uploaded_profile,
-            kind_of_image_twitter_background=we_vote_image.kind_of_image_twitter_background,
-            kind_of_image_twitter_banner=we_vote_image.kind_of_image_twitter_banner,
-            kind_of_image_twitter_profile=we_vote_image.kind_of_image_twitter_profile,
-            kind_of_image_vote_smart=we_vote_image.kind_of_image_vote_smart,
-            kind_of_image_vote_usa_profile=we_vote_image.kind_of_image_vote_usa_profile,
-            kind_of_image_voter_uploaded_profile=we_vote_image.kind_of_image_voter_uploaded_profile,
-            kind_of_image_wikipedia_profile=we_vote_image.kind_of_image_wikipedia_profile,
-            maplight_id=we_vote_image.maplight_id,
-            organization_we_vote_id=we_vote_image.organization_we_vote_id,
-            other_source=we_vote_image.other_source,
-            politician_we_vote_id=we_vote_image.politician_we_vote_id,
-            representative_we_vote_id=we_vote_image.representative_we_vote_id,
-            twitter_id=we_vote_image.twitter_id,
-            vote_smart_id=we_vote_image.vote_smart_id,
-            voter_we_vote_id=we_vote_image.voter_we_vote_id,
-            we_vote_parent_image_id=we_vote_image.id,
-        )
-        create_resized_image_results['cached_large_image'] = cache_resized_image_locally_results['success']
+        resized_version_list.append(('cached_large_image', 'kind_of_image_large'))
     else:
         create_resized_image_results['cached_large_image'] = IMAGE_ALREADY_CACHED
 
     # Only some of our kinds of images have medium or tiny sizes
-    if we_vote_image.kind_of_image_ballotpedia_profile or \
-            we_vote_image.kind_of_image_campaignx_photo or \
-            we_vote_image.kind_of_image_ctcl_profile or \
-            we_vote_image.kind_of_image_facebook_profile or \
-            we_vote_image.kind_of_image_linkedin_profile or \
-            we_vote_image.kind_of_image_organization_uploaded_profile or \
-            we_vote_image.kind_of_image_politician_uploaded_profile or \
-            we_vote_image.kind_of_image_maplight or \
-            we_vote_image.kind_of_image_twitter_profile or \
-            we_vote_image.kind_of_image_vote_smart or \
-            we_vote_image.kind_of_image_vote_usa_profile or \
-            we_vote_image.kind_of_image_voter_uploaded_profile or \
-            we_vote_image.kind_of_image_wikipedia_profile or \
-            we_vote_image.kind_of_image_other_source:
+    if we_vote_image_has_medium_and_tiny_versions(we_vote_image):
         if not resized_version_exists_results['medium_image_version_exists']:
-            # Medium version does not exist so create resize image and cache it
-            cache_resized_image_locally_results = cache_resized_image_locally(
-                campaignx_we_vote_id=we_vote_image.campaignx_we_vote_id,
-                candidate_we_vote_id=we_vote_image.candidate_we_vote_id,
-                facebook_user_id=we_vote_image.facebook_user_id,
-                google_civic_election_id=we_vote_image.google_civic_election_id,
-                image_format=image_format,
-                image_offset_x=we_vote_image.facebook_background_image_offset_x,
-                image_offset_y=we_vote_image.facebook_background_image_offset_y,
-                image_url_https=image_url_https,
-                kind_of_image_ballotpedia_profile=we_vote_image.kind_of_image_ballotpedia_profile,
-                kind_of_image_campaignx_photo=we_vote_image.kind_of_image_campaignx_photo,
-                kind_of_image_ctcl_profile=we_vote_image.kind_of_image_ctcl_profile,
-                kind_of_image_facebook_profile=we_vote_image.kind_of_image_facebook_profile,
-                kind_of_image_facebook_background=we_vote_image.kind_of_image_facebook_background,
-                kind_of_image_linkedin_profile=we_vote_image.kind_of_image_linkedin_profile,
-                kind_of_image_maplight=we_vote_image.kind_of_image_maplight,
-                kind_of_image_medium=True,
-                kind_of_image_organization_uploaded_profile=we_vote_image.kind_of_image_organization_uploaded_profile,
-                kind_of_image_other_source=we_vote_image.kind_of_image_other_source,
-                kind_of_image_politician_uploaded_profile=we_vote_image.kind_of_image_politician_uploaded_profile,
-                kind_of_image_twitter_background=we_vote_image.kind_of_image_twitter_background,
-                kind_of_image_twitter_banner=we_vote_image.kind_of_image_twitter_banner,
-                kind_of_image_twitter_profile=we_vote_image.kind_of_image_twitter_profile,
-                kind_of_image_vote_smart=we_vote_image.kind_of_image_vote_smart,
-                kind_of_image_vote_usa_profile=we_vote_image.kind_of_image_vote_usa_profile,
-                kind_of_image_voter_uploaded_profile=we_vote_image.kind_of_image_voter_uploaded_profile,
-                kind_of_image_wikipedia_profile=we_vote_image.kind_of_image_wikipedia_profile,
-                maplight_id=we_vote_image.maplight_id,
-                organization_we_vote_id=we_vote_image.organization_we_vote_id,
-                other_source=we_vote_image.other_source,
-                politician_we_vote_id=we_vote_image.politician_we_vote_id,
-                representative_we_vote_id=we_vote_image.representative_we_vote_id,
-                twitter_id=we_vote_image.twitter_id,
-                vote_smart_id=we_vote_image.vote_smart_id,
-                voter_we_vote_id=we_vote_image.voter_we_vote_id,
-                we_vote_parent_image_id=we_vote_image.id,
-            )
-            create_resized_image_results['cached_medium_image'] = cache_resized_image_locally_results['success']
+            resized_version_list.append(('cached_medium_image', 'kind_of_image_medium'))
         else:
             create_resized_image_results['cached_medium_image'] = IMAGE_ALREADY_CACHED
 
         if not resized_version_exists_results['tiny_image_version_exists']:
-            # Tiny version does not exist so create resize image and cache it
-            cache_resized_image_locally_results = cache_resized_image_locally(
-                campaignx_we_vote_id=we_vote_image.campaignx_we_vote_id,
-                candidate_we_vote_id=we_vote_image.candidate_we_vote_id,
-                facebook_user_id=we_vote_image.facebook_user_id,
-                google_civic_election_id=we_vote_image.google_civic_election_id,
-                image_format=image_format,
-                image_offset_x=we_vote_image.facebook_background_image_offset_x,
-                image_offset_y=we_vote_image.facebook_background_image_offset_y,
-                image_url_https=image_url_https,
-                kind_of_image_ballotpedia_profile=we_vote_image.kind_of_image_ballotpedia_profile,
-                kind_of_image_campaignx_photo=we_vote_image.kind_of_image_campaignx_photo,
-                kind_of_image_ctcl_profile=we_vote_image.kind_of_image_ctcl_profile,
-                kind_of_image_facebook_background=we_vote_image.kind_of_image_facebook_background,
-                kind_of_image_facebook_profile=we_vote_image.kind_of_image_facebook_profile,
-                kind_of_image_linkedin_profile=we_vote_image.kind_of_image_linkedin_profile,
-                kind_of_image_maplight=we_vote_image.kind_of_image_maplight,
-                kind_of_image_organization_uploaded_profile=we_vote_image.kind_of_image_organization_uploaded_profile,
-                kind_of_image_other_source=we_vote_image.kind_of_image_other_source,
-                kind_of_image_politician_uploaded_profile=we_vote_image.kind_of_image_politician_uploaded_profile,
-                kind_of_image_tiny=True,
-                kind_of_image_twitter_background=we_vote_image.kind_of_image_twitter_background,
-                kind_of_image_twitter_banner=we_vote_image.kind_of_image_twitter_banner,
-                kind_of_image_twitter_profile=we_vote_image.kind_of_image_twitter_profile,
-                kind_of_image_vote_smart=we_vote_image.kind_of_image_vote_smart,
-                kind_of_image_vote_usa_profile=we_vote_image.kind_of_image_vote_usa_profile,
-                kind_of_image_voter_uploaded_profile=we_vote_image.kind_of_image_voter_uploaded_profile,
-                kind_of_image_wikipedia_profile=we_vote_image.kind_of_image_wikipedia_profile,
-                maplight_id=we_vote_image.maplight_id,
-                organization_we_vote_id=we_vote_image.organization_we_vote_id,
-                other_source=we_vote_image.other_source,
-                politician_we_vote_id=we_vote_image.politician_we_vote_id,
-                representative_we_vote_id=we_vote_image.representative_we_vote_id,
-                twitter_id=we_vote_image.twitter_id,
-                vote_smart_id=we_vote_image.vote_smart_id,
-                voter_we_vote_id=we_vote_image.voter_we_vote_id,
-                we_vote_parent_image_id=we_vote_image.id,
-            )
-            create_resized_image_results['cached_tiny_image'] = cache_resized_image_locally_results['success']
+            resized_version_list.append(('cached_tiny_image', 'kind_of_image_tiny'))
         else:
             create_resized_image_results['cached_tiny_image'] = IMAGE_ALREADY_CACHED
+
+    if len(resized_version_list) and not positive_value_exists(we_vote_image.content_hash):
+        # Download the source image once, and make every missing version from that one copy. (When we know the
+        #  master image's content_hash, versions made before from the same bytes are reused without a download.)
+        cache_resized_image_kwargs['image_bytes'] = fetch_image_bytes(image_url_https)
+    if len(resized_version_list):
+
+        def cache_one_resized_version(kind_of_image_key):
+            return cache_resized_image_locally(**cache_resized_image_kwargs, **{kind_of_image_key: True})
+
+        def cache_one_resized_version_in_thread(kind_of_image_key):
+            try:
+                return cache_one_resized_version(kind_of_image_key)
+            finally:
+                connection.close()  # This thread's Django connection
+
+        kind_of_image_key_list = [kind_of_image_key for results_key, kind_of_image_key in resized_version_list]
+        if len(kind_of_image_key_list) > 1 and IMAGE_RESIZE_CONCURRENT_VERSIONS > 1:
+            # The versions are resized and uploaded to S3 at the same time
+            with ThreadPoolExecutor(max_workers=min(IMAGE_RESIZE_CONCURRENT_VERSIONS, len(kind_of_image_key_list)),
+                                    thread_name_prefix='image_resize') as executor:
+                cache_resized_image_locally_results_list = list(executor.map(
+                    cache_one_resized_version_in_thread, kind_of_image_key_list))
+        else:
+            cache_resized_image_locally_results_list = [
+                cache_one_resized_version(kind_of_image_key) for kind_of_image_key in kind_of_image_key_list]
+        for (results_key, kind_of_image_key), cache_resized_image_locally_results in \
+                zip(resized_version_list, cache_resized_image_locally_results_list):
+            create_resized_image_results[results_key] = cache_resized_image_locally_results['success']
     log_and_time_cache_action(False, time0, 'create_resized_image_if_not_created')
     return create_resized_image_results
 
@@ -3029,9 +3056,13 @@ def cache_resized_image_locally(
         vote_smart_id=None,
         voter_we_vote_id=None,
         we_vote_parent_image_id=0,
+        image_bytes=None,
+        content_hash=None,
     ):
     """
-    Resize the image as per image version and cache the same
+    Resize the image as per image version and cache the same. The source image is resized in memory, from
+    image_bytes if the caller already has them, or from one download of image_url_https. If this version of the
+    same bytes (content_hash) was made before, for anyone, we use that file instead.
     :param campaignx_we_vote_id:
     :param candidate_we_vote_id:
     :param facebook_user_id:
@@ -3073,6 +3104,8 @@ def cache_resized_image_locally(
     :param vote_smart_id:
     :param voter_we_vote_id:
     :param we_vote_parent_image_id:
+    :param image_bytes:
+    :param content_hash:
     :return:
     """
     time0 = log_and_time_cache_action(True, 0, 'cache_resized_image_locally')
@@ -3395,9 +3428,24 @@ def cache_resized_image_locally(
         else:
             we_vote_image_file_location = "missing_id/" + we_vote_image_file_name
 
-
-        image_stored_locally = we_vote_image_manager.store_image_locally(
-                image_url_https, we_vote_image_file_name)
+        # If we already made this version of these exact bytes, use that file instead of downloading and resizing again
+        variant_key = generate_image_variant_key(
+            image_width=image_width,
+            image_height=image_height,
+            image_type=image_type,
+            image_offset_y=image_offset_y,
+            image_format=image_format_filtered)
+        if not positive_value_exists(content_hash) and image_bytes is not None:
+            content_hash = generate_image_content_hash(image_bytes)
+        image_content_results = we_vote_image_manager.retrieve_we_vote_image_content(
+            content_hash=content_hash, variant_key=variant_key)
+
+        if image_bytes is None and not image_content_results['we_vote_image_content_found']:
+            image_bytes = fetch_image_bytes(image_url_https)
+            content_hash = generate_image_content_hash(image_bytes)
+            image_content_results = we_vote_image_manager.retrieve_we_vote_image_content(
+                content_hash=content_hash, variant_key=variant_key)
+        image_stored_locally = image_bytes is not None or image_content_results['we_vote_image_content_found']
         if not image_stored_locally:
             status += " IMAGE_NOT_STORED_LOCALLY1 "
             error_results = {
@@ -3413,14 +3461,20 @@ def cache_resized_image_locally(
             return error_results
 
         status += " IMAGE_STORED_LOCALLY "
-        resized_image_created = we_vote_image_manager.resize_we_vote_master_image(
-            image_local_path=we_vote_image_file_name,
-            image_width=image_width,
-            image_height=image_height,
-            image_type=image_type,
-            image_offset_x=image_offset_x,
-            image_offset_y=image_offset_y,
-            convert_image_to_jpg=convert_image_to_jpg)
+        if image_content_results['we_vote_image_content_found']:
+            we_vote_image_file_location = image_content_results['we_vote_image_content'].we_vote_image_file_location
+            resized_image_bytes = None
+            status += " RESIZED_IMAGE_CONTENT_ALREADY_STORED "
+        else:
+            resized_image_bytes = we_vote_image_manager.resize_we_vote_master_image_bytes(
+                image_bytes=image_bytes,
+                image_width=image_width,
+                image_height=image_height,
+                image_type=image_type,
+                image_offset_x=image_offset_x,
+                image_offset_y=image_offset_y,
+                convert_image_to_jpg=convert_image_to_jpg)
+        resized_image_created = resized_image_bytes is not None or image_content_results['we_vote_image_content_found']
         if not resized_image_created:
             status += " IMAGE_NOT_STORED_LOCALLY2 "
             error_results = {
@@ -3436,10 +3490,13 @@ def cache_resized_image_locally(
             return error_results
 
         status += " RESIZED_IMAGE_CREATED "
-        image_stored_to_aws = we_vote_image_manager.store_image_to_aws(
-            we_vote_image_file_name=we_vote_image_file_name,
-            we_vote_image_file_location=we_vote_image_file_location,
-            image_format=image_format_filtered)
+        if image_content_results['we_vote_image_content_found']:
+            image_stored_to_aws = True
+        else:
+            image_stored_to_aws = we_vote_image_manager.store_image_bytes_to_aws(
+                image_bytes=resized_image_bytes,
+                we_vote_image_file_location=we_vote_image_file_location,
+                image_format=image_format_filtered)
         if not image_stored_to_aws:
             status += " IMAGE_NOT_STORED_TO_AWS "
             error_results = {
@@ -3461,12 +3518,22 @@ def cache_resized_image_locally(
         if we_vote_image_url is not None and we_vote_image_url != "":
             # logger.error('(Ok) New image created in cache_resized_image_locally we_vote_image_url: %s' %
             #              we_vote_image_url)
+            if not image_content_results['we_vote_image_content_found']:
+                save_content_results = we_vote_image_manager.save_we_vote_image_content(
+                    content_hash=content_hash,
+                    variant_key=variant_key,
+                    image_width=image_width,
+                    image_height=image_height,
+                    we_vote_image_url=we_vote_image_url,
+                    we_vote_image_file_location=we_vote_image_file_location)
+                status += save_content_results['status']
             save_aws_info = we_vote_image_manager.save_we_vote_image_aws_info(
                 we_vote_image,
                 we_vote_image_url=we_vote_image_url,
                 we_vote_image_file_location=we_vote_image_file_location,
                 we_vote_parent_image_id=we_vote_parent_image_id,
-                is_active_version=is_active_version)
+                is_active_version=is_active_version,
+                content_hash=content_hash)
         else:
             status += " WE_VOTE_IMAGE_URL_IS_EMPTY "
             error_results = {
@@ -2,55 +2,111 @@
 # Brought to you by We Vote. Be good.
 # -*- coding: UTF-8 -*-
 
+from collections import OrderedDict
+from config.base import get_environment_variable_default
 from exception.models import handle_exception
+import hashlib
 from io import BytesIO
 from PIL import Image, ImageOps
-from urllib.request import Request, urlopen
-import urllib
-import requests
+import threading
+import time
 import wevote_functions.admin
+from wevote_functions.functions import convert_to_int
+from wevote_functions.functions_http_fetch import get_pooled_session
 
 logger = wevote_functions.admin.get_logger(__name__)
 
-
-def analyze_remote_url(image_url_https):
+IMAGE_FETCH_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 6.1; WOW64) AppleWebKit/537.36 (KHTML, like Gecko) '
+                  'Chrome/36.0.1941.0 Safari/537.36',
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+    'Accept-Charset': 'ISO-8859-1,utf-8;q=0.7,*;q=0.3',
+    'Accept-Language': 'en-US,en;q=0.8',
+}
+IMAGE_FETCH_TIMEOUT_SECONDS = 30
+# The master image and its large, medium and tiny versions are all made from one download of the source image.
+#  We hold on to the last few downloads (in this process) so the resize steps don't download the source again.
+IMAGE_BYTES_CACHE_MAX_ENTRIES = \
+    convert_to_int(get_environment_variable_default("IMAGE_BYTES_CACHE_MAX_ENTRIES", 16))
+IMAGE_BYTES_CACHE_SECONDS = 300
+
+image_bytes_by_url = OrderedDict()
+image_bytes_by_url_lock = threading.Lock()
+
+
+def remember_image_bytes(image_url_https, image_bytes):
+    if not image_url_https or not image_bytes or IMAGE_BYTES_CACHE_MAX_ENTRIES <= 0:
+        return
+    with image_bytes_by_url_lock:
+        image_bytes_by_url[image_url_https] = (time.monotonic(), image_bytes)
+        image_bytes_by_url.move_to_end(image_url_https)
+        while len(image_bytes_by_url) > IMAGE_BYTES_CACHE_MAX_ENTRIES:
+            image_bytes_by_url.popitem(last=False)
+
+
+def forget_image_bytes(image_url_https=None):
+    with image_bytes_by_url_lock:
+        if image_url_https is None:
+            image_bytes_by_url.clear()
+        else:
+            image_bytes_by_url.pop(image_url_https, None)
+
+
+def fetch_image_bytes(image_url_https):
     """
-    Validate url and get image properties
+    Download the image at image_url_https into memory, or reuse a recent download of the same url
     :param image_url_https:
-    :return:
+    :return: the image bytes, or None if the url can't be downloaded
     """
-    image_format = None
-    image_height = None
-    image_width = None
-    image_url_valid = False
+    if not image_url_https:
+        return None
+    with image_bytes_by_url_lock:
+        cached_entry = image_bytes_by_url.get(image_url_https)
+        if cached_entry is not None:
+            if time.monotonic() - cached_entry[0] < IMAGE_BYTES_CACHE_SECONDS:
+                return cached_entry[1]
+            del image_bytes_by_url[image_url_https]
     try:
-        if image_url_https is not None:
-            # urlopen(Request(image_url_https))
-            remote_url_req = urllib.request.Request(
-                image_url_https,
-                headers={
-                    'User-Agent': 'Mozilla/5.0 (Windows NT 6.1; WOW64) AppleWebKit/537.36 (KHTML, like Gecko) '
-                                  'Chrome/36.0.1941.0 Safari/537.36',
-                    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
-                    'Accept-Charset': 'ISO-8859-1,utf-8;q=0.7,*;q=0.3',
-                    'Accept-Encoding': 'none',
-                    'Accept-Language': 'en-US,en;q=0.8',
-                    'Connection': 'keep-alive'})
-            remote_url = urlopen(remote_url_req)
-            image_url_valid = True
+        response = get_pooled_session().get(
+            image_url_https, headers=IMAGE_FETCH_HEADERS, timeout=IMAGE_FETCH_TIMEOUT_SECONDS)
+        response.raise_for_status()
+        image_bytes = response.content
     except Exception as e:
-        image_url_valid = False
-        exception_message = "analyze_remote_url: image url {image_url_https} is not valid."\
+        exception_message = "fetch_image_bytes: image url {image_url_https} is not valid."\
             .format(image_url_https=image_url_https)
         handle_exception(e, logger=logger, exception_message=exception_message)
+        return None
+    remember_image_bytes(image_url_https, image_bytes)
+    return image_bytes
 
-    if image_url_valid:
+
+def generate_image_content_hash(image_bytes):
+    """
+    :param image_bytes:
+    :return: the SHA-256 of the image bytes as hex, so the same image from any url or owner is only stored once
+    """
+    if not image_bytes:
+        return None
+    return hashlib.sha256(image_bytes).hexdigest()
+
+
+def analyze_image_bytes(image_bytes):
+    """
+    Get image properties from an image held in memory
+    :param image_bytes:
+    :return:
+    """
+    image_format = None
+    image_height = None
+    image_width = None
+    image_url_valid = False
+    if image_bytes:
         try:
-            response = requests.get(image_url_https)
-            original_image = Image.open(BytesIO(response.content))
+            original_image = Image.open(BytesIO(image_bytes))
             image_format = original_image.format
             image = ImageOps.exif_transpose(original_image)
             image_width, image_height = image.size
+            image_url_valid = True
         except Exception as e:
             image_url_valid = False
 
@@ -58,11 +114,23 @@ def analyze_remote_url(image_url_https):
         'image_url_valid':              image_url_valid,
         'image_width':                  image_width,
         'image_height':                 image_height,
-        'image_format':                 image_format.lower() if image_format is not None else image_format
+        'image_format':                 image_format.lower() if image_format is not None else image_format,
+        'image_bytes':                  image_bytes if image_url_valid else None,
     }
     return results
 
 
+def analyze_remote_url(image_url_https):
+    """
+    Validate url and get image properties. The image is downloaded once, and returned in image_bytes so the caller
+    can store and resize it without downloading it again.
+    :param image_url_https:
+    :return:
+    """
+    image_bytes = fetch_image_bytes(image_url_https) if image_url_https is not None else None
+    return analyze_image_bytes(image_bytes)
+
+
 def analyze_image_file(image_file):
     """
     Analyse inMemoryUploadedFile object to get image properties
@@ -0,0 +1,171 @@
+import hashlib
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+from urllib.request import urlopen, urlretrieve
+
+import boto3
+import requests
+from botocore.config import Config
+from django.core.management.base import BaseCommand
+from PIL import Image
+
+from image.controllers import IMAGE_RESIZE_CONCURRENT_VERSIONS
+from image.functions import analyze_image_bytes, fetch_image_bytes, forget_image_bytes
+from image.models import configure_s3_client, resize_python_image, WeVoteImageManager, AWS_STORAGE_BUCKET_NAME, \
+    TWITTER_PROFILE_IMAGE_NAME
+from wevote_functions.fake_json_provider_server import FakeJsonProviderServer
+
+# Large, medium and tiny profile image sizes
+RESIZED_VERSION_SIZE_LIST = ((200, 200), (48, 48), (32, 32))
+
+
+class FakeS3Server:
+    """
+    Local stand-in for S3 which keeps uploaded objects in memory. Every request waits latency_seconds, like a trip
+    to AWS would. Use as a context manager.
+    """
+
+    def __init__(self, latency_seconds=0.0):
+        self.latency_seconds = latency_seconds
+        self.object_by_path = {}
+        self.put_count = 0
+        self.lock = threading.Lock()
+        fake_server = self
+
+        class FakeS3Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_PUT(self):
+                body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                time.sleep(fake_server.latency_seconds)
+                with fake_server.lock:
+                    fake_server.object_by_path[self.path.split('?')[0]] = body
+                    fake_server.put_count += 1
+                self.send_response(200)
+                self.send_header('ETag', '"' + hashlib.md5(body).hexdigest() + '"')
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+
+            def log_message(self, format, *args):  # noqa: PLR6301 - Keep the benchmark output quiet
+                pass
+
+        self.http_server = ThreadingHTTPServer(('127.0.0.1', 0), FakeS3Handler)
+        self.http_server.daemon_threads = True
+        self.url = 'http://127.0.0.1:' + str(self.http_server.server_address[1])
+        self.thread = threading.Thread(target=self.http_server.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.http_server.shutdown()
+        self.http_server.server_close()
+
+
+class Command(BaseCommand):
+    help = 'Compares the old download-to-/tmp image caching with the in-memory pipeline (one download, resized ' \
+           'versions made from that buffer, uploads over the shared S3 client), against a local image source and ' \
+           'a local S3 stand-in'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--images', type=int, default=50,
+                            help='Number of source images to cache')
+        parser.add_argument('--source_latency', type=float, default=0.05,
+                            help='Seconds the fake image source takes to answer each request')
+        parser.add_argument('--s3_latency', type=float, default=0.05,
+                            help='Seconds the S3 stand-in takes to answer each upload')
+        parser.add_argument('--skip_old', action='store_true',
+                            help='Only time the in-memory pipeline')
+
+    def handle(self, *args, **options):
+        image_count = options['images']
+        source_image_buffer = BytesIO()
+        Image.new('RGB', (800, 800), (40, 90, 160)).save(source_image_buffer, format='JPEG', quality=90)
+
+        with FakeJsonProviderServer(response_text=source_image_buffer.getvalue(), content_type='image/jpeg',
+                                    latency_seconds=options['source_latency']) as source_server, \
+                FakeS3Server(latency_seconds=options['s3_latency']) as s3_server:
+            configure_s3_client(aws_access_key_id='benchmark', aws_secret_access_key='benchmark',
+                                endpoint_url=s3_server.url)
+            url_list = [source_server.url + 'image_' + str(image_number) + '.jpg'
+                        for image_number in range(image_count)]
+
+            if not options['skip_old']:
+                start_time = time.monotonic()
+                for image_url in url_list:
+                    self.cache_image_the_old_way(image_url, s3_server.url)
+                self.write_timing('old (/tmp, new client per upload)', image_count, time.monotonic() - start_time,
+                                  source_server, s3_server)
+
+            source_server.request_count = 0
+            s3_server.put_count = 0
+            forget_image_bytes()
+            start_time = time.monotonic()
+            for image_url in url_list:
+                self.cache_image_in_memory(image_url)
+            self.write_timing('in-memory pipeline', image_count, time.monotonic() - start_time,
+                              source_server, s3_server)
+
+    @staticmethod
+    def cache_image_the_old_way(image_url, s3_endpoint_url):
+        def new_s3_client():
+            return boto3.client('s3', aws_access_key_id='benchmark', aws_secret_access_key='benchmark',
+                                region_name='us-east-1', endpoint_url=s3_endpoint_url,
+                                config=Config(s3={'addressing_style': 'path'}))
+
+        # analyze_remote_url: one download to validate, another to read the size
+        urlopen(image_url).read()
+        Image.open(BytesIO(requests.get(image_url).content)).size
+        temp_path = os.path.join(tempfile.gettempdir(), 'benchmark_' + os.path.basename(image_url))
+        urlretrieve(image_url, temp_path)
+        new_s3_client().upload_file(temp_path, AWS_STORAGE_BUCKET_NAME, 'master/' + os.path.basename(image_url))
+        for image_width, image_height in RESIZED_VERSION_SIZE_LIST:
+            urlretrieve(image_url, temp_path)
+            image = resize_python_image(Image.open(temp_path), image_width=image_width, image_height=image_height,
+                                        image_type=TWITTER_PROFILE_IMAGE_NAME)
+            image.convert('RGB').save(temp_path, format='JPEG', quality=95, subsampling=0)
+            new_s3_client().upload_file(temp_path, AWS_STORAGE_BUCKET_NAME,
+                                        str(image_width) + '/' + os.path.basename(image_url))
+        os.remove(temp_path)
+
+    @staticmethod
+    def cache_image_in_memory(image_url):
+        # The same steps as cache_image_locally, then create_resized_image_if_not_created with
+        #  cache_resized_image_locally, without the WeVoteImage entries
+        we_vote_image_manager = WeVoteImageManager()
+        analyze_results = analyze_image_bytes(fetch_image_bytes(image_url))
+        we_vote_image_manager.store_image_bytes_to_aws(
+            image_bytes=analyze_results['image_bytes'],
+            we_vote_image_file_location='master/' + os.path.basename(image_url),
+            image_format=analyze_results['image_format'])
+
+        def cache_one_resized_version(image_size):
+            image_width, image_height = image_size
+            return we_vote_image_manager.store_image_bytes_to_aws(
+                image_bytes=we_vote_image_manager.resize_we_vote_master_image_bytes(
+                    image_bytes=fetch_image_bytes(image_url), image_width=image_width, image_height=image_height,
+                    image_type=TWITTER_PROFILE_IMAGE_NAME),
+                we_vote_image_file_location=str(image_width) + '/' + os.path.basename(image_url),
+                image_format='jpg')
+
+        if IMAGE_RESIZE_CONCURRENT_VERSIONS > 1:
+            with ThreadPoolExecutor(max_workers=min(IMAGE_RESIZE_CONCURRENT_VERSIONS, len(RESIZED_VERSION_SIZE_LIST)),
+                                    thread_name_prefix='image_resize') as executor:
+                list(executor.map(cache_one_resized_version, RESIZED_VERSION_SIZE_LIST))
+        else:
+            for image_size in RESIZED_VERSION_SIZE_LIST:
+                cache_one_resized_version(image_size)
+
+    def write_timing(self, label, image_count, elapsed_seconds, source_server, s3_server):
+        self.stdout.write(
+            '{label}: {count} images in {seconds:.2f}s ({rate:.1f} per second), {downloads} source downloads, '
+            '{uploads} uploads'.format(
+                label=label, count=image_count, seconds=elapsed_seconds,
+                rate=image_count / elapsed_seconds if elapsed_seconds else 0,
+                downloads=source_server.request_count, uploads=s3_server.put_count))
@@ -2,16 +2,20 @@
 # Brought to you by We Vote. Be good.
 # -*- coding: UTF-8 -*-
 
-from config.base import get_environment_variable
+from botocore.config import Config
+from config.base import get_environment_variable, get_environment_variable_default
 from datetime import date
 from django.db import models
 from exception.models import handle_record_found_more_than_one_exception, handle_exception, \
     handle_record_not_saved_exception, handle_record_not_deleted_exception
+from io import BytesIO
 from PIL import Image, ImageOps
 from urllib.request import urlretrieve
 from urllib.error import HTTPError
 from wevote_functions.functions import convert_to_int, positive_value_exists
 import boto3
+import os
+import threading
 import wevote_functions.admin
 from .functions import analyze_remote_url
 
@@ -28,6 +32,7 @@ ISSUE_IMAGE_NAME = "issue_image"
 LINKEDIN_IMAGE_NAME = "linkedin_image"
 MAPLIGHT_IMAGE_NAME = "maplight_image"
 MASTER_IMAGE = "master"
+IMAGE_VARIANT_KEY_MASTER = "master"
 ORGANIZATION_ENDORSEMENTS_IMAGE_NAME = "organization_endorsements_image"
 ORGANIZATION_UPLOADED_PROFILE_IMAGE_NAME = "organization_uploaded_profile_image"
 POLITICIAN_UPLOADED_PROFILE_IMAGE_NAME = "politician_uploaded_profile_image"
@@ -44,9 +49,99 @@ AWS_SECRET_ACCESS_KEY = get_environment_variable("AWS_SECRET_ACCESS_KEY")
 AWS_REGION_NAME = get_environment_variable("AWS_REGION_NAME")
 AWS_STORAGE_BUCKET_NAME = get_environment_variable("AWS_STORAGE_BUCKET_NAME")
 AWS_STORAGE_SERVICE = "s3"
+# Point this at a local S3 stand-in for development and benchmarks. Leave it empty for AWS.
+AWS_S3_ENDPOINT_URL = get_environment_variable_default("AWS_S3_ENDPOINT_URL", "")
+# Connections kept open to S3, shared by every upload in this process
+AWS_S3_MAX_POOL_CONNECTIONS = convert_to_int(get_environment_variable_default("AWS_S3_MAX_POOL_CONNECTIONS", 20))
 
 logger = wevote_functions.admin.get_logger(__name__)
 
+# boto3 clients are safe to share between threads, but not across a fork, so we keep one per process
+s3_client_by_process_id = {}
+s3_client_lock = threading.Lock()
+s3_client_settings = {
+    'aws_access_key_id':        AWS_ACCESS_KEY_ID,
+    'aws_secret_access_key':    AWS_SECRET_ACCESS_KEY,
+    'endpoint_url':             AWS_S3_ENDPOINT_URL,
+}
+
+
+def configure_s3_client(**settings):
+    """
+    Change the S3 settings for this process, for example to send uploads to a local S3 stand-in in a benchmark
+    :param settings: aws_access_key_id, aws_secret_access_key and/or endpoint_url
+    """
+    with s3_client_lock:
+        s3_client_settings.update(settings)
+        s3_client_by_process_id.clear()
+
+
+def get_s3_client():
+    """
+    One S3 client per process, with a pool of AWS_S3_MAX_POOL_CONNECTIONS keep-alive connections, instead of a new
+    client (and new TLS handshakes) for every image
+    """
+    process_id = os.getpid()
+    with s3_client_lock:
+        client = s3_client_by_process_id.get(process_id)
+        if client is None:
+            endpoint_url = s3_client_settings['endpoint_url']
+            client = boto3.client(
+                AWS_STORAGE_SERVICE,
+                region_name=AWS_REGION_NAME if positive_value_exists(AWS_REGION_NAME) else None,
+                aws_access_key_id=s3_client_settings['aws_access_key_id'],
+                aws_secret_access_key=s3_client_settings['aws_secret_access_key'],
+                endpoint_url=endpoint_url if positive_value_exists(endpoint_url) else None,
+                config=Config(
+                    max_pool_connections=max(1, AWS_S3_MAX_POOL_CONNECTIONS),
+                    retries={'max_attempts': 4, 'mode': 'standard'},
+                    s3={'addressing_style': 'path'} if positive_value_exists(endpoint_url) else None))
+            s3_client_by_process_id.clear()
+            s3_client_by_process_id[process_id] = client
+        return client
+
+
+def generate_image_variant_key(
+        image_width=0,
+        image_height=0,
+        image_type='',
+        image_offset_y=0,
+        image_format=''):
+    """
+    Name one resized version of a master image, for WeVoteImageContent. Everything resize_python_image
+    uses to make the version is part of the key.
+    """
+    if image_type == TWITTER_BACKGROUND_IMAGE_NAME or image_type == TWITTER_BANNER_IMAGE_NAME:
+        resize_mode = 'resize'
+    elif image_type == FACEBOOK_BACKGROUND_IMAGE_NAME:
+        resize_mode = 'fit' + str(convert_to_int(image_offset_y))
+    else:
+        resize_mode = 'fit'
+    return "{image_width}x{image_height}_{resize_mode}.{image_format}".format(
+        image_width=image_width, image_height=image_height, resize_mode=resize_mode, image_format=image_format)
+
+
+def resize_python_image(
+        image,
+        image_width=0,
+        image_height=0,
+        image_type='',
+        image_offset_y=0):
+    """
+    Scale and crop a PIL image for one of our image sizes. See resize_we_vote_master_image for the facebook background.
+    """
+    image = ImageOps.exif_transpose(image)
+    if image_type == TWITTER_BACKGROUND_IMAGE_NAME or image_type == TWITTER_BANNER_IMAGE_NAME:
+        image = image.resize((image_width, image_height), Image.Resampling.LANCZOS)
+    elif image_type == FACEBOOK_BACKGROUND_IMAGE_NAME:
+        centering_x = 0.5
+        centering_y = ((image.height - image_offset_y) * 0.5) / image.height
+        image = ImageOps.fit(image, (image_width, image_height), Image.Resampling.LANCZOS,
+                             centering=(centering_x, centering_y))
+    else:
+        image = ImageOps.fit(image, (image_width, image_height), Image.Resampling.LANCZOS, centering=(0.5, 0.5))
+    return image
+
 
 class WeVoteImage(models.Model):
     """
@@ -144,6 +239,8 @@ class WeVoteImage(models.Model):
     kind_of_image_tiny = models.BooleanField(verbose_name="is image size tiny", default=False)
     politician_we_vote_id = models.CharField(max_length=255, null=True, blank=True)
     representative_we_vote_id = models.CharField(max_length=255, null=True, blank=True)
+    # SHA-256 of the master image bytes. Resized images carry the hash of the master they were made from.
+    content_hash = models.CharField(max_length=64, null=True, blank=True, db_index=True)
 
     class Meta:
         indexes = [
@@ -204,6 +301,27 @@ class WeVoteImage(models.Model):
         return ""
 
 
+class WeVoteImageContent(models.Model):
+    """
+    One image file we have stored on AWS, found by the hash of the master image it came from and the version
+    (IMAGE_VARIANT_KEY_MASTER, or the size and format of a resized version). The same Twitter, Facebook or
+    Ballotpedia photo is often used by a candidate, a politician, an organization and a voter. Each of them still gets
+    their own WeVoteImage, but the image is only uploaded and resized once.
+    """
+    content_hash = models.CharField(max_length=64, null=False, blank=False)
+    variant_key = models.CharField(max_length=64, null=False, blank=False)
+    image_width = models.BigIntegerField(null=True, blank=True)
+    image_height = models.BigIntegerField(null=True, blank=True)
+    we_vote_image_url = models.TextField(null=True, blank=True)
+    we_vote_image_file_location = models.TextField(null=True, blank=True, db_index=True)
+    date_created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['content_hash', 'variant_key'], name='image_content_hash_variant_key'),
+        ]
+
+
 class WeVoteImageManager(models.Manager):
 
     def __unicode__(self):
@@ -367,15 +485,17 @@ class WeVoteImageManager(models.Manager):
     @staticmethod
     def delete_image_from_aws(we_vote_image_file_location):
         """
-        Delete image from aws
+        Delete image from aws, unless another WeVoteImage is still using the same file (see WeVoteImageContent)
         :param we_vote_image_file_location:
         :return:
         """
         try:
+            if positive_value_exists(we_vote_image_file_location):
+                if WeVoteImage.objects.filter(we_vote_image_file_location=we_vote_image_file_location).count() > 1:
+                    return True
+                WeVoteImageContent.objects.filter(we_vote_image_file_location=we_vote_image_file_location).delete()
 
-            client = boto3.client(AWS_STORAGE_SERVICE, region_name=AWS_REGION_NAME,
-                                  aws_access_key_id=AWS_ACCESS_KEY_ID,
-                                  aws_secret_access_key=AWS_SECRET_ACCESS_KEY)
+            client = get_s3_client()
             client.delete_object(Bucket=AWS_STORAGE_BUCKET_NAME, Key=we_vote_image_file_location)
             image_deleted_from_aws = True
         except Exception as e:
@@ -1078,7 +1198,8 @@ class WeVoteImageManager(models.Manager):
             we_vote_image_url='',
             we_vote_image_file_location='',
             we_vote_parent_image_id=0,
-            is_active_version=False):
+            is_active_version=False,
+            content_hash=None):
         """
         Save aws specific information to WeVoteImage
         :param we_vote_image:
@@ -1086,6 +1207,7 @@ class WeVoteImageManager(models.Manager):
         :param we_vote_image_file_location:
         :param we_vote_parent_image_id:
         :param is_active_version:
+        :param content_hash:
         :return:
         """
         try:
@@ -1093,6 +1215,8 @@ class WeVoteImageManager(models.Manager):
             we_vote_image.we_vote_image_file_location = we_vote_image_file_location
             we_vote_image.we_vote_parent_image_id = we_vote_parent_image_id
             we_vote_image.is_active_version = is_active_version
+            if content_hash is not None:
+                we_vote_image.content_hash = content_hash
 
             we_vote_image.save()
             success = True
@@ -1109,6 +1233,77 @@ class WeVoteImageManager(models.Manager):
         }
         return results
 
+    @staticmethod
+    def retrieve_we_vote_image_content(content_hash='', variant_key=''):
+        """
+        Find an image file we have already stored for these bytes and this version
+        :param content_hash:
+        :param variant_key:
+        :return:
+        """
+        status = ''
+        success = True
+        we_vote_image_content = None
+        we_vote_image_content_found = False
+        if positive_value_exists(content_hash) and positive_value_exists(variant_key):
+            try:
+                we_vote_image_content = WeVoteImageContent.objects.filter(
+                    content_hash=content_hash, variant_key=variant_key).first()
+                we_vote_image_content_found = we_vote_image_content is not None
+            except Exception as e:
+                success = False
+                status += "RETRIEVE_WE_VOTE_IMAGE_CONTENT_FAILED: " + str(e) + " "
+        else:
+            status += "RETRIEVE_WE_VOTE_IMAGE_CONTENT_MISSING_HASH_OR_VARIANT "
+
+        results = {
+            'success':                      success,
+            'status':                       status,
+            'we_vote_image_content':        we_vote_image_content,
+            'we_vote_image_content_found':  we_vote_image_content_found,
+        }
+        return results
+
+    @staticmethod
+    def save_we_vote_image_content(
+            content_hash='',
+            variant_key='',
+            image_width=None,
+            image_height=None,
+            we_vote_image_url='',
+            we_vote_image_file_location=''):
+        """
+        Remember the image file we just stored, so the next WeVoteImage with the same bytes can use it
+        :return:
+        """
+        status = ''
+        success = True
+        if not positive_value_exists(content_hash) or not positive_value_exists(variant_key):
+            status += "SAVE_WE_VOTE_IMAGE_CONTENT_MISSING_HASH_OR_VARIANT "
+            success = False
+        else:
+            try:
+                # If another process stored the same image at the same time, either file is fine
+                we_vote_image_content, created = WeVoteImageContent.objects.get_or_create(
+                    content_hash=content_hash,
+                    variant_key=variant_key,
+                    defaults={
+                        'image_width':                  image_width,
+                        'image_height':                 image_height,
+                        'we_vote_image_url':            we_vote_image_url,
+                        'we_vote_image_file_location':  we_vote_image_file_location,
+                    })
+                status += "WE_VOTE_IMAGE_CONTENT_SAVED " if created else "WE_VOTE_IMAGE_CONTENT_ALREADY_SAVED "
+            except Exception as e:
+                success = False
+                status += "WE_VOTE_IMAGE_CONTENT_NOT_SAVED: " + str(e) + " "
+
+        results = {
+            'success':  success,
+            'status':   status,
+        }
+        return results
+
     @staticmethod
     def set_active_version_false_for_other_images(
             campaignx_we_vote_id=None,
@@ -2094,16 +2289,12 @@ class WeVoteImageManager(models.Manager):
         try:
             image_local_path = "/tmp/" + image_local_path
             original_image = Image.open(image_local_path)
-            image = ImageOps.exif_transpose(original_image)
-            if image_type == TWITTER_BACKGROUND_IMAGE_NAME or image_type == TWITTER_BANNER_IMAGE_NAME:
-                image = image.resize((image_width, image_height), Image.Resampling.LANCZOS)
-            elif image_type == FACEBOOK_BACKGROUND_IMAGE_NAME:
-                centering_x = 0.5
-                centering_y = ((image.height - image_offset_y) * 0.5) / image.height
-                image = ImageOps.fit(image, (image_width, image_height), Image.Resampling.LANCZOS,
-                                     centering=(centering_x, centering_y))
-            else:
-                image = ImageOps.fit(image, (image_width, image_height), Image.Resampling.LANCZOS, centering=(0.5, 0.5))
+            image = resize_python_image(
+                original_image,
+                image_width=image_width,
+                image_height=image_height,
+                image_type=image_type,
+                image_offset_y=image_offset_y)
             if convert_image_to_jpg:
                 image = image.convert('RGB')
                 image.save(image_local_path, quality=95, subsampling=0)
@@ -2117,6 +2308,49 @@ class WeVoteImageManager(models.Manager):
 
         return resized_image_created
 
+    @staticmethod
+    def resize_we_vote_master_image_bytes(
+            image_bytes=None,
+            image_width=0,
+            image_height=0,
+            image_type='',
+            image_offset_x=0,
+            image_offset_y=0,
+            convert_image_to_jpg=True):
+        """
+        Like resize_we_vote_master_image, but the image is read from and written to memory instead of /tmp/
+        :param image_bytes:
+        :param image_width:
+        :param image_height:
+        :param image_type:
+        :param image_offset_x:
+        :param image_offset_y:
+        :param convert_image_to_jpg:
+        :return: the resized image bytes, or None if the image couldn't be resized
+        """
+        try:
+            original_image = Image.open(BytesIO(image_bytes))
+            image_format = original_image.format
+            image = resize_python_image(
+                original_image,
+                image_width=image_width,
+                image_height=image_height,
+                image_type=image_type,
+                image_offset_y=image_offset_y)
+            resized_image_buffer = BytesIO()
+            if convert_image_to_jpg:
+                image = image.convert('RGB')
+                image.save(resized_image_buffer, format='JPEG', quality=95, subsampling=0)
+            else:
+                image.save(resized_image_buffer, format=image_format)
+            resized_image_bytes = resized_image_buffer.getvalue()
+        except Exception as e:
+            resized_image_bytes = None
+            exception_message = "resize_we_vote_master_image_bytes failed"
+            handle_exception(e, logger=logger, exception_message=exception_message)
+
+        return resized_image_bytes
+
     @staticmethod
     def store_image_locally(image_url_https, image_local_path):
         """
@@ -2174,9 +2408,7 @@ class WeVoteImageManager(models.Manager):
         :return:
         """
         try:
-            client = boto3.client(AWS_STORAGE_SERVICE, region_name=AWS_REGION_NAME,
-                                  aws_access_key_id=AWS_ACCESS_KEY_ID,
-                                  aws_secret_access_key=AWS_SECRET_ACCESS_KEY)
+            client = get_s3_client()
             upload_image_from_location = "/tmp/" + we_vote_image_file_name
             # print('-------------- temp file upload to aws ' +  upload_image_from_location)
             content_type = "image/{image_format}".format(image_format=image_format)
@@ -2190,6 +2422,28 @@ class WeVoteImageManager(models.Manager):
 
         return image_stored_to_aws
 
+    @staticmethod
+    def store_image_bytes_to_aws(image_bytes=None, we_vote_image_file_location='', image_format=''):
+        """
+        Upload an image held in memory to aws, over the shared S3 client
+        :param image_bytes:
+        :param we_vote_image_file_location:
+        :param image_format:
+        :return:
+        """
+        try:
+            content_type = "image/{image_format}".format(image_format=image_format)
+            get_s3_client().put_object(
+                Body=image_bytes, Bucket=AWS_STORAGE_BUCKET_NAME, ContentType=content_type,
+                Key=we_vote_image_file_location)
+            image_stored_to_aws = True
+        except Exception as e:
+            image_stored_to_aws = False
+            exception_message = "store_image_bytes_to_aws failed: " + str(e) + " "
+            handle_exception(e, logger=logger, exception_message=exception_message)
+
+        return image_stored_to_aws
+
     @staticmethod
     def store_image_file_to_aws(image_file, we_vote_image_file_location):
         """
@@ -2199,12 +2453,8 @@ class WeVoteImageManager(models.Manager):
         :return:
         """
         try:
-            session = boto3.session.Session(region_name=AWS_REGION_NAME,
-                                            aws_access_key_id=AWS_ACCESS_KEY_ID,
-                                            aws_secret_access_key=AWS_SECRET_ACCESS_KEY)
-            s3 = session.resource(AWS_STORAGE_SERVICE)
-            s3.Bucket(AWS_STORAGE_BUCKET_NAME).put_object(Key=we_vote_image_file_location,
-                                                          Body=image_file)
+            get_s3_client().put_object(Bucket=AWS_STORAGE_BUCKET_NAME, Key=we_vote_image_file_location,
+                                       Body=image_file)
             image_stored_to_aws = True
         except Exception as e:
             image_stored_to_aws = False
@@ -2221,9 +2471,7 @@ class WeVoteImageManager(models.Manager):
         :return:
         """
         try:
-            client = boto3.client(AWS_STORAGE_SERVICE, region_name=AWS_REGION_NAME,
-                                  aws_access_key_id=AWS_ACCESS_KEY_ID,
-                                  aws_secret_access_key=AWS_SECRET_ACCESS_KEY)
+            client = get_s3_client()
             download_image_at_location = "/tmp/" + we_vote_image_file_location
             client.download_file(AWS_STORAGE_BUCKET_NAME, we_vote_image_file_location, download_image_at_location)
             image_retrieved_from_aws = True
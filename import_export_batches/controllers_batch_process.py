@@ -16,12 +16,14 @@ from .models import ACTIVITY_NOTICE_PROCESS, API_REFRESH_REQUEST, \
     REFRESH_BALLOT_ITEMS_FROM_POLLING_LOCATIONS, REFRESH_BALLOT_ITEMS_FROM_VOTERS, \
     RETRIEVE_BALLOT_ITEMS_FROM_POLLING_LOCATIONS, RETRIEVE_FROM_BALLOTPEDIA, \
     RETRIEVE_REPRESENTATIVES_FROM_POLLING_LOCATIONS, \
-    SEARCH_TWITTER_FOR_CANDIDATE_TWITTER_HANDLE, UPDATE_TWITTER_DATA_FROM_TWITTER
+    SEARCH_TWITTER_FOR_CANDIDATE_TWITTER_HANDLE, UPDATE_TWITTER_DATA_FROM_TWITTER, \
+    fetch_batch_process_checked_out_expiration_time
 from activity.controllers import process_activity_notice_seeds_triggered_by_batch_process
 from analytics.controllers import calculate_sitewide_daily_metrics, \
     process_one_analytics_batch_process_augment_with_election_id, \
     process_one_analytics_batch_process_augment_with_first_visit, process_sitewide_voter_metrics, \
     retrieve_analytics_processing_next_step
+from analytics.controllers_rollup import update_analytics_rollups
 from analytics.models import AnalyticsManager
 from api_internal_cache.models import ApiInternalCacheManager
 from ballot.models import BallotReturnedListManager
@@ -30,6 +32,7 @@ from candidate.controllers import fetch_ballotpedia_urls_to_retrieve_for_links_c
     fetch_ballotpedia_urls_to_retrieve_for_photos_count
 from candidate.models import CandidateListManager
 from datetime import timedelta
+from django.db import connection
 from django.db.models import Q
 from django.utils.timezone import localtime, now
 from election.models import ElectionManager
@@ -42,6 +45,7 @@ from import_export_twitter.controllers import fetch_number_of_candidates_needing
 from issue.controllers import update_issue_statistics
 import json
 from politician.controllers import fetch_number_of_politicians_to_match_to_organizations
+import threading
 from position.models import PositionEntered
 from voter_guide.controllers import voter_guides_upcoming_retrieve_for_api
 from voter_guide.models import VoterGuideManager, VoterGuidesGenerated
@@ -77,6 +81,19 @@ NUMBER_OF_SIMULTANEOUS_BALLOT_ITEM_BATCH_PROCESSES = 4  # Four processes at a ti
 NUMBER_OF_SIMULTANEOUS_GENERAL_MAINTENANCE_BATCH_PROCESSES = 1
 NUMBER_OF_SIMULTANEOUS_REPRESENTATIVE_BATCH_PROCESSES = 1  # One processes at a time because of rate limiting
 
+# Used by the runbatchprocessworker management command
+BATCH_PROCESS_WORKER_ACTIVITY_NOTICES = 'activity_notices'
+BATCH_PROCESS_WORKER_BALLOT_ITEMS = 'ballot_items'
+BATCH_PROCESS_WORKER_GENERAL_MAINTENANCE = 'general_maintenance'
+BATCH_PROCESS_WORKER_REPRESENTATIVES = 'representatives'
+BATCH_PROCESS_WORKER_KIND_LIST = [
+    BATCH_PROCESS_WORKER_ACTIVITY_NOTICES, BATCH_PROCESS_WORKER_BALLOT_ITEMS,
+    BATCH_PROCESS_WORKER_GENERAL_MAINTENANCE, BATCH_PROCESS_WORKER_REPRESENTATIVES]
+# Must stay well under the shortest fetch_batch_process_checked_out_expiration_time (2 minutes)
+BATCH_PROCESS_WORKER_HEARTBEAT_SECONDS = 30
+# A failed step is retried after this many seconds, doubling with each consecutive failure
+BATCH_PROCESS_WORKER_RETRY_SECONDS = 60
+
 
 def pass_through_batch_list_incoming_variables(request):
     batch_process_search = request.GET.get('batch_process_search', '')
@@ -103,7 +120,7 @@ def pass_through_batch_list_incoming_variables(request):
     return url_variables
 
 
-def process_next_activity_notices():
+def process_next_activity_notices(schedule_only=False):
     success = True
     status = ""
     batch_process_manager = BatchProcessManager()
@@ -185,6 +202,14 @@ def process_next_activity_notices():
                     status=status,
                 )
 
+    if positive_value_exists(schedule_only):
+        # The batch process worker (runbatchprocessworker) runs the scheduled processes itself
+        results = {
+            'success': success,
+            'status': status,
+        }
+        return results
+
     # Finally, retrieve the ActivityNotice BatchProcess to run, and only use the first one returned
     results = batch_process_manager.retrieve_batch_process_list(
         kind_of_process_list=activity_notice_kind_of_processes,
@@ -440,11 +465,7 @@ def process_next_ballot_items():
     return results
 
 
-def process_next_general_maintenance():
-    success = True
-    status = ""
-    batch_process_manager = BatchProcessManager()
-
+def fetch_general_maintenance_kind_of_processes_to_run():
     # Only include the processes if the process system is turned on
     kind_of_processes_to_run = []
     if fetch_batch_process_system_api_refresh_on():
@@ -475,6 +496,16 @@ def process_next_general_maintenance():
     if fetch_batch_process_system_match_politicians_to_organizations_on():
         match_politicians_to_organizations_process_list = [MATCH_POLITICIANS_TO_ORGANIZATIONS]
         kind_of_processes_to_run = kind_of_processes_to_run + match_politicians_to_organizations_process_list
+    return kind_of_processes_to_run
+
+
+def process_next_general_maintenance(schedule_only=False):
+    success = True
+    status = ""
+    batch_process_manager = BatchProcessManager()
+
+    # Only include the processes if the process system is turned on
+    kind_of_processes_to_run = fetch_general_maintenance_kind_of_processes_to_run()
 
     if not fetch_batch_process_system_on():
         status += "BATCH_PROCESS_SYSTEM_TURNED_OFF-GENERAL "
@@ -937,6 +968,14 @@ def process_next_general_maintenance():
                             status=status,
                         )
 
+    if positive_value_exists(schedule_only):
+        # The batch process worker (runbatchprocessworker) runs the scheduled processes itself
+        results = {
+            'success': success,
+            'status': status,
+        }
+        return results
+
     # Finally, retrieve the General Maintenance BatchProcess to run, and only use the first one returned
     results = batch_process_manager.retrieve_batch_process_list(
         kind_of_process_list=kind_of_processes_to_run,
@@ -1233,6 +1272,197 @@ def process_next_representatives():
     return results
 
 
+def fetch_batch_process_worker_claim_list(worker_kind_list=BATCH_PROCESS_WORKER_KIND_LIST):
+    """
+    Which groups of BatchProcess kinds the batch process worker should claim from, respecting the same
+    fetch_batch_process_system_*_on switches as the process_next_* cron views.
+    :param worker_kind_list: Any of BATCH_PROCESS_WORKER_KIND_LIST
+    :return:
+    """
+    claim_list = []
+    if not fetch_batch_process_system_on():
+        return claim_list
+
+    if BATCH_PROCESS_WORKER_ACTIVITY_NOTICES in worker_kind_list and fetch_batch_process_system_activity_notices_on():
+        claim_list.append({
+            'kind_of_process_list': [ACTIVITY_NOTICE_PROCESS],
+            'for_upcoming_elections': False,
+            'maximum_active_count': 0,
+        })
+    if BATCH_PROCESS_WORKER_BALLOT_ITEMS in worker_kind_list and fetch_batch_process_system_ballot_items_on():
+        claim_list.append({
+            'kind_of_process_list': [
+                REFRESH_BALLOT_ITEMS_FROM_POLLING_LOCATIONS,
+                REFRESH_BALLOT_ITEMS_FROM_VOTERS,
+                RETRIEVE_BALLOT_ITEMS_FROM_POLLING_LOCATIONS],
+            'for_upcoming_elections': True,
+            'maximum_active_count': NUMBER_OF_SIMULTANEOUS_BALLOT_ITEM_BATCH_PROCESSES,
+        })
+    if BATCH_PROCESS_WORKER_GENERAL_MAINTENANCE in worker_kind_list \
+            and fetch_batch_process_system_general_maintenance_on():
+        kind_of_processes_to_run = fetch_general_maintenance_kind_of_processes_to_run()
+        if len(kind_of_processes_to_run):
+            claim_list.append({
+                'kind_of_process_list': kind_of_processes_to_run,
+                'for_upcoming_elections': False,
+                'maximum_active_count': 0,
+            })
+    if BATCH_PROCESS_WORKER_REPRESENTATIVES in worker_kind_list and fetch_batch_process_system_representatives_on():
+        claim_list.append({
+            'kind_of_process_list': [RETRIEVE_REPRESENTATIVES_FROM_POLLING_LOCATIONS],
+            'for_upcoming_elections': False,
+            'maximum_active_count': NUMBER_OF_SIMULTANEOUS_REPRESENTATIVE_BATCH_PROCESSES,
+        })
+    return claim_list
+
+
+def process_one_claimed_batch_process(batch_process):
+    """
+    Run one step of a BatchProcess that has already been checked out, with the same process_one_* function the
+    process_next_* cron views use for this kind_of_process.
+    """
+    status = ""
+    kind_of_process = batch_process.kind_of_process
+    if kind_of_process in [ACTIVITY_NOTICE_PROCESS]:
+        results = process_activity_notice_batch_process(batch_process)
+    elif kind_of_process in [
+            REFRESH_BALLOT_ITEMS_FROM_POLLING_LOCATIONS, REFRESH_BALLOT_ITEMS_FROM_VOTERS,
+            RETRIEVE_BALLOT_ITEMS_FROM_POLLING_LOCATIONS]:
+        results = process_one_ballot_item_batch_process(batch_process)
+    elif kind_of_process in [RETRIEVE_REPRESENTATIVES_FROM_POLLING_LOCATIONS]:
+        results = process_one_representatives_batch_process(batch_process)
+    elif kind_of_process in [API_REFRESH_REQUEST]:
+        results = process_one_api_refresh_request_batch_process(batch_process)
+    elif kind_of_process in [
+            AUGMENT_ANALYTICS_ACTION_WITH_ELECTION_ID, AUGMENT_ANALYTICS_ACTION_WITH_FIRST_VISIT,
+            CALCULATE_ORGANIZATION_DAILY_METRICS, CALCULATE_ORGANIZATION_ELECTION_METRICS,
+            CALCULATE_SITEWIDE_ELECTION_METRICS, CALCULATE_SITEWIDE_VOTER_METRICS]:
+        results = process_one_analytics_batch_process(batch_process)
+    elif kind_of_process in [CALCULATE_SITEWIDE_DAILY_METRICS]:
+        results = process_one_sitewide_daily_analytics_batch_process(batch_process)
+    elif kind_of_process in [GENERATE_VOTER_GUIDES]:
+        results = process_one_generate_voter_guides_batch_process(batch_process)
+    elif kind_of_process in [MATCH_POLITICIANS_TO_ORGANIZATIONS]:
+        results = process_one_match_politicians_to_organizations_batch_process(batch_process)
+    elif kind_of_process in [RETRIEVE_FROM_BALLOTPEDIA]:
+        results = process_one_retrieve_from_ballotpedia_batch_process(batch_process)
+    elif kind_of_process in [SEARCH_TWITTER_FOR_CANDIDATE_TWITTER_HANDLE]:
+        results = process_one_search_twitter_batch_process(batch_process)
+    elif kind_of_process in [UPDATE_TWITTER_DATA_FROM_TWITTER]:
+        results = process_one_update_twitter_batch_process(batch_process)
+    else:
+        status += "KIND_OF_PROCESS_NOT_RECOGNIZED: " + str(kind_of_process) + " "
+        results = {
+            'success': False,
+            'status': status,
+        }
+    return results
+
+
+def process_next_claimed_batch_process(claim_list=[], failure_count_by_batch_process_id=None):
+    """
+    Used by the runbatchprocessworker management command. Claim the first BatchProcess available in claim_list
+    (see fetch_batch_process_worker_claim_list), keep the claim fresh while running one step of it, then give it up.
+    A failed step is left checked out with a date_checked_out that expires after an exponential backoff, so it is
+    retried later (by any worker) instead of immediately.
+    :param claim_list:
+    :param failure_count_by_batch_process_id: Consecutive failures seen by this worker, updated in place
+    :return:
+    """
+    status = ""
+    success = True
+    batch_process_manager = BatchProcessManager()
+    if failure_count_by_batch_process_id is None:
+        failure_count_by_batch_process_id = {}
+
+    google_civic_election_id_list = None
+    batch_process = None
+    for claim in claim_list:
+        if claim['for_upcoming_elections']:
+            if google_civic_election_id_list is None:
+                # Limit this search to upcoming_elections only, or no election specified
+                election_results = ElectionManager().retrieve_upcoming_elections()
+                google_civic_election_id_list = [0]
+                for one_election in election_results['election_list']:
+                    google_civic_election_id_list.append(convert_to_int(one_election.google_civic_election_id))
+            claim_election_id_list = google_civic_election_id_list
+        else:
+            claim_election_id_list = None
+        results = batch_process_manager.claim_next_batch_process(
+            kind_of_process_list=claim['kind_of_process_list'],
+            google_civic_election_id_list=claim_election_id_list,
+            maximum_active_count=claim['maximum_active_count'])
+        if not results['success']:
+            status += results['status']
+            success = False
+        elif results['batch_process_found']:
+            batch_process = results['batch_process']
+            break
+
+    if batch_process is None:
+        results = {
+            'success':              success,
+            'status':               status,
+            'batch_process_found':  False,
+        }
+        return results
+
+    batch_process_id = batch_process.id
+    kind_of_process = batch_process.kind_of_process
+    heartbeat_stopped = threading.Event()
+
+    def keep_batch_process_checked_out():
+        while not heartbeat_stopped.wait(BATCH_PROCESS_WORKER_HEARTBEAT_SECONDS):
+            batch_process_manager.update_batch_process_date_checked_out(
+                batch_process_id=batch_process_id, date_checked_out=now())
+        connection.close()
+
+    heartbeat_thread = threading.Thread(target=keep_batch_process_checked_out, daemon=True)
+    heartbeat_thread.start()
+    try:
+        results = process_one_claimed_batch_process(batch_process)
+        step_success = results['success']
+        status += results['status']
+    except Exception as e:
+        step_success = False
+        status += "BATCH_PROCESS_WORKER_STEP_FAILED: " + str(e) + " "
+        handle_exception(e, logger=logger, exception_message=status)
+    finally:
+        heartbeat_stopped.set()
+        heartbeat_thread.join()
+
+    if step_success:
+        failure_count_by_batch_process_id.pop(batch_process_id, None)
+        date_checked_out = None
+    else:
+        success = False
+        failure_count = failure_count_by_batch_process_id.get(batch_process_id, 0) + 1
+        failure_count_by_batch_process_id[batch_process_id] = failure_count
+        expiration_time = fetch_batch_process_checked_out_expiration_time(kind_of_process)
+        retry_delay = min(BATCH_PROCESS_WORKER_RETRY_SECONDS * (2 ** (failure_count - 1)), expiration_time)
+        date_checked_out = now() - timedelta(seconds=expiration_time - retry_delay)
+        status += "BATCH_PROCESS_WORKER_RETRY_IN_SECONDS: " + str(retry_delay) + " "
+        batch_process_manager.create_batch_process_log_entry(
+            batch_process_id=batch_process_id,
+            google_civic_election_id=batch_process.google_civic_election_id,
+            kind_of_process=kind_of_process,
+            state_code=batch_process.state_code,
+            status=status,
+        )
+    results = batch_process_manager.update_batch_process_date_checked_out(
+        batch_process_id=batch_process_id, date_checked_out=date_checked_out)
+    status += results['status']
+
+    results = {
+        'success':              success,
+        'status':               status,
+        'batch_process_found':  True,
+        'batch_process_id':     batch_process_id,
+        'kind_of_process':      kind_of_process,
+    }
+    return results
+
+
 def process_one_analytics_batch_process(batch_process):
     from import_export_batches.models import BatchProcessManager
     batch_process_manager = BatchProcessManager()
@@ -3297,6 +3527,10 @@ def process_one_sitewide_daily_analytics_batch_process(batch_process):
     update_results = update_issue_statistics()
     status += update_results['status']
 
+    # Once per batch process, so calculate_sitewide_daily_metrics can read the rollups
+    update_results = update_analytics_rollups()
+    status += update_results['status']
+
     daily_metrics_calculated = False
     results = calculate_sitewide_daily_metrics(batch_process.analytics_date_as_integer)
     status += results['status']
@@ -0,0 +1,66 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand
+
+from wevote_functions.fake_json_provider_server import FakeJsonProviderServer
+from wevote_functions.functions_http_fetch import TokenBucketRateLimiter, fetch_url_with_retry, \
+    fetch_urls_concurrently
+
+# A small voterinfo-like response, so parsing time is part of what we measure
+FAKE_BALLOT_JSON = json.dumps({
+    'contests': [
+        {'office': 'Office ' + str(contest_number),
+         'candidates': [{'name': 'Candidate ' + str(candidate_number)} for candidate_number in range(4)]}
+        for contest_number in range(20)],
+})
+
+
+class Command(BaseCommand):
+    help = 'Compares one-at-a-time and concurrent map point ballot downloads against a local fake provider, ' \
+           'so the retrieve speed-up can be measured without calling (or being rate limited by) CTCL or Vote USA'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--map_points', type=int, default=200,
+                            help='Number of map point ballots to download')
+        parser.add_argument('--latency', type=float, default=0.2,
+                            help='Seconds the fake provider takes to answer each request')
+        parser.add_argument('--workers', type=int, default=8,
+                            help='Concurrent downloads (BALLOT_RETRIEVE_CONCURRENT_REQUESTS)')
+        parser.add_argument('--requests_per_second', type=float, default=0,
+                            help='Provider rate limit to apply. 0 for no limit.')
+        parser.add_argument('--skip_serial', action='store_true',
+                            help='Only time the concurrent downloads')
+
+    def handle(self, *args, **options):
+        map_point_count = options['map_points']
+        with FakeJsonProviderServer(response_text=FAKE_BALLOT_JSON, latency_seconds=options['latency']) as server:
+            request_list = [{'url': server.url, 'params': {'address': 'Map point ' + str(map_point_number)}}
+                            for map_point_number in range(map_point_count)]
+
+            if not options['skip_serial']:
+                rate_limiter = TokenBucketRateLimiter(options['requests_per_second'])
+                start_time = time.monotonic()
+                for request in request_list:
+                    results = fetch_url_with_retry(request['url'], params=request['params'], rate_limiter=rate_limiter)
+                    json.loads(results['response_text'])
+                self.write_timing('one at a time', map_point_count, time.monotonic() - start_time)
+
+            rate_limiter = TokenBucketRateLimiter(options['requests_per_second'])
+            start_time = time.monotonic()
+            failed_count = 0
+            for request, results in fetch_urls_concurrently(
+                    request_list, rate_limiter=rate_limiter, max_workers=max(1, options['workers'])):
+                if results['success']:
+                    json.loads(results['response_text'])
+                else:
+                    failed_count += 1
+            self.write_timing('{workers} concurrent'.format(workers=options['workers']), map_point_count,
+                              time.monotonic() - start_time)
+            if failed_count:
+                self.stdout.write('{failed} downloads failed'.format(failed=failed_count))
+
+    def write_timing(self, label, map_point_count, elapsed_seconds):
+        self.stdout.write('{label}: {count} map points in {seconds:.2f}s ({rate:.1f} per second)'.format(
+            label=label, count=map_point_count, seconds=elapsed_seconds,
+            rate=map_point_count / elapsed_seconds if elapsed_seconds else 0))
@@ -0,0 +1,126 @@
+import multiprocessing
+import signal
+import threading
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+import wevote_functions.admin
+from import_export_batches.controllers_batch_process import BATCH_PROCESS_WORKER_ACTIVITY_NOTICES, \
+    BATCH_PROCESS_WORKER_GENERAL_MAINTENANCE, BATCH_PROCESS_WORKER_KIND_LIST, \
+    fetch_batch_process_worker_claim_list, process_next_activity_notices, process_next_claimed_batch_process, \
+    process_next_general_maintenance
+
+logger = wevote_functions.admin.get_logger(__name__)
+
+# Start the worker pool (in place of the cron calls to the process_next_* admin urls) with
+#      python manage.py runbatchprocessworker --processes 4
+#
+# Each worker claims BatchProcess rows with SELECT ... FOR UPDATE SKIP LOCKED, so any number of workers, on any
+#  number of servers, can run at once. Only run "--schedule" on one server, since it creates the new
+#  ACTIVITY_NOTICE_PROCESS and general maintenance BatchProcess entries which the cron urls used to create.
+
+# How often new ActivityNotice and general maintenance BatchProcess entries are scheduled (the old cron interval)
+SCHEDULE_EVERY_SECONDS = 60
+# When there is nothing to claim, wait this long before looking again, doubling up to --max_idle_seconds
+MIN_IDLE_SECONDS = 1
+
+
+def run_worker(worker_index, worker_kind_list, schedule, max_idle_seconds):
+    stop_requested = threading.Event()
+
+    def request_stop(signum, frame):
+        # Let the current step finish, so its BatchProcess is handed back instead of waiting to time out
+        stop_requested.set()
+
+    signal.signal(signal.SIGTERM, request_stop)
+    signal.signal(signal.SIGINT, request_stop)
+
+    failure_count_by_batch_process_id = {}
+    idle_seconds = MIN_IDLE_SECONDS
+    next_schedule_time = 0
+    logger.info('BatchProcess worker ' + str(worker_index) + ' started for ' + ', '.join(worker_kind_list))
+    while not stop_requested.is_set():
+        try:
+            if schedule and worker_index == 0 and time.monotonic() >= next_schedule_time:
+                if BATCH_PROCESS_WORKER_ACTIVITY_NOTICES in worker_kind_list:
+                    process_next_activity_notices(schedule_only=True)
+                if BATCH_PROCESS_WORKER_GENERAL_MAINTENANCE in worker_kind_list:
+                    process_next_general_maintenance(schedule_only=True)
+                next_schedule_time = time.monotonic() + SCHEDULE_EVERY_SECONDS
+
+            claim_list = fetch_batch_process_worker_claim_list(worker_kind_list)
+            if len(claim_list):
+                # Start each worker on a different group, so busy ballot items can't starve the other kinds
+                offset = worker_index % len(claim_list)
+                claim_list = claim_list[offset:] + claim_list[:offset]
+            results = process_next_claimed_batch_process(
+                claim_list=claim_list,
+                failure_count_by_batch_process_id=failure_count_by_batch_process_id)
+            if not results['success']:
+                logger.error('BatchProcess worker ' + str(worker_index) + ': ' + results['status'])
+        except Exception as e:
+            logger.error('BatchProcess worker ' + str(worker_index) + ' exception: ' + str(e))
+            connections.close_all()
+            results = {'batch_process_found': False}
+
+        if results['batch_process_found']:
+            idle_seconds = MIN_IDLE_SECONDS
+        else:
+            stop_requested.wait(idle_seconds)
+            idle_seconds = min(idle_seconds * 2, max_idle_seconds)
+
+    connections.close_all()
+    logger.info('BatchProcess worker ' + str(worker_index) + ' stopped')
+
+
+class Command(BaseCommand):
+    help = 'Runs BatchProcess entries (ballot items, activity notices, general maintenance, representatives) ' \
+           'continuously, with several worker processes in parallel'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=4,
+                            help='Number of worker processes to run in parallel')
+        parser.add_argument('--kinds', type=str, default=','.join(BATCH_PROCESS_WORKER_KIND_LIST),
+                            help='Comma separated list of: ' + ', '.join(BATCH_PROCESS_WORKER_KIND_LIST))
+        parser.add_argument('--schedule', action='store_true',
+                            help='Also schedule new ActivityNotice and general maintenance BatchProcess entries, '
+                                 'like the process_next_* cron urls do. Use on only one server.')
+        parser.add_argument('--max_idle_seconds', type=int, default=30,
+                            help='Longest wait between looks for new work when the queues are empty')
+
+    def handle(self, *args, **options):
+        worker_kind_list = [kind.strip() for kind in options['kinds'].split(',') if kind.strip()]
+        unknown_kind_list = [kind for kind in worker_kind_list if kind not in BATCH_PROCESS_WORKER_KIND_LIST]
+        if unknown_kind_list or not worker_kind_list:
+            raise CommandError('--kinds must be a comma separated list of: ' +
+                               ', '.join(BATCH_PROCESS_WORKER_KIND_LIST))
+        number_of_processes = max(1, options['processes'])
+        schedule = options['schedule']
+        max_idle_seconds = max(MIN_IDLE_SECONDS, options['max_idle_seconds'])
+
+        if number_of_processes == 1:
+            run_worker(0, worker_kind_list, schedule, max_idle_seconds)
+            return
+
+        # Database connections can't be shared with forked processes
+        connections.close_all()
+        context = multiprocessing.get_context('fork')
+        worker_process_list = []
+        for worker_index in range(number_of_processes):
+            worker_process = context.Process(
+                target=run_worker, args=(worker_index, worker_kind_list, schedule, max_idle_seconds))
+            worker_process.start()
+            worker_process_list.append(worker_process)
+
+        def stop_workers(signum, frame):
+            for one_worker_process in worker_process_list:
+                if one_worker_process.is_alive():
+                    one_worker_process.terminate()  # Sends SIGTERM, which lets the current step finish
+
+        signal.signal(signal.SIGTERM, stop_workers)
+        signal.signal(signal.SIGINT, stop_workers)
+        for worker_process in worker_process_list:
+            worker_process.join()
+        self.stdout.write('stopped {count} batch process workers'.format(count=number_of_processes))
@@ -12,8 +12,8 @@ from urllib.parse import quote
 from urllib.request import Request, urlopen
 
 import magic
-from django.db import models
-from django.db.models import Q
+from django.db import connection, models, transaction
+from django.db.models import F, Q
 from django.utils.timezone import now
 
 import wevote_functions.admin
@@ -710,6 +710,42 @@ def get_header_map_value_if_index_in_list(incoming_list, index, kind_of_batch=""
         return ""
 
 
+def fetch_batch_process_checked_out_expiration_time(kind_of_process):
+    """
+    How many seconds a checked out BatchProcess of this kind can go without a new date_checked_out before we consider
+    it crashed or timed out, and let another process pick it up.
+    See also longest_activity_notice_processing_run_time_allowed
+    """
+    if kind_of_process == ACTIVITY_NOTICE_PROCESS:
+        return 270  # 4.5 minutes * 60 seconds
+    elif kind_of_process == API_REFRESH_REQUEST:
+        return 360  # 6 minutes * 60 seconds
+    elif kind_of_process == GENERATE_VOTER_GUIDES:
+        return 600  # 10 minutes * 60 seconds
+    elif kind_of_process == MATCH_POLITICIANS_TO_ORGANIZATIONS:
+        return 600  # 10 minutes * 60 seconds
+    elif kind_of_process in [
+            REFRESH_BALLOT_ITEMS_FROM_POLLING_LOCATIONS, REFRESH_BALLOT_ITEMS_FROM_VOTERS,
+            RETRIEVE_BALLOT_ITEMS_FROM_POLLING_LOCATIONS]:
+        return 1800  # 30 minutes * 60 seconds
+    elif kind_of_process in [RETRIEVE_REPRESENTATIVES_FROM_POLLING_LOCATIONS]:
+        return 120  # 2 minutes * 60 seconds
+    elif kind_of_process in [
+            AUGMENT_ANALYTICS_ACTION_WITH_ELECTION_ID, AUGMENT_ANALYTICS_ACTION_WITH_FIRST_VISIT,
+            CALCULATE_ORGANIZATION_DAILY_METRICS, CALCULATE_ORGANIZATION_ELECTION_METRICS,
+            CALCULATE_SITEWIDE_ELECTION_METRICS, CALCULATE_SITEWIDE_VOTER_METRICS,
+            CALCULATE_SITEWIDE_DAILY_METRICS]:
+        return 600  # 10 minutes * 60 seconds
+    elif kind_of_process == RETRIEVE_FROM_BALLOTPEDIA:
+        return 600  # 10 minutes * 60 seconds
+    elif kind_of_process == SEARCH_TWITTER_FOR_CANDIDATE_TWITTER_HANDLE:
+        return 300  # 5 minutes * 60 seconds - See SEARCH_TWITTER_TIMED_OUT
+    elif kind_of_process == UPDATE_TWITTER_DATA_FROM_TWITTER:
+        return 600  # 10 minutes * 60 seconds - See UPDATE_TWITTER_TIMED_OUT
+    else:
+        return 1800  # 30 minutes * 60 seconds
+
+
 class BatchManager(models.Manager):
 
     def __unicode__(self):
@@ -4891,6 +4927,83 @@ class BatchProcessManager(models.Manager):
     def __unicode__(self):
         return "BatchProcessManager"
 
+    def claim_next_batch_process(
+            self,
+            kind_of_process_list=[],
+            google_civic_election_id_list=None,
+            maximum_active_count=0):
+        """
+        Check out the next BatchProcess that needs to be run, so that only one worker works on it at a time.
+        Rows are locked with SELECT ... FOR UPDATE SKIP LOCKED, so workers claiming at the same moment never wait on,
+        or receive, the same row. The claim is held by date_checked_out, which the worker keeps fresh while running.
+        :param kind_of_process_list:
+        :param google_civic_election_id_list: If not None, only claim processes for these elections
+        :param maximum_active_count: If set, only start a new (not yet started) process when fewer than this many
+          processes in kind_of_process_list have been started but not completed
+        :return:
+        """
+        status = ""
+        success = True
+        batch_process = None
+        batch_process_found = False
+
+        date_now = now()
+        not_checked_out_filter = Q(date_checked_out__isnull=True)
+        for kind_of_process in kind_of_process_list:
+            date_checked_out_time_out = \
+                date_now - timedelta(seconds=fetch_batch_process_checked_out_expiration_time(kind_of_process))
+            not_checked_out_filter |= Q(kind_of_process=kind_of_process, date_checked_out__lt=date_checked_out_time_out)
+
+        try:
+            with transaction.atomic():
+                if positive_value_exists(maximum_active_count):
+                    # Serialize claims within this group of processes, so two workers can't both start a new process
+                    #  when there is room for only one more
+                    with connection.cursor() as cursor:
+                        cursor.execute("SELECT pg_advisory_xact_lock(hashtext(%s))",
+                                       ["batch_process_claim:" + ",".join(sorted(kind_of_process_list))])
+                batch_process_queryset = BatchProcess.objects.select_for_update(skip_locked=True)
+                batch_process_queryset = batch_process_queryset.filter(kind_of_process__in=kind_of_process_list)
+                batch_process_queryset = batch_process_queryset.filter(date_completed__isnull=True)
+                batch_process_queryset = batch_process_queryset.exclude(batch_process_paused=True)
+                batch_process_queryset = batch_process_queryset.filter(not_checked_out_filter)
+                if google_civic_election_id_list is not None:
+                    batch_process_queryset = batch_process_queryset.filter(
+                        google_civic_election_id__in=google_civic_election_id_list)
+                if positive_value_exists(maximum_active_count):
+                    active_count = BatchProcess.objects.filter(
+                        kind_of_process__in=kind_of_process_list,
+                        date_started__isnull=False,
+                        date_completed__isnull=True,
+                    ).exclude(batch_process_paused=True).count()
+                    if active_count >= maximum_active_count:
+                        # No room to start another, so only continue processes which have already been started
+                        batch_process_queryset = batch_process_queryset.filter(date_started__isnull=False)
+                # Continue processes which have already been started before starting new ones
+                batch_process_queryset = batch_process_queryset.order_by(F('date_started').asc(nulls_last=True), 'id')
+                batch_process = batch_process_queryset.first()
+                if batch_process is not None:
+                    batch_process.date_checked_out = date_now
+                    if positive_value_exists(maximum_active_count) and batch_process.date_started is None:
+                        batch_process.date_started = date_now
+                    batch_process.save()
+                    batch_process_found = True
+                    status += "BATCH_PROCESS_CLAIMED "
+                else:
+                    status += "NO_BATCH_PROCESS_TO_CLAIM "
+        except Exception as e:
+            status += "FAILED_TO_CLAIM_BATCH_PROCESS: " + str(e) + " "
+            success = False
+            batch_process = None
+
+        results = {
+            'success':              success,
+            'status':               status,
+            'batch_process':        batch_process,
+            'batch_process_found':  batch_process_found,
+        }
+        return results
+
     def create_batch_process_analytics_chunk(self, batch_process_id=0, batch_process=None):
         status = ""
         success = True
@@ -5410,34 +5523,8 @@ class BatchProcessManager(models.Manager):
                     # See also longest_activity_notice_processing_run_time_allowed
                     # If this kind_of_process has run longer than allowed (i.e. probably crashed or timed out)
                     #  consider it to no longer be active
-                    if batch_process.kind_of_process == ACTIVITY_NOTICE_PROCESS:
-                        checked_out_expiration_time = 270  # 4.5 minutes * 60 seconds
-                    elif batch_process.kind_of_process == API_REFRESH_REQUEST:
-                        checked_out_expiration_time = 360  # 6 minutes * 60 seconds
-                    elif batch_process.kind_of_process == GENERATE_VOTER_GUIDES:
-                        checked_out_expiration_time = 600  # 10 minutes * 60 seconds
-                    elif batch_process.kind_of_process == MATCH_POLITICIANS_TO_ORGANIZATIONS:
-                        checked_out_expiration_time = 600  # 10 minutes * 60 seconds
-                    elif batch_process.kind_of_process in [
-                            REFRESH_BALLOT_ITEMS_FROM_POLLING_LOCATIONS, REFRESH_BALLOT_ITEMS_FROM_VOTERS,
-                            RETRIEVE_BALLOT_ITEMS_FROM_POLLING_LOCATIONS]:
-                        checked_out_expiration_time = 1800  # 30 minutes * 60 seconds
-                    elif batch_process.kind_of_process in [RETRIEVE_REPRESENTATIVES_FROM_POLLING_LOCATIONS]:
-                        checked_out_expiration_time = 120  # 2 minutes * 60 seconds
-                    elif batch_process.kind_of_process in [
-                            AUGMENT_ANALYTICS_ACTION_WITH_ELECTION_ID, AUGMENT_ANALYTICS_ACTION_WITH_FIRST_VISIT,
-                            CALCULATE_ORGANIZATION_DAILY_METRICS, CALCULATE_ORGANIZATION_ELECTION_METRICS,
-                            CALCULATE_SITEWIDE_ELECTION_METRICS, CALCULATE_SITEWIDE_VOTER_METRICS,
-                            CALCULATE_SITEWIDE_DAILY_METRICS]:
-                        checked_out_expiration_time = 600  # 10 minutes * 60 seconds
-                    elif batch_process.kind_of_process == RETRIEVE_FROM_BALLOTPEDIA:
-                        checked_out_expiration_time = 600  # 10 minutes * 60 seconds
-                    elif batch_process.kind_of_process == SEARCH_TWITTER_FOR_CANDIDATE_TWITTER_HANDLE:
-                        checked_out_expiration_time = 300  # 5 minutes * 60 seconds - See SEARCH_TWITTER_TIMED_OUT
-                    elif batch_process.kind_of_process == UPDATE_TWITTER_DATA_FROM_TWITTER:
-                        checked_out_expiration_time = 600  # 10 minutes * 60 seconds - See UPDATE_TWITTER_TIMED_OUT
-                    else:
-                        checked_out_expiration_time = 1800  # 30 minutes * 60 seconds
+                    checked_out_expiration_time = \
+                        fetch_batch_process_checked_out_expiration_time(batch_process.kind_of_process)
                     date_checked_out_time_out = \
                         batch_process.date_checked_out + timedelta(seconds=checked_out_expiration_time)
                     status += "CHECKED_OUT_PROCESS_FOUND "
@@ -5569,6 +5656,24 @@ class BatchProcessManager(models.Manager):
         from wevote_settings.models import fetch_batch_process_system_on
         return not fetch_batch_process_system_on()
 
+    def update_batch_process_date_checked_out(self, batch_process_id=0, date_checked_out=None):
+        """
+        Refresh (or release, with date_checked_out=None) the claim on a BatchProcess without touching other fields,
+        so a worker heartbeat never overwrites changes saved by the process itself.
+        """
+        status = ""
+        try:
+            BatchProcess.objects.filter(id=batch_process_id).update(date_checked_out=date_checked_out)
+            success = True
+        except Exception as e:
+            status += "FAILED_TO_UPDATE_DATE_CHECKED_OUT: " + str(e) + " "
+            success = False
+        results = {
+            'success':  success,
+            'status':   status,
+        }
+        return results
+
 
 class BatchProcess(models.Model):
     """
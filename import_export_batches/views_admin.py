@@ -25,6 +25,7 @@ from .controllers_batch_process import pass_through_batch_list_incoming_variable
 from .controllers_ballotpedia import store_ballotpedia_json_response_to_import_batch_system
 from admin_tools.views import redirect_to_sign_in_page
 from ballot.models import BallotReturnedListManager, BallotReturnedManager, MEASURE, CANDIDATE, POLITICIAN
+from config.base import get_environment_variable_default
 import csv
 from datetime import date
 from django.contrib.auth.decorators import login_required
@@ -40,9 +41,11 @@ from election.models import Election, ElectionManager
 from exception.models import handle_exception
 from import_export_ballotpedia.controllers import groom_ballotpedia_data_for_processing, \
     process_ballotpedia_voter_districts, BALLOTPEDIA_API_SAMPLE_BALLOT_RESULTS_URL
-from import_export_ctcl.controllers import CTCL_VOTER_INFO_URL
+from import_export_ctcl.controllers import CTCL_API_REQUESTS_PER_SECOND, CTCL_VOTER_INFO_URL, \
+    fetch_ctcl_voter_info_request
 from import_export_google_civic.controllers import REPRESENTATIVES_BY_ADDRESS_URL
-from import_export_vote_usa.controllers import VOTE_USA_VOTER_INFO_URL
+from import_export_vote_usa.controllers import VOTE_USA_API_REQUESTS_PER_SECOND, VOTE_USA_VOTER_INFO_URL, \
+    fetch_vote_usa_voter_info_request
 import json
 import math
 from polling_location.models import KIND_OF_LOG_ENTRY_BALLOT_RECEIVED, KIND_OF_LOG_ENTRY_REPRESENTATIVES_RECEIVED, \
@@ -55,9 +58,14 @@ from voter.models import voter_has_authority
 from voter_guide.models import ORGANIZATION_WORD
 import wevote_functions.admin
 from wevote_functions.functions import convert_to_int, get_voter_api_device_id, positive_value_exists, STATE_CODE_MAP
+from wevote_functions.functions_http_fetch import fetch_urls_concurrently, get_rate_limiter
 
 logger = wevote_functions.admin.get_logger(__name__)
 
+# How many map point ballots to download at once from CTCL or Vote USA (each provider is also rate limited)
+BALLOT_RETRIEVE_CONCURRENT_REQUESTS = \
+    convert_to_int(get_environment_variable_default("BALLOT_RETRIEVE_CONCURRENT_REQUESTS", 8))
+
 
 @login_required
 def batches_home_view(request):
@@ -3267,6 +3275,56 @@ def retrieve_ballots_for_polling_locations_api_v4_view(request):
             use_vote_usa=use_vote_usa)
 
 
+def fetch_ballots_for_polling_location_list(
+        polling_location_list=[],
+        ctcl_election_uuid="",
+        election_day_text="",
+        state_code="",
+        use_ctcl=False,
+        use_vote_usa=False):
+    """
+    Generator of (polling_location, prefetched_ballot_results) for retrieve_ctcl_ballot_items_from_polling_location_api
+    or retrieve_vote_usa_ballot_items_from_polling_location_api. The provider requests for all the map points run
+    concurrently, and each map point is yielded as soon as its ballot arrives, so the caller parses and stores one
+    ballot while the next ones download. Map points we can't build a request for are yielded with None, so the
+    retrieve function can report (and log) the problem the way it always has.
+    """
+    request_list = []
+    for polling_location in polling_location_list:
+        text_for_map_search = polling_location.get_text_for_map_search()
+        if not positive_value_exists(text_for_map_search):
+            yield polling_location, None
+            continue
+        if positive_value_exists(use_ctcl):
+            voter_info_request = fetch_ctcl_voter_info_request(
+                ctcl_election_uuid=ctcl_election_uuid,
+                text_for_map_search=text_for_map_search)
+        else:
+            if not polling_location.latitude or not polling_location.longitude:
+                yield polling_location, None
+                continue
+            request_state_code = state_code
+            if not positive_value_exists(request_state_code):
+                request_state_code = polling_location.state if positive_value_exists(polling_location.state) else "na"
+            voter_info_request = fetch_vote_usa_voter_info_request(
+                election_day_text=election_day_text,
+                latitude=polling_location.latitude,
+                longitude=polling_location.longitude,
+                state_code=request_state_code)
+        voter_info_request['polling_location'] = polling_location
+        request_list.append(voter_info_request)
+
+    if positive_value_exists(use_ctcl):
+        rate_limiter = get_rate_limiter('ctcl', CTCL_API_REQUESTS_PER_SECOND)
+    else:
+        rate_limiter = get_rate_limiter('vote_usa', VOTE_USA_API_REQUESTS_PER_SECOND)
+    for voter_info_request, fetch_results in fetch_urls_concurrently(
+            request_list,
+            rate_limiter=rate_limiter,
+            max_workers=max(1, BALLOT_RETRIEVE_CONCURRENT_REQUESTS)):
+        yield voter_info_request['polling_location'], fetch_results
+
+
 def retrieve_ballots_for_polling_locations_api_v4_internal_view(
         request=None,
         batch_process_id=0,
@@ -3753,7 +3811,19 @@ def retrieve_ballots_for_polling_locations_api_v4_internal_view(
             from import_export_vote_usa.controllers import retrieve_vote_usa_ballot_items_from_polling_location_api
         contest_not_returned_from_data_source_polling_location_we_vote_id_list = []
         contest_returned_from_data_source_polling_location_we_vote_id_list = []
-        for polling_location in polling_location_list:
+        if positive_value_exists(use_ctcl) or positive_value_exists(use_vote_usa):
+            # Download the ballots concurrently, and store each one here as it arrives
+            polling_location_with_prefetched_results_list = fetch_ballots_for_polling_location_list(
+                polling_location_list=polling_location_list,
+                ctcl_election_uuid=ctcl_election_uuid,
+                election_day_text=election_day_text,
+                state_code=state_code,
+                use_ctcl=use_ctcl,
+                use_vote_usa=use_vote_usa)
+        else:
+            polling_location_with_prefetched_results_list = \
+                [(polling_location, None) for polling_location in polling_location_list]
+        for polling_location, prefetched_ballot_results in polling_location_with_prefetched_results_list:
             one_ballot_results = {}
             if positive_value_exists(use_ballotpedia):
                 one_ballot_results = retrieve_ballotpedia_ballot_items_from_polling_location_api_v4(
@@ -3789,6 +3859,7 @@ def retrieve_ballots_for_polling_locations_api_v4_internal_view(
                     new_candidate_we_vote_ids_list=new_candidate_we_vote_ids_list,
                     new_measure_we_vote_ids_list=new_measure_we_vote_ids_list,
                     update_or_create_rules=update_or_create_rules,
+                    prefetched_ballot_results=prefetched_ballot_results,
                 )
             elif positive_value_exists(use_vote_usa):
                 one_ballot_results = retrieve_vote_usa_ballot_items_from_polling_location_api(
@@ -3807,6 +3878,7 @@ def retrieve_ballots_for_polling_locations_api_v4_internal_view(
                     new_candidate_we_vote_ids_list=new_candidate_we_vote_ids_list,
                     new_measure_we_vote_ids_list=new_measure_we_vote_ids_list,
                     update_or_create_rules=update_or_create_rules,
+                    prefetched_ballot_results=prefetched_ballot_results,
                 )
             else:
                 # Should not be possible to get here
@@ -5,7 +5,7 @@
 import xml.etree.ElementTree as ElementTree
 from .models import CandidateSelection, CTCLApiCounterManager
 from ballot.models import BallotReturnedManager
-from config.base import get_environment_variable
+from config.base import get_environment_variable, get_environment_variable_default
 from datetime import datetime
 from electoral_district.controllers import electoral_district_import_from_xml_data
 from exception.models import handle_exception, handle_record_found_more_than_one_exception
@@ -18,7 +18,8 @@ from polling_location.models import KIND_OF_LOG_ENTRY_ADDRESS_PARSE_ERROR, \
     KIND_OF_LOG_ENTRY_NO_BALLOT_JSON, PollingLocationManager
 import requests
 import wevote_functions.admin
-from wevote_functions.functions import extract_state_code_from_address_string, positive_value_exists
+from wevote_functions.functions import convert_to_int, extract_state_code_from_address_string, \
+    positive_value_exists
 from wevote_functions.functions_date import convert_we_vote_date_string_to_date
 
 logger = wevote_functions.admin.get_logger(__name__)
@@ -28,6 +29,8 @@ CTCL_ELECTION_QUERY_URL = "https://api.ballotinfo.org/elections"
 CTCL_SAMPLE_XML_FILE = "import_export_ctcl/import_data/GoogleCivic.Sample.xml"
 CTCL_VOTER_INFO_URL = "https://api.ballotinfo.org/voterinfo"
 CTCL_API_VOTER_INFO_QUERY_TYPE = "voterinfo"
+# Shared by all the map point retrieves running at once in one process
+CTCL_API_REQUESTS_PER_SECOND = convert_to_int(get_environment_variable_default("CTCL_API_REQUESTS_PER_SECOND", 5))
 
 
 HEADERS_FOR_CTCL_API_CALL = {
@@ -540,6 +543,18 @@ def retrieve_ctcl_ballot_items_for_one_voter_api(
     return results
 
 
+def fetch_ctcl_voter_info_request(ctcl_election_uuid="", text_for_map_search=""):
+    return {
+        'url':      CTCL_VOTER_INFO_URL,
+        'headers':  HEADERS_FOR_CTCL_API_CALL,
+        'params':   {
+            "key": CTCL_API_KEY,
+            "electionId": ctcl_election_uuid,
+            "address": text_for_map_search,
+        },
+    }
+
+
 def retrieve_ctcl_ballot_items_from_polling_location_api(
         google_civic_election_id=0,
         ctcl_election_uuid="",
@@ -556,7 +571,12 @@ def retrieve_ctcl_ballot_items_from_polling_location_api(
         new_office_we_vote_ids_list=[],
         new_candidate_we_vote_ids_list=[],
         new_measure_we_vote_ids_list=[],
-        update_or_create_rules={}):
+        update_or_create_rules={},
+        prefetched_ballot_results=None):
+    """
+    :param prefetched_ballot_results: If the voterinfo request (from fetch_ctcl_voter_info_request) has already been
+      made by fetch_urls_concurrently, its results, so we only parse and store the ballot here
+    """
     success = True
     status = ""
     polling_location_found = False
@@ -653,22 +673,31 @@ def retrieve_ctcl_ballot_items_from_polling_location_api(
         one_ballot_json = ''
         one_ballot_json_found = False
         ballot_returned_manager = BallotReturnedManager()
+        latency_seconds = None
         try:
-            api_key = CTCL_API_KEY
-            # Get the ballot info at this address
-            response = requests.get(
-                CTCL_VOTER_INFO_URL,
-                headers=HEADERS_FOR_CTCL_API_CALL,
-                params={
-                    "key": api_key,
-                    "electionId": ctcl_election_uuid,
-                    "address": text_for_map_search,
-                })
-            if positive_value_exists(response.url):
-                status += str(response.url) + ' '
-            if len(response.text) >= 2:
-                # one_ballot_json = json.loads(response.text)
-                one_ballot_json = response.json()
+            if prefetched_ballot_results is None:
+                # Get the ballot info at this address
+                voter_info_request = fetch_ctcl_voter_info_request(
+                    ctcl_election_uuid=ctcl_election_uuid,
+                    text_for_map_search=text_for_map_search)
+                response = requests.get(
+                    voter_info_request['url'],
+                    headers=voter_info_request['headers'],
+                    params=voter_info_request['params'])
+                response_text = response.text
+                response_url = response.url
+                latency_seconds = response.elapsed.total_seconds()
+            elif prefetched_ballot_results['success']:
+                # Already retrieved by fetch_urls_concurrently
+                response_text = prefetched_ballot_results['response_text']
+                response_url = prefetched_ballot_results['response_url']
+                latency_seconds = prefetched_ballot_results.get('elapsed_seconds')
+            else:
+                raise Exception(prefetched_ballot_results['status'])
+            if positive_value_exists(response_url):
+                status += str(response_url) + ' '
+            if len(response_text) >= 2:
+                one_ballot_json = json.loads(response_text)
                 one_ballot_json_found = True
             else:
                 status += "NO_RESULT_FOR: " + str(text_for_map_search) + " "
@@ -714,7 +743,8 @@ def retrieve_ctcl_ballot_items_from_polling_location_api(
             api_counter_manager = CTCLApiCounterManager()
             api_counter_manager.create_counter_entry(
                 CTCL_API_VOTER_INFO_QUERY_TYPE,
-                google_civic_election_id=google_civic_election_id)
+                google_civic_election_id=google_civic_election_id,
+                latency_seconds=latency_seconds)
         except Exception as e:
             status += 'CTCL_API_COUNTER_CRASH: ' + str(e) + ' '
 
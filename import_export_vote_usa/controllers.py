@@ -5,7 +5,7 @@
 from .models import VoteUSAApiCounterManager
 from ballot.models import BallotReturnedManager
 from candidate.models import PROFILE_IMAGE_TYPE_UNKNOWN, PROFILE_IMAGE_TYPE_VOTE_USA
-from config.base import get_environment_variable
+from config.base import get_environment_variable, get_environment_variable_default
 from exception.models import handle_exception, handle_record_found_more_than_one_exception
 from image.controllers import cache_master_and_resized_image, IMAGE_SOURCE_VOTE_USA
 from import_export_batches.controllers_vote_usa import store_vote_usa_json_response_to_import_batch_system
@@ -15,7 +15,7 @@ from polling_location.models import KIND_OF_LOG_ENTRY_ADDRESS_PARSE_ERROR, KIND_
     PollingLocationManager
 import requests
 import wevote_functions.admin
-from wevote_functions.functions import positive_value_exists
+from wevote_functions.functions import convert_to_int, positive_value_exists
 
 logger = wevote_functions.admin.get_logger(__name__)
 
@@ -25,6 +25,9 @@ VOTE_USA_CANDIDATE_QUERY_URL = "https://vote-usa.org/api/v1.asmx/candidatesQuery
 VOTE_USA_ELECTION_QUERY_URL = "https://vote-usa.org/api/v1.asmx/electionQuery"
 VOTE_USA_VOTER_INFO_URL = "https://vote-usa.org/api/v1.asmx/voterInfoQuery"
 VOTE_USA_VOTER_INFO_QUERY_TYPE = "voterinfo"
+# Shared by all the map point retrieves running at once in one process
+VOTE_USA_API_REQUESTS_PER_SECOND = \
+    convert_to_int(get_environment_variable_default("VOTE_USA_API_REQUESTS_PER_SECOND", 5))
 
 HEADERS_FOR_VOTE_USA_API_CALL = {
     'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
@@ -291,6 +294,20 @@ def retrieve_vote_usa_ballot_items_for_one_voter_api(
     return results
 
 
+def fetch_vote_usa_voter_info_request(election_day_text="", latitude=0.0, longitude=0.0, state_code=""):
+    return {
+        'url':      VOTE_USA_VOTER_INFO_URL,
+        'headers':  HEADERS_FOR_VOTE_USA_API_CALL,
+        'params':   {
+            "accessKey": VOTE_USA_API_KEY,
+            "electionDay": election_day_text,
+            "latitude": latitude,
+            "longitude": longitude,
+            "state": state_code,
+        },
+    }
+
+
 def retrieve_vote_usa_ballot_items_from_polling_location_api(
         google_civic_election_id=0,
         election_day_text="",
@@ -306,7 +323,8 @@ def retrieve_vote_usa_ballot_items_from_polling_location_api(
         new_office_we_vote_ids_list=[],
         new_candidate_we_vote_ids_list=[],
         new_measure_we_vote_ids_list=[],
-        update_or_create_rules={}):
+        update_or_create_rules={},
+        prefetched_ballot_results=None):
     """
 
     :param google_civic_election_id:
@@ -324,6 +342,8 @@ def retrieve_vote_usa_ballot_items_from_polling_location_api(
     :param new_candidate_we_vote_ids_list:
     :param new_measure_we_vote_ids_list:
     :param update_or_create_rules:
+    :param prefetched_ballot_results: If the voterInfoQuery request (from fetch_vote_usa_voter_info_request) has
+      already been made by fetch_urls_concurrently, its results, so we only parse and store the ballot here
     :return:
     """
     success = True
@@ -443,20 +463,28 @@ def retrieve_vote_usa_ballot_items_from_polling_location_api(
             else:
                 state_code = "na"
 
+        latency_seconds = None
         try:
-            api_key = VOTE_USA_API_KEY
-            # Get the ballot info at this address
-            response = requests.get(
-                VOTE_USA_VOTER_INFO_URL,
-                headers=HEADERS_FOR_VOTE_USA_API_CALL,
-                params={
-                    "accessKey": api_key,
-                    "electionDay": election_day_text,
-                    "latitude": latitude,
-                    "longitude": longitude,
-                    "state": state_code,
-                })
-            one_ballot_json = json.loads(response.text)
+            if prefetched_ballot_results is None:
+                # Get the ballot info at this address
+                voter_info_request = fetch_vote_usa_voter_info_request(
+                    election_day_text=election_day_text,
+                    latitude=latitude,
+                    longitude=longitude,
+                    state_code=state_code)
+                response = requests.get(
+                    voter_info_request['url'],
+                    headers=voter_info_request['headers'],
+                    params=voter_info_request['params'])
+                response_text = response.text
+                latency_seconds = response.elapsed.total_seconds()
+            elif prefetched_ballot_results['success']:
+                # Already retrieved by fetch_urls_concurrently
+                response_text = prefetched_ballot_results['response_text']
+                latency_seconds = prefetched_ballot_results.get('elapsed_seconds')
+            else:
+                raise Exception(prefetched_ballot_results['status'])
+            one_ballot_json = json.loads(response_text)
         except Exception as e:
             success = False
             status += 'VOTE_USA_API_END_POINT_CRASH: ' + str(e) + ' '
@@ -499,7 +527,8 @@ def retrieve_vote_usa_ballot_items_from_polling_location_api(
             api_counter_manager = VoteUSAApiCounterManager()
             api_counter_manager.create_counter_entry(
                 VOTE_USA_VOTER_INFO_QUERY_TYPE,
-                google_civic_election_id=google_civic_election_id)
+                google_civic_election_id=google_civic_election_id,
+                latency_seconds=latency_seconds)
 
             if 'contests' in one_ballot_json:
                 from import_export_google_civic.controllers import groom_and_store_google_civic_ballot_json_2021
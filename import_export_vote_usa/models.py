@@ -2,10 +2,10 @@
 # Brought to you by We Vote. Be good.
 # -*- coding: UTF-8 -*-
 
-from datetime import date, timedelta
+from api_telemetry.controllers import record_api_call, retrieve_api_call_summaries
+from api_telemetry.models import API_PROVIDER_VOTE_USA
 from django.db import models
 import wevote_functions.admin
-from wevote_functions.functions import convert_to_int, positive_value_exists
 
 
 logger = wevote_functions.admin.get_logger(__name__)
@@ -43,23 +43,16 @@ class VoteUSAApiCounterMonthlySummary(models.Model):
 class VoteUSAApiCounterManager(models.Manager):
 
     @staticmethod
-    def create_counter_entry(kind_of_action, google_civic_election_id=0):
+    def create_counter_entry(kind_of_action, google_civic_election_id=0, call_succeeded=True, latency_seconds=None):
         """
-        Create an entry that records that a call to the VoteUSA Api was made.
+        Record that a call to the VoteUSA Api was made.
         """
-        try:
-            google_civic_election_id = convert_to_int(google_civic_election_id)
-
-            # TODO: We need to work out the timezone questions
-            VoteUSAApiCounter.objects.create(
-                kind_of_action=kind_of_action,
-                google_civic_election_id=google_civic_election_id,
-            )
-            success = True
-            status = 'ENTRY_SAVED'
-        except Exception:
-            success = False
-            status = 'SOME_ERROR'
+        # Counted in memory, and saved with the other calls made this minute by api_telemetry
+        record_api_call(
+            API_PROVIDER_VOTE_USA, kind_of_action, google_civic_election_id=google_civic_election_id,
+            success=call_succeeded, latency_seconds=latency_seconds)
+        success = True
+        status = 'ENTRY_RECORDED'
 
         results = {
             'success':                  success,
@@ -69,41 +62,6 @@ class VoteUSAApiCounterManager(models.Manager):
 
     @staticmethod
     def retrieve_daily_summaries(kind_of_action='', google_civic_election_id=0, days_to_display=30):
-        # Start with today and cycle backwards in time
-        daily_summaries = []
-        day_on_stage = date.today()  # TODO: We need to work out the timezone questions
-        number_found = 0
-        maximum_attempts = 365
-        attempt_count = 0
-
-        try:
-            while number_found <= days_to_display and attempt_count <= maximum_attempts:
-                attempt_count += 1
-                counter_queryset = VoteUSAApiCounter.objects.using('readonly').all()
-                if positive_value_exists(kind_of_action):
-                    counter_queryset = counter_queryset.filter(kind_of_action=kind_of_action)
-                if positive_value_exists(google_civic_election_id):
-                    counter_queryset = counter_queryset.filter(google_civic_election_id=google_civic_election_id)
-
-                # Find the number of these entries on that particular day
-                # counter_queryset = counter_queryset.filter(datetime_of_action__contains=day_on_stage)
-                counter_queryset = counter_queryset.filter(
-                    datetime_of_action__year=day_on_stage.year,
-                    datetime_of_action__month=day_on_stage.month,
-                    datetime_of_action__day=day_on_stage.day)
-                api_call_count = counter_queryset.count()
-
-                # If any api calls were found on that date, pass it out for display
-                if positive_value_exists(api_call_count):
-                    daily_summary = {
-                        'date_string': day_on_stage,
-                        'count': api_call_count,
-                    }
-                    daily_summaries.append(daily_summary)
-                    number_found += 1
-
-                day_on_stage -= timedelta(days=1)
-        except Exception:
-            pass
-
-        return daily_summaries
+        return retrieve_api_call_summaries(
+            API_PROVIDER_VOTE_USA, kind_of_action=kind_of_action, google_civic_election_id=google_civic_election_id,
+            periods_to_display=days_to_display)
@@ -1,71 +1,230 @@
-import os
+import itertools
 import json
-from locust import HttpUser, TaskSet, task
+import os
+import random
+
+from locust import HttpUser, TaskSet, between, events, task
+
+from load_test_report import compare_report_to_baseline, format_report_table, generate_endpoint_report
+
+LOADTEST_DIR = os.path.dirname(os.path.abspath(__file__))
+QUERY_COUNT_HEADER_NAME = 'X-Query-Count'
+
+fixtures = {}
+voter_device_id_counter = itertools.count()
+# Per endpoint [total queries, responses that reported a count], from the X-Query-Count header
+query_counts = {}
+
+
+def fetch_google_civic_election_id():
+    return fixtures.get('google_civic_election_id', 0)
+
+
+@events.init_command_line_parser.add_listener
+def add_arguments(parser):
+    parser.add_argument('--fixtures-file', type=str, default=os.path.join(LOADTEST_DIR, 'test_variables.json'),
+                        help='Ids written by "python manage.py seed_load_test_fixtures"')
+    parser.add_argument('--report-file', type=str,
+                        default=os.path.join(LOADTEST_DIR, 'reports', 'load_test_report.json'))
+    parser.add_argument('--baseline-file', type=str, default=os.path.join(LOADTEST_DIR, 'baseline.json'))
+    parser.add_argument('--update-baseline', action='store_true', help='Save this run as the new baseline')
+
+
+@events.init.add_listener
+def load_fixtures(environment, **kwargs):
+    try:
+        with open(environment.parsed_options.fixtures_file) as f:
+            fixtures.update(json.loads(f.read()))
+    except Exception as e:
+        print("Cant read the fixtures file, run 'python manage.py seed_load_test_fixtures' first: " + str(e))
+    if 'voter_device_id_list' not in fixtures and 'voter_device_id' in fixtures:
+        # An older test_variables.json, with one voter
+        fixtures['voter_device_id_list'] = [fixtures['voter_device_id']]
+
+
+@events.request.add_listener
+def count_queries(name, response=None, exception=None, **kwargs):
+    if exception is not None or response is None:
+        return
+    query_count = response.headers.get(QUERY_COUNT_HEADER_NAME)
+    if query_count is not None:
+        totals = query_counts.setdefault(name, [0, 0])
+        totals[0] += int(query_count)
+        totals[1] += 1
+
+
+@events.quitting.add_listener
+def save_report_and_compare_to_baseline(environment, **kwargs):
+    report = {'endpoints': {}}
+    for (name, method), entry in environment.stats.entries.items():
+        if not entry.num_requests:
+            continue
+        query_count_total, query_count_responses = query_counts.get(name, [0, 0])
+        report['endpoints'][name] = generate_endpoint_report(
+            name, entry.num_requests, entry.num_failures,
+            entry.get_response_time_percentile(0.50), entry.get_response_time_percentile(0.95),
+            entry.get_response_time_percentile(0.99), query_count_total, query_count_responses)
+    if not report['endpoints']:
+        return
+    print(format_report_table(report))
+
+    options = environment.parsed_options
+    os.makedirs(os.path.dirname(options.report_file), exist_ok=True)
+    with open(options.report_file, 'w') as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+    if options.update_baseline:
+        with open(options.baseline_file, 'w') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+        print('Saved this run as the baseline in ' + options.baseline_file)
+        return
+    if not os.path.exists(options.baseline_file):
+        print('No baseline yet, run again with --update-baseline to save one')
+        return
+    with open(options.baseline_file) as f:
+        baseline = json.load(f)
+    regression_list = compare_report_to_baseline(report, baseline)
+    for regression in regression_list:
+        print('REGRESSION: ' + regression)
+    if regression_list:
+        environment.process_exit_code = 1
+
+
+class WeVoteTaskSet(TaskSet):
+    """
+    One endpoint family. Each task is one screen's worth of API calls, then the voter picks a family again
+    """
+
+    def api_get(self, api_name, **params):
+        params['voter_device_id'] = self.user.voter_device_id
+        return self.client.get('/apis/v1/' + api_name + '/', params=params, name=api_name)
+
+    @staticmethod
+    def random_we_vote_id(list_name):
+        return random.choice(fixtures.get(list_name) or [''])
+
+
+class BallotTasks(WeVoteTaskSet):
+
+    @task(5)
+    def ballot(self):
+        self.api_get('voterBallotItemsRetrieve', google_civic_election_id=fetch_google_civic_election_id(),
+                     use_test_election='false')
+        self.api_get('voterBallotListRetrieve')
+        self.interrupt()
+
+    @task(3)
+    def candidate(self):
+        self.api_get('candidatesRetrieve', office_we_vote_id=self.random_we_vote_id('office_we_vote_id_list'))
+        self.api_get('ballotItemRetrieve', kind_of_ballot_item='CANDIDATE',
+                     ballot_item_we_vote_id=self.random_we_vote_id('candidate_we_vote_id_list'))
+        self.interrupt()
+
+    @task(1)
+    def all_ballot_items(self):
+        self.api_get('allBallotItemsRetrieve', google_civic_election_id=fetch_google_civic_election_id(),
+                     state_code=fixtures.get('state_code', ''))
+        self.interrupt()
+
+
+class PositionTasks(WeVoteTaskSet):
+
+    @task(5)
+    def ballot_item_positions(self):
+        kind_of_ballot_item, list_name = random.choice([('CANDIDATE', 'candidate_we_vote_id_list'),
+                                                        ('MEASURE', 'measure_we_vote_id_list')])
+        ballot_item_we_vote_id = self.random_we_vote_id(list_name)
+        self.api_get('positionListForBallotItem', kind_of_ballot_item=kind_of_ballot_item,
+                     ballot_item_we_vote_id=ballot_item_we_vote_id)
+        self.api_get('positionListForBallotItemFromFriends', kind_of_ballot_item=kind_of_ballot_item,
+                     ballot_item_we_vote_id=ballot_item_we_vote_id)
+        self.interrupt()
+
+    @task(2)
+    def voter_positions(self):
+        self.api_get('voterAllPositionsRetrieve', google_civic_election_id=fetch_google_civic_election_id())
+        self.interrupt()
+
+    @task(2)
+    def opinion_maker_positions(self):
+        self.api_get('positionListForOpinionMaker', kind_of_opinion_maker='ORGANIZATION',
+                     opinion_maker_we_vote_id=self.random_we_vote_id('organization_we_vote_id_list'),
+                     google_civic_election_id=fetch_google_civic_election_id())
+        self.interrupt()
 
 
-class WeVoteTasks(TaskSet):
+class VoterGuideTasks(WeVoteTaskSet):
+
+    @task(3)
+    def upcoming(self):
+        election_params = {'google_civic_election_id_list[]': fetch_google_civic_election_id()}
+        self.api_get('voterGuidesUpcomingRetrieve', **election_params)
+        self.api_get('voterGuidesFromFriendsUpcomingRetrieve', **election_params)
+        self.interrupt()
+
+    @task(2)
+    def to_follow(self):
+        self.api_get('voterGuidesToFollowRetrieve', google_civic_election_id=fetch_google_civic_election_id(),
+                     maximum_number_to_retrieve=350, search_string='')
+        self.api_get('voterGuidesFollowedRetrieve')
+        self.interrupt()
+
+
+class FriendTasks(WeVoteTaskSet):
+
+    @task(3)
+    def current_friends(self):
+        self.api_get('friendList', kind_of_list='CURRENT_FRIENDS')
+        self.interrupt()
+
+    @task(1)
+    def all_lists(self):
+        self.api_get('friendListsAll')
+        self.interrupt()
+
+
+class ActivityTasks(WeVoteTaskSet):
+
+    @task
+    def news_feed(self):
+        self.api_get('activityListRetrieve')
+        self.api_get('activityNoticeListRetrieve')
+        self.interrupt()
+
+
+class CampaignTasks(WeVoteTaskSet):
+
+    @task(2)
+    def campaign_list(self):
+        self.api_get('campaignListRetrieve')
+        self.interrupt()
+
+    @task(3)
+    def campaign(self):
+        self.api_get('campaignRetrieve', seo_friendly_path=self.random_we_vote_id('campaignx_seo_friendly_path_list'))
+        self.interrupt()
+
+
+class WeVoteUser(HttpUser):
+    # Roughly the mix of API calls before an election: mostly ballots and positions
+    tasks = {
+        BallotTasks:        30,
+        PositionTasks:      25,
+        VoterGuideTasks:    15,
+        FriendTasks:        10,
+        ActivityTasks:      10,
+        CampaignTasks:      10,
+    }
+    wait_time = between(0.5, 1.5)
 
     def on_start(self):
         """
-        read voter_device_id from a property file (./loadtest/test_variables.json) if exists
-        otherwise generate a new one via the API
+        Each simulated voter uses one of the seeded voter_device_ids, or a new one from the API if there are none
         """
-        try:
-            # print("voter_device_id = %s" % self.voter_device_id)
-            with open(os.path.join(os.path.dirname(__file__), "test_variables.json")) as f:
-                self.voter_device_id = json.loads(f.read())["voter_device_id"]
-        except Exception as e:
-            print("Cant find test_variables.json, generating new voter_device_id")
-            response = self.client.get("/apis/v1/deviceIdGenerate/")
-            self.voter_device_id = response.json()["voter_device_id"]
-
-        try:
-            # print("voter_device_id = %s" % self.voter_device_id)
-            with open(os.path.join(os.path.dirname(__file__), "test_variables.json")) as f:
-                self.google_civic_election_id = json.loads(f.read())["google_civic_election_id"]
-        except Exception as e:
-            print("Cant find test_variables.json, setting google_civic_election_id to 0")
-            self.google_civic_election_id = 0
-
-    @task(1)
-    def homepage(self):
-        voter_device_id = self.voter_device_id
-        google_civic_election_id = self.google_civic_election_id
-        response = self.client.get("/apis/v1/voterAllBookmarksStatusRetrieve/?voter_device_id={voter_device_id}"
-                                   "".format(voter_device_id=voter_device_id), name="voterAllBookmarksStatusRetrieve")
-        response = self.client.get("/apis/v1/voterRetrieve/?voter_device_id={voter_device_id}"
-                                   "".format(voter_device_id=voter_device_id), name="voterRetrieve")
-        response = self.client.get("/apis/v1/voterAddressRetrieve/?voter_device_id={voter_device_id}"
-                                   "".format(voter_device_id=voter_device_id), name="voterAddressRetrieve")
-        response = self.client.get("/apis/v1/searchAll/?voter_device_id={voter_device_id}"
-                                   "".format(voter_device_id=voter_device_id), name="searchAll")
-        response = self.client.get("/apis/v1/voterAllPositionsRetrieve/?voter_device_id={voter_device_id}"
-                                   "".format(voter_device_id=voter_device_id), name="voterAllPositionsRetrieve")
-        response = self.client.get("/apis/v1/voterGuidesToFollowRetrieve/?voter_device_id={voter_device_id}"
-                                   "&google_civic_election_id={google_civic_election_id}"
-                                   "&maximum_number_to_retrieve=350&search_string="
-                                   "".format(google_civic_election_id=google_civic_election_id,
-                                             voter_device_id=voter_device_id), name="voterGuidesToFollowRetrieve")
-        response = self.client.get("/apis/v1/voterGuidesFollowedRetrieve/?voter_device_id={voter_device_id}"
-                                   "".format(voter_device_id=voter_device_id), name="voterGuidesFollowedRetrieve")
-        response = self.client.get("/apis/v1/voterBallotItemsRetrieve/?voter_device_id={voter_device_id}"
-                                   "&use_test_election=false"
-                                   "".format(voter_device_id=voter_device_id), name="voterBallotItemsRetrieve")
-
-    # @task(1)
-    # def organizationCount(self):
-    #     response = self.client.get("/apis/v1/organizationCount/")
-    #     #print "organizationCount:", response.status_code, response.content
-    #     pass
-    #
-    # @task(1)
-    # def voterCount(self):
-    #     response = self.client.get("/apis/v1/voterCount/")
-    #     #print "voterCount:", response.status_code, response.content
-    #     pass
-
-
-class WeVoteLocust(HttpUser):
-    tasks = {WeVoteTasks:5}
-    min_wait = 500  # 0.5s
-    max_wait = 1500
+        voter_device_id_list = fixtures.get('voter_device_id_list') or []
+        if len(voter_device_id_list):
+            self.voter_device_id = voter_device_id_list[next(voter_device_id_counter) % len(voter_device_id_list)]
+        else:
+            response = self.client.get('/apis/v1/deviceIdGenerate/', name='deviceIdGenerate')
+            self.voter_device_id = response.json()['voter_device_id']
+        self.client.get('/apis/v1/voterRetrieve/', params={'voter_device_id': self.voter_device_id},
+                        name='voterRetrieve')
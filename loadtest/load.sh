@@ -1,6 +1,9 @@
 #!/bin/bash
-# DIR="$( cd "$( dirname "${BASH_SOURCE[0]}" )" && pwd )"
-# locust -f $DIR/WeVoteLocust.py -H http://localhost:8000 -c 100 -r 10 -n 1000 --no-web --print-stats WeVoteLocust
+# Usage: loadtest/load.sh [host] [extra locust options, like --update-baseline]
+# Runs headless against the seeded fixtures, prints p50/p95/p99 and queries per request per endpoint,
+# and exits non-zero when an endpoint regressed against loadtest/baseline.json
 
 DIR="$( cd "$( dirname "${BASH_SOURCE[0]}" )" && pwd )"
-locust -f $DIR/WeVoteLocust.py -H https://api.wevoteusa.org -r 10 --print-stats WeVoteLocust
+HOST=${1:-http://localhost:8000}
+shift
+locust -f $DIR/WeVoteLocust.py -H $HOST --headless -u 100 -r 10 -t 5m --only-summary "$@"
@@ -0,0 +1,91 @@
+# loadtest/load_test_report.py
+# Brought to you by We Vote. Be good.
+# -*- coding: UTF-8 -*-
+
+"""
+Per endpoint latency and queries-per-request reports for the Locust load test, and the comparison against a stored
+baseline.  No Locust or Django imports here, so the comparison can also be run on saved reports:
+    python loadtest/load_test_report.py loadtest/reports/load_test_report.json loadtest/baseline.json
+"""
+
+import json
+import sys
+
+# An endpoint regresses when its p95 or p99 latency grows by more than this fraction of the baseline...
+LATENCY_REGRESSION_TOLERANCE = 0.20
+# ...and by more than this many milliseconds, so fast endpoints don't fail on noise
+LATENCY_REGRESSION_MINIMUM_MS = 25
+# Queries per request should be stable for the same fixtures, so small increases count
+QUERIES_PER_REQUEST_REGRESSION_TOLERANCE = 0.5
+FAILURE_RATE_REGRESSION_TOLERANCE = 0.01
+
+
+def generate_endpoint_report(name, num_requests, num_failures, p50, p95, p99, query_count_total=0,
+                             query_count_responses=0):
+    return {
+        'name':                 name,
+        'requests':             num_requests,
+        'failures':             num_failures,
+        'failure_rate':         round(float(num_failures) / num_requests, 4) if num_requests else 0.0,
+        'p50_ms':               p50,
+        'p95_ms':               p95,
+        'p99_ms':               p99,
+        # None when the server didn't send X-Query-Count (API_QUERY_COUNT_HEADER_ON is off)
+        'queries_per_request':  round(float(query_count_total) / query_count_responses, 2)
+        if query_count_responses else None,
+    }
+
+
+def compare_report_to_baseline(report, baseline, latency_tolerance=LATENCY_REGRESSION_TOLERANCE):
+    """
+    :param report: {'endpoints': {name: endpoint_report}}
+    :param baseline: a report saved earlier, from the same fixtures and the same machine
+    :return: list of human readable regressions, empty when there are none
+    """
+    regression_list = []
+    baseline_endpoints = baseline.get('endpoints', {})
+    for name, endpoint in sorted(report.get('endpoints', {}).items()):
+        baseline_endpoint = baseline_endpoints.get(name)
+        if baseline_endpoint is None:
+            continue
+        for percentile_key in ('p95_ms', 'p99_ms'):
+            current = endpoint.get(percentile_key) or 0
+            allowed = (baseline_endpoint.get(percentile_key) or 0) * (1 + latency_tolerance)
+            if current > allowed and current - (baseline_endpoint.get(percentile_key) or 0) > \
+                    LATENCY_REGRESSION_MINIMUM_MS:
+                regression_list.append('{name} {key} {current:.0f} ms, baseline {baseline:.0f} ms'.format(
+                    name=name, key=percentile_key, current=current, baseline=baseline_endpoint[percentile_key]))
+        current_queries = endpoint.get('queries_per_request')
+        baseline_queries = baseline_endpoint.get('queries_per_request')
+        if current_queries is not None and baseline_queries is not None and \
+                current_queries > baseline_queries + QUERIES_PER_REQUEST_REGRESSION_TOLERANCE:
+            regression_list.append('{name} queries per request {current}, baseline {baseline}'.format(
+                name=name, current=current_queries, baseline=baseline_queries))
+        if endpoint.get('failure_rate', 0) > baseline_endpoint.get('failure_rate', 0) + \
+                FAILURE_RATE_REGRESSION_TOLERANCE:
+            regression_list.append('{name} failure rate {current:.2%}, baseline {baseline:.2%}'.format(
+                name=name, current=endpoint['failure_rate'], baseline=baseline_endpoint.get('failure_rate', 0)))
+    return regression_list
+
+
+def format_report_table(report):
+    line_list = ['{:<45} {:>8} {:>8} {:>8} {:>8} {:>8} {:>8}'.format(
+        'endpoint', 'requests', 'failures', 'p50 ms', 'p95 ms', 'p99 ms', 'queries')]
+    for name, endpoint in sorted(report.get('endpoints', {}).items()):
+        queries = endpoint['queries_per_request']
+        line_list.append('{:<45} {:>8} {:>8} {:>8.0f} {:>8.0f} {:>8.0f} {:>8}'.format(
+            name, endpoint['requests'], endpoint['failures'], endpoint['p50_ms'] or 0, endpoint['p95_ms'] or 0,
+            endpoint['p99_ms'] or 0, '-' if queries is None else queries))
+    return '\n'.join(line_list)
+
+
+if __name__ == '__main__':
+    with open(sys.argv[1]) as report_file:
+        saved_report = json.load(report_file)
+    with open(sys.argv[2]) as baseline_file:
+        saved_baseline = json.load(baseline_file)
+    print(format_report_table(saved_report))
+    regressions = compare_report_to_baseline(saved_report, saved_baseline)
+    for regression in regressions:
+        print('REGRESSION: ' + regression)
+    sys.exit(1 if regressions else 0)
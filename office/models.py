@@ -4,9 +4,13 @@
 
 from django.db import models
 from django.db.models import Q
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
 from exception.models import handle_exception, handle_record_found_more_than_one_exception
 from wevote_settings.models import fetch_next_we_vote_id_contest_office_integer, fetch_site_unique_id_prefix
 import wevote_functions.admin
+from wevote_functions.functions_cache import CACHE_NAMESPACE_CONTEST_OFFICE, invalidate_cache_key, \
+    retrieve_results_through_cache
 from wevote_functions.functions import convert_to_int, extract_state_from_ocd_division_id, \
     generate_office_equivalent_district_phrase_pairs, positive_value_exists, \
     OFFICE_NAME_COMMON_PHRASES_TO_REMOVE_FROM_SEARCHES, OFFICE_NAME_EQUIVALENT_PHRASE_PAIRS, STATE_CODE_MAP
@@ -307,6 +311,16 @@ class ContestOffice(models.Model):
         super(ContestOffice, self).save(*args, **kwargs)
 
 
+@receiver(post_save, sender=ContestOffice)
+def save_contest_office_cache_signal(sender, instance, **kwargs):
+    invalidate_cache_key(CACHE_NAMESPACE_CONTEST_OFFICE, instance.we_vote_id)
+
+
+@receiver(post_delete, sender=ContestOffice)
+def delete_contest_office_cache_signal(sender, instance, **kwargs):
+    invalidate_cache_key(CACHE_NAMESPACE_CONTEST_OFFICE, instance.we_vote_id)
+
+
 class ContestOfficeManager(models.Manager):
 
     def __unicode__(self):
@@ -321,6 +335,12 @@ class ContestOfficeManager(models.Manager):
     def retrieve_contest_office_from_we_vote_id(contest_office_we_vote_id, read_only=False):
         contest_office_id = 0
         contest_office_manager = ContestOfficeManager()
+        if positive_value_exists(read_only):
+            # Read-only lookups are served from the shared cache, which is cleared when the office is saved
+            return retrieve_results_through_cache(
+                CACHE_NAMESPACE_CONTEST_OFFICE, contest_office_we_vote_id, 'contest_office_found',
+                lambda: contest_office_manager.retrieve_contest_office(
+                    contest_office_id, contest_office_we_vote_id, read_only=read_only))
         return contest_office_manager.retrieve_contest_office(contest_office_id, contest_office_we_vote_id,
                                                               read_only=read_only)
 
@@ -5,6 +5,8 @@
 from django.core.validators import RegexValidator
 from django.db import models
 from django.db.models import Q
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
 
 from candidate.models import PROFILE_IMAGE_TYPE_FACEBOOK, PROFILE_IMAGE_TYPE_TWITTER, PROFILE_IMAGE_TYPE_UNKNOWN, \
     PROFILE_IMAGE_TYPE_UPLOADED, PROFILE_IMAGE_TYPE_VOTE_USA, PROFILE_IMAGE_TYPE_CURRENTLY_ACTIVE_CHOICES
@@ -16,6 +18,8 @@ from twitter.models import TwitterApiCounterManager, TwitterLinkToOrganization,
 from voter.models import VoterManager
 import wevote_functions.admin
 from wevote_functions.functions import convert_to_int, extract_twitter_handle_from_text_string, positive_value_exists
+from wevote_functions.functions_cache import CACHE_NAMESPACE_ORGANIZATION, invalidate_cache_key, \
+    retrieve_results_through_cache
 from wevote_settings.models import fetch_next_we_vote_id_org_integer, fetch_site_unique_id_prefix
 
 
@@ -548,6 +552,11 @@ class OrganizationManager(models.Manager):
         return self.retrieve_organization(organization_id=organization_id, read_only=read_only)
 
     def retrieve_organization_from_we_vote_id(self, organization_we_vote_id, read_only=False):
+        if positive_value_exists(read_only):
+            # Read-only lookups are served from the shared cache, which is cleared when the organization is saved
+            return retrieve_results_through_cache(
+                CACHE_NAMESPACE_ORGANIZATION, organization_we_vote_id, 'organization_found',
+                lambda: self.retrieve_organization(we_vote_id=organization_we_vote_id, read_only=read_only))
         return self.retrieve_organization(we_vote_id=organization_we_vote_id, read_only=read_only)
 
     def retrieve_organization_from_we_vote_id_and_pass_code(
@@ -3573,6 +3582,16 @@ class Organization(models.Model):
             return ''
 
 
+@receiver(post_save, sender=Organization)
+def save_organization_cache_signal(sender, instance, **kwargs):
+    invalidate_cache_key(CACHE_NAMESPACE_ORGANIZATION, instance.we_vote_id)
+
+
+@receiver(post_delete, sender=Organization)
+def delete_organization_cache_signal(sender, instance, **kwargs):
+    invalidate_cache_key(CACHE_NAMESPACE_ORGANIZATION, instance.we_vote_id)
+
+
 class OrganizationChangeLog(models.Model):  # OrganizationLogEntry would be another name
     """
     What changes were made, and by whom?
@@ -4,7 +4,8 @@
 
 from .models import PositionEntered, PositionForFriends, PositionManager, PositionListManager, ANY_STANCE, \
     FRIENDS_AND_PUBLIC, FRIENDS_ONLY, PUBLIC_ONLY, SHOW_PUBLIC, THIS_ELECTION_ONLY, ALL_OTHER_ELECTIONS, \
-    ALL_ELECTIONS, SUPPORT, OPPOSE, INFORMATION_ONLY, NO_STANCE
+    ALL_ELECTIONS, SUPPORT, OPPOSE, INFORMATION_ONLY, NO_STANCE, batch_position_aggregate_updates, \
+    generate_position_list_for_ballot_item_cache_key, queue_position_aggregate_update
 from ballot.models import OFFICE, CANDIDATE, MEASURE, POLITICIAN
 from candidate.models import CandidateCampaign, CandidateManager, CandidateListManager, \
     CandidateToOfficeLink
@@ -21,11 +22,14 @@ from operator import itemgetter
 from organization.models import Organization, OrganizationManager, PUBLIC_FIGURE, UNKNOWN
 from share.models import ShareManager
 import json
-from voter.models import fetch_voter_id_from_voter_device_link, VoterManager
+from voter.models import fetch_voter_id_from_voter_device_link, Voter, VoterManager
 from voter_guide.models import ORGANIZATION, VoterGuideManager
 import wevote_functions.admin
-from wevote_functions.functions import is_voter_device_id_valid, positive_value_exists, process_request_from_master, \
+from wevote_functions.functions import is_voter_device_id_valid, positive_value_exists, \
     convert_to_int, is_link_to_video, is_speaker_type_organization
+from wevote_functions.functions_cache import CACHE_NAMESPACE_CANDIDATE, \
+    CACHE_NAMESPACE_POSITION_LIST_FOR_BALLOT_ITEM, invalidate_cache_namespace, retrieve_results_through_cache
+from wevote_functions.functions_sync import process_request_from_master_in_batches, SYNC_IMPORT_COUNT_KEYS
 
 logger = wevote_functions.admin.get_logger(__name__)
 
@@ -251,6 +255,9 @@ def update_positions_and_candidate_position_year(position_year=0, candidate_we_v
         update_query = update_query.filter(we_vote_id__in=candidate_we_vote_id_list)
         update_query = update_query.filter(Q(candidate_year__isnull=True) | Q(candidate_year__lt=position_year))
         candidate_year_update_count = update_query.update(candidate_year=position_year)
+        if positive_value_exists(candidate_year_update_count):
+            # update() doesn't send post_save, so the cached candidates aren't invalidated one by one
+            invalidate_cache_namespace(CACHE_NAMESPACE_CANDIDATE)
     except Exception as e:
         exception_found = True
         status += "FAILED_TRYING_TO_UPDATE_POSITIONS_FOR_POSITION_YEAR: " + str(e) + " "
@@ -298,6 +305,9 @@ def update_positions_and_candidate_position_ultimate_election_date(
             Q(candidate_ultimate_election_date__lt=position_ultimate_election_date))
         candidate_ultimate_update_count = \
             update_query.update(candidate_ultimate_election_date=position_ultimate_election_date)
+        if positive_value_exists(candidate_ultimate_update_count):
+            # update() doesn't send post_save, so the cached candidates aren't invalidated one by one
+            invalidate_cache_namespace(CACHE_NAMESPACE_CANDIDATE)
     except Exception as e:
         exception_found = True
         status += "FAILED_TRYING_TO_UPDATE_POSITIONS_FOR_POSITION_ULTIMATE_ELECTION_DATE: " + str(e) + " "
@@ -522,6 +532,7 @@ def generate_position_sorting_dates_for_election(google_civic_election_id=0):
     return results
 
 
+@batch_position_aggregate_updates()
 def merge_duplicate_positions_for_voter(position_list_for_one_voter):
 
     removed = []
@@ -640,6 +651,7 @@ def return_most_likely_data(from_position, to_position, attribute):
     return getattr(to_position, attribute)
 
 
+@batch_position_aggregate_updates()
 def move_positions_to_another_candidate(from_candidate_id, from_candidate_we_vote_id,
                                         to_candidate_id, to_candidate_we_vote_id,
                                         public_or_private):
@@ -664,6 +676,9 @@ def move_positions_to_another_candidate(from_candidate_id, from_candidate_we_vot
     friends_we_vote_id_list = False
     retrieve_all_admin_override = True
 
+    # The positions moved away from this candidate don't point to it anymore, so recount it explicitly
+    queue_position_aggregate_update(from_candidate_we_vote_id, CANDIDATE)
+
     # Get all positions for the "from_candidate" that we are moving away from
     from_position_list = position_list_manager.retrieve_all_positions_for_candidate(
         public_or_private, from_candidate_id, from_candidate_we_vote_id, stance_we_are_looking_for,
@@ -782,6 +797,7 @@ def move_positions_to_another_candidate(from_candidate_id, from_candidate_we_vot
     return results
 
 
+@batch_position_aggregate_updates()
 def move_positions_to_another_measure(from_contest_measure_id, from_contest_measure_we_vote_id,
                                       to_contest_measure_id, to_contest_measure_we_vote_id, public_or_private):
     status = ''
@@ -795,6 +811,9 @@ def move_positions_to_another_measure(from_contest_measure_id, from_contest_meas
     most_recent_only = False
     friends_we_vote_id_list = False
 
+    # The positions moved away from this measure don't point to it anymore, so recount it explicitly
+    queue_position_aggregate_update(from_contest_measure_we_vote_id, MEASURE)
+
     # Get all positions for the "from_office" that we are moving away from
     from_position_list = position_list_manager.retrieve_all_positions_for_contest_measure(
         public_or_private, from_contest_measure_id, from_contest_measure_we_vote_id, stance_we_are_looking_for,
@@ -915,6 +934,7 @@ def move_positions_to_another_measure(from_contest_measure_id, from_contest_meas
     return results
 
 
+@batch_position_aggregate_updates()
 def move_positions_to_another_office(from_contest_office_id, from_contest_office_we_vote_id,
                                      to_contest_office_id, to_contest_office_we_vote_id, public_or_private):
     status = ''
@@ -928,6 +948,9 @@ def move_positions_to_another_office(from_contest_office_id, from_contest_office
     most_recent_only = False
     friends_we_vote_id_list = False
 
+    # The positions moved away from this office don't point to it anymore, so recount it explicitly
+    queue_position_aggregate_update(from_contest_office_we_vote_id, OFFICE)
+
     # Get all positions for the "from_office" that we are moving away from
     from_position_list = position_list_manager.retrieve_all_positions_for_contest_office(
         retrieve_public_positions=public_or_private,
@@ -1058,6 +1081,7 @@ def move_positions_to_another_office(from_contest_office_id, from_contest_office
     return results
 
 
+@batch_position_aggregate_updates()
 def move_positions_to_another_organization(
         from_organization_id=0,
         from_organization_we_vote_id='',
@@ -1303,6 +1327,7 @@ def move_positions_to_another_organization(
     return results
 
 
+@batch_position_aggregate_updates()
 def move_positions_to_another_politician(
         from_politician_id=0,
         from_politician_we_vote_id='',
@@ -1366,6 +1391,7 @@ def move_positions_to_another_politician(
     return results
 
 
+@batch_position_aggregate_updates()
 def move_positions_to_another_voter(from_voter_id, from_voter_we_vote_id,
                                     to_voter_id, to_voter_we_vote_id,
                                     to_voter_linked_organization_id, to_voter_linked_organization_we_vote_id):
@@ -2140,12 +2166,40 @@ def position_list_for_ballot_item_for_api(office_id, office_we_vote_id,  # posit
                                           stance_we_are_looking_for=ANY_STANCE,
                                           private_citizens_only=False):
     """
-    We want to return a JSON file with the public positions from organizations and public figures
+    We want to return a JSON file with the public positions from organizations and public figures.
+    This path only reads. The response is precomputed in the cache per ballot item and stance, and is invalidated
+    when one of its positions is saved.
     """
+    ballot_item_we_vote_id = candidate_we_vote_id if positive_value_exists(candidate_id) \
+        or positive_value_exists(candidate_we_vote_id) else \
+        measure_we_vote_id if positive_value_exists(measure_id) or positive_value_exists(measure_we_vote_id) else \
+        office_we_vote_id
+    cache_key = generate_position_list_for_ballot_item_cache_key(ballot_item_we_vote_id, stance_we_are_looking_for) \
+        if positive_value_exists(ballot_item_we_vote_id) else ''
+
+    def retrieve_json_data():
+        return position_list_for_ballot_item_json_data(
+            office_id=office_id,
+            office_we_vote_id=office_we_vote_id,
+            candidate_id=candidate_id,
+            candidate_we_vote_id=candidate_we_vote_id,
+            measure_id=measure_id,
+            measure_we_vote_id=measure_we_vote_id,
+            stance_we_are_looking_for=stance_we_are_looking_for)
+
+    json_data = dict(retrieve_results_through_cache(
+        CACHE_NAMESPACE_POSITION_LIST_FOR_BALLOT_ITEM, cache_key, 'success', retrieve_json_data))
+    json_data['private_citizens_only'] = private_citizens_only
+    return HttpResponse(json.dumps(json_data), content_type='application/json')
+
+
+def position_list_for_ballot_item_json_data(office_id, office_we_vote_id,
+                                            candidate_id, candidate_we_vote_id,
+                                            measure_id, measure_we_vote_id,
+                                            stance_we_are_looking_for=ANY_STANCE):
     status = "POSITION_LIST_FOR_BALLOT_ITEM "
     success = True
 
-    position_manager = PositionManager()
     position_list_manager = PositionListManager()
     ballot_item_found = False
     if positive_value_exists(candidate_id) or positive_value_exists(candidate_we_vote_id):
@@ -2158,7 +2212,7 @@ def position_list_for_ballot_item_for_api(office_id, office_we_vote_id,  # posit
         return_only_latest_position_per_speaker = True
         position_objects = position_list_manager.retrieve_all_positions_for_candidate(
             retrieve_public_positions_now, candidate_id, candidate_we_vote_id, stance_we_are_looking_for,
-            return_only_latest_position_per_speaker, read_only=False)
+            return_only_latest_position_per_speaker, read_only=True)
         # is_public_position_setting = True
         # public_positions_list = position_list_manager.add_is_public_position(public_positions_list,
         #                                                                      is_public_position_setting)
@@ -2192,7 +2246,7 @@ def position_list_for_ballot_item_for_api(office_id, office_we_vote_id,  # posit
         position_objects = position_list_manager.retrieve_all_positions_for_contest_measure(
             retrieve_public_positions_now,
             measure_id, measure_we_vote_id, stance_we_are_looking_for,
-            return_only_latest_position_per_speaker, read_only=False)
+            return_only_latest_position_per_speaker, read_only=True)
         # is_public_position_setting = True
         # public_positions_list = position_list_manager.add_is_public_position(public_positions_list,
         #                                                                      is_public_position_setting)
@@ -2227,7 +2281,7 @@ def position_list_for_ballot_item_for_api(office_id, office_we_vote_id,  # posit
             contest_office_we_vote_id=office_we_vote_id,
             stance_we_are_looking_for=stance_we_are_looking_for,
             most_recent_only=return_only_latest_position_per_speaker,
-            read_only=False)
+            read_only=True)
         # is_public_position_setting = True
         # public_positions_list = position_list_manager.add_is_public_position(public_positions_list,
         #                                                                      is_public_position_setting)
@@ -2261,7 +2315,7 @@ def position_list_for_ballot_item_for_api(office_id, office_we_vote_id,  # posit
             'ballot_item_we_vote_id':   '',
             'position_list':            position_list,
         }
-        return HttpResponse(json.dumps(json_data), content_type='application/json')
+        return json_data
 
     if not ballot_item_found:
         position_list = []
@@ -2274,15 +2328,11 @@ def position_list_for_ballot_item_for_api(office_id, office_we_vote_id,  # posit
             'ballot_item_we_vote_id':   ballot_item_we_vote_id,
             'position_list':            position_list,
         }
-        return HttpResponse(json.dumps(json_data), content_type='application/json')
+        return json_data
 
+    position_objects = list(position_objects)
+    fill_in_missing_speaker_info_without_saving(position_objects)
     position_list = []
-    offices_dict = {}
-    candidates_dict = {}
-    measures_dict = {}
-    organizations_dict = {}
-    voters_by_linked_org_dict = {}
-    voters_dict = {}
     for one_position in position_objects:
         # Is there sufficient information in the position to display it?
         some_data_exists = True if one_position.is_support_or_positive_rating() \
@@ -2300,28 +2350,6 @@ def position_list_for_ballot_item_for_api(office_id, office_we_vote_id,  # posit
             speaker_id = one_position.organization_id
             speaker_we_vote_id = one_position.organization_we_vote_id
             one_position_success = True
-            # Make sure we have this data to display
-            if not positive_value_exists(one_position.speaker_display_name) \
-                    or not positive_value_exists(one_position.speaker_image_url_https_large) \
-                    or not positive_value_exists(one_position.speaker_image_url_https_medium) \
-                    or not positive_value_exists(one_position.speaker_image_url_https_tiny) \
-                    or not positive_value_exists(one_position.speaker_twitter_handle) \
-                    or one_position.speaker_type == UNKNOWN:
-                results = position_manager.refresh_cached_position_info(
-                    one_position,
-                    offices_dict=offices_dict,
-                    candidates_dict=candidates_dict,
-                    measures_dict=measures_dict,
-                    organizations_dict=organizations_dict,
-                    voters_by_linked_org_dict=voters_by_linked_org_dict,
-                    voters_dict=voters_dict)
-                one_position = results['position']
-                offices_dict = results['offices_dict']
-                candidates_dict = results['candidates_dict']
-                measures_dict = results['measures_dict']
-                organizations_dict = results['organizations_dict']
-                voters_by_linked_org_dict = results['voters_by_linked_org_dict']
-                voters_dict = results['voters_dict']
             speaker_display_name = one_position.speaker_display_name
         else:
             speaker_display_name = "Unknown"
@@ -2382,9 +2410,56 @@ def position_list_for_ballot_item_for_api(office_id, office_we_vote_id,  # posit
         'ballot_item_id':           ballot_item_id,
         'ballot_item_we_vote_id':   ballot_item_we_vote_id,
         'position_list':            position_list,
-        'private_citizens_only':    private_citizens_only,
     }
-    return HttpResponse(json.dumps(json_data), content_type='application/json')
+    return json_data
+
+
+def fill_in_missing_speaker_info_without_saving(position_list):
+    """
+    Positions that are missing speaker information get it from their organization for this response only, with one
+    read-only query. The refresh_position_denormalized_fields job saves these values, so reading never writes.
+    :param position_list:
+    :return:
+    """
+    positions_missing_speaker_info = [
+        one_position for one_position in position_list
+        if positive_value_exists(one_position.organization_we_vote_id) and (
+            not positive_value_exists(one_position.speaker_display_name)
+            or not positive_value_exists(one_position.speaker_image_url_https_large)
+            or not positive_value_exists(one_position.speaker_image_url_https_medium)
+            or not positive_value_exists(one_position.speaker_image_url_https_tiny)
+            or not positive_value_exists(one_position.speaker_twitter_handle)
+            or one_position.speaker_type == UNKNOWN)]
+    if not positive_value_exists(len(positions_missing_speaker_info)):
+        return
+    organization_we_vote_id_list = list(set(
+        one_position.organization_we_vote_id for one_position in positions_missing_speaker_info))
+    organizations_dict = {}
+    try:
+        for organization in Organization.objects.using('readonly').filter(
+                we_vote_id__in=organization_we_vote_id_list):
+            organizations_dict[organization.we_vote_id] = organization
+    except Exception as e:
+        logger.error("fill_in_missing_speaker_info_without_saving: " + str(e))
+        return
+    for one_position in positions_missing_speaker_info:
+        organization = organizations_dict.get(one_position.organization_we_vote_id)
+        if not organization:
+            continue
+        if not positive_value_exists(one_position.speaker_display_name):
+            one_position.speaker_display_name = organization.organization_name
+        if not positive_value_exists(one_position.speaker_image_url_https):
+            one_position.speaker_image_url_https = organization.organization_photo_url()
+        if not positive_value_exists(one_position.speaker_image_url_https_large):
+            one_position.speaker_image_url_https_large = organization.we_vote_hosted_profile_image_url_large
+        if not positive_value_exists(one_position.speaker_image_url_https_medium):
+            one_position.speaker_image_url_https_medium = organization.we_vote_hosted_profile_image_url_medium
+        if not positive_value_exists(one_position.speaker_image_url_https_tiny):
+            one_position.speaker_image_url_https_tiny = organization.we_vote_hosted_profile_image_url_tiny
+        if not positive_value_exists(one_position.speaker_twitter_handle):
+            one_position.speaker_twitter_handle = organization.organization_twitter_handle
+        if one_position.speaker_type == UNKNOWN:
+            one_position.speaker_type = organization.organization_type
 
 
 def position_list_for_ballot_item_from_friends_for_api(  # positionListForBallotItemFromFriends
@@ -3677,28 +3752,34 @@ def positions_import_from_sample_file(request=None):  # , load_from_uri=False
     return positions_import_from_structured_json(request, structured_json)
 
 
-def positions_import_from_master_server(request, google_civic_election_id=''):
+def positions_import_from_master_server(request, google_civic_election_id='', changed_since='', since_id=0):
     """
-    Get the json data, and either create new entries or update existing
+    Get the json data, and either create new entries or update existing. The master server streams the positions,
+    and we import them a batch at a time as they arrive.
+    :param changed_since: Only pull positions changed on the master server on or after this date
+    :param since_id: Resume a pull which was cut off, from the last_id it returned
     :return:
     """
+    get_params = {
+        "key":                      WE_VOTE_API_KEY,  # This comes from an environment variable
+        "google_civic_election_id": str(google_civic_election_id),
+    }
+    if positive_value_exists(changed_since):
+        get_params['changed_since'] = changed_since
+    if positive_value_exists(since_id):
+        get_params['since_id'] = since_id
 
-    import_results, structured_json = process_request_from_master(
-        request, "Loading Positions from We Vote Master servers",
-        POSITIONS_SYNC_URL, {
-            "key":                      WE_VOTE_API_KEY,  # This comes from an environment variable
-            "format":                   'json',
-            "google_civic_election_id": str(google_civic_election_id),
-        }
-    )
-
-    if import_results['success']:
+    def import_one_batch_of_positions(structured_json):
         results = filter_positions_structured_json_for_local_duplicates(structured_json)
-        filtered_structured_json = results['structured_json']
-        duplicates_removed = results['duplicates_removed']
+        batch_results = positions_import_from_structured_json(results['structured_json'])
+        batch_results['duplicates_removed'] = results['duplicates_removed']
+        return batch_results
 
-        import_results = positions_import_from_structured_json(filtered_structured_json)
-        import_results['duplicates_removed'] = duplicates_removed
+    import_results = process_request_from_master_in_batches(
+        request, "Loading Positions from We Vote Master servers",
+        POSITIONS_SYNC_URL, get_params, import_one_batch_of_positions)
+    for count_key in SYNC_IMPORT_COUNT_KEYS:
+        import_results.setdefault(count_key, 0)
 
     return import_results
 
@@ -3751,6 +3832,18 @@ def positions_import_from_structured_json(structured_json):
     positions_saved = 0
     positions_updated = 0
     positions_not_processed = 0
+
+    # Look up the positions imported previously with one query, instead of one query per position
+    position_by_we_vote_id = {}
+    we_vote_id_list = [one_position.get('we_vote_id', '') for one_position in structured_json
+                       if positive_value_exists(one_position.get('we_vote_id', ''))]
+    if len(we_vote_id_list):
+        try:
+            for position in PositionEntered.objects.filter(we_vote_id__in=we_vote_id_list):
+                position_by_we_vote_id.setdefault(position.we_vote_id, position)
+        except Exception as e:
+            print("exception thrown in positions_import_from_structured_json" + str(e))
+
     for one_position in structured_json:
         # Make sure we have the minimum required variables
         if positive_value_exists(one_position["we_vote_id"]) \
@@ -3772,17 +3865,9 @@ def positions_import_from_structured_json(structured_json):
 
         # Check to see if this position had been imported previously
         position_on_stage_found = False
-        try:
-            if len(one_position["we_vote_id"]) > 0:
-                position_query = PositionEntered.objects.filter(we_vote_id=one_position["we_vote_id"])
-                if len(position_query):
-                    position_on_stage = position_query[0]
-                    position_on_stage_found = True
-        except PositionEntered.DoesNotExist as e:
-            pass
-        except Exception as e:
-            print("exception thrown in positions_import_from_structured_json" + e)
-            pass
+        if one_position["we_vote_id"] in position_by_we_vote_id:
+            position_on_stage = position_by_we_vote_id[one_position["we_vote_id"]]
+            position_on_stage_found = True
 
         # We need to look up the local organization_id and store for internal use
         organization_id = 0
@@ -4597,6 +4682,7 @@ def voter_position_visibility_save_for_api(  # voterPositionVisibilitySave
         return json_data
 
 
+@batch_position_aggregate_updates()
 def refresh_cached_position_info_for_election(google_civic_election_id, state_code=''):
     google_civic_election_id = convert_to_int(google_civic_election_id)
 
@@ -4617,6 +4703,7 @@ def refresh_cached_position_info_for_election(google_civic_election_id, state_co
     return results
 
 
+@batch_position_aggregate_updates()
 def refresh_positions_with_candidate_details_for_election(google_civic_election_id, state_code):
     update_all_positions_results = []
     positions_updated_count = 0
@@ -4648,6 +4735,7 @@ def refresh_positions_with_candidate_details_for_election(google_civic_election_
     return results
 
 
+@batch_position_aggregate_updates()
 def refresh_positions_with_contest_office_details_for_election(google_civic_election_id, state_code):
     update_all_positions_results = []
     positions_updated_count = 0
@@ -4675,6 +4763,7 @@ def refresh_positions_with_contest_office_details_for_election(google_civic_elec
     return results
 
 
+@batch_position_aggregate_updates()
 def refresh_positions_with_contest_measure_details_for_election(google_civic_election_id, state_code):
     update_all_positions_results = []
     positions_updated_count = 0
@@ -5329,3 +5418,98 @@ def update_position_for_friends_details_from_voter(voter):
         'positions_not_updated_count':  positions_not_updated_count,
     }
     return results
+
+
+@batch_position_aggregate_updates()
+def refresh_position_denormalized_fields(changed_since, missing_speaker_info_limit=1000):
+    """
+    Background job that copies speaker_* and ballot_item_* values onto the positions, so positionListForBallotItem
+    never needs to write while reading. Run it every few minutes with the refresh_position_denormalized_fields
+    management command.
+      - Organizations, voters and candidates changed since changed_since are copied to their positions
+      - Up to missing_speaker_info_limit positions without a speaker name or type are refreshed from the source tables
+    :param changed_since:
+    :param missing_speaker_info_limit:
+    :return:
+    """
+    status = ""
+    success = True
+    organizations_refreshed = 0
+    voters_refreshed = 0
+    candidates_refreshed = 0
+    positions_missing_speaker_info_refreshed = 0
+    position_manager = PositionManager()
+
+    try:
+        organization_query = Organization.objects.using('readonly').filter(date_last_changed__gte=changed_since)
+        for organization in organization_query:
+            update_position_entered_details_from_organization(organization)
+            organizations_refreshed += 1
+    except Exception as e:
+        status += "REFRESH_POSITIONS_FROM_ORGANIZATIONS_FAILED: " + str(e) + " "
+        success = False
+
+    try:
+        # Only the voters who have friends-only positions
+        voter_query = Voter.objects.filter(
+            date_last_changed__gte=changed_since,
+            we_vote_id__in=PositionForFriends.objects.values('voter_we_vote_id'))
+        for voter in voter_query:
+            update_position_for_friends_details_from_voter(voter)
+            voters_refreshed += 1
+    except Exception as e:
+        status += "REFRESH_POSITIONS_FROM_VOTERS_FAILED: " + str(e) + " "
+        success = False
+
+    try:
+        candidate_query = CandidateCampaign.objects.using('readonly').filter(date_last_updated__gte=changed_since)
+        for candidate in candidate_query:
+            for position_model in (PositionEntered, PositionForFriends):
+                position_query = position_model.objects.filter(candidate_campaign_we_vote_id=candidate.we_vote_id)
+                for position_object in position_query:
+                    position_manager.update_position_image_urls_from_candidate(position_object, candidate)
+                    position_manager.update_position_ballot_data_from_candidate(position_object, candidate)
+            candidates_refreshed += 1
+    except Exception as e:
+        status += "REFRESH_POSITIONS_FROM_CANDIDATES_FAILED: " + str(e) + " "
+        success = False
+
+    offices_dict = {}
+    candidates_dict = {}
+    measures_dict = {}
+    organizations_dict = {}
+    voters_by_linked_org_dict = {}
+    voters_dict = {}
+    try:
+        position_query = PositionEntered.objects.filter(
+            Q(speaker_display_name__isnull=True) | Q(speaker_display_name='') | Q(speaker_type=UNKNOWN))
+        position_query = position_query.order_by('-id')[:missing_speaker_info_limit]
+        for position_object in position_query:
+            results = position_manager.refresh_cached_position_info(
+                position_object,
+                offices_dict=offices_dict,
+                candidates_dict=candidates_dict,
+                measures_dict=measures_dict,
+                organizations_dict=organizations_dict,
+                voters_by_linked_org_dict=voters_by_linked_org_dict,
+                voters_dict=voters_dict)
+            offices_dict = results['offices_dict']
+            candidates_dict = results['candidates_dict']
+            measures_dict = results['measures_dict']
+            organizations_dict = results['organizations_dict']
+            voters_by_linked_org_dict = results['voters_by_linked_org_dict']
+            voters_dict = results['voters_dict']
+            positions_missing_speaker_info_refreshed += 1
+    except Exception as e:
+        status += "REFRESH_POSITIONS_MISSING_SPEAKER_INFO_FAILED: " + str(e) + " "
+        success = False
+
+    results = {
+        'success':                                  success,
+        'status':                                   status,
+        'organizations_refreshed':                  organizations_refreshed,
+        'voters_refreshed':                         voters_refreshed,
+        'candidates_refreshed':                     candidates_refreshed,
+        'positions_missing_speaker_info_refreshed': positions_missing_speaker_info_refreshed,
+    }
+    return results
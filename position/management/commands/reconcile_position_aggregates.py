@@ -0,0 +1,50 @@
+from django.core.management.base import BaseCommand
+
+from ballot.models import CANDIDATE, MEASURE, OFFICE
+from position.models import PositionAggregate, PositionAggregateManager, PositionEntered, PositionForFriends
+
+
+class Command(BaseCommand):
+    help = 'Recalculates PositionAggregate for every ballot item with positions (run nightly), and removes ' \
+           'aggregates for ballot items that no longer have any'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--google_civic_election_id', type=int, default=0,
+                            help='Only recalculate ballot items with positions in this election')
+
+    def handle(self, *args, **options):
+        google_civic_election_id = options['google_civic_election_id']
+        ballot_item_dict = {}
+        for position_model in (PositionEntered, PositionForFriends):
+            position_query = position_model.objects.all()
+            if google_civic_election_id:
+                position_query = position_query.filter(google_civic_election_id=google_civic_election_id)
+            for field_name, kind_of_ballot_item in (('candidate_campaign_we_vote_id', CANDIDATE),
+                                                    ('contest_measure_we_vote_id', MEASURE),
+                                                    ('contest_office_we_vote_id', OFFICE)):
+                ballot_item_we_vote_id_query = position_query.exclude(**{field_name + '__isnull': True}) \
+                    .exclude(**{field_name: ''}).values_list(field_name, flat=True).distinct()
+                for ballot_item_we_vote_id in ballot_item_we_vote_id_query.iterator():
+                    ballot_item_dict[ballot_item_we_vote_id] = kind_of_ballot_item
+
+        position_aggregate_manager = PositionAggregateManager()
+        failed_count = 0
+        for ballot_item_we_vote_id, kind_of_ballot_item in ballot_item_dict.items():
+            results = position_aggregate_manager.update_position_aggregate_for_ballot_item(
+                ballot_item_we_vote_id, kind_of_ballot_item)
+            if not results['success']:
+                failed_count += 1
+
+        deleted_count = 0
+        if not google_civic_election_id:
+            stale_we_vote_id_list = [
+                ballot_item_we_vote_id for ballot_item_we_vote_id in
+                PositionAggregate.objects.values_list('ballot_item_we_vote_id', flat=True).iterator()
+                if ballot_item_we_vote_id not in ballot_item_dict]
+            for start in range(0, len(stale_we_vote_id_list), 1000):
+                chunk_deleted_count, _ = PositionAggregate.objects.filter(
+                    ballot_item_we_vote_id__in=stale_we_vote_id_list[start:start + 1000]).delete()
+                deleted_count += chunk_deleted_count
+        self.stdout.write('recalculated {count} ballot items ({failed} failed), removed {deleted} stale '
+                          'aggregates'.format(count=len(ballot_item_dict), failed=failed_count,
+                                              deleted=deleted_count))
@@ -0,0 +1,29 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils.timezone import now
+
+from position.controllers import refresh_position_denormalized_fields
+
+
+class Command(BaseCommand):
+    help = 'Copies changed organization, voter and candidate details onto their positions, and fills in positions ' \
+           'missing speaker information. Schedule it more often than --minutes so the windows overlap.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--minutes', type=int, default=15,
+                            help='Refresh positions for organizations, voters and candidates changed in this window')
+        parser.add_argument('--missing_speaker_info_limit', type=int, default=1000,
+                            help='Most positions without a speaker name or type to refresh in one run')
+
+    def handle(self, *args, **options):
+        results = refresh_position_denormalized_fields(
+            changed_since=now() - timedelta(minutes=options['minutes']),
+            missing_speaker_info_limit=options['missing_speaker_info_limit'])
+        self.stdout.write('organizations: {organizations}, voters: {voters}, candidates: {candidates}, '
+                          'positions missing speaker info: {missing} {status}'.format(
+                              organizations=results['organizations_refreshed'],
+                              voters=results['voters_refreshed'],
+                              candidates=results['candidates_refreshed'],
+                              missing=results['positions_missing_speaker_info_refreshed'],
+                              status=results['status']))
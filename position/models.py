@@ -3,14 +3,19 @@
 # -*- coding: UTF-8 -*-
 # Diagrams here: https://docs.google.com/drawings/d/1DsPnl97GKe9f14h41RPeZDssDUztRETGkXGaolXCeyo/edit
 
+import threading
+from contextlib import contextmanager
 from activity.controllers import update_or_create_activity_notice_seed_for_voter_position
 from analytics.models import ACTION_POSITION_TAKEN, AnalyticsManager
 from candidate.models import CandidateCampaign, CandidateListManager, CandidateManager
 from ballot.controllers import figure_out_google_civic_election_id_voter_is_watching, \
     figure_out_google_civic_election_id_voter_is_watching_by_voter_we_vote_id
+from ballot.models import CANDIDATE, MEASURE, OFFICE
 from django.core.exceptions import ObjectDoesNotExist, MultipleObjectsReturned
 from django.db import models
-from django.db.models import Q
+from django.db.models import Count, Q
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
 from django.utils.timezone import now
 from election.models import Election
 from exception.models import handle_exception, handle_record_found_more_than_one_exception,\
@@ -29,6 +34,7 @@ from voter.models import fetch_voter_id_from_voter_we_vote_id, fetch_voter_we_vo
 from voter_guide.models import VoterGuideManager
 import wevote_functions.admin
 from wevote_functions.functions import convert_to_int, positive_value_exists
+from wevote_functions.functions_cache import CACHE_NAMESPACE_POSITION_LIST_FOR_BALLOT_ITEM, invalidate_cache_key
 from wevote_functions.functions_date import DATE_FORMAT_YMD_HMS
 from wevote_settings.models import fetch_next_we_vote_id_position_integer, fetch_site_unique_id_prefix
 
@@ -40,6 +46,9 @@ NO_STANCE = 'NO_STANCE'  # DALE 2016-8-29 We will want to deprecate NO_STANCE an
 INFORMATION_ONLY = 'INFO_ONLY'
 OPPOSE = 'OPPOSE'
 PERCENT_RATING = 'PERCENT_RATING'
+# The stances positionListForBallotItem can be asked for
+POSITION_LIST_FOR_BALLOT_ITEM_STANCES = (ANY_STANCE, SUPPORT, STILL_DECIDING, INFORMATION_ONLY, NO_STANCE, OPPOSE,
+                                         PERCENT_RATING)
 POSITION_CHOICES = (
     # ('SUPPORT_STRONG',    'Strong Supports'),  # I do not believe we will be offering 'SUPPORT_STRONG' as an option
     (SUPPORT,           'Supports'),
@@ -509,6 +518,37 @@ class PositionEntered(models.Model):
         return voter
 
 
+def generate_position_list_for_ballot_item_cache_key(ballot_item_we_vote_id, stance_we_are_looking_for):
+    return str(ballot_item_we_vote_id) + ':' + str(stance_we_are_looking_for)
+
+
+@receiver(post_save, sender=PositionEntered)
+def save_position_entered_cache_signal(sender, instance, **kwargs):
+    invalidate_position_list_for_ballot_item_cache(instance)
+    queue_position_aggregate_updates_for_position(instance)
+
+
+@receiver(post_delete, sender=PositionEntered)
+def delete_position_entered_cache_signal(sender, instance, **kwargs):
+    invalidate_position_list_for_ballot_item_cache(instance)
+    queue_position_aggregate_updates_for_position(instance)
+
+
+def invalidate_position_list_for_ballot_item_cache(position):
+    for ballot_item_we_vote_id in (position.candidate_campaign_we_vote_id, position.contest_measure_we_vote_id,
+                                   position.contest_office_we_vote_id):
+        if positive_value_exists(ballot_item_we_vote_id):
+            for stance in POSITION_LIST_FOR_BALLOT_ITEM_STANCES:
+                invalidate_cache_key(CACHE_NAMESPACE_POSITION_LIST_FOR_BALLOT_ITEM,
+                                     generate_position_list_for_ballot_item_cache_key(ballot_item_we_vote_id, stance))
+
+
+def queue_position_aggregate_updates_for_position(position):
+    queue_position_aggregate_update(position.candidate_campaign_we_vote_id, CANDIDATE)
+    queue_position_aggregate_update(position.contest_measure_we_vote_id, MEASURE)
+    queue_position_aggregate_update(position.contest_office_we_vote_id, OFFICE)
+
+
 class PositionForFriends(models.Model):
     """
     Any position intended for friends only that is entered by any organization or candidate gets its own
@@ -950,6 +990,16 @@ class PositionForFriends(models.Model):
         return voter
 
 
+@receiver(post_save, sender=PositionForFriends)
+def save_position_for_friends_aggregate_signal(sender, instance, **kwargs):
+    queue_position_aggregate_updates_for_position(instance)
+
+
+@receiver(post_delete, sender=PositionForFriends)
+def delete_position_for_friends_aggregate_signal(sender, instance, **kwargs):
+    queue_position_aggregate_updates_for_position(instance)
+
+
 class PositionNetworkScore(models.Model):
     """
     Built for rapid lookup of the number of support / oppose for one ballot item, coming from one voter's network
@@ -996,6 +1046,148 @@ class PositionNetworkScore(models.Model):
         return ""
 
 
+class PositionAggregate(models.Model):
+    """
+    Position counts for one ballot item, so the count APIs read one row instead of counting positions.
+    Kept current as positions are saved and deleted, and rebuilt nightly by the reconcile_position_aggregates
+    management command.
+    """
+    ballot_item_we_vote_id = models.CharField(max_length=255, null=False, unique=True)
+    kind_of_ballot_item = models.CharField(max_length=255, null=True)
+
+    public_positions_count = models.PositiveIntegerField(default=0)
+    public_support_count = models.PositiveIntegerField(default=0)
+    public_oppose_count = models.PositiveIntegerField(default=0)
+    public_information_only_count = models.PositiveIntegerField(default=0)
+    public_no_stance_count = models.PositiveIntegerField(default=0)
+
+    friends_positions_count = models.PositiveIntegerField(default=0)
+    friends_support_count = models.PositiveIntegerField(default=0)
+    friends_oppose_count = models.PositiveIntegerField(default=0)
+    friends_information_only_count = models.PositiveIntegerField(default=0)
+    friends_no_stance_count = models.PositiveIntegerField(default=0)
+
+    date_last_calculated = models.DateTimeField(null=True, auto_now=True)
+
+    def fetch_count(self, stance_we_are_looking_for, public_or_private=PUBLIC_ONLY):
+        prefix = 'friends_' if public_or_private == FRIENDS_ONLY else 'public_'
+        if stance_we_are_looking_for == SUPPORT:
+            return getattr(self, prefix + 'support_count')
+        elif stance_we_are_looking_for == OPPOSE:
+            return getattr(self, prefix + 'oppose_count')
+        elif stance_we_are_looking_for == INFORMATION_ONLY:
+            return getattr(self, prefix + 'information_only_count')
+        elif stance_we_are_looking_for == NO_STANCE:
+            return getattr(self, prefix + 'no_stance_count')
+        elif stance_we_are_looking_for == ANY_STANCE:
+            return getattr(self, prefix + 'positions_count')
+        return None
+
+
+# Ballot items whose PositionAggregate is recalculated when the outermost batch_position_aggregate_updates exits
+position_aggregate_batch = threading.local()
+
+
+@contextmanager
+def batch_position_aggregate_updates():
+    """
+    Recalculate each PositionAggregate once at the end, instead of after every position saved in a move or merge.
+    Works as a "with" block or a function decorator.
+    """
+    if getattr(position_aggregate_batch, 'ballot_item_dict', None) is not None:
+        # Already inside a batch, which will do the updates
+        yield
+        return
+    position_aggregate_batch.ballot_item_dict = {}
+    try:
+        yield
+    finally:
+        ballot_item_dict = position_aggregate_batch.ballot_item_dict
+        position_aggregate_batch.ballot_item_dict = None
+        position_aggregate_manager = PositionAggregateManager()
+        for ballot_item_we_vote_id, kind_of_ballot_item in ballot_item_dict.items():
+            position_aggregate_manager.update_position_aggregate_for_ballot_item(
+                ballot_item_we_vote_id, kind_of_ballot_item)
+
+
+def queue_position_aggregate_update(ballot_item_we_vote_id, kind_of_ballot_item):
+    if not positive_value_exists(ballot_item_we_vote_id):
+        return
+    ballot_item_dict = getattr(position_aggregate_batch, 'ballot_item_dict', None)
+    if ballot_item_dict is not None:
+        ballot_item_dict[ballot_item_we_vote_id] = kind_of_ballot_item
+    else:
+        PositionAggregateManager().update_position_aggregate_for_ballot_item(
+            ballot_item_we_vote_id, kind_of_ballot_item)
+
+
+class PositionAggregateManager(models.Manager):
+
+    @staticmethod
+    def fetch_position_aggregate_count(ballot_item_we_vote_id, stance_we_are_looking_for,
+                                       public_or_private=PUBLIC_ONLY):
+        """
+        :return: The count from PositionAggregate, or None if there isn't one yet (so the caller counts positions)
+        """
+        if not positive_value_exists(ballot_item_we_vote_id):
+            return None
+        try:
+            position_aggregate = PositionAggregate.objects.using('readonly').get(
+                ballot_item_we_vote_id=ballot_item_we_vote_id)
+            return position_aggregate.fetch_count(stance_we_are_looking_for, public_or_private)
+        except PositionAggregate.DoesNotExist:
+            return None
+        except Exception as e:
+            logger.error("fetch_position_aggregate_count: " + str(e))
+            return None
+
+    @staticmethod
+    def update_position_aggregate_for_ballot_item(ballot_item_we_vote_id, kind_of_ballot_item):
+        """
+        Recount the positions for one ballot item from the primary database and store the counts
+        :param ballot_item_we_vote_id:
+        :param kind_of_ballot_item: CANDIDATE, MEASURE or OFFICE
+        :return:
+        """
+        status = ""
+        success = True
+        if kind_of_ballot_item == CANDIDATE:
+            ballot_item_filter = Q(candidate_campaign_we_vote_id=ballot_item_we_vote_id)
+        elif kind_of_ballot_item == MEASURE:
+            ballot_item_filter = Q(contest_measure_we_vote_id=ballot_item_we_vote_id)
+        elif kind_of_ballot_item == OFFICE:
+            ballot_item_filter = Q(contest_office_we_vote_id=ballot_item_we_vote_id)
+        else:
+            return {'success': False, 'status': 'POSITION_AGGREGATE_UNKNOWN_KIND_OF_BALLOT_ITEM '}
+
+        updated_values = {'kind_of_ballot_item': kind_of_ballot_item}
+        try:
+            for prefix, position_model in (('public_', PositionEntered), ('friends_', PositionForFriends)):
+                stance_counts = {}
+                for stance, stance_count in position_model.objects.filter(ballot_item_filter) \
+                        .values_list('stance').annotate(stance_count=Count('id')).order_by():
+                    stance = str(stance).upper() if stance else ''
+                    stance_counts[stance] = stance_counts.get(stance, 0) + stance_count
+                updated_values[prefix + 'positions_count'] = sum(stance_counts.values())
+                updated_values[prefix + 'support_count'] = stance_counts.get(SUPPORT, 0)
+                updated_values[prefix + 'oppose_count'] = stance_counts.get(OPPOSE, 0)
+                updated_values[prefix + 'information_only_count'] = stance_counts.get(INFORMATION_ONLY, 0)
+                updated_values[prefix + 'no_stance_count'] = stance_counts.get(NO_STANCE, 0)
+
+            PositionAggregate.objects.update_or_create(
+                ballot_item_we_vote_id=ballot_item_we_vote_id,
+                defaults=updated_values)
+            status += "POSITION_AGGREGATE_UPDATED "
+        except Exception as e:
+            success = False
+            status += "POSITION_AGGREGATE_NOT_UPDATED: " + str(e) + " "
+            logger.error(status)
+        return {
+            'success':  success,
+            'status':   status,
+        }
+
+
 class PositionListManager(models.Manager):
     # 2018-05 We now have an "is_public_position()" function
     # def add_is_public_position(self, incoming_position_list, is_public_position):
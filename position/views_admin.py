@@ -31,6 +31,8 @@ import wevote_functions.admin
 from wevote_functions.functions import convert_to_int, \
     convert_integer_to_string_with_comma_for_thousands_separator, \
     positive_value_exists, STATE_CODE_MAP
+from wevote_functions.functions_sync import filter_sync_out_queryset_for_cursor, is_sync_out_streaming_request, \
+    stream_sync_out_response
 from wevote_settings.constants import ELECTION_YEARS_AVAILABLE
 from django.http import HttpResponse
 import json
@@ -39,6 +41,21 @@ from time import time
 UNKNOWN = 'U'
 POSITIONS_SYNC_URL = get_environment_variable("POSITIONS_SYNC_URL")  # positionsSyncOut
 WE_VOTE_SERVER_ROOT_URL = get_environment_variable("WE_VOTE_SERVER_ROOT_URL")
+POSITION_SYNC_OUT_FIELD_LIST = (
+    'we_vote_id', 'ballot_item_display_name', 'ballot_item_image_url_https',
+    'ballot_item_twitter_handle', 'speaker_display_name',
+    'speaker_image_url_https', 'speaker_twitter_handle', 'date_entered',
+    'date_last_changed', 'organization_we_vote_id', 'voter_we_vote_id',
+    'public_figure_we_vote_id', 'google_civic_election_id', 'state_code',
+    'vote_smart_rating_id', 'vote_smart_time_span', 'vote_smart_rating',
+    'vote_smart_rating_name', 'contest_office_we_vote_id', 'race_office_level',
+    'candidate_campaign_we_vote_id', 'google_civic_candidate_name',
+    'politician_we_vote_id', 'contest_measure_we_vote_id', 'speaker_type', 'stance',
+    'position_ultimate_election_date', 'position_year',
+    'statement_text', 'statement_html', 'twitter_followers_count', 'more_info_url', 'from_scraper',
+    'organization_certified', 'volunteer_certified', 'voter_entering_position',
+    'tweet_source_id', 'twitter_user_entered_position', 'is_private_citizen',
+)
 
 logger = wevote_functions.admin.get_logger(__name__)
 
@@ -67,6 +84,9 @@ def positions_sync_out_view(request):  # positionsSyncOut
         if stance_we_are_looking_for != ANY_STANCE:
             # If we passed in the stance "ANY" it means we want to not filter down the list
             position_list_query = position_list_query.filter(stance__iexact=stance_we_are_looking_for)
+        if is_sync_out_streaming_request(request):
+            position_list_query = filter_sync_out_queryset_for_cursor(
+                request, position_list_query, changed_since_field_name='date_last_changed')
 
         # convert datetime to str for date_entered and date_last_changed columns
         position_list_query = position_list_query.extra(
@@ -74,20 +94,10 @@ def positions_sync_out_view(request):  # positionsSyncOut
         position_list_query = position_list_query.extra(
             select={'date_last_changed': "to_char(date_last_changed, 'YYYY-MM-DD HH24:MI:SS')"})
 
-        position_list_dict = position_list_query.values(
-            'we_vote_id', 'ballot_item_display_name', 'ballot_item_image_url_https',
-            'ballot_item_twitter_handle', 'speaker_display_name',
-            'speaker_image_url_https', 'speaker_twitter_handle', 'date_entered',
-            'date_last_changed', 'organization_we_vote_id', 'voter_we_vote_id',
-            'public_figure_we_vote_id', 'google_civic_election_id', 'state_code',
-            'vote_smart_rating_id', 'vote_smart_time_span', 'vote_smart_rating',
-            'vote_smart_rating_name', 'contest_office_we_vote_id', 'race_office_level',
-            'candidate_campaign_we_vote_id', 'google_civic_candidate_name',
-            'politician_we_vote_id', 'contest_measure_we_vote_id', 'speaker_type', 'stance',
-            'position_ultimate_election_date', 'position_year',
-            'statement_text', 'statement_html', 'twitter_followers_count', 'more_info_url', 'from_scraper',
-            'organization_certified', 'volunteer_certified', 'voter_entering_position',
-            'tweet_source_id', 'twitter_user_entered_position', 'is_private_citizen')
+        if is_sync_out_streaming_request(request):
+            return stream_sync_out_response(position_list_query, POSITION_SYNC_OUT_FIELD_LIST)
+
+        position_list_dict = position_list_query.values(*POSITION_SYNC_OUT_FIELD_LIST)
 
         if position_list_dict:
             position_list_json = list(position_list_dict)
@@ -122,7 +132,11 @@ def positions_import_from_master_server_view(request):
         return HttpResponseRedirect(reverse('admin_tools:sync_dashboard', args=()) + "?google_civic_election_id=" +
                                     str(google_civic_election_id) + "&state_code=" + str(state_code))
 
-    results = positions_import_from_master_server(request, google_civic_election_id)
+    changed_since = request.GET.get('changed_since', '')
+    since_id = convert_to_int(request.GET.get('since_id', 0))
+
+    results = positions_import_from_master_server(
+        request, google_civic_election_id, changed_since=changed_since, since_id=since_id)
 
     if not results['success']:
         messages.add_message(request, messages.ERROR, results['status'])
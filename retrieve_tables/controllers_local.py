@@ -3,26 +3,51 @@
 # -*- coding: UTF-8 -*-
 
 import csv
+import gzip
 import json
 import os
+import shutil
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta, timezone
 
 import psycopg2
 import requests
+from django.db import connection
 from django.http import HttpResponse
 
 import wevote_functions.admin
 from config.base import get_environment_variable
 from retrieve_tables.controllers_master import allowable_tables, dump_row_col_labels_and_errors
-from wevote_functions.functions import get_voter_api_device_id
+from retrieve_tables.models import RetrieveTableState
+from wevote_functions.functions import convert_to_int, get_voter_api_device_id, positive_value_exists
 
 logger = wevote_functions.admin.get_logger(__name__)
 
 # This api will only return the data from the following tables
 
 dummy_unique_id = 10000000
+dummy_unique_id_lock = threading.Lock()
 LOCAL_TMP_PATH = '/tmp/'
 
+# ONLY CHANGE host to 'wevotedeveloper.com' while debugging the fast load code, where Master and Client are the same
+# RETRIEVE_SQL_TABLES_HOST = 'https://wevotedeveloper.com:8000'
+RETRIEVE_SQL_TABLES_HOST = 'https://api.wevoteusa.org'
+RETRIEVE_SQL_TABLES_WORKERS_DEFAULT = 4
+RETRIEVE_SQL_TABLES_WORKERS_MAXIMUM = 8
+RETRIEVE_SQL_TABLES_RETRY_MAXIMUM = 10
+RETRIEVE_SQL_TABLES_COPY_BYTES = 64 * 1024
+GULP_SIZE = 500000
+GULP_SIZE_TOO_MANY_COLUMNS = 100000
+TABLES_WITH_TOO_MANY_COLUMNS = {'candidate_candidatecampaign'}
+# Incremental syncs overlap the previous sync a little, in case the two servers' clocks don't agree
+INCREMENTAL_SYNC_OVERLAP = timedelta(hours=1)
+SYNC_MODE_FULL = 'full'
+SYNC_MODE_INCREMENTAL = 'incremental'
+
+sync_checkpoints_lock = threading.Lock()
+
 
 def save_off_database():
     file = "WeVoteServerDB-{:.0f}.pgsql".format(time.time())
@@ -30,6 +55,16 @@ def save_off_database():
     time.sleep(20)
 
 
+def get_local_database_connection():
+    return psycopg2.connect(
+        database=get_environment_variable('DATABASE_NAME'),
+        user=get_environment_variable('DATABASE_USER'),
+        password=get_environment_variable('DATABASE_PASSWORD'),
+        host=get_environment_variable('DATABASE_HOST'),
+        port=get_environment_variable('DATABASE_PORT')
+    )
+
+
 def update_fast_load_db(host, voter_api_device_id, table_name, additional_records):
     try:
         response = requests.get(host + '/apis/v1/fastLoadStatusUpdate/',
@@ -44,179 +79,286 @@ def update_fast_load_db(host, voter_api_device_id, table_name, additional_record
         logger.error('update_fast_load_db caught: ', str(e))
 
 
-def retrieve_sql_files_from_master_server(request):
+def save_sync_checkpoint(state_id, checkpoints, table_name, next_start=None, table_complete=False):
     """
-    Get the json data, and create new entries in the developers local database
-    Runs on the Local server (developer's Mac)
-    :return:
+    Record how far a table got, in the local RetrieveTableState, so an interrupted sync can resume there
+    Called from the worker threads
     """
+    with sync_checkpoints_lock:
+        checkpoint = checkpoints.setdefault(table_name, {'next_start': 0, 'complete': False})
+        if next_start is not None:
+            checkpoint['next_start'] = next_start
+        if table_complete:
+            checkpoint['complete'] = True
+        RetrieveTableState.objects.filter(id=state_id).update(
+            table_name=table_name, sync_checkpoints_json=json.dumps(checkpoints))
+
+
+def retrieve_table_chunk_from_master_server(host, voter_api_device_id, table_name, start, end, changed_since='',
+                                            since_id=0):
+    """
+    Download one chunk of a table into LOCAL_TMP_PATH/<table_name>.csvTemp, uncompressing it as it streams in
+    Runs on the Local server
+    """
+    params = {
+        'table_name': table_name,
+        'start': start,
+        'end': end,
+        'changed_since': changed_since,
+        'since_id': since_id,
+        'voter_api_device_id': voter_api_device_id,
+    }
     status = ''
-    t0 = time.time()
-    print(
-        'Saving off a copy of your local db (an an emergency fallback, that will almost never be needed) in \'WeVoteServerDB-*.pgsql\' files, feel free to delete them at anytime')
-    save_off_database()
-    dt = time.time() - t0
-    stats = {}
-    print('Saved off local database in ' + str(int(dt)) + ' seconds')
-    stats |= {'save_off': str(int(dt))}
+    for retry in range(1, RETRIEVE_SQL_TABLES_RETRY_MAXIMUM + 1):
+        try:
+            with requests.get(host + '/apis/v1/retrieveSQLTables/', params=params, verify=True, stream=True,
+                              timeout=(30, 1800)) as response:
+                content_type = response.headers.get('Content-Type', '')
+                if response.status_code == 200 and content_type.startswith('application/gzip'):
+                    with open(os.path.join(LOCAL_TMP_PATH, table_name + '.csvTemp'), 'wb') as csv_file, \
+                            gzip.GzipFile(fileobj=response.raw) as gzip_file:
+                        shutil.copyfileobj(gzip_file, csv_file, RETRIEVE_SQL_TABLES_COPY_BYTES)
+                    results = {
+                        'success': True,
+                        'status': status,
+                        'max_id': convert_to_int(response.headers.get('X-Max-Id', 0)),
+                    }
+                    return results
+                if response.status_code == 200:
+                    # A JSON answer means the master server won't send this table, so retrying won't help
+                    status += "FAILED:  Did not receive '" + table_name + "' from server: " + response.text + " "
+                    break
+                print(host + '/apis/v1/retrieveSQLTables/   (failing get response) response.status_code ' +
+                      str(response.status_code) + '  RETRY #' + str(retry) + ' ---- ' + response.url)
+        except Exception as getErr:
+            print(host + '/apis/v1/retrieveSQLTables/   (failing SSL connection err on get) error ' + str(getErr) +
+                  '  RETRY #' + str(retry) + '  ---- ' + table_name + ' ' + str(start) + ' ' + str(end))
+        time.sleep(min(2 ** retry, 60))
+    else:
+        status += "FAILED:  Gave up on '" + table_name + "' after " + str(RETRIEVE_SQL_TABLES_RETRY_MAXIMUM) + \
+                  " tries "
 
-    # ONLY CHANGE host to 'wevotedeveloper.com' while debugging the fast load code, where Master and Client are the same
-    # host = 'https://wevotedeveloper.com:8000'
-    host = 'https://api.wevoteusa.org'
+    results = {
+        'success': False,
+        'status': status,
+        'max_id': 0,
+    }
+    return results
 
-    voter_api_device_id = get_voter_api_device_id(request)
-    requests.get(host + '/apis/v1/fastLoadStatusRetrieve',
-                 params={"initialize": True, "voter_api_device_id": voter_api_device_id}, verify=True)
-
-    for table_name in allowable_tables:
-        print('Starting on the ' + table_name + ' table, requesting up to 500,000 rows')
-        t1 = time.time()
-        dt = 0
-        tables_with_too_many_columns = {'candidate_candidatecampaign'}
-        gulp_size = 500000 if table_name not in tables_with_too_many_columns else 100000
-        start = 0
-        end = gulp_size - 1
-
-        final_lines_count = 0
-        while end < 20000000:
-            t2 = time.time()
-            request_count = 0
-            wait_for_a_http_200 = True
-            response = {}
-
-            while wait_for_a_http_200:
-                load_successful = False
-                retry = 1
-                while not load_successful:
-                    base_url = (host + 'apis/v1/retrieveSQLTables/?table_name=' + table_name + '&start=' + str(start) +
-                                '&end=' + str(end))
-                    try:
-                        response = requests.get(host + '/apis/v1/retrieveSQLTables/',
-                                                verify=True,
-                                                params={'table_name': table_name, 'start': start, 'end': end,
-                                                        'voter_api_device_id': voter_api_device_id})
-                        print('retrieveSQLTables url: ' + response.url)
-                        request_count += 1
-                        load_successful = True
-                        if response.status_code == 200:
-                            wait_for_a_http_200 = False
-                        else:
-                            print(host + '/apis/v1/retrieveSQLTables/   (failing get response) response.status_code ' +
-                                  str(response.status_code) + '  RETRY ---- ' + base_url)
-                            continue
-                    except Exception as getErr:
-                        print(host +
-                              '/apis/v1/retrieveSQLTables/   (failing SSL connection err on get) error ' +
-                              str(getErr) + '  RETRY #' + str(retry) + '  ---- ' + base_url)
-                        retry += 1
-                        if retry < 10:
-                            continue
-
-            bytes_transferred = len(response.text)
-            structured_json = json.loads(response.text)
-            if structured_json['success'] is False:
-                print("FAILED:  Did not receive '" + table_name + " from server")
-                break
-
-            data = structured_json['files'][table_name]
-            lines = data.splitlines()
-            if len(lines) == 1:
-                dt = time.time() - t1
-                print('... Retrieved ' + "{:,}".format(final_lines_count) + ' lines from the ' + table_name +
-                      ' table (as JSON) in ' + str(int(dt)) + ' seconds)')
-                break
-            final_lines_count += len(lines)
-            print(f'... Intermediate line count from this request of {gulp_size:,} rows, returned {len(lines):,} '
-                  f'rows ({bytes_transferred:,} bytes), cumulative lines is {final_lines_count:,}')
-            update_fast_load_db(host, voter_api_device_id, table_name, len(lines))
-
-            if len(lines) > 0:
-                try:
-                    conn = psycopg2.connect(
-                        database=get_environment_variable('DATABASE_NAME'),
-                        user=get_environment_variable('DATABASE_USER'),
-                        password=get_environment_variable('DATABASE_PASSWORD'),
-                        host=get_environment_variable('DATABASE_HOST'),
-                        port=get_environment_variable('DATABASE_PORT')
-                    )
-
-                    cur = conn.cursor()
-
-                    print("... Processing rows " + "{:,}".format(start) + " through " + "{:,}".format(end) +
-                          " of table " + table_name + " data received from master server.")
-                    if start == 0:
-                        cur.execute("DELETE FROM " + table_name)  # Delete all existing data in this table
-                        conn.commit()
-                        print("... SQL executed: DELETE (all) FROM " + table_name)
-
-                    with open(os.path.join(LOCAL_TMP_PATH, table_name + '.csvTemp'), 'w') as csv_file:
-                        for s in lines:
-                            csv_file.write("%s\n" % s)
-                        csv_file.close()
-
-                    header = csv_file_to_clean_csv_file2(table_name)
-
-                    try:
-                        with open(os.path.join(LOCAL_TMP_PATH, table_name + '2.csvTemp'), 'r') as file:
-                            cur.copy_from(file, table_name, sep='|', size=16384, columns=header)
-                            file.close()
-                    except Exception as e0:
-                        print("FAILED_TABLE_INSERT: " + table_name + " -- " + str(e0))
-                    conn.commit()
-                    conn.close()
-                    dt = time.time() - t1
-                    dt2 = time.time() - t2
-                    dtc = time.time() - t0
-                    print('... Processing and inserting the chunk of 500k from ' + table_name + ' table took ' +
-                          str(int(dt2)) + ' seconds, cumulative ' + str(int(dtc)) + ' seconds')
-                    stats |= {table_name: str(int(dtc))}
-
-                except Exception as e:
-                    status += "retrieve_tables retrieve_sql_files_from_master_server caught " + str(e)
-                    logger.error(status)
-
-                finally:
-                    if table_name not in tables_with_too_many_columns:
-                        start += 500000
-                        end += 500000
-                    else:
-                        start += 100000
-                        end += 100000
-
-        # Update the last_value for this table so creating new entries doesn't
-        #  throw "django Key (id)= already exists" error
-        try:
-            conn = psycopg2.connect(
-                database=get_environment_variable('DATABASE_NAME'),
-                user=get_environment_variable('DATABASE_USER'),
-                password=get_environment_variable('DATABASE_PASSWORD'),
-                host=get_environment_variable('DATABASE_HOST'),
-                port=get_environment_variable('DATABASE_PORT')
-            )
-
-            cur = conn.cursor()
-            command = "SELECT setval('" + table_name + "_id_seq', (SELECT MAX(id) FROM \"" + table_name + "\"))"
+
+def load_table_chunk_into_local_database(conn, table_name, start, end, incremental):
+    """
+    Clean the downloaded chunk and COPY it in.  A full sync replaces the chunk's id range (the whole table for the
+    first chunk), so loading the same chunk again after an interruption is harmless.  An incremental sync replaces
+    just the rows that came back.
+    :return: the number of rows loaded
+    """
+    header, rows_written = csv_file_to_clean_csv_file2(table_name)
+    if header is None:
+        return 0
+
+    with conn.cursor() as cur, open(os.path.join(LOCAL_TMP_PATH, table_name + '2.csvTemp'), 'r') as file:
+        if incremental:
+            cur.execute("CREATE TEMP TABLE retrieve_tables_incoming (LIKE " + table_name +
+                        " INCLUDING DEFAULTS) ON COMMIT DROP")
+            cur.copy_from(file, 'retrieve_tables_incoming', sep='|', size=16384, columns=header)
+            columns = ', '.join('"' + column + '"' for column in header)
+            cur.execute("DELETE FROM " + table_name + " USING retrieve_tables_incoming WHERE " + table_name +
+                        ".id = retrieve_tables_incoming.id")
+            cur.execute("INSERT INTO " + table_name + " (" + columns + ") SELECT " + columns +
+                        " FROM retrieve_tables_incoming")
+        else:
+            if start == 0:
+                cur.execute("DELETE FROM " + table_name)  # Delete all existing data in this table
+            else:
+                cur.execute("DELETE FROM " + table_name + " WHERE id BETWEEN %s AND %s", [start, end])
+            cur.copy_from(file, table_name, sep='|', size=16384, columns=header)
+    conn.commit()
+    return rows_written
+
+
+def reset_table_id_sequence(conn, table_name):
+    """
+    Update the last_value for this table so creating new entries doesn't
+    throw "django Key (id)= already exists" error
+    """
+    status = ''
+    try:
+        cur = conn.cursor()
+        command = "SELECT setval('" + table_name + "_id_seq', (SELECT MAX(id) FROM \"" + table_name + "\"))"
+        cur.execute(command)
+        data_tuple = cur.fetchone()
+        print("... SQL executed: " + command + " and returned " + str(data_tuple[0]))
+        conn.commit()
+        if str(data_tuple[0]) != 'None':
+            command = "ALTER SEQUENCE " + table_name + "_id_seq START WITH " + str(data_tuple[0])
             cur.execute(command)
-            data_tuple = cur.fetchone()
-            print("... SQL executed: " + command + " and returned " + str(data_tuple[0]))
             conn.commit()
-            if str(data_tuple[0]) != 'None':
-                command = "ALTER SEQUENCE " + table_name + "_id_seq START WITH " + str(data_tuple[0])
-                cur.execute(command)
-                conn.commit()
+        print("... SQL executed: " + command)
+        # To confirm:  SELECT * FROM information_schema.sequences where sequence_name like 'org%'
+
+    except Exception as e:
+        conn.rollback()
+        status += "... SQL FAILED: SELECT setval('" + \
+                  table_name + "_id_seq', (SELECT MAX(id) FROM \"" + table_name + "\")): " + str(e)
+        logger.error(status)
+    return status
+
+
+def retrieve_table_from_master_server(host, voter_api_device_id, state_id, checkpoints, table_name,
+                                      changed_since=''):
+    """
+    Stream one table from the master server in id range chunks (or all the changed rows at once, when incremental),
+    saving a checkpoint after each chunk.  Several of these run at once in retrieve_sql_files_from_master_server.
+    Runs on the Local server, in a worker thread
+    """
+    status = ''
+    success = False
+    t1 = time.time()
+    incremental = positive_value_exists(changed_since)
+    gulp_size = GULP_SIZE if table_name not in TABLES_WITH_TOO_MANY_COLUMNS else GULP_SIZE_TOO_MANY_COLUMNS
+    final_lines_count = 0
+    conn = None
+    try:
+        conn = get_local_database_connection()
+        if incremental:
+            with conn.cursor() as cur:
+                cur.execute("SELECT MAX(id) FROM " + table_name)
+                since_id = convert_to_int(cur.fetchone()[0])
+            print('Starting on the ' + table_name + ' table, requesting the rows changed since ' + changed_since)
+            chunk_results = retrieve_table_chunk_from_master_server(
+                host, voter_api_device_id, table_name, 0, 0, changed_since=changed_since, since_id=since_id)
+            status += chunk_results['status']
+            if chunk_results['success']:
+                final_lines_count = load_table_chunk_into_local_database(conn, table_name, 0, 0, incremental)
+                update_fast_load_db(host, voter_api_device_id, table_name, final_lines_count)
+                success = True
+        else:
+            start = convert_to_int(checkpoints.get(table_name, {}).get('next_start', 0))
+            print('Starting on the ' + table_name + ' table at id ' + "{:,}".format(start) + ', requesting up to ' +
+                  "{:,}".format(gulp_size) + ' rows at a time')
+            max_id = None
+            while max_id is None or start <= max_id:
+                t2 = time.time()
+                end = start + gulp_size - 1
+                chunk_results = retrieve_table_chunk_from_master_server(
+                    host, voter_api_device_id, table_name, start, end)
+                status += chunk_results['status']
+                if not chunk_results['success']:
+                    break
+                max_id = chunk_results['max_id']
+                lines_count = load_table_chunk_into_local_database(conn, table_name, start, end, incremental)
+                final_lines_count += lines_count
+                start = end + 1
+                save_sync_checkpoint(state_id, checkpoints, table_name, next_start=start)
+                update_fast_load_db(host, voter_api_device_id, table_name, lines_count)
+                print('... Loaded ' + "{:,}".format(lines_count) + ' rows of ' + table_name + ' up to id ' +
+                      "{:,}".format(end) + ' in ' + str(int(time.time() - t2)) + ' seconds')
+            else:
+                success = True
+
+        if success:
+            status += reset_table_id_sequence(conn, table_name)
+            save_sync_checkpoint(state_id, checkpoints, table_name, table_complete=True)
+            status += " loaded " + table_name + ", "
+    except Exception as e:
+        status += "retrieve_tables retrieve_table_from_master_server (" + table_name + ") caught " + str(e) + " "
+        logger.error(status)
+    finally:
+        if conn is not None:
             conn.close()
-            print("... SQL executed: " + command)
-            # To confirm:  SELECT * FROM information_schema.sequences where sequence_name like 'org%'
+        connection.close()  # This thread's Django connection, used for the checkpoints
 
-        except Exception as e:
-            status += "... SQL FAILED: SELECT setval('" + \
-                      table_name + "_id_seq', (SELECT MAX(id) FROM \"" + table_name + "\")): " + str(e)
-            logger.error(status)
+    dt = time.time() - t1
+    print('... Retrieved ' + "{:,}".format(final_lines_count) + ' lines from the ' + table_name + ' table in ' +
+          str(int(dt)) + ' seconds')
+    results = {
+        'success': success,
+        'status': status,
+        'table_name': table_name,
+    }
+    return results
 
-        status += ", " + " loaded " + table_name
-        stat = 'Processing and loading table: ' + table_name + '  took ' + str(int(dt)) + ' seconds'
-        print("... " + stat)
-        status += stat
+
+def retrieve_sql_files_from_master_server(request):
+    """
+    Get the table data from the master server, and create new entries in the developers local database.
+    Several tables are transferred at once (workers, up to RETRIEVE_SQL_TABLES_WORKERS_MAXIMUM).  If a sync is
+    interrupted, calling this again resumes it from the last checkpoint (unless resume=false).  With incremental=true
+    only the rows changed since the last complete sync are pulled.
+    Runs on the Local server (developer's Mac)
+    :return:
+    """
+    status = ''
+    t0 = time.time()
+    stats = {}
+    host = RETRIEVE_SQL_TABLES_HOST
+    incremental = positive_value_exists(request.GET.get('incremental', False))
+    resume = positive_value_exists(request.GET.get('resume', True))
+    workers = convert_to_int(request.GET.get('workers', RETRIEVE_SQL_TABLES_WORKERS_DEFAULT))
+    workers = max(1, min(workers, RETRIEVE_SQL_TABLES_WORKERS_MAXIMUM))
+    voter_api_device_id = get_voter_api_device_id(request)
+
+    state, created = RetrieveTableState.objects.get_or_create(voter_api_device_id=voter_api_device_id)
+    changed_since = ''
+    if incremental:
+        if state.last_complete_sync_started_date:
+            changed_since = (state.last_complete_sync_started_date - INCREMENTAL_SYNC_OVERLAP).isoformat()
+        else:
+            status += "NO_COMPLETE_SYNC_YET_RUNNING_FULL_SYNC "
+            incremental = False
+    sync_mode = SYNC_MODE_INCREMENTAL if incremental else SYNC_MODE_FULL
+
+    checkpoints = {}
+    resuming = False
+    if resume and state.is_running and state.sync_mode == sync_mode and \
+            positive_value_exists(state.sync_checkpoints_json):
+        try:
+            checkpoints = json.loads(state.sync_checkpoints_json)
+            resuming = True
+            status += "RESUMING_SYNC "
+        except ValueError:
+            checkpoints = {}
+    if not resuming:
+        state.started_date = datetime.now(tz=timezone.utc)
+    state.is_running = True
+    state.sync_mode = sync_mode
+    state.sync_checkpoints_json = json.dumps(checkpoints)
+    state.save()
+
+    if not incremental and not resuming:
+        print(
+            'Saving off a copy of your local db (an an emergency fallback, that will almost never be needed) in \'WeVoteServerDB-*.pgsql\' files, feel free to delete them at anytime')
+        save_off_database()
+        dt = time.time() - t0
+        print('Saved off local database in ' + str(int(dt)) + ' seconds')
+        stats |= {'save_off': str(int(dt))}
+
+    if not resuming:
+        requests.get(host + '/apis/v1/fastLoadStatusRetrieve',
+                     params={"initialize": True, "voter_api_device_id": voter_api_device_id}, verify=True)
+
+    table_names = [table_name for table_name in allowable_tables
+                   if not checkpoints.get(table_name, {}).get('complete', False)]
+    failed_tables = []
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(retrieve_table_from_master_server, host, voter_api_device_id, state.id,
+                                   checkpoints, table_name, changed_since)
+                   for table_name in table_names]
+        for future in as_completed(futures):
+            table_results = future.result()
+            status += table_results['status']
+            if not table_results['success']:
+                failed_tables.append(table_results['table_name'])
+            stats |= {table_results['table_name']: str(int(time.time() - t0))}
+
+    if len(failed_tables):
+        status += "SYNC_INCOMPLETE, call again to resume these tables: " + ", ".join(failed_tables) + " "
+    else:
+        RetrieveTableState.objects.filter(id=state.id).update(
+            is_running=False,
+            sync_checkpoints_json=json.dumps({}),
+            last_complete_sync_started_date=state.started_date)
 
     minutes = (time.time() - t0)/60
 
@@ -225,7 +367,8 @@ def retrieve_sql_files_from_master_server(request):
         min1 = int(secs / 60)
         secs1 = int(secs % 60)
         print("Processing and loading table " + table + " ended at " + str(min1) + ":" + str(secs1) + "  cumulative")
-    print("Processing and loading grand total " + str(len(allowable_tables)) + " tables took {:.1f}".format(minutes) + ' minutes')
+    print("Processing and loading grand total " + str(len(table_names)) + " tables took {:.1f}".format(minutes) +
+          ' minutes')
 
     os.system('rm ' + os.path.join(LOCAL_TMP_PATH, '*.csvTemp'))    # Clean up all the temp files
 
@@ -250,11 +393,15 @@ def retrieve_sql_files_from_master_server(request):
 # hint: Access https://pg.admin.wevote.us/  (view access to the production server Postgres) can really help, ask Dale
 def csv_file_to_clean_csv_file2(table_name):
     """
-    Runs on the Master server
+    Cleans <table_name>.csvTemp into <table_name>2.csvTemp one row at a time, so a big chunk never has to fit in memory
+    Runs on the Local server
+    :return: header, rows_written
     """
-    csv_rows = []
-    with open(os.path.join(LOCAL_TMP_PATH, table_name + '.csvTemp'), 'r') as csv_file2:
+    rows_written = 0
+    with open(os.path.join(LOCAL_TMP_PATH, table_name + '.csvTemp'), 'r') as csv_file2, \
+            open(os.path.join(LOCAL_TMP_PATH, table_name + '2.csvTemp'), 'w') as csv_file:
         line_reader = csv.reader(csv_file2, delimiter='|')
+        csvwriter = csv.writer(csv_file, delimiter='|')
         header = None
 
         skipped_rows = '... Skipped rows in ' + table_name + ': '
@@ -427,7 +574,8 @@ def csv_file_to_clean_csv_file2(table_name):
                 elif table_name == 'representative_representative':
                     clean_row(row, 18)                  # 'twitter_location'
                     clean_row(row, 23)                  # 'twitter_description'
-                csv_rows.append(row)
+                csvwriter.writerow(row)
+                rows_written += 1
             except Exception as e:
                 logger.error("csv_file_to_clean_csv_file2 (" + table_name + ") caught " + str(e))
 
@@ -435,12 +583,7 @@ def csv_file_to_clean_csv_file2(table_name):
         if ',' in skipped_rows:
             print(skipped_rows + ' were skipped since they had pipe characters in the data')
 
-    with open(os.path.join(LOCAL_TMP_PATH, table_name + '2.csvTemp'), 'w') as csv_file:
-        csvwriter = csv.writer(csv_file, delimiter='|')
-        for row in csv_rows:
-            csvwriter.writerow(row)
-    csv_file.close()
-    return header
+    return header, rows_written
 
 
 def get_row_count_from_master_server():
@@ -482,5 +625,6 @@ def substitute_null(row, index, sub):
 
 def get_dummy_unique_id():
     global dummy_unique_id
-    dummy_unique_id += 1
-    return str(dummy_unique_id)
+    with dummy_unique_id_lock:  # Several tables are cleaned at once
+        dummy_unique_id += 1
+        return str(dummy_unique_id)
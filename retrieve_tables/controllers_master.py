@@ -2,13 +2,15 @@
 # Brought to you by We Vote. Be good.
 # -*- coding: UTF-8 -*-
 
+import gzip
 import json
 import re
+import tempfile
+import threading
 import time
 from datetime import datetime, timezone
-from io import StringIO
 
-import psycopg2
+from psycopg2.pool import PoolError, ThreadedConnectionPool
 from django.http import HttpResponse
 
 import wevote_functions.admin
@@ -64,133 +66,214 @@ dummy_unique_id = 10000000
 LOCAL_TMP_PATH = '/tmp/'
 
 
+RETRIEVE_SQL_TABLES_CONNECTIONS_MAXIMUM = 4   # More simultaneous requests than this get a 503, and retry
+RETRIEVE_SQL_TABLES_SPOOL_BYTES = 8 * 1024 * 1024   # Larger compressed exports are spooled to a temp file on disk
+RETRIEVE_SQL_TABLES_STREAM_CHUNK_BYTES = 64 * 1024
+RETRIEVE_SQL_TABLES_COMPRESS_LEVEL = 3
+# Tables with one of these columns can be synced incrementally by date, the others only pick up new ids
+INCREMENTAL_DATE_COLUMN_NAMES = ['date_last_changed', 'date_last_updated', 'date_updated']
+# Postgres errors which mean the export may work if tried again later: lock_not_available (lock_timeout) and
+#  query_canceled (statement_timeout). Any other error would fail again the same way.
+SERVER_BUSY_PGCODES = ['55P03', '57014']
+
+readonly_connection_pool = None
+readonly_connection_pool_lock = threading.Lock()
+incremental_date_column_by_table = {}
+
+
+def get_readonly_connection_pool():
+    """
+    One pool of connections to the readonly database per process, instead of a new connection for every request
+    Runs on the Master server
+    """
+    global readonly_connection_pool
+    with readonly_connection_pool_lock:
+        if readonly_connection_pool is None:
+            readonly_connection_pool = ThreadedConnectionPool(
+                1,
+                RETRIEVE_SQL_TABLES_CONNECTIONS_MAXIMUM,
+                database=get_environment_variable('DATABASE_NAME_READONLY'),
+                user=get_environment_variable('DATABASE_USER_READONLY'),
+                password=get_environment_variable('DATABASE_PASSWORD_READONLY'),
+                host=get_environment_variable('DATABASE_HOST_READONLY'),
+                port=get_environment_variable('DATABASE_PORT_READONLY')
+            )
+    return readonly_connection_pool
+
+
 def get_total_row_count():
     """
     Returns the total row count of tables to be fetched from the MASTER server
     Runs on the Master server
-    :return: the number of rows
+    :return: the number of rows, or None if all the readonly connections are in use
     """
-    conn = psycopg2.connect(
-        database=get_environment_variable('DATABASE_NAME_READONLY'),
-        user=get_environment_variable('DATABASE_USER_READONLY'),
-        password=get_environment_variable('DATABASE_PASSWORD_READONLY'),
-        host=get_environment_variable('DATABASE_HOST_READONLY'),
-        port=get_environment_variable('DATABASE_PORT_READONLY')
-    )
+    connection_pool = get_readonly_connection_pool()
+    try:
+        conn = connection_pool.getconn()
+    except PoolError:
+        logger.error("get_total_row_count: all readonly connections are in use")
+        return None
 
     rows = 0
-    for table_name in allowable_tables:
-        with conn.cursor() as cursor:
-            sql = "SELECT MAX(id) FROM {table_name};".format(table_name=table_name)
-            cursor.execute(sql)
-            row = cursor.fetchone()
-            if positive_value_exists(row[0]):
-                cnt = int(row[0])
-            else:
-                sql = "SELECT COUNT(*) FROM {table_name};".format(table_name=table_name)
+    try:
+        for table_name in allowable_tables:
+            with conn.cursor() as cursor:
+                cnt = 0
+                sql = "SELECT MAX(id) FROM {table_name};".format(table_name=table_name)
                 cursor.execute(sql)
                 row = cursor.fetchone()
                 if positive_value_exists(row[0]):
                     cnt = int(row[0])
-            print('get_total_row_count of table ', table_name, ' is ', cnt)
-            rows += cnt
+                else:
+                    sql = "SELECT COUNT(*) FROM {table_name};".format(table_name=table_name)
+                    cursor.execute(sql)
+                    row = cursor.fetchone()
+                    if positive_value_exists(row[0]):
+                        cnt = int(row[0])
+                print('get_total_row_count of table ', table_name, ' is ', cnt)
+                rows += cnt
+        conn.rollback()
+    finally:
+        connection_pool.putconn(conn)
 
     print('get_total_row_count is ', rows)
-
-    conn.close()
     return rows
 
 
-def retrieve_sql_tables_as_csv(voter_api_device_id, table_name, start, end):
+def fetch_incremental_date_column(cursor, table_name):
+    if table_name not in incremental_date_column_by_table:
+        cursor.execute("SELECT column_name FROM information_schema.columns WHERE table_name = %s", [table_name])
+        column_names = set(row[0] for row in cursor.fetchall())
+        incremental_date_column_by_table[table_name] = next(
+            (column_name for column_name in INCREMENTAL_DATE_COLUMN_NAMES if column_name in column_names), '')
+    return incremental_date_column_by_table[table_name]
+
+
+def generate_retrieve_sql_table_query(table_name, start=0, end=0, date_column='', changed_since='', since_id=0):
+    """
+    The SELECT that is wrapped in COPY ... TO STDOUT. table_name must already be checked against allowable_tables.
+    In incremental mode (changed_since or since_id) only rows changed since that date, or with an id above since_id,
+    are returned.
+    :return: sql, params
+    """
+    conditions = []
+    params = []
+    if positive_value_exists(end):
+        conditions.append("id BETWEEN %s AND %s")
+        params += [convert_to_int(start), convert_to_int(end)]
+    incremental_conditions = []
+    if positive_value_exists(changed_since) and positive_value_exists(date_column):
+        incremental_conditions.append(date_column + " >= %s")
+        params.append(changed_since)
+    if positive_value_exists(since_id):
+        incremental_conditions.append("id > %s")
+        params.append(convert_to_int(since_id))
+    if len(incremental_conditions):
+        conditions.append("(" + " OR ".join(incremental_conditions) + ")")
+
+    sql = "SELECT * FROM public." + table_name
+    if len(conditions):
+        sql += " WHERE " + " AND ".join(conditions)
+    sql += " ORDER BY id"
+    return sql, params
+
+
+def retrieve_sql_table_as_gzip_csv_file(table_name, start=0, end=0, changed_since='', since_id=0):
     """
-    Extract one of the approximately 21 allowable database tables to CSV (pipe delimited) and send it to the
-    developer's local WeVoteServer instance
-    limit is used to specify a number of rows to return (this is the SQL LIMIT clause), non-zero or ignored
-    offset is used to specify the first row to return (this is the SQL OFFSET clause), non-zero or ignored
+    COPY one of the allowable tables (or the start..end id range of it) to a gzip compressed, pipe delimited CSV file,
+    to be streamed to the developer's local WeVoteServer instance.  The file is held in memory up to
+    RETRIEVE_SQL_TABLES_SPOOL_BYTES and on disk beyond that, so a big table never has to fit in memory.
     Note July 2022, re Joe:  This call to `https://api.wevoteusa.org/apis/v1/retrieveSQLTables/` has been moved from a
     "normal" API server (which was timing out) to a "process" API server with an 1800-second timeout.
+    Runs on the Master server
     """
-    t0 = time.time()
-
     status = ''
+    csv_gzip_file = None
+    max_id = 0
+    server_busy = False
+    success = False
 
-    csv_files = {}
-    try:
-        conn = psycopg2.connect(
-            database=get_environment_variable('DATABASE_NAME_READONLY'),
-            user=get_environment_variable('DATABASE_USER_READONLY'),
-            password=get_environment_variable('DATABASE_PASSWORD_READONLY'),
-            host=get_environment_variable('DATABASE_HOST_READONLY'),
-            port=get_environment_variable('DATABASE_PORT_READONLY')
-        )
-
-        # logger.debug("retrieve_sql_tables_as_csv psycopg2 Connected to DB")
-
-        print('retrieve_sql_tables_as_csv "', table_name + '"')
-        print('retrieve_sql_tables_as_csv if table_name in allowable_tables ' + str(table_name in allowable_tables))
-        if table_name in allowable_tables:
-            try:
-                cur = conn.cursor()
-                file = StringIO()  # Empty file
-
-                # logger.error("experiment: REAL FILE ALLOWED FOR file: " + table_name)
-                if positive_value_exists(end):
-                    sql = "COPY (SELECT * FROM public." + table_name + " WHERE id BETWEEN " + start + " AND " + \
-                          end + " ORDER BY id) TO STDOUT WITH DELIMITER '|' CSV HEADER NULL '\\N'"
-                else:
-                    sql = "COPY " + table_name + " TO STDOUT WITH DELIMITER '|' CSV HEADER NULL '\\N'"
-                # logger.error("experiment: retrieve_tables sql: " + sql)
-                cur.copy_expert(sql, file, size=8192)
-                # logger.error("experiment: after cur.copy_expert ")
-                file.seek(0)
-                # logger.error("experiment: retrieve_tables file contents: " + file.readline().strip())
-                file.seek(0)
-                csv_files[table_name] = file.read()
-                # table_st = csv_files[table_name]
-                # for i in range(0, 100000, 150):    # c type for loop for(i=0; i < 10000; i+= 150)
-                #     print(table_str[i:i+150])
-
-                file.close()
-                # logger.error("experiment: after file close, status " + status)
-                if "exported" not in status:
-                    status += "exported "
-                status += table_name + "(" + start + "," + end + "), "
-                # logger.error("experiment: after status +=, " + status)
-                # logger.error("experiment: before conn.commit")
-                conn.commit()
-                # logger.error("experiment: after conn.commit ")
-                conn.close()
-                # logger.error("experiment: after conn.close ")
-                dt = time.time() - t0
-                logger.error('Extracting the "' + table_name + '" table took ' + "{:.3f}".format(dt) +
-                             ' seconds.  start = ' + start + ', end = ' + end)
-            except Exception as e:
-                logger.error("Real exception in retrieve_sql_tables_as_csv(): " + str(e) + " ")
-        else:
-            status = "the table_name '" + table_name + "' is not in the table list, therefore no table was returned"
-            logger.error(status)
-
-        # logger.error("experiment: before results")
+    if table_name not in allowable_tables:
+        status += "the table_name '" + str(table_name) + "' is not in the table list, therefore no table was returned"
+        logger.error(status)
         results = {
-            'success': True,
+            'success': False,
             'status': status,
-            'files': csv_files,
+            'server_busy': False,
+            'csv_gzip_file': None,
+            'max_id': 0,
         }
-
-        # logger.error("experiment: results returned")
         return results
 
-    # run `pg_dump -f /dev/null wevotedev` on the server to evaluate for a corrupted file
-    except Exception as e:
-        status += "retrieve_tables export_sync_files_to_csv caught " + str(e)
-        logger.error(status)
-        logger.error("retrieve_tables export_sync_files_to_csv caught " + str(e))
+    connection_pool = get_readonly_connection_pool()
+    try:
+        conn = connection_pool.getconn()
+    except PoolError:
+        status += "RETRIEVE_SQL_TABLES_ALL_CONNECTIONS_IN_USE "
         results = {
             'success': False,
             'status': status,
+            'server_busy': True,
+            'csv_gzip_file': None,
+            'max_id': 0,
         }
         return results
 
+    t0 = time.time()
+    close_connection = False
+    try:
+        with conn.cursor() as cursor:
+            date_column = fetch_incremental_date_column(cursor, table_name)
+            sql, params = generate_retrieve_sql_table_query(
+                table_name, start=start, end=end, date_column=date_column, changed_since=changed_since,
+                since_id=since_id)
+            copy_sql = "COPY (" + cursor.mogrify(sql, params).decode('utf-8') + \
+                       ") TO STDOUT WITH DELIMITER '|' CSV HEADER NULL '\\N'"
+            csv_gzip_file = tempfile.SpooledTemporaryFile(max_size=RETRIEVE_SQL_TABLES_SPOOL_BYTES)
+            with gzip.GzipFile(fileobj=csv_gzip_file, mode='wb',
+                               compresslevel=RETRIEVE_SQL_TABLES_COMPRESS_LEVEL) as gzip_file:
+                cursor.copy_expert(copy_sql, gzip_file, size=RETRIEVE_SQL_TABLES_STREAM_CHUNK_BYTES)
+            cursor.execute("SELECT MAX(id) FROM public." + table_name)
+            max_id = convert_to_int(cursor.fetchone()[0])
+        conn.rollback()  # Only read, so just end the transaction before the connection goes back to the pool
+        csv_gzip_file.seek(0)
+        success = True
+        status += "exported " + table_name + "(" + str(start) + "," + str(end) + ") "
+        dt = time.time() - t0
+        logger.info('Extracting the "' + table_name + '" table took ' + "{:.3f}".format(dt) +
+                    ' seconds.  start = ' + str(start) + ', end = ' + str(end))
+    except Exception as e:
+        # run `pg_dump -f /dev/null wevotedev` on the server to evaluate for a corrupted file
+        close_connection = True
+        server_busy = getattr(e, 'pgcode', None) in SERVER_BUSY_PGCODES
+        if csv_gzip_file is not None:
+            csv_gzip_file.close()
+            csv_gzip_file = None
+        status += "retrieve_sql_table_as_gzip_csv_file caught " + str(e) + " "
+        logger.error(status)
+    finally:
+        connection_pool.putconn(conn, close=close_connection)
+
+    results = {
+        'success': success,
+        'status': status,
+        'server_busy': server_busy,
+        'csv_gzip_file': csv_gzip_file,
+        'max_id': max_id,
+    }
+    return results
+
+
+def stream_file_and_close(file, chunk_bytes=RETRIEVE_SQL_TABLES_STREAM_CHUNK_BYTES):
+    try:
+        while True:
+            data = file.read(chunk_bytes)
+            if not data:
+                break
+            yield data
+    finally:
+        file.close()
+
 
 def dump_row_col_labels_and_errors(table_name, header, row, index):
     if row[0] == index:
@@ -224,6 +307,9 @@ def fast_load_status_retrieve(request):   # fastLoadStatusRetrieve
     try:
         if initialize:
             total = get_total_row_count()
+            if total is None:
+                status += "RETRIEVE_SQL_TABLES_ALL_CONNECTIONS_IN_USE "
+                total = 0
             started = datetime.now(tz=timezone.utc)
             row, success = RetrieveTableState.objects.update_or_create(
                 voter_api_device_id=voter_api_device_id,
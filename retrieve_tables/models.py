@@ -15,3 +15,10 @@ class RetrieveTableState(models.Model):
     total_records = models.PositiveIntegerField(verbose_name="Total records to be exported", default=0)
     voter_api_device_id = models.CharField(verbose_name='voter_api_device_id', max_length=255, null=True, unique=True,
                                            db_index=True)
+    # Used on the developer's local server, so an interrupted sync from the master server can resume
+    sync_mode = models.CharField(verbose_name="full or incremental", max_length=20, null=True, blank=True)
+    sync_checkpoints_json = models.TextField(verbose_name="Per table next start id, and completed tables",
+                                             null=True, blank=True)
+    last_complete_sync_started_date = models.DateTimeField(
+        verbose_name='Start of the last sync that completed, incremental syncs pull the rows changed since then',
+        null=True, blank=True)
@@ -0,0 +1,52 @@
+# retrieve_tables/tests.py
+# Brought to you by We Vote. Be good.
+# -*- coding: UTF-8 -*-
+
+from unittest import mock
+from django.test import SimpleTestCase
+import retrieve_tables.controllers_master
+from retrieve_tables.controllers_master import generate_retrieve_sql_table_query, retrieve_sql_table_as_gzip_csv_file
+
+
+class FakeDatabaseError(Exception):
+    def __init__(self, pgcode):
+        super().__init__('fake database error ' + pgcode)
+        self.pgcode = pgcode
+
+
+class RetrieveTablesTests(SimpleTestCase):
+
+    def test_full_chunk_query(self):
+        sql, params = generate_retrieve_sql_table_query('party_party', start=0, end=499999)
+        self.assertEqual(sql, "SELECT * FROM public.party_party WHERE id BETWEEN %s AND %s ORDER BY id")
+        self.assertEqual(params, [0, 499999])
+
+        sql, params = generate_retrieve_sql_table_query('party_party')
+        self.assertEqual(sql, "SELECT * FROM public.party_party ORDER BY id")
+        self.assertEqual(params, [])
+
+    def test_incremental_query(self):
+        sql, params = generate_retrieve_sql_table_query(
+            'issue_issue', date_column='date_last_changed', changed_since='2024-09-01T00:00:00+00:00', since_id=42)
+        self.assertEqual(sql, "SELECT * FROM public.issue_issue WHERE (date_last_changed >= %s OR id > %s) "
+                              "ORDER BY id")
+        self.assertEqual(params, ['2024-09-01T00:00:00+00:00', 42])
+
+        # Without a date column only new rows can be found
+        sql, params = generate_retrieve_sql_table_query(
+            'party_party', changed_since='2024-09-01T00:00:00+00:00', since_id=42)
+        self.assertEqual(sql, "SELECT * FROM public.party_party WHERE (id > %s) ORDER BY id")
+        self.assertEqual(params, [42])
+
+    @mock.patch.object(retrieve_tables.controllers_master, 'get_readonly_connection_pool')
+    @mock.patch.object(retrieve_tables.controllers_master, 'fetch_incremental_date_column')
+    def test_only_timeouts_are_server_busy(self, fetch_incremental_date_column, get_readonly_connection_pool):
+        fetch_incremental_date_column.side_effect = FakeDatabaseError('55P03')  # lock_not_available
+        results = retrieve_sql_table_as_gzip_csv_file('party_party')
+        self.assertFalse(results['success'])
+        self.assertTrue(results['server_busy'])
+
+        fetch_incremental_date_column.side_effect = FakeDatabaseError('42703')  # undefined_column
+        results = retrieve_sql_table_as_gzip_csv_file('party_party')
+        self.assertFalse(results['success'])
+        self.assertFalse(results['server_busy'])
@@ -4,9 +4,13 @@
 
 from candidate.models import CandidateManager
 from config.base import get_environment_variable
+from django.db.models import Q
 from elasticsearch import Elasticsearch
 from organization.models import OrganizationManager
-from politician.models import PoliticianManager
+from politician.models import Politician
+from search.models import fetch_politician_search_name, fetch_search_index, KIND_OF_OWNER_CANDIDATE, \
+    KIND_OF_OWNER_MEASURE, KIND_OF_OWNER_ORGANIZATION, KIND_OF_OWNER_POLITICIAN, SEARCH_RESULTS_LIMIT_DEFAULT, \
+    SEARCH_RESULTS_LIMIT_MAXIMUM
 from voter.models import fetch_voter_id_from_voter_device_link
 import wevote_functions.admin
 from wevote_functions.functions import is_voter_device_id_valid, positive_value_exists
@@ -15,12 +19,61 @@ logger = wevote_functions.admin.get_logger(__name__)
 ELASTIC_SEARCH_CONNECTION_STRING = get_environment_variable("ELASTIC_SEARCH_CONNECTION_STRING")
 
 
-def search_all_for_api(text_from_search_field='', voter_device_id='', search_scope_list=[]):
-    """
+# search_scope_list options, and the kinds of results they include
+SEARCH_SCOPE_KIND_OF_OWNER_DICT = {
+    'PN':   KIND_OF_OWNER_POLITICIAN,     # POLITICIAN_NAME
+    'CN':   KIND_OF_OWNER_CANDIDATE,      # CANDIDATE_NAME
+    'ON':   KIND_OF_OWNER_ORGANIZATION,   # ORGANIZATION_NAME
+    'MN':   KIND_OF_OWNER_MEASURE,        # MEASURE_NAME
+}
+
 
+def search_politicians_in_database(text_from_search_field, offset=0, limit=SEARCH_RESULTS_LIMIT_DEFAULT):
+    """
+    searchAll when there are too many documents for the in-process SearchIndex: politicians with every word in their
+    name or one of their twitter handles, by name
+    :return: (total matching politician count, list of search results for this page)
+    """
+    queryset = Politician.objects.using('readonly').all()
+    for one_word in text_from_search_field.split():
+        queryset = queryset.filter(
+            Q(politician_name__icontains=one_word) | Q(politician_twitter_handle__icontains=one_word) |
+            Q(politician_twitter_handle2__icontains=one_word) | Q(politician_twitter_handle3__icontains=one_word) |
+            Q(politician_twitter_handle4__icontains=one_word) | Q(politician_twitter_handle5__icontains=one_word))
+    total_count = queryset.count()
+    search_results = []
+    for one_politician in queryset.order_by('politician_name', 'id')[max(0, offset):max(0, offset) + limit]:
+        search_results.append({
+            'result_title':             fetch_politician_search_name(one_politician),
+            'result_image':             one_politician.we_vote_hosted_profile_image_url_medium,
+            'result_subtitle':          "",
+            'result_summary':           "",
+            'result_score':             0,
+            'link_internal':            '',
+            'kind_of_owner':            KIND_OF_OWNER_POLITICIAN,
+            'google_civic_election_id': 0,
+            'state_code':               one_politician.state_code,
+            'twitter_handle':           one_politician.politician_twitter_handle,
+            'twitter_handle2':          one_politician.politician_twitter_handle2,
+            'twitter_handle3':          one_politician.politician_twitter_handle3,
+            'twitter_handle4':          one_politician.politician_twitter_handle4,
+            'twitter_handle5':          one_politician.politician_twitter_handle5,
+            'we_vote_id':               one_politician.we_vote_id,
+            'local_id':                 one_politician.id,
+        })
+    return total_count, search_results
+
+
+def search_all_for_api(text_from_search_field='', voter_device_id='', search_scope_list=[],
+                       offset=0, limit=SEARCH_RESULTS_LIMIT_DEFAULT):
+    """
+    Ranked search across politicians, upcoming candidates, organizations and upcoming measures, from the
+    in-process SearchIndex (see search/models.py). Without one, only politicians are searched, in the database.
     :param text_from_search_field:
     :param voter_device_id:
     :param search_scope_list:
+    :param offset:
+    :param limit:
     :return:
     """
     if not positive_value_exists(text_from_search_field):
@@ -31,6 +84,9 @@ def search_all_for_api(text_from_search_field='', voter_device_id='', search_sco
             'voter_device_id':          voter_device_id,
             'search_results_found':     False,
             'search_results':           [],
+            'search_results_total':     0,
+            'offset':                   offset,
+            'limit':                    limit,
         }
         return results
 
@@ -44,6 +100,9 @@ def search_all_for_api(text_from_search_field='', voter_device_id='', search_sco
             'voter_device_id':          voter_device_id,
             'search_results_found':     False,
             'search_results':           [],
+            'search_results_total':     0,
+            'offset':                   offset,
+            'limit':                    limit,
         }
         return results
 
@@ -56,41 +115,52 @@ def search_all_for_api(text_from_search_field='', voter_device_id='', search_sco
             'voter_device_id':          voter_device_id,
             'search_results_found':     False,
             'search_results':           [],
+            'search_results_total':     0,
+            'offset':                   offset,
+            'limit':                    limit,
         }
         return results
 
-    # Example of querying ALL indexes
     search_results = []
     search_count = 0
+    total_count = 0
     status = ""
-    politician_manager = PoliticianManager()
+    if not positive_value_exists(limit):
+        limit = SEARCH_RESULTS_LIMIT_DEFAULT
+    limit = min(limit, SEARCH_RESULTS_LIMIT_MAXIMUM)
+    kind_of_owner_list = [SEARCH_SCOPE_KIND_OF_OWNER_DICT[search_scope] for search_scope in search_scope_list
+                          if search_scope in SEARCH_SCOPE_KIND_OF_OWNER_DICT]
     try:
-        results = politician_manager.search_politicians(name_search_terms=text_from_search_field)
-        politician_search_results_list = results['politician_search_results_list']
-        success = results['success']
-        if not positive_value_exists(success):
-            status += results['status']
-        for one_politician in politician_search_results_list:
-            # link_internal = "/office/" + one_search_result_dict['we_vote_id']
-            link_internal = ''
-
+        search_index = fetch_search_index()
+        if search_index is None:
+            scored_document_list = []
+            if not kind_of_owner_list or KIND_OF_OWNER_POLITICIAN in kind_of_owner_list:
+                total_count, search_results = search_politicians_in_database(
+                    text_from_search_field, offset=offset, limit=limit)
+                search_count = len(search_results)
+            status += "SEARCH_ALL_FROM_DATABASE "
+        else:
+            total_count, scored_document_list = search_index.search(
+                text_from_search_field, kind_of_owner_list=kind_of_owner_list, offset=offset, limit=limit)
+        for score, one_document in scored_document_list:
+            twitter_handle_list = one_document['twitter_handle_list'] + [''] * 5
             one_search_result = {
-                'result_title':             one_politician.display_full_name(),
-                'result_image':             one_politician.we_vote_hosted_profile_image_url_medium,
-                'result_subtitle':          "",
+                'result_title':             one_document['title'],
+                'result_image':             one_document['image'],
+                'result_subtitle':          one_document['subtitle'],
                 'result_summary':           "",
-                'result_score':             0,
-                'link_internal':            link_internal,
-                'kind_of_owner':            "POLITICIAN",
-                'google_civic_election_id': 0,
-                'state_code':               one_politician.state_code,
-                'twitter_handle':           one_politician.politician_twitter_handle,
-                'twitter_handle2':          one_politician.politician_twitter_handle2,
-                'twitter_handle3':          one_politician.politician_twitter_handle3,
-                'twitter_handle4':          one_politician.politician_twitter_handle4,
-                'twitter_handle5':          one_politician.politician_twitter_handle5,
-                'we_vote_id':               one_politician.we_vote_id,
-                'local_id':                 one_politician.id,
+                'result_score':             score,
+                'link_internal':            '',
+                'kind_of_owner':            one_document['kind_of_owner'],
+                'google_civic_election_id': one_document['google_civic_election_id'],
+                'state_code':               one_document['state_code'],
+                'twitter_handle':           twitter_handle_list[0],
+                'twitter_handle2':          twitter_handle_list[1],
+                'twitter_handle3':          twitter_handle_list[2],
+                'twitter_handle4':          twitter_handle_list[3],
+                'twitter_handle5':          twitter_handle_list[4],
+                'we_vote_id':               one_document['we_vote_id'],
+                'local_id':                 one_document['local_id'],
             }
             search_results.append(one_search_result)
             search_count += 1
@@ -99,7 +169,7 @@ def search_all_for_api(text_from_search_field='', voter_device_id='', search_sco
         success = True
 
     except Exception as e:
-        status = 'POLITICIAN_SEARCH: ' + str(e) + " "
+        status = 'SEARCH_ALL_INDEX: ' + str(e) + " "
         success = False
 
     results = {
@@ -109,6 +179,9 @@ def search_all_for_api(text_from_search_field='', voter_device_id='', search_sco
         'voter_device_id':          voter_device_id,
         'search_results_found':     True if search_count > 0 else False,
         'search_results':           search_results,
+        'search_results_total':     total_count,
+        'offset':                   offset,
+        'limit':                    limit,
     }
     return results
 
@@ -0,0 +1,73 @@
+import random
+import string
+import time
+
+from django.core.management.base import BaseCommand
+
+from search.models import fetch_search_index, KIND_OF_OWNER_CANDIDATE, KIND_OF_OWNER_ORGANIZATION, \
+    KIND_OF_OWNER_POLITICIAN, SEARCH_WEIGHT_NAME, SEARCH_WEIGHT_TWITTER_HANDLE, SearchIndex
+
+
+class Command(BaseCommand):
+    help = 'Times building the search index and searching it, on a synthetic production-sized fixture ' \
+           'or with --database on the real politician, candidate, organization and measure tables'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--documents', type=int, default=500000,
+                            help='Number of synthetic politicians, candidates and organizations to index')
+        parser.add_argument('--searches', type=int, default=1000, help='Number of searches to time')
+        parser.add_argument('--database', action='store_true', help='Index the readonly database instead')
+
+    def handle(self, *args, **options):
+        random.seed(42)
+        name_list = [''.join(random.choice(string.ascii_lowercase) for _ in range(random.randint(3, 10))).title()
+                     for _ in range(60000)]
+
+        t0 = time.perf_counter()
+        if options['database']:
+            search_index = fetch_search_index()
+            if search_index is None:
+                self.stdout.write('more than SEARCH_INDEX_MAXIMUM_DOCUMENTS documents, so searchAll searches the '
+                                  'database instead of an index')
+                return
+        else:
+            kind_of_owner_list = [KIND_OF_OWNER_POLITICIAN, KIND_OF_OWNER_CANDIDATE, KIND_OF_OWNER_ORGANIZATION]
+            document_list = []
+            for local_id in range(options['documents']):
+                title = random.choice(name_list) + ' ' + random.choice(name_list)
+                twitter_handle = random.choice(name_list) + random.choice(name_list)
+                document_list.append({
+                    'kind_of_owner':            kind_of_owner_list[local_id % 3],
+                    'local_id':                 local_id,
+                    'we_vote_id':               'wv01pol' + str(local_id),
+                    'title':                    title,
+                    'subtitle':                 '',
+                    'image':                    '',
+                    'state_code':               '',
+                    'google_civic_election_id': 0,
+                    'twitter_handle_list':      [twitter_handle],
+                    'searchable_text_list':     [(title, SEARCH_WEIGHT_NAME),
+                                                 (twitter_handle, SEARCH_WEIGHT_TWITTER_HANDLE)],
+                })
+            search_index = SearchIndex(document_list)
+        build_seconds = time.perf_counter() - t0
+        self.stdout.write('indexed {count} documents in {seconds:.2f} s'.format(
+            count=search_index.document_count(), seconds=build_seconds))
+
+        # Mix of whole names, first and last name together, and the partial words people type while searching
+        search_text_list = []
+        for _ in range(options['searches']):
+            name = random.choice(name_list)
+            search_text_list.append(random.choice([
+                name, name[:random.randint(2, len(name))], name + ' ' + random.choice(name_list)[:3]]))
+        elapsed_list = []
+        for search_text in search_text_list:
+            t0 = time.perf_counter()
+            search_index.search(search_text)
+            elapsed_list.append(time.perf_counter() - t0)
+        elapsed_list.sort()
+        self.stdout.write('{count} searches: median {median:.2f} ms, p95 {p95:.2f} ms, max {max:.2f} ms'.format(
+            count=len(elapsed_list),
+            median=elapsed_list[len(elapsed_list) // 2] * 1000,
+            p95=elapsed_list[int(len(elapsed_list) * 0.95)] * 1000,
+            max=elapsed_list[-1] * 1000))
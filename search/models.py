@@ -2,8 +2,13 @@
 # Brought to you by We Vote. Be good.
 # -*- coding: UTF-8 -*-
 
+import re
+import sys
+import threading
+import time
+from bisect import bisect_left, insort
 from ballot.models import BallotReturnedManager
-from config.base import get_environment_variable
+from config.base import get_environment_variable, get_environment_variable_default
 from candidate.models import CandidateCampaign
 from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
@@ -11,9 +16,11 @@ from elasticsearch import Elasticsearch
 from election.models import Election
 from measure.models import ContestMeasure
 from office.models import ContestOffice
-from organization.models import Organization
+from organization.models import INDIVIDUAL, Organization
+from politician.models import Politician
 import wevote_functions.admin
-from wevote_functions.functions import positive_value_exists
+from wevote_functions.functions import convert_to_int, positive_value_exists
+from wevote_functions.functions_date import get_current_date_as_integer
 
 logger = wevote_functions.admin.get_logger(__name__)
 STATE_CODE_MAP = {
@@ -95,6 +102,416 @@ if positive_value_exists(ELASTIC_SEARCH_CONNECTION_STRING):
     )
 
 
+KIND_OF_OWNER_CANDIDATE = 'CANDIDATE'
+KIND_OF_OWNER_MEASURE = 'MEASURE'
+KIND_OF_OWNER_ORGANIZATION = 'ORGANIZATION'
+KIND_OF_OWNER_POLITICIAN = 'POLITICIAN'
+# Each worker keeps its own index, about 1.5 KB per document, and twice that while it rebuilds. With more documents
+#  than SEARCH_INDEX_MAXIMUM_DOCUMENTS to index, searchAll searches the politician table instead.
+SEARCH_INDEX_MAXIMUM_DOCUMENTS = \
+    convert_to_int(get_environment_variable_default('SEARCH_INDEX_MAXIMUM_DOCUMENTS', 250000))
+# Saves only update the index in the worker which made them, so other workers can be this far behind
+SEARCH_INDEX_MAXIMUM_AGE_IN_SECONDS = \
+    convert_to_int(get_environment_variable_default('SEARCH_INDEX_MAXIMUM_AGE_IN_SECONDS', 600))
+SEARCH_RESULTS_LIMIT_DEFAULT = 20
+SEARCH_RESULTS_LIMIT_MAXIMUM = 100
+# Words shorter than this only match whole words, so "a" doesn't expand to every word starting with "a"
+SEARCH_PREFIX_MINIMUM_LENGTH = 2
+SEARCH_PREFIX_EXPANSION_LIMIT = 500
+# A name or title counts more than a twitter handle, which counts more than a subtitle
+SEARCH_WEIGHT_NAME = 3.0
+SEARCH_WEIGHT_TWITTER_HANDLE = 2.0
+SEARCH_WEIGHT_SUBTITLE = 1.0
+# A word that only matches the start of a longer word counts this much of a whole word match
+SEARCH_PREFIX_MATCH_FACTOR = 0.5
+
+
+def tokenize_search_text(text, split_camel_case=False):
+    """
+    Lower case words in text. When indexing, split_camel_case also adds the parts of words like "SenWarren",
+    so a search for "warren" finds the twitter handle.
+    """
+    if not positive_value_exists(text):
+        return []
+    word_list = []
+    for word in re.findall(r'\w+', str(text)):
+        word_list.append(word.lower())
+        if split_camel_case:
+            word_part_list = re.findall(r'[A-Z]?[a-z]+|[A-Z]+(?![a-z])|[0-9]+', word)
+            if len(word_part_list) > 1:
+                word_list += [word_part.lower() for word_part in word_part_list]
+    return word_list
+
+
+class SearchIndex(object):
+    """
+    Inverted index from lower case word to the politicians, candidates, organizations and measures that contain it,
+    so searchAll can rank and page results without an icontains scan of each table.
+    Each document is a dict with 'kind_of_owner', 'local_id', 'we_vote_id', 'title', 'subtitle', 'image',
+    'state_code', 'google_civic_election_id', 'twitter_handle_list' and 'searchable_text_list',
+    a list of (text, weight).
+    """
+
+    def __init__(self, document_list=[]):
+        self.document_dict = {}     # key = (kind_of_owner, local_id), value = document
+        self.postings = {}          # key = word, value = {document key: weight}
+        self.sorted_words = []
+        self.date_built = time.time()
+        self.lock = threading.RLock()
+        for document in document_list:
+            self.add_document(document, keep_words_sorted=False)
+        self.sorted_words = sorted(self.postings)
+
+    def is_expired(self):
+        return time.time() - self.date_built > SEARCH_INDEX_MAXIMUM_AGE_IN_SECONDS
+
+    def document_count(self):
+        return len(self.document_dict)
+
+    @staticmethod
+    def document_words(document):
+        word_weights = {}
+        for text, weight in document['searchable_text_list']:
+            for word in tokenize_search_text(text, split_camel_case=True):
+                if weight > word_weights.get(word, 0):
+                    word_weights[word] = weight
+        return word_weights
+
+    def add_document(self, document, keep_words_sorted=True):
+        document_key = (document['kind_of_owner'], document['local_id'])
+        with self.lock:
+            self.remove_document(document['kind_of_owner'], document['local_id'])
+            self.document_dict[document_key] = document
+            for word, weight in self.document_words(document).items():
+                if word not in self.postings:
+                    self.postings[word] = {}
+                    if keep_words_sorted:
+                        insort(self.sorted_words, word)
+                self.postings[word][document_key] = weight
+
+    def remove_document(self, kind_of_owner, local_id):
+        document_key = (kind_of_owner, local_id)
+        with self.lock:
+            document = self.document_dict.pop(document_key, None)
+            if document is None:
+                return
+            for word in self.document_words(document):
+                word_postings = self.postings.get(word)
+                if word_postings is not None:
+                    word_postings.pop(document_key, None)
+                    # Empty postings stay in sorted_words; they cost a dict lookup until the next rebuild
+
+    def score_word(self, word):
+        word_scores = {}
+        if len(word) < SEARCH_PREFIX_MINIMUM_LENGTH:
+            for document_key, weight in self.postings.get(word, {}).items():
+                word_scores[document_key] = weight
+            return word_scores
+        position = bisect_left(self.sorted_words, word)
+        expansion_count = 0
+        while position < len(self.sorted_words) and expansion_count < SEARCH_PREFIX_EXPANSION_LIMIT:
+            indexed_word = self.sorted_words[position]
+            if not indexed_word.startswith(word):
+                break
+            factor = 1.0 if indexed_word == word else SEARCH_PREFIX_MATCH_FACTOR
+            for document_key, weight in self.postings.get(indexed_word, {}).items():
+                score = weight * factor
+                if score > word_scores.get(document_key, 0):
+                    word_scores[document_key] = score
+            position += 1
+            expansion_count += 1
+        return word_scores
+
+    def search(self, text_from_search_field, kind_of_owner_list=None, offset=0, limit=SEARCH_RESULTS_LIMIT_DEFAULT):
+        """
+        Every word in the search text has to match a word (or the start of a word) in the document.
+        :return: (total matching document count, list of (score, document) for this page, best first)
+        """
+        search_words = tokenize_search_text(text_from_search_field)
+        if not search_words:
+            return 0, []
+        limit = max(0, min(limit, SEARCH_RESULTS_LIMIT_MAXIMUM))
+        offset = max(0, offset)
+        with self.lock:
+            document_scores = None
+            # Start with the rarest word, so the intersection stays small
+            for word_scores in sorted((self.score_word(word) for word in set(search_words)), key=len):
+                if document_scores is None:
+                    document_scores = dict(word_scores)
+                else:
+                    document_scores = {document_key: score + word_scores[document_key]
+                                       for document_key, score in document_scores.items()
+                                       if document_key in word_scores}
+                if not document_scores:
+                    return 0, []
+            if kind_of_owner_list:
+                document_scores = {document_key: score for document_key, score in document_scores.items()
+                                   if document_key[0] in kind_of_owner_list}
+            ranked = sorted(document_scores.items(),
+                            key=lambda item: (-item[1], self.document_dict[item[0]]['title'].lower()))
+            return len(ranked), [(round(score, 3), self.document_dict[document_key])
+                                 for document_key, score in ranked[offset:offset + limit]]
+
+
+def fetch_politician_search_name(politician):
+    # display_full_name adds first_name and last_name together even when one of them is None
+    try:
+        return politician.display_full_name() or ''
+    except TypeError:
+        return " ".join(name for name in (politician.first_name, politician.last_name) if name)
+
+
+def generate_search_document_from_politician(politician):
+    twitter_handle_list = [handle for handle in (
+        politician.politician_twitter_handle, politician.politician_twitter_handle2,
+        politician.politician_twitter_handle3, politician.politician_twitter_handle4,
+        politician.politician_twitter_handle5) if positive_value_exists(handle)]
+    return {
+        'kind_of_owner':            KIND_OF_OWNER_POLITICIAN,
+        'local_id':                 politician.id,
+        'we_vote_id':               politician.we_vote_id,
+        'title':                    fetch_politician_search_name(politician),
+        'subtitle':                 '',
+        'image':                    politician.we_vote_hosted_profile_image_url_medium,
+        'state_code':               politician.state_code,
+        'google_civic_election_id': 0,
+        'twitter_handle_list':      twitter_handle_list,
+        'searchable_text_list':     [(fetch_politician_search_name(politician), SEARCH_WEIGHT_NAME),
+                                     (politician.google_civic_candidate_name, SEARCH_WEIGHT_NAME)] +
+                                    [(handle, SEARCH_WEIGHT_TWITTER_HANDLE) for handle in twitter_handle_list],
+    }
+
+
+def generate_search_document_from_candidate(candidate):
+    return {
+        'kind_of_owner':            KIND_OF_OWNER_CANDIDATE,
+        'local_id':                 candidate.id,
+        'we_vote_id':               candidate.we_vote_id,
+        'title':                    candidate.candidate_name or '',
+        'subtitle':                 candidate.party or '',
+        'image':                    candidate.we_vote_hosted_profile_image_url_medium,
+        'state_code':               candidate.state_code,
+        'google_civic_election_id': convert_to_int(candidate.google_civic_election_id),
+        'twitter_handle_list':      [candidate.candidate_twitter_handle]
+        if positive_value_exists(candidate.candidate_twitter_handle) else [],
+        'searchable_text_list':     [(candidate.candidate_name, SEARCH_WEIGHT_NAME),
+                                     (candidate.candidate_twitter_handle, SEARCH_WEIGHT_TWITTER_HANDLE),
+                                     (candidate.party, SEARCH_WEIGHT_SUBTITLE)],
+    }
+
+
+def generate_search_document_from_organization(organization):
+    return {
+        'kind_of_owner':            KIND_OF_OWNER_ORGANIZATION,
+        'local_id':                 organization.id,
+        'we_vote_id':               organization.we_vote_id,
+        'title':                    organization.organization_name or '',
+        'subtitle':                 '',
+        'image':                    organization.we_vote_hosted_profile_image_url_medium,
+        'state_code':               organization.state_served_code,
+        'google_civic_election_id': 0,
+        'twitter_handle_list':      [organization.organization_twitter_handle]
+        if positive_value_exists(organization.organization_twitter_handle) else [],
+        'searchable_text_list':     [(organization.organization_name, SEARCH_WEIGHT_NAME),
+                                     (organization.organization_twitter_handle, SEARCH_WEIGHT_TWITTER_HANDLE)],
+    }
+
+
+def generate_search_document_from_measure(contest_measure):
+    return {
+        'kind_of_owner':            KIND_OF_OWNER_MEASURE,
+        'local_id':                 contest_measure.id,
+        'we_vote_id':               contest_measure.we_vote_id,
+        'title':                    contest_measure.measure_title or '',
+        'subtitle':                 contest_measure.measure_subtitle or '',
+        'image':                    '',
+        'state_code':               contest_measure.state_code,
+        'google_civic_election_id': convert_to_int(contest_measure.google_civic_election_id),
+        'twitter_handle_list':      [],
+        'searchable_text_list':     [(contest_measure.measure_title, SEARCH_WEIGHT_NAME),
+                                     (contest_measure.measure_subtitle, SEARCH_WEIGHT_SUBTITLE)],
+    }
+
+
+def is_candidate_searchable(candidate):
+    # Candidates and measures from past elections are found through their politician, or not at all
+    return positive_value_exists(candidate.candidate_ultimate_election_date) \
+        and candidate.candidate_ultimate_election_date >= get_current_date_as_integer()
+
+
+def is_measure_searchable(contest_measure):
+    return positive_value_exists(contest_measure.measure_ultimate_election_date) \
+        and contest_measure.measure_ultimate_election_date >= get_current_date_as_integer()
+
+
+def is_organization_searchable(organization):
+    # Every voter has an INDIVIDUAL organization, which we leave out of search
+    return organization.organization_type != INDIVIDUAL and positive_value_exists(organization.organization_name)
+
+
+# The process-wide SearchIndex, built on first use and rebuilt after SEARCH_INDEX_MAXIMUM_AGE_IN_SECONDS.
+# Saves and deletes in this process update it right away. 'date_too_large' is when a build last found more than
+#  SEARCH_INDEX_MAXIMUM_DOCUMENTS documents, so the counts aren't run again on every search.
+search_index_holder = {}
+search_index_lock = threading.Lock()
+# Held while building, so each worker runs one rebuild at a time while its other threads search the expired index
+search_index_build_lock = threading.Lock()
+
+
+def build_search_index(read_only=True):
+    """
+    :return: SearchIndex, or None if there are more than SEARCH_INDEX_MAXIMUM_DOCUMENTS documents to index
+    """
+    database_alias = 'default' if 'test' in sys.argv or not positive_value_exists(read_only) else 'readonly'
+    today_as_integer = get_current_date_as_integer()
+    politician_query = Politician.objects.using(database_alias)
+    candidate_query = CandidateCampaign.objects.using(database_alias).filter(
+        candidate_ultimate_election_date__gte=today_as_integer)
+    organization_query = Organization.objects.using(database_alias).exclude(organization_type=INDIVIDUAL).exclude(
+        organization_name__isnull=True).exclude(organization_name='')
+    contest_measure_query = ContestMeasure.objects.using(database_alias).filter(
+        measure_ultimate_election_date__gte=today_as_integer)
+    document_count = politician_query.count() + candidate_query.count() + organization_query.count() + \
+        contest_measure_query.count()
+    if document_count > SEARCH_INDEX_MAXIMUM_DOCUMENTS:
+        logger.error("build_search_index: " + str(document_count) + " documents is more than "
+                     "SEARCH_INDEX_MAXIMUM_DOCUMENTS, so searchAll will search the database")
+        return None
+
+    document_list = []
+    for politician in politician_query.only(
+            'id', 'we_vote_id', 'politician_name', 'first_name', 'last_name', 'google_civic_candidate_name',
+            'politician_twitter_handle', 'politician_twitter_handle2', 'politician_twitter_handle3',
+            'politician_twitter_handle4', 'politician_twitter_handle5', 'state_code',
+            'we_vote_hosted_profile_image_url_medium').iterator(chunk_size=10000):
+        document_list.append(generate_search_document_from_politician(politician))
+    for candidate in candidate_query.only(
+            'id', 'we_vote_id', 'candidate_name', 'party', 'candidate_twitter_handle', 'state_code',
+            'google_civic_election_id', 'we_vote_hosted_profile_image_url_medium').iterator(chunk_size=10000):
+        document_list.append(generate_search_document_from_candidate(candidate))
+    for organization in organization_query.only(
+            'id', 'we_vote_id', 'organization_name', 'organization_twitter_handle', 'state_served_code',
+            'we_vote_hosted_profile_image_url_medium').iterator(chunk_size=10000):
+        document_list.append(generate_search_document_from_organization(organization))
+    for contest_measure in contest_measure_query.only(
+            'id', 'we_vote_id', 'measure_title', 'measure_subtitle', 'state_code',
+            'google_civic_election_id').iterator(chunk_size=10000):
+        document_list.append(generate_search_document_from_measure(contest_measure))
+    return SearchIndex(document_list)
+
+
+def is_search_index_too_large():
+    return time.time() - search_index_holder.get('date_too_large', 0) <= SEARCH_INDEX_MAXIMUM_AGE_IN_SECONDS
+
+
+def fetch_search_index(read_only=True):
+    """
+    :return: The process-wide SearchIndex, or None while there are too many documents to keep one in memory
+    """
+    search_index = search_index_holder.get('search_index')
+    if search_index is not None and not search_index.is_expired():
+        return search_index
+    if search_index is None and is_search_index_too_large():
+        return None
+    if search_index is None:
+        # Nothing to search yet, so wait for whichever thread is building it
+        search_index_build_lock.acquire()
+    elif not search_index_build_lock.acquire(blocking=False):
+        # Another thread is already rebuilding, so keep using the expired index until it is done
+        return search_index
+    try:
+        # Another thread may have finished building while we waited for the lock
+        current_search_index = search_index_holder.get('search_index')
+        if current_search_index is not None and not current_search_index.is_expired():
+            return current_search_index
+        if current_search_index is None and is_search_index_too_large():
+            return None
+        try:
+            new_search_index = build_search_index(read_only=read_only)
+        except Exception as e:
+            if current_search_index is None:
+                raise
+            logger.error("fetch_search_index could not rebuild, keeping the expired index: " + str(e))
+            return current_search_index
+        with search_index_lock:
+            if new_search_index is None:
+                # Free the old index too, rather than keep serving it long past its age
+                search_index_holder.pop('search_index', None)
+                search_index_holder['date_too_large'] = time.time()
+            else:
+                search_index_holder['search_index'] = new_search_index
+        return new_search_index
+    finally:
+        search_index_build_lock.release()
+
+
+def invalidate_search_index():
+    with search_index_lock:
+        search_index_holder.clear()
+
+
+def update_search_index_document(kind_of_owner, instance, generate_document_function, is_searchable=True):
+    search_index = search_index_holder.get('search_index')
+    if search_index is None:
+        return
+    try:
+        if is_searchable:
+            search_index.add_document(generate_document_function(instance))
+        else:
+            search_index.remove_document(kind_of_owner, instance.id)
+    except Exception as e:
+        logger.error("update_search_index_document " + kind_of_owner + ": " + str(e))
+
+
+def remove_search_index_document(kind_of_owner, instance):
+    search_index = search_index_holder.get('search_index')
+    if search_index is not None:
+        search_index.remove_document(kind_of_owner, instance.id)
+
+
+@receiver(post_save, sender=Politician)
+def save_politician_search_index_signal(sender, instance, **kwargs):
+    update_search_index_document(KIND_OF_OWNER_POLITICIAN, instance, generate_search_document_from_politician)
+
+
+@receiver(post_delete, sender=Politician)
+def delete_politician_search_index_signal(sender, instance, **kwargs):
+    remove_search_index_document(KIND_OF_OWNER_POLITICIAN, instance)
+
+
+@receiver(post_save, sender=CandidateCampaign)
+def save_candidate_search_index_signal(sender, instance, **kwargs):
+    update_search_index_document(KIND_OF_OWNER_CANDIDATE, instance, generate_search_document_from_candidate,
+                                 is_searchable=is_candidate_searchable(instance))
+
+
+@receiver(post_delete, sender=CandidateCampaign)
+def delete_candidate_search_index_signal(sender, instance, **kwargs):
+    remove_search_index_document(KIND_OF_OWNER_CANDIDATE, instance)
+
+
+@receiver(post_save, sender=Organization)
+def save_organization_search_index_signal(sender, instance, **kwargs):
+    update_search_index_document(KIND_OF_OWNER_ORGANIZATION, instance, generate_search_document_from_organization,
+                                 is_searchable=is_organization_searchable(instance))
+
+
+@receiver(post_delete, sender=Organization)
+def delete_organization_search_index_signal(sender, instance, **kwargs):
+    remove_search_index_document(KIND_OF_OWNER_ORGANIZATION, instance)
+
+
+@receiver(post_save, sender=ContestMeasure)
+def save_contest_measure_search_index_signal(sender, instance, **kwargs):
+    update_search_index_document(KIND_OF_OWNER_MEASURE, instance, generate_search_document_from_measure,
+                                 is_searchable=is_measure_searchable(instance))
+
+
+@receiver(post_delete, sender=ContestMeasure)
+def delete_contest_measure_search_index_signal(sender, instance, **kwargs):
+    remove_search_index_document(KIND_OF_OWNER_MEASURE, instance)
+
+
 # CandidateCampaign
 @receiver(post_save, sender=CandidateCampaign)
 def save_candidate_campaign_signal(sender, instance, **kwargs):
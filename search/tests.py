@@ -0,0 +1,105 @@
+import threading
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+import search.models
+from politician.models import Politician
+from search.models import fetch_politician_search_name, fetch_search_index, invalidate_search_index, \
+    KIND_OF_OWNER_ORGANIZATION, KIND_OF_OWNER_POLITICIAN, SEARCH_INDEX_MAXIMUM_AGE_IN_SECONDS, SEARCH_WEIGHT_NAME, \
+    SEARCH_WEIGHT_TWITTER_HANDLE, SearchIndex
+
+
+def generate_test_document(kind_of_owner, local_id, title, twitter_handle=''):
+    return {
+        'kind_of_owner':            kind_of_owner,
+        'local_id':                 local_id,
+        'we_vote_id':               'wv01test' + str(local_id),
+        'title':                    title,
+        'subtitle':                 '',
+        'image':                    '',
+        'state_code':               '',
+        'google_civic_election_id': 0,
+        'twitter_handle_list':      [twitter_handle] if twitter_handle else [],
+        'searchable_text_list':     [(title, SEARCH_WEIGHT_NAME), (twitter_handle, SEARCH_WEIGHT_TWITTER_HANDLE)],
+    }
+
+
+class SearchIndexTests(SimpleTestCase):
+
+    def setUp(self):
+        self.search_index = SearchIndex([
+            generate_test_document(KIND_OF_OWNER_POLITICIAN, 1, 'Elizabeth Warren', 'SenWarren'),
+            generate_test_document(KIND_OF_OWNER_POLITICIAN, 2, 'Warren Davidson'),
+            generate_test_document(KIND_OF_OWNER_ORGANIZATION, 3, 'Warrenton Voters League'),
+            generate_test_document(KIND_OF_OWNER_POLITICIAN, 4, 'John Smith'),
+        ])
+
+    def test_ranked_and_every_word_must_match(self):
+        total_count, results = self.search_index.search('warren')
+        self.assertEqual(total_count, 3)
+        # Whole word matches rank above a match on the start of a word
+        self.assertEqual(results[-1][1]['local_id'], 3)
+        total_count, results = self.search_index.search('eliz warren')
+        self.assertEqual([document['local_id'] for score, document in results], [1])
+
+    def test_paged_and_filtered(self):
+        total_count, results = self.search_index.search('warren', offset=1, limit=1)
+        self.assertEqual(total_count, 3)
+        self.assertEqual(len(results), 1)
+        total_count, results = self.search_index.search('warren', kind_of_owner_list=[KIND_OF_OWNER_ORGANIZATION])
+        self.assertEqual([document['local_id'] for score, document in results], [3])
+
+    def test_documents_updated_in_place(self):
+        self.search_index.add_document(generate_test_document(KIND_OF_OWNER_POLITICIAN, 4, 'John Warren'))
+        self.assertEqual(self.search_index.search('smith')[0], 0)
+        self.assertEqual(self.search_index.search('warren')[0], 4)
+        self.search_index.remove_document(KIND_OF_OWNER_POLITICIAN, 1)
+        self.assertEqual(self.search_index.search('senwarren')[0], 0)
+
+    def test_politician_search_name_without_last_name(self):
+        self.assertEqual(fetch_politician_search_name(Politician(first_name='Cher', last_name=None)), 'Cher')
+        self.assertEqual(fetch_politician_search_name(Politician(politician_name='Jane Doe')), 'Jane Doe')
+
+
+class FetchSearchIndexTests(SimpleTestCase):
+
+    def setUp(self):
+        invalidate_search_index()
+
+    def tearDown(self):
+        invalidate_search_index()
+
+    def test_expired_index_is_served_while_one_thread_rebuilds(self):
+        expired_search_index = SearchIndex([generate_test_document(KIND_OF_OWNER_POLITICIAN, 1, 'Old Index')])
+        expired_search_index.date_built -= SEARCH_INDEX_MAXIMUM_AGE_IN_SECONDS + 1
+        search.models.search_index_holder['search_index'] = expired_search_index
+        rebuild_started = threading.Event()
+        finish_rebuild = threading.Event()
+        new_search_index = SearchIndex([generate_test_document(KIND_OF_OWNER_POLITICIAN, 2, 'New Index')])
+
+        def slow_build_search_index(read_only=True):
+            rebuild_started.set()
+            finish_rebuild.wait(5)
+            return new_search_index
+
+        with mock.patch.object(search.models, 'build_search_index', side_effect=slow_build_search_index) \
+                as build_search_index:
+            rebuild_thread = threading.Thread(target=fetch_search_index)
+            rebuild_thread.start()
+            self.assertTrue(rebuild_started.wait(5))
+            self.assertIs(fetch_search_index(), expired_search_index)
+            finish_rebuild.set()
+            rebuild_thread.join(5)
+            self.assertIs(fetch_search_index(), new_search_index)
+            self.assertEqual(build_search_index.call_count, 1)
+
+    def test_too_many_documents_to_index(self):
+        search.models.search_index_holder['search_index'] = SearchIndex([])
+        search.models.search_index_holder['search_index'].date_built -= SEARCH_INDEX_MAXIMUM_AGE_IN_SECONDS + 1
+        with mock.patch.object(search.models, 'build_search_index', return_value=None) as build_search_index:
+            self.assertIsNone(fetch_search_index())
+            # The expired index is dropped, and the counts aren't run again until it would have expired
+            self.assertIsNone(fetch_search_index())
+            self.assertEqual(build_search_index.call_count, 1)
+            self.assertNotIn('search_index', search.models.search_index_holder)
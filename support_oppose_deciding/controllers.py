@@ -11,7 +11,8 @@ from politician.models import PoliticianManager
 from django.http import HttpResponse
 from follow.models import FollowOrganizationList
 import json
-from position.models import ANY_STANCE, FRIENDS_ONLY, SUPPORT, OPPOSE, PositionManager, PositionListManager, PUBLIC_ONLY
+from position.models import ANY_STANCE, FRIENDS_ONLY, SUPPORT, OPPOSE, PositionAggregateManager, PositionManager, \
+    PositionListManager, PUBLIC_ONLY
 from voter.models import fetch_voter_id_from_voter_device_link, VoterManager
 import wevote_functions.admin
 from wevote_functions.functions import convert_to_int, is_voter_device_id_valid, positive_value_exists
@@ -384,16 +385,8 @@ def positions_public_count_for_candidate(candidate_id, candidate_we_vote_id, sta
     We want to return a JSON file with the number of orgs and public figures who support
     this particular candidate's campaign
     """
-    # This implementation is built to make only two database calls. All other calculations are done here in the
-    #  application layer
-
-    position_list_manager = PositionListManager()
-    all_positions_count_for_candidate = \
-        position_list_manager.fetch_public_positions_count_for_candidate(
-            candidate_id,
-            candidate_we_vote_id,
-            stance_we_are_looking_for)
-
+    # The count comes from the one PositionAggregate row for this candidate. We only count positions
+    #  if that row hasn't been calculated yet.
     if positive_value_exists(candidate_id) or positive_value_exists(candidate_we_vote_id):
         candidate_manager = CandidateManager()
         # Since we can take in either candidate_id or candidate_we_vote_id, we need to retrieve the value we don't have
@@ -402,6 +395,17 @@ def positions_public_count_for_candidate(candidate_id, candidate_we_vote_id, sta
         elif positive_value_exists(candidate_we_vote_id):
             candidate_id = candidate_manager.fetch_candidate_id_from_we_vote_id(candidate_we_vote_id)
 
+    position_aggregate_manager = PositionAggregateManager()
+    all_positions_count_for_candidate = position_aggregate_manager.fetch_position_aggregate_count(
+        candidate_we_vote_id, stance_we_are_looking_for, PUBLIC_ONLY)
+    if all_positions_count_for_candidate is None:
+        position_list_manager = PositionListManager()
+        all_positions_count_for_candidate = \
+            position_list_manager.fetch_public_positions_count_for_candidate(
+                candidate_id,
+                candidate_we_vote_id,
+                stance_we_are_looking_for)
+
     json_data = {
         'status':                   'SUCCESSFUL_RETRIEVE_OF_PUBLIC_POSITION_COUNT_RE_CANDIDATE',
         'success':                  True,
@@ -422,14 +426,8 @@ def positions_public_count_for_contest_measure(measure_id, measure_we_vote_id, s
     We want to return a JSON file with the number of orgs and public figures who support
     this particular measure
     """
-    # This implementation is built to make only two database calls. All other calculations are done here in the
-    #  application layer
-
-    position_list_manager = PositionListManager()
-    all_positions_count_for_contest_measure = \
-        position_list_manager.fetch_public_positions_count_for_contest_measure(
-            measure_id, measure_we_vote_id, stance_we_are_looking_for)
-
+    # The count comes from the one PositionAggregate row for this measure. We only count positions
+    #  if that row hasn't been calculated yet.
     if positive_value_exists(measure_id) or positive_value_exists(measure_we_vote_id):
         contest_measure_manager = ContestMeasureManager()
         # Since we can take in either measure_id or measure_we_vote_id, we need to retrieve the value we don't have
@@ -438,6 +436,15 @@ def positions_public_count_for_contest_measure(measure_id, measure_we_vote_id, s
         elif positive_value_exists(measure_we_vote_id):
             measure_id = contest_measure_manager.fetch_contest_measure_id_from_we_vote_id(measure_we_vote_id)
 
+    position_aggregate_manager = PositionAggregateManager()
+    all_positions_count_for_contest_measure = position_aggregate_manager.fetch_position_aggregate_count(
+        measure_we_vote_id, stance_we_are_looking_for, PUBLIC_ONLY)
+    if all_positions_count_for_contest_measure is None:
+        position_list_manager = PositionListManager()
+        all_positions_count_for_contest_measure = \
+            position_list_manager.fetch_public_positions_count_for_contest_measure(
+                measure_id, measure_we_vote_id, stance_we_are_looking_for)
+
     json_data = {
         'status':                   'SUCCESSFUL_RETRIEVE_OF_PUBLIC_POSITION_COUNT_FOR_CONTEST_MEASURE',
         'success':                  True,
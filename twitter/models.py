@@ -2,10 +2,12 @@
 # Brought to you by We Vote. Be good.
 # -*- coding: UTF-8 -*-
 
-from datetime import date, timedelta, datetime, timezone
+from datetime import datetime, timezone
 
 # See also WeVoteServer/import_export_twitter/models.py for the code that interfaces with twitter (or other) servers
 import tweepy
+from api_telemetry.controllers import record_api_call, retrieve_api_call_summaries
+from api_telemetry.models import API_PROVIDER_TWITTER
 from django.db import models
 from django.db.models import Q
 from django.utils.timezone import localtime, now
@@ -1651,23 +1653,16 @@ class TwitterApiCounterMonthlySummary(models.Model):
 class TwitterApiCounterManager(models.Manager):
 
     @staticmethod
-    def create_counter_entry(kind_of_action, google_civic_election_id=0):
+    def create_counter_entry(kind_of_action, google_civic_election_id=0, call_succeeded=True, latency_seconds=None):
         """
-        Create an entry that records that a call to the Twitter Api was made.
+        Record that a call to the Twitter Api was made.
         """
-        try:
-            google_civic_election_id = convert_to_int(google_civic_election_id)
-
-            # TODO: We need to work out the timezone questions
-            TwitterApiCounter.objects.create(
-                kind_of_action=kind_of_action,
-                google_civic_election_id=google_civic_election_id,
-            )
-            success = True
-            status = 'ENTRY_SAVED'
-        except Exception:
-            success = False
-            status = 'SOME_ERROR'
+        # Counted in memory, and saved with the other calls made this minute by api_telemetry
+        record_api_call(
+            API_PROVIDER_TWITTER, kind_of_action, google_civic_election_id=google_civic_election_id,
+            success=call_succeeded, latency_seconds=latency_seconds)
+        success = True
+        status = 'ENTRY_RECORDED'
 
         results = {
             'success':                  success,
@@ -1677,95 +1672,40 @@ class TwitterApiCounterManager(models.Manager):
 
     @staticmethod
     def retrieve_daily_summaries(kind_of_action='', google_civic_election_id=0, days_to_display=30):
-        # Start with today and cycle backwards in time
-        daily_summaries = []
-        day_on_stage = date.today()  # TODO: We need to work out the timezone questions
-        number_found = 0
-        maximum_attempts = 365
-        attempt_count = 0
-
-        try:
-            while number_found <= days_to_display and attempt_count <= maximum_attempts:
-                attempt_count += 1
-                counter_queryset = TwitterApiCounter.objects.using('readonly').all()
-                if positive_value_exists(kind_of_action):
-                    counter_queryset = counter_queryset.filter(kind_of_action=kind_of_action)
-                if positive_value_exists(google_civic_election_id):
-                    counter_queryset = counter_queryset.filter(google_civic_election_id=google_civic_election_id)
-
-                # Find the number of these entries on that particular day
-                # counter_queryset = counter_queryset.filter(datetime_of_action__contains=day_on_stage)
-                counter_queryset = counter_queryset.filter(
-                    datetime_of_action__year=day_on_stage.year,
-                    datetime_of_action__month=day_on_stage.month,
-                    datetime_of_action__day=day_on_stage.day)
-                total_api_call_count = counter_queryset.count()
-                fail_counter_queryset = counter_queryset.filter(success=False)
-                failing_api_call_count = fail_counter_queryset.count()
-                succeeding_api_call_count = total_api_call_count - failing_api_call_count
-
-                # If any api calls were found on that date, pass it out for display
-                if positive_value_exists(total_api_call_count):
-                    daily_summary = {
-                        'date_string': day_on_stage,
-                        'total_count': total_api_call_count,
-                        'succeeding_count': succeeding_api_call_count,
-                        'failing_count': failing_api_call_count,
-                    }
-                    daily_summaries.append(daily_summary)
-                    number_found += 1
-
-                day_on_stage -= timedelta(days=1)
-        except Exception:
-            pass
-
-        return daily_summaries
+        return retrieve_api_call_summaries(
+            API_PROVIDER_TWITTER, kind_of_action=kind_of_action, google_civic_election_id=google_civic_election_id,
+            periods_to_display=days_to_display)
 
 
 def create_detailed_counter_entry(kind_of_action=None, function=None, success=True, elements=None):
     """
-    Create a detailed entry that records that a call to the Twitter Api was made.
+    Record that a call to the Twitter Api was made. The call is counted by api_telemetry, with the other calls made
+    this minute, instead of saving a TwitterApiCounter row for each call.
     """
-    idt = 0
-    try:
-        # TODO: We need to work out the timezone questions
-        counter = TwitterApiCounter.objects.create(
-            kind_of_action=kind_of_action,
-            google_civic_election_id=elements.get('google_civic_election_id', None),
-            function=function,
-            success=success,
-            disambiguator=elements.get('disambiguator', None),
-            candidate_name=elements.get('candidate_name', None),
-            search_term=elements.get('search_term', None),
-            text=elements.get('text', None),
-            username=elements.get('username', None),
-            voter_we_vote_id=elements.get('voter_we_vote_id', None),
-        )
-        success = True
-        status = 'ENTRY_SAVED'
-        idt = counter.id
-    except Exception as e:
-        print('create_detailed_counter_entry error ' + str(e))
-        success = False
-        status = 'CREATE_DETAILED_COUNTER_ENTRY_ERROR: ' + str(e) + " "
+    elements = elements or {}
+    google_civic_election_id = convert_to_int(elements.get('google_civic_election_id', 0))
+    record_api_call(API_PROVIDER_TWITTER, kind_of_action, google_civic_election_id=google_civic_election_id,
+                    success=success)
     results = {
-        'success':                  success,
-        'status':                   status,
-        'id':                       idt,
+        'success':                  True,
+        'status':                   'ENTRY_RECORDED',
+        'id':                       0,
+        'function':                 function,
+        'kind_of_action':           kind_of_action,
+        'google_civic_election_id': google_civic_election_id,
     }
     return results
 
 
-# If we got a tweepy error, mark the row as NOT success
+# If we got a tweepy error, count the call as failed
 def mark_detailed_counter_entry(counter, success, status):
     try:
-        idt = counter['id']
-        print('mark_detailed_counter_entry id: ', idt, ', success: ', success, ', status: ', status)
-        counter_queryset = TwitterApiCounter.objects.filter(id=idt)
-        counter_row = counter_queryset.first()
-        counter_row.success = success
-        counter_row.text = status + counter_row.text
-        counter_row.save()
-
+        print('mark_detailed_counter_entry function: ', counter.get('function'), ', success: ', success,
+              ', status: ', status)
+        if not success:
+            # The call itself was already counted by create_detailed_counter_entry
+            record_api_call(API_PROVIDER_TWITTER, counter.get('kind_of_action'),
+                            google_civic_election_id=counter.get('google_civic_election_id', 0),
+                            success=False, call_count=0)
     except Exception as e:
         print('mark_detailed_counter_entry exception (' + status + ')' + str(e))
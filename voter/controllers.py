@@ -20,11 +20,14 @@ from activity.controllers import delete_activity_comments_for_voter, delete_acti
     delete_activity_posts_for_voter, \
     move_activity_comments_to_another_voter, move_activity_notices_to_another_voter, \
     move_activity_posts_to_another_voter
-from analytics.controllers import delete_analytics_info_for_voter, move_analytics_info_to_another_voter
+from analytics.controllers import ANALYTICS_ACTION_BUFFER_ON, analytics_action_buffer, \
+    delete_analytics_info_for_voter, move_analytics_info_to_another_voter
+from apple.models import AppleUser
 from analytics.models import AnalyticsManager, ACTION_FACEBOOK_AUTHENTICATION_EXISTS, \
     ACTION_GOOGLE_AUTHENTICATION_EXISTS, \
     ACTION_TWITTER_AUTHENTICATION_EXISTS, ACTION_EMAIL_AUTHENTICATION_EXISTS
 from aws.controllers import submit_web_function_job
+from config.base import get_environment_variable_default
 from campaign.controllers import move_campaignx_to_another_voter
 from email_outbound.controllers import delete_email_address_entries_for_voter, \
     move_email_address_entries_to_another_voter, schedule_verification_email, \
@@ -62,6 +65,8 @@ from sms.controllers import delete_sms_phone_number_entries_for_voter, move_sms_
 from stripe_donations.controllers import move_donation_info_to_another_voter
 from twitter.models import TwitterLinkToOrganization, TwitterLinkToVoter, TwitterUserManager
 from voter.controllers_contacts import delete_all_voter_contact_emails_for_voter
+from voter.controllers_voter_repair import create_linked_organization_for_voter, queue_voter_account_repair, \
+    repair_voter_account
 from voter.models import Voter, VoterAddress, VoterDeviceLinkManager, VoterManager, VoterMergeLog, \
     MAINTENANCE_STATUS_FLAGS_TASK_ONE, \
     NOTIFICATION_FRIEND_REQUESTS_EMAIL, NOTIFICATION_SUGGESTED_FRIENDS_EMAIL, \
@@ -71,13 +76,21 @@ from voter.models import Voter, VoterAddress, VoterDeviceLinkManager, VoterManag
     VoterDeviceLink, BALLOT_ADDRESS
 from voter_guide.controllers import delete_voter_guides_for_voter, duplicate_voter_guides, \
     move_voter_guides_to_another_voter
-from wevote_functions.functions import generate_voter_device_id, is_voter_device_id_valid, positive_value_exists
+from wevote_functions.functions import convert_to_int, generate_voter_device_id, is_voter_device_id_valid, \
+    positive_value_exists
+from wevote_functions.functions_cache import CACHE_NAMESPACE_VOTER_PROFILE, retrieve_results_through_cache
 from wevote_functions.functions_date import DATE_FORMAT_YMD_HMS
 from campaign.controllers import delete_campaign_supporter
 
 
 logger = wevote_functions.admin.get_logger(__name__)
 
+# voterRetrieve answers from the voter's cached profile snapshot, and leaves the Twitter, linked organization and
+#  Facebook repairs to the background queue in voter/controllers_voter_repair.py, which sign-in events feed.
+#  Set VOTER_RETRIEVE_FAST_PATH_ON to false to do the repairs in every voterRetrieve again.
+VOTER_RETRIEVE_FAST_PATH_ON = \
+    str(get_environment_variable_default('VOTER_RETRIEVE_FAST_PATH_ON', True)).lower() not in ('false', '0', '')
+
 
 def add_state_code_for_display_to_voter_list(voter_we_vote_id_list=None):
     if voter_we_vote_id_list is None:
@@ -3757,6 +3770,7 @@ def voter_retrieve_for_api(  # voterRetrieve
         user_agent_object=None,
         voter_device_id='',
         voter_location_results=None,
+        fast_path=None,
 ):
     """
     Used by the api
@@ -3766,10 +3780,10 @@ def voter_retrieve_for_api(  # voterRetrieve
     :param user_agent_string:
     :param user_agent_object:
     :param voter_location_results:
+    :param fast_path: Answer from the voter's cached profile snapshot, and leave repair_voter_account to the
+      background. Defaults to VOTER_RETRIEVE_FAST_PATH_ON.
     :return:
     """
-    if voter_location_results is None:
-        voter_location_results = {}
     if voter_location_results is None:
         voter_location_results = {}
     organization_manager = OrganizationManager()
@@ -3778,10 +3792,6 @@ def voter_retrieve_for_api(  # voterRetrieve
     voter_device_link_manager = VoterDeviceLinkManager()
     voter_id = 0
     voter_created = False
-    twitter_link_to_voter = TwitterLinkToVoter()
-    repair_twitter_link_to_voter_caching_now = False
-    repair_facebook_link_to_voter_caching_now = False
-    facebook_user = None
 
     status = "VOTER_RETRIEVE_START "
 
@@ -3864,361 +3874,72 @@ def voter_retrieve_for_api(  # voterRetrieve
             return json_data
 
     # At this point, we should have a valid voter_id
-    voter_read_only = True
-    results = voter_manager.retrieve_voter_by_id(voter_id, read_only=True)
-    if results['voter_found']:
-        voter = results['voter']
+    if fast_path is None:
+        fast_path = VOTER_RETRIEVE_FAST_PATH_ON
+    voter_profile = None
+    if fast_path:
+        # Save state_code found via IP address, if it changed
+        if positive_value_exists(state_code_from_ip_address) and \
+                voter_device_link.state_code != state_code_from_ip_address:
+            voter_device_link_manager.update_voter_device_link_with_state_code(
+                voter_device_link, state_code_from_ip_address)
+        results = retrieve_voter_profile_snapshot(voter_id)
+        if results['voter_profile_found']:
+            voter_profile = results['voter_profile']
+            if not positive_value_exists(voter_profile['linked_organization_we_vote_id']):
+                # A new voter gets their organization now, so this response includes it. Linking a Twitter voter to
+                #  their Twitter organization, and the Facebook image copy, are left to the background repair.
+                organization_results = create_linked_organization_for_voter(voter_id)
+                status += organization_results['status']
+                if organization_results['organization_created']:
+                    # Saving the voter invalidated the snapshot, so this reads it again from the primary
+                    results = retrieve_voter_profile_snapshot(voter_id)
+                    if results['voter_profile_found']:
+                        voter_profile = results['voter_profile']
+                elif queue_voter_account_repair(voter_id):
+                    status += "VOTER_ACCOUNT_REPAIR_QUEUED "
+    else:
+        results = voter_manager.retrieve_voter_by_id(voter_id, read_only=True)
+        if results['voter_found']:
+            # Save state_code found via IP address
+            if positive_value_exists(state_code_from_ip_address):
+                voter_device_link_manager.update_voter_device_link_with_state_code(
+                    voter_device_link, state_code_from_ip_address)
+            repair_results = repair_voter_account(voter_id)
+            status += repair_results['status']
+            if repair_results['voter_found']:
+                voter_profile = generate_voter_profile_snapshot(
+                    repair_results['voter'], facebook_user=repair_results['facebook_user'])
 
+    if voter_profile is not None:
         if voter_created:
             status += 'VOTER_CREATED '
         else:
             status += 'VOTER_FOUND '
 
-        # Save state_code found via IP address
-        if positive_value_exists(state_code_from_ip_address):
-            voter_device_link_manager.update_voter_device_link_with_state_code(
-                voter_device_link, state_code_from_ip_address)
-
-        twitter_link_to_voter_twitter_id = 0
-        # 2018-07-17 DALE Trying with this off
-        # if voter.is_signed_in():
-        twitter_user_manager = TwitterUserManager()
-        twitter_link_results = twitter_user_manager.retrieve_twitter_link_to_voter(0, voter.we_vote_id)
-        if twitter_link_results['twitter_link_to_voter_found']:
-            twitter_link_to_voter = twitter_link_results['twitter_link_to_voter']
-            twitter_link_to_voter_twitter_id = twitter_link_to_voter.twitter_id
-
-        twitter_link_to_organization_we_vote_id = ""
-        twitter_link_to_organization_twitter_id = 0
-        if positive_value_exists(twitter_link_to_voter_twitter_id):
-            twitter_org_link_results = \
-                twitter_user_manager.retrieve_twitter_link_to_organization_from_twitter_user_id(
-                    twitter_link_to_voter_twitter_id)
-            if twitter_org_link_results['twitter_link_to_organization_found']:
-                twitter_link_to_organization = twitter_org_link_results['twitter_link_to_organization']
-                twitter_link_to_organization_twitter_id = twitter_link_to_organization.twitter_id
-                twitter_link_to_organization_we_vote_id = twitter_link_to_organization.organization_we_vote_id
-        else:
-            if positive_value_exists(voter.twitter_screen_name) or positive_value_exists(voter.twitter_id):
-                # If the voter has cached twitter information, delete it now because there isn't a
-                #  twitter_link_to_voter entry
-                # Pull voter object we can save
-                if voter_read_only:
-                    results = voter_manager.retrieve_voter_by_id(voter_id, read_only=False)
-                    if results['voter_found']:
-                        voter = results['voter']
-                        voter_read_only = False
-                try:
-                    voter.twitter_id = 0
-                    voter.twitter_screen_name = ""
-                    voter.save()
-                    status += "VOTER_TWITTER_CLEARED1 "
-                    repair_twitter_link_to_voter_caching_now = True
-                except Exception as e:
-                    status += "UNABLE_TO_CLEAR_TWITTER_SCREEN_NAME1 "
-
-        if positive_value_exists(twitter_link_to_voter_twitter_id) and \
-                positive_value_exists(twitter_link_to_organization_twitter_id) and \
-                twitter_link_to_voter_twitter_id == twitter_link_to_organization_twitter_id:
-            # If we have a twitter link to both the voter and the organization, then we want to make sure the
-            #  voter is linked to the correct organization
-            status += "VERIFYING_TWITTER_LINK_TO_ORGANIZATION "
-            if voter.linked_organization_we_vote_id != twitter_link_to_organization_we_vote_id:
-                # If here there is a mismatch to fix
-                if voter_read_only:
-                    # Pull voter object we can save
-                    results = voter_manager.retrieve_voter_by_id(voter_id, read_only=False)
-                    if results['voter_found']:
-                        voter = results['voter']
-                        voter_read_only = False
-                try:
-                    voter.linked_organization_we_vote_id = twitter_link_to_organization_we_vote_id
-                    voter.save()
-                    repair_twitter_link_to_voter_caching_now = True
-                    status += "VOTER_LINKED_ORGANIZATION_FIXED "
-                except Exception as e:
-                    status += "VOTER_LINKED_ORGANIZATION_COULD_NOT_BE_FIXED " + str(e) + " "
-
-        if positive_value_exists(voter.linked_organization_we_vote_id):
-            existing_organization_for_this_voter_found = True
-        else:
-            status += "VOTER.LINKED_ORGANIZATION_WE_VOTE_ID-MISSING "
-            existing_organization_for_this_voter_found = False
-            create_twitter_link_to_organization = False
-            organization_twitter_handle = ""
-            organization_twitter_id = ""
-            twitter_link_to_voter_twitter_id = 0
-
-            # Is this voter associated with a Twitter account?
-            # If so, check to see if an organization entry exists for this voter.
-            if twitter_link_results['twitter_link_to_voter_found']:
-                twitter_link_to_voter = twitter_link_results['twitter_link_to_voter']
-                if not positive_value_exists(twitter_link_to_voter.twitter_id):
-                    if positive_value_exists(voter.twitter_screen_name) or positive_value_exists(voter.twitter_id):
-                        if voter_read_only:
-                            # Pull voter object we can save
-                            results = voter_manager.retrieve_voter_by_id(voter_id, read_only=False)
-                            if results['voter_found']:
-                                voter = results['voter']
-                                voter_read_only = False
-                        try:
-                            voter.twitter_id = 0
-                            voter.twitter_screen_name = ""
-                            voter.save()
-                            status += "VOTER_TWITTER_CLEARED2 "
-                        except Exception as e:
-                            status += "UNABLE_TO_CLEAR_TWITTER_SCREEN_NAME2: " + str(e) + " "
-                else:
-                    # If here there is a twitter_link_to_voter to possibly update
-                    try:
-                        value_to_save = False
-                        twitter_link_to_voter_twitter_id = twitter_link_to_voter.twitter_id
-                        if voter.twitter_id == twitter_link_to_voter_twitter_id:
-                            status += "VOTER_TWITTER_ID_MATCHES "
-                        else:
-                            status += "VOTER_TWITTER_ID_DOES_NOT_MATCH_LINKED_TO_VOTER "
-                            if voter_read_only:
-                                # Pull voter object we can save
-                                results = voter_manager.retrieve_voter_by_id(voter_id, read_only=False)
-                                if results['voter_found']:
-                                    voter = results['voter']
-                                    voter_read_only = False
-                            voter.twitter_id = twitter_link_to_voter_twitter_id
-                            value_to_save = True
-
-                        voter_twitter_screen_name = twitter_link_to_voter.fetch_twitter_handle_locally_or_remotely()
-                        if voter.twitter_screen_name == voter_twitter_screen_name:
-                            status += "VOTER_TWITTER_SCREEN_NAME_MATCHES "
-                        else:
-                            status += "VOTER_TWITTER_SCREEN_NAME_DOES_NOT_MATCH_LINKED_TO_VOTER "
-                            if voter_read_only:
-                                # Pull voter object we can save
-                                results = voter_manager.retrieve_voter_by_id(voter_id, read_only=False)
-                                if results['voter_found']:
-                                    voter = results['voter']
-                                    voter_read_only = False
-                            voter.twitter_screen_name = voter_twitter_screen_name
-                            value_to_save = True
-
-                        if value_to_save:
-                            voter.save()
-                            repair_twitter_link_to_voter_caching_now = True
-                    except Exception as e:
-                        status += "UNABLE_TO_SAVE_VOTER_TWITTER_CACHED_INFO: " + str(e) + " "
-
-                    twitter_link_to_voter_twitter_id = twitter_link_to_voter.twitter_id
-                    # Since we know this voter has authenticated for a Twitter account,
-                    #  check to see if there is an organization associated with this Twitter account
-                    # If an existing TwitterLinkToOrganization is found, link this org to this voter
-                    twitter_org_link_results = \
-                        twitter_user_manager.retrieve_twitter_link_to_organization_from_twitter_user_id(
-                            twitter_link_to_voter.twitter_id)
-                    if twitter_org_link_results['twitter_link_to_organization_found']:
-                        twitter_link_to_organization = twitter_org_link_results['twitter_link_to_organization']
-                        organization_twitter_id = twitter_link_to_organization.twitter_id
-                        if positive_value_exists(twitter_link_to_organization.organization_we_vote_id):
-                            if twitter_link_to_organization.organization_we_vote_id \
-                                    != voter.linked_organization_we_vote_id:
-                                if voter_read_only:
-                                    # Pull voter object we can save
-                                    results = voter_manager.retrieve_voter_by_id(voter_id, read_only=False)
-                                    if results['voter_found']:
-                                        voter = results['voter']
-                                        voter_read_only = False
-                                try:
-                                    voter.linked_organization_we_vote_id = \
-                                        twitter_link_to_organization.organization_we_vote_id
-                                    voter.save()
-                                    existing_organization_for_this_voter_found = True
-
-                                except Exception as e:
-                                    status += "UNABLE_TO_SAVE_LINKED_ORGANIZATION_FROM_TWITTER_LINK_TO_VOTER " + \
-                                              str(e) + " "
-                    else:
-                        # If an existing TwitterLinkToOrganization was not found,
-                        # create the organization below, and then create TwitterLinkToOrganization
-                        organization_twitter_handle = twitter_link_to_voter.fetch_twitter_handle_locally_or_remotely()
-                        organization_twitter_id = twitter_link_to_voter.twitter_id
-                        create_twitter_link_to_organization = True
-
-            if not existing_organization_for_this_voter_found:
-                status += "EXISTING_ORGANIZATION_NOT_FOUND "
-                # If we are here, we need to create an organization for this voter
-                create_results = organization_manager.create_organization(
-                    organization_name=voter.get_full_name(),
-                    organization_twitter_handle=organization_twitter_handle,
-                    organization_image=voter.voter_photo_url(),
-                    organization_type=INDIVIDUAL,
-                    twitter_id=organization_twitter_id,
-                    we_vote_hosted_profile_image_url_large=voter.we_vote_hosted_profile_image_url_large,
-                    we_vote_hosted_profile_image_url_medium=voter.we_vote_hosted_profile_image_url_medium,
-                    we_vote_hosted_profile_image_url_tiny=voter.we_vote_hosted_profile_image_url_tiny
-                )
-                if create_results['organization_created']:
-                    # Add value to twitter_owner_voter.linked_organization_we_vote_id when done.
-                    organization = create_results['organization']
-                    status += "ORGANIZATION_CREATED "
-                    if voter_read_only:
-                        # Pull voter object we can save
-                        results = voter_manager.retrieve_voter_by_id(voter_id, read_only=False)
-                        if results['voter_found']:
-                            voter = results['voter']
-                            voter_read_only = False
-                    try:
-                        voter.linked_organization_we_vote_id = organization.we_vote_id
-                        voter.save()
-                        existing_organization_for_this_voter_found = True
-                        if create_twitter_link_to_organization:
-                            create_results = twitter_user_manager.create_twitter_link_to_organization(
-                                twitter_link_to_voter_twitter_id, organization.we_vote_id)
-
-                            if create_results['twitter_link_to_organization_saved']:
-                                twitter_link_to_organization = create_results['twitter_link_to_organization']
-                                organization_list_manager = OrganizationListManager()
-                                repair_results = \
-                                    organization_list_manager.repair_twitter_related_organization_caching(
-                                        twitter_link_to_organization.twitter_id)
-                                status += repair_results['status']
-
-                    except Exception as e:
-                        status += "UNABLE_TO_CREATE_NEW_ORGANIZATION_TO_VOTER_FROM_RETRIEVE_VOTER: " + str(e) + " "
-                else:
-                    status += "ORGANIZATION_NOT_CREATED "
-
-        # Check to see if there is a FacebookLinkToVoter for this voter, and if so, see if we need to make
-        #  organization update with latest Facebook data
-        facebook_manager = FacebookManager()
-        facebook_link_results = facebook_manager.retrieve_facebook_link_to_voter_from_voter_we_vote_id(
-            voter.we_vote_id, read_only=True)
-        if facebook_link_results['facebook_link_to_voter_found']:
-            status += "FACEBOOK_LINK_TO_VOTER_FOUND "
-            facebook_link_to_voter = facebook_link_results['facebook_link_to_voter']
-            facebook_link_to_voter_facebook_user_id = facebook_link_to_voter.facebook_user_id
-            if positive_value_exists(facebook_link_to_voter_facebook_user_id):
-                facebook_user_results = FacebookManager().retrieve_facebook_user_by_facebook_user_id(
-                    facebook_link_to_voter_facebook_user_id)
-                if facebook_user_results['facebook_user_found']:
-                    status += "FACEBOOK_USER_FOUND "
-                    facebook_user = facebook_user_results['facebook_user']
-
-                    organization_results = \
-                        OrganizationManager().retrieve_organization_from_we_vote_id(
-                            voter.linked_organization_we_vote_id)
-                    if organization_results['organization_found']:
-                        try:
-                            organization = organization_results['organization']
-                            status += "FACEBOOK-ORGANIZATION_FOUND "
-                            save_organization = False
-                            # Look at the linked_organization for the voter and update with latest
-                            if positive_value_exists(facebook_user.facebook_profile_image_url_https):
-                                facebook_profile_image_different = \
-                                    not positive_value_exists(organization.facebook_profile_image_url_https) \
-                                    or facebook_user.facebook_profile_image_url_https != \
-                                    organization.facebook_profile_image_url_https
-                                if facebook_profile_image_different:
-                                    organization.facebook_profile_image_url_https = \
-                                        facebook_user.facebook_profile_image_url_https
-                                    save_organization = True
-                            if positive_value_exists(facebook_user.facebook_background_image_url_https) and \
-                                    not positive_value_exists(organization.facebook_background_image_url_https):
-                                organization.facebook_background_image_url_https = \
-                                    facebook_user.facebook_background_image_url_https
-                                save_organization = True
-                            if positive_value_exists(facebook_user.facebook_user_id) and \
-                                    not positive_value_exists(organization.facebook_id):
-                                organization.facebook_id = facebook_user.facebook_user_id
-                                save_organization = True
-                            if positive_value_exists(facebook_user.facebook_email) and \
-                                    not positive_value_exists(organization.facebook_email):
-                                organization.facebook_email = facebook_user.facebook_email
-                                save_organization = True
-                            if save_organization:
-                                repair_facebook_link_to_voter_caching_now = True
-                                organization.save()
-                                status += "FACEBOOK-ORGANIZATION_SAVED "
-                        except Exception as e:
-                            status += "FAILED_UPDATE_OR_CREATE_ORGANIZATION: " + str(e)
-                            logger.error('FAILED organization_manager.update_or_create_organization. '
-                                         '{error} [type: {error_type}]'.format(error=e, error_type=type(e)))
-                    else:
-                        status += "FACEBOOK_RELATED_ORGANIZATION_NOT_FOUND "
-                else:
-                    status += "FACEBOOK_USER_NOT_FOUND "
-
-        else:
-            status += "FACEBOOK_LINK_TO_VOTER_NOT_FOUND "
-
-        if not positive_value_exists(voter.linked_organization_we_vote_id):
-            # If we are here, we need to create an organization for this voter
-            status += "NEED_TO_CREATE_ORGANIZATION_FOR_THIS_VOTER "
-            create_results = organization_manager.create_organization(
-                organization_name=voter.get_full_name(),
-                organization_image=voter.voter_photo_url(),
-                organization_type=INDIVIDUAL,
-                we_vote_hosted_profile_image_url_large=voter.we_vote_hosted_profile_image_url_large,
-                we_vote_hosted_profile_image_url_medium=voter.we_vote_hosted_profile_image_url_medium,
-                we_vote_hosted_profile_image_url_tiny=voter.we_vote_hosted_profile_image_url_tiny
-            )
-            if create_results['organization_created']:
-                # Add value to twitter_owner_voter.linked_organization_we_vote_id when done.
-                organization = create_results['organization']
-                if voter_read_only:
-                    # Pull voter object we can save
-                    results = voter_manager.retrieve_voter_by_id(voter_id, read_only=False)
-                    if results['voter_found']:
-                        voter = results['voter']
-                        voter_read_only = False
-                try:
-                    voter.linked_organization_we_vote_id = organization.we_vote_id
-                    voter.save()
-                    status += "ORGANIZATION_CREATED "
-                except Exception as e:
-                    status += "UNABLE_TO_CREATE_NEW_ORGANIZATION_TO_VOTER_FROM_RETRIEVE_VOTER2 "
-
-        if repair_twitter_link_to_voter_caching_now:
-            # If here then we know that we have a twitter_link_to_voter, and there was some data cleanup done
-            repair_results = voter_manager.repair_twitter_related_voter_caching(
-                twitter_link_to_voter.twitter_id)
-            status += repair_results['status']
-
-        # TODO DALE: Add if repair_facebook_link_to_voter_caching_now
         is_bot = user_agent_object.is_bot or robot_detection.is_robot(user_agent_string)
         analytics_manager = AnalyticsManager()
-        if voter.signed_in_facebook():
-            is_signed_in = True
-            analytics_manager.save_action(ACTION_FACEBOOK_AUTHENTICATION_EXISTS, voter.we_vote_id, voter_id,
-                                          is_signed_in, user_agent_string=user_agent_string, is_bot=is_bot,
-                                          is_mobile=user_agent_object.is_mobile,
-                                          is_desktop=user_agent_object.is_pc,
-                                          is_tablet=user_agent_object.is_tablet)
-        if voter.signed_in_google():
-            is_signed_in = True
-            analytics_manager.save_action(ACTION_GOOGLE_AUTHENTICATION_EXISTS, voter.we_vote_id, voter_id,
-                                          is_signed_in, user_agent_string=user_agent_string, is_bot=is_bot,
-                                          is_mobile=user_agent_object.is_mobile,
-                                          is_desktop=user_agent_object.is_pc,
-                                          is_tablet=user_agent_object.is_tablet)
-        if voter.signed_in_twitter():
-            is_signed_in = True
-            analytics_manager.save_action(ACTION_TWITTER_AUTHENTICATION_EXISTS, voter.we_vote_id, voter_id,
-                                          is_signed_in, user_agent_string=user_agent_string, is_bot=is_bot,
-                                          is_mobile=user_agent_object.is_mobile,
-                                          is_desktop=user_agent_object.is_pc,
-                                          is_tablet=user_agent_object.is_tablet)
-        if voter.signed_in_with_email():
-            is_signed_in = True
-            analytics_manager.save_action(ACTION_EMAIL_AUTHENTICATION_EXISTS, voter.we_vote_id, voter_id,
-                                          is_signed_in, user_agent_string=user_agent_string, is_bot=is_bot,
-                                          is_mobile=user_agent_object.is_mobile,
-                                          is_desktop=user_agent_object.is_pc,
-                                          is_tablet=user_agent_object.is_tablet)
-
-        facebook_profile_image_url_https, \
-            we_vote_hosted_profile_image_url_large, \
-            we_vote_hosted_profile_image_url_medium = \
-            get_displayable_images(voter, facebook_user)
-
-        address_results = voter_address_retrieve_for_voter_id(voter_id)
+        authentication_action_list = [
+            (ACTION_FACEBOOK_AUTHENTICATION_EXISTS, voter_profile['signed_in_facebook']),
+            (ACTION_GOOGLE_AUTHENTICATION_EXISTS, voter_profile['signed_in_google']),
+            (ACTION_TWITTER_AUTHENTICATION_EXISTS, voter_profile['signed_in_twitter']),
+            (ACTION_EMAIL_AUTHENTICATION_EXISTS, voter_profile['signed_in_with_email']),
+        ]
+        for action_constant, signed_in in authentication_action_list:
+            if not signed_in:
+                continue
+            if ANALYTICS_ACTION_BUFFER_ON:
+                analytics_action_buffer.add(analytics_manager.generate_action(
+                    action_constant, voter_profile['we_vote_id'], voter_id, True, '', '', 0, 0, user_agent_string,
+                    is_bot, user_agent_object.is_mobile, user_agent_object.is_pc, user_agent_object.is_tablet))
+            else:
+                analytics_manager.save_action(action_constant, voter_profile['we_vote_id'], voter_id,
+                                              True, user_agent_string=user_agent_string, is_bot=is_bot,
+                                              is_mobile=user_agent_object.is_mobile,
+                                              is_desktop=user_agent_object.is_pc,
+                                              is_tablet=user_agent_object.is_tablet)
+
+        address_results = voter_profile['address']
         if address_results['success'] and not address_results['address_found']:
             # Create new address
             if 'voter_location_found' not in voter_location_results:
@@ -4228,7 +3949,6 @@ def voter_retrieve_for_api(  # voterRetrieve
                 text_for_map_search = voter_location_results['voter_location']
                 status += '*** ' + text_for_map_search + ' ***, '
 
-                from voter.models import VoterAddressManager
                 voter_address_manager = VoterAddressManager()
                 voter_address_save_results = voter_address_manager.update_or_create_voter_address(
                     voter_id, BALLOT_ADDRESS, text_for_map_search)
@@ -4239,61 +3959,63 @@ def voter_retrieve_for_api(  # voterRetrieve
 
         team_member_list = organization_manager.retrieve_team_member_list(
             can_edit_campaignx_owned_by_organization=True,
-            voter_we_vote_id=voter.we_vote_id)
+            voter_we_vote_id=voter_profile['we_vote_id'],
+            read_only=fast_path)
         can_edit_campaignx_owned_by_organization_list = []
         for team_member in team_member_list:
             can_edit_campaignx_owned_by_organization_list.append(team_member.organization_we_vote_id)
 
-        # print('voterRetrieve status', status, ', voter.email ', voter.email, ', full name ', voter.get_full_name(), ',
-        #   voter_photo_url_medium', we_vote_hosted_profile_image_url_medium )
         json_data = {
             'status':                           status,
             'success':                          True,
             'address':                          address_results,
             'can_edit_campaignx_owned_by_organization_list': can_edit_campaignx_owned_by_organization_list,
-            'date_joined':                      voter.date_joined.strftime(DATE_FORMAT_YMD_HMS), # '%Y-%m-%d %H:%M:%S'
-            'email':                            voter.email,
-            'facebook_email':                   voter.facebook_email,
-            'facebook_id':                      voter.facebook_id,
-            'facebook_profile_image_url_https': facebook_profile_image_url_https,
-            'first_name':                       voter.first_name,
-            'full_name':                        voter.get_full_name(),
-            'has_data_to_preserve':             voter.has_data_to_preserve(),
-            'has_email_with_verified_ownership':    voter.has_email_with_verified_ownership(),
-            'has_valid_email':                  voter.has_valid_email(),
-            'interface_status_flags':           voter.interface_status_flags,
-            'is_admin':                         voter.is_admin,
-            'is_analytics_admin':               voter.is_analytics_admin,
-            'is_partner_organization':          voter.is_partner_organization,
-            'is_political_data_manager':        voter.is_political_data_manager,
-            'is_political_data_viewer':         voter.is_political_data_viewer,
-            'is_signed_in':                     voter.is_signed_in(),
-            'is_verified_volunteer':            voter.is_verified_volunteer,
-            'is_voter_manager':                 voter.is_voter_manager,
-            'last_name':                        voter.last_name,
-            'linked_organization_we_vote_id':   voter.linked_organization_we_vote_id,
-            'notification_settings_flags':      voter.notification_settings_flags,
-            'profile_image_type_currently_active':  voter.profile_image_type_currently_active,
-            'signed_in':                        voter.is_signed_in(),            # Extra field for debugging the WebApp
-            'signed_in_facebook':               voter.signed_in_facebook(),
-            'signed_in_google':                 voter.signed_in_google(),
-            'signed_in_twitter':                voter.signed_in_twitter(),
-            'signed_in_with_apple':             voter.signed_in_with_apple(),
-            'signed_in_with_email':             voter.signed_in_with_email(),
-            'signed_in_with_sms_phone_number':  voter.signed_in_with_sms_phone_number(),
+            'date_joined':                      voter_profile['date_joined'],
+            'email':                            voter_profile['email'],
+            'facebook_email':                   voter_profile['facebook_email'],
+            'facebook_id':                      voter_profile['facebook_id'],
+            'facebook_profile_image_url_https': voter_profile['facebook_profile_image_url_https'],
+            'first_name':                       voter_profile['first_name'],
+            'full_name':                        voter_profile['full_name'],
+            'has_data_to_preserve':             voter_profile['has_data_to_preserve'],
+            'has_email_with_verified_ownership':    voter_profile['has_email_with_verified_ownership'],
+            'has_valid_email':                  voter_profile['has_valid_email'],
+            'interface_status_flags':           voter_profile['interface_status_flags'],
+            'is_admin':                         voter_profile['is_admin'],
+            'is_analytics_admin':               voter_profile['is_analytics_admin'],
+            'is_partner_organization':          voter_profile['is_partner_organization'],
+            'is_political_data_manager':        voter_profile['is_political_data_manager'],
+            'is_political_data_viewer':         voter_profile['is_political_data_viewer'],
+            'is_signed_in':                     voter_profile['is_signed_in'],
+            'is_verified_volunteer':            voter_profile['is_verified_volunteer'],
+            'is_voter_manager':                 voter_profile['is_voter_manager'],
+            'last_name':                        voter_profile['last_name'],
+            'linked_organization_we_vote_id':   voter_profile['linked_organization_we_vote_id'],
+            'notification_settings_flags':      voter_profile['notification_settings_flags'],
+            'profile_image_type_currently_active':  voter_profile['profile_image_type_currently_active'],
+            'signed_in':                        voter_profile['is_signed_in'],  # Extra field for debugging the WebApp
+            'signed_in_facebook':               voter_profile['signed_in_facebook'],
+            'signed_in_google':                 voter_profile['signed_in_google'],
+            'signed_in_twitter':                voter_profile['signed_in_twitter'],
+            'signed_in_with_apple':             voter_profile['signed_in_with_apple'],
+            'signed_in_with_email':             voter_profile['signed_in_with_email'],
+            'signed_in_with_sms_phone_number':  voter_profile['signed_in_with_sms_phone_number'],
             'state_code_from_ip_address':       state_code_from_ip_address,
             'text_for_map_search':              address_results['text_for_map_search'],
-            'twitter_screen_name':              voter.twitter_screen_name,
+            'twitter_screen_name':              voter_profile['twitter_screen_name'],
             'voter_created':                    voter_created,
             'voter_device_id':                  voter_device_id,
             'voter_found':                      True,
-            'voter_photo_url_large':            we_vote_hosted_profile_image_url_large,
-            'voter_photo_url_medium':           we_vote_hosted_profile_image_url_medium,
-            'voter_photo_url_tiny':             voter.we_vote_hosted_profile_image_url_tiny,
-            'we_vote_hosted_profile_facebook_image_url_large':  voter.we_vote_hosted_profile_facebook_image_url_large,
-            'we_vote_hosted_profile_twitter_image_url_large':   voter.we_vote_hosted_profile_twitter_image_url_large,
-            'we_vote_hosted_profile_uploaded_image_url_large':  voter.we_vote_hosted_profile_uploaded_image_url_large,
-            'we_vote_id':                       voter.we_vote_id,
+            'voter_photo_url_large':            voter_profile['voter_photo_url_large'],
+            'voter_photo_url_medium':           voter_profile['voter_photo_url_medium'],
+            'voter_photo_url_tiny':             voter_profile['voter_photo_url_tiny'],
+            'we_vote_hosted_profile_facebook_image_url_large':
+                voter_profile['we_vote_hosted_profile_facebook_image_url_large'],
+            'we_vote_hosted_profile_twitter_image_url_large':
+                voter_profile['we_vote_hosted_profile_twitter_image_url_large'],
+            'we_vote_hosted_profile_uploaded_image_url_large':
+                voter_profile['we_vote_hosted_profile_uploaded_image_url_large'],
+            'we_vote_id':                       voter_profile['we_vote_id'],
         }
         return json_data
 
@@ -4365,6 +4087,111 @@ def get_displayable_images(voter, facebook_user):
         we_vote_hosted_profile_image_url_medium
 
 
+def generate_voter_profile_snapshot(voter, facebook_user=None):
+    """
+    What voterRetrieve returns about this voter, as a plain dict that can be cached. Each sign-in link is looked up
+    once (Voter.is_signed_in and Voter.has_data_to_preserve would look them up again), from the primary database.
+    :param voter:
+    :param facebook_user: If already retrieved
+    :return:
+    """
+    twitter_link_results = TwitterUserManager().retrieve_twitter_link_to_voter(0, voter.we_vote_id)
+    signed_in_twitter = twitter_link_results['twitter_link_to_voter_found'] and \
+        positive_value_exists(twitter_link_results['twitter_link_to_voter'].twitter_id)
+    facebook_manager = FacebookManager()
+    facebook_link_results = facebook_manager.retrieve_facebook_link_to_voter(0, voter.we_vote_id)
+    signed_in_facebook = facebook_link_results['facebook_link_to_voter_found'] and \
+        positive_value_exists(facebook_link_results['facebook_link_to_voter'].facebook_user_id)
+    if facebook_user is None and signed_in_facebook and \
+            not positive_value_exists(voter.facebook_profile_image_url_https):
+        # get_displayable_images only needs the FacebookUser when the voter doesn't have a Facebook image
+        facebook_user_results = facebook_manager.retrieve_facebook_user_by_facebook_user_id(
+            facebook_link_results['facebook_link_to_voter'].facebook_user_id)
+        if facebook_user_results['facebook_user_found']:
+            facebook_user = facebook_user_results['facebook_user']
+    try:
+        signed_in_with_apple = AppleUser.objects.filter(voter_we_vote_id__iexact=voter.we_vote_id).exists()
+    except Exception as e:
+        signed_in_with_apple = False
+    signed_in_with_email = voter.signed_in_with_email()
+    signed_in_with_sms_phone_number = voter.signed_in_with_sms_phone_number()
+    has_email_with_verified_ownership = voter.has_email_with_verified_ownership()
+
+    facebook_profile_image_url_https, \
+        we_vote_hosted_profile_image_url_large, \
+        we_vote_hosted_profile_image_url_medium = \
+        get_displayable_images(voter, facebook_user)
+
+    return {
+        'address':                          voter_address_retrieve_for_voter_id(voter.id),
+        'date_joined':                      voter.date_joined.strftime(DATE_FORMAT_YMD_HMS),  # '%Y-%m-%d %H:%M:%S'
+        'email':                            voter.email,
+        'facebook_email':                   voter.facebook_email,
+        'facebook_id':                      voter.facebook_id,
+        'facebook_profile_image_url_https': facebook_profile_image_url_https,
+        'first_name':                       voter.first_name,
+        'full_name':                        voter.get_full_name(),
+        'has_data_to_preserve':
+            has_email_with_verified_ownership or signed_in_twitter or signed_in_facebook or
+            bool(voter.data_to_preserve),
+        'has_email_with_verified_ownership':    has_email_with_verified_ownership,
+        'has_valid_email':                  voter.has_valid_email(),
+        'interface_status_flags':           voter.interface_status_flags,
+        'is_admin':                         voter.is_admin,
+        'is_analytics_admin':               voter.is_analytics_admin,
+        'is_partner_organization':          voter.is_partner_organization,
+        'is_political_data_manager':        voter.is_political_data_manager,
+        'is_political_data_viewer':         voter.is_political_data_viewer,
+        'is_signed_in':
+            signed_in_with_email or signed_in_with_sms_phone_number or signed_in_with_apple or
+            signed_in_facebook or signed_in_twitter,
+        'is_verified_volunteer':            voter.is_verified_volunteer,
+        'is_voter_manager':                 voter.is_voter_manager,
+        'last_name':                        voter.last_name,
+        'linked_organization_we_vote_id':   voter.linked_organization_we_vote_id,
+        'notification_settings_flags':      voter.notification_settings_flags,
+        'profile_image_type_currently_active':  voter.profile_image_type_currently_active,
+        'signed_in_facebook':               signed_in_facebook,
+        'signed_in_google':                 voter.signed_in_google(),
+        'signed_in_twitter':                signed_in_twitter,
+        'signed_in_with_apple':             signed_in_with_apple,
+        'signed_in_with_email':             signed_in_with_email,
+        'signed_in_with_sms_phone_number':  signed_in_with_sms_phone_number,
+        'twitter_screen_name':              voter.twitter_screen_name,
+        'voter_id':                         voter.id,
+        'voter_photo_url_large':            we_vote_hosted_profile_image_url_large,
+        'voter_photo_url_medium':           we_vote_hosted_profile_image_url_medium,
+        'voter_photo_url_tiny':             voter.we_vote_hosted_profile_image_url_tiny,
+        'we_vote_hosted_profile_facebook_image_url_large':  voter.we_vote_hosted_profile_facebook_image_url_large,
+        'we_vote_hosted_profile_twitter_image_url_large':   voter.we_vote_hosted_profile_twitter_image_url_large,
+        'we_vote_hosted_profile_uploaded_image_url_large':  voter.we_vote_hosted_profile_uploaded_image_url_large,
+        'we_vote_id':                       voter.we_vote_id,
+    }
+
+
+def retrieve_voter_profile_snapshot(voter_id):
+    """
+    The voter's generate_voter_profile_snapshot, reading through the shared cache. Saving the voter, their ballot
+    address, or their Twitter, Facebook or Apple sign-in invalidates it (see the receivers in voter/models.py).
+    :param voter_id:
+    :return: results dict with voter_profile_found and voter_profile
+    """
+    def retrieve_voter_profile_from_database():
+        # From the primary, so a replica that hasn't caught up with a sign-in yet can't put an old profile in the cache
+        results = VoterManager.retrieve_voter_by_id(voter_id, read_only=False)
+        voter_profile = generate_voter_profile_snapshot(results['voter']) if results['voter_found'] else None
+        return {
+            'success':              results['success'],
+            'status':               results['status'],
+            'voter_profile_found':  voter_profile is not None,
+            'voter_profile':        voter_profile,
+        }
+
+    return retrieve_results_through_cache(
+        CACHE_NAMESPACE_VOTER_PROFILE, convert_to_int(voter_id), 'voter_profile_found',
+        retrieve_voter_profile_from_database)
+
+
 def voter_retrieve_list_for_api(voter_device_id):
     """
     This is used for voterExportView
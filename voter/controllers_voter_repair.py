@@ -0,0 +1,468 @@
+# voter/controllers_voter_repair.py
+# Brought to you by We Vote. Be good.
+# -*- coding: UTF-8 -*-
+
+"""
+Keep a voter's cached Twitter values, linked organization, and organization images in step with their sign-in links.
+This used to run inside every voterRetrieve. Now sign-in events (saving a TwitterLinkToVoter or FacebookLinkToVoter,
+or moving a voter_device_id to another voter) call queue_voter_account_repair, and a background thread runs
+repair_voter_account once for each voter waiting, however many events came in for them.
+A new voter's organization is still created inline by voterRetrieve, with create_linked_organization_for_voter.
+"""
+
+from django.db import connections
+from config.base import get_environment_variable_default
+from import_export_facebook.models import FacebookManager
+from organization.models import OrganizationListManager, OrganizationManager, INDIVIDUAL
+from twitter.models import TwitterLinkToVoter, TwitterUserManager
+from voter.models import VoterManager
+import wevote_functions.admin
+from wevote_functions.functions import convert_to_int, positive_value_exists
+from wevote_functions.functions_cache import CACHE_KEY_PREFIX, get_cache
+from wevote_functions.functions_write_behind import WriteBehindBuffer
+
+logger = wevote_functions.admin.get_logger(__name__)
+
+VOTER_ACCOUNT_REPAIR_MAX_DELAY_SECONDS = \
+    float(get_environment_variable_default('VOTER_ACCOUNT_REPAIR_MAX_DELAY_SECONDS', 2))
+# A voter stays marked as waiting for a repair at most this long, in case the process holding it stops first
+VOTER_ACCOUNT_REPAIR_PENDING_SECONDS = 300
+
+
+def generate_voter_account_repair_pending_cache_key(voter_id):
+    return '{prefix}:voter_account_repair_pending:{voter_id}'.format(prefix=CACHE_KEY_PREFIX, voter_id=voter_id)
+
+
+def repair_voter_account_list(voter_id_list):
+    # The buffer's thread keeps its own connection, so make sure it is still good before each batch
+    connections['default'].close_if_unusable_or_obsolete()
+    for voter_id in dict.fromkeys(voter_id_list):
+        try:
+            # Events from now on need another repair, since this one may already have read what they change
+            get_cache().delete(generate_voter_account_repair_pending_cache_key(voter_id))
+        except Exception as e:
+            logger.error("repair_voter_account_list cache: " + str(e))
+        try:
+            results = repair_voter_account(voter_id)
+            if not results['success']:
+                logger.error("repair_voter_account " + str(voter_id) + ": " + results['status'])
+        except Exception as e:
+            # One voter's problem shouldn't hold back the rest of the batch
+            logger.error("repair_voter_account " + str(voter_id) + " exception: " + str(e))
+
+
+voter_account_repair_buffer = WriteBehindBuffer(
+    'voter_account_repair',
+    repair_voter_account_list,
+    max_batch_size=50,
+    max_delay_seconds=VOTER_ACCOUNT_REPAIR_MAX_DELAY_SECONDS)
+
+
+def queue_voter_account_repair(voter_id):
+    """
+    Ask for repair_voter_account to be run for this voter, in the background
+    :param voter_id:
+    :return: True if queued, False if a repair for this voter was already waiting
+    """
+    voter_id = convert_to_int(voter_id)
+    if not positive_value_exists(voter_id):
+        return False
+    try:
+        # add() only succeeds for the first request while a repair is waiting, from any server
+        if not get_cache().add(generate_voter_account_repair_pending_cache_key(voter_id), True,
+                               timeout=VOTER_ACCOUNT_REPAIR_PENDING_SECONDS):
+            return False
+    except Exception as e:
+        logger.error("queue_voter_account_repair: " + str(e))
+    voter_account_repair_buffer.add(voter_id)
+    return True
+
+
+def create_organization_for_voter(voter):
+    """
+    Create an individual organization from the voter's name and photo, and link the voter to it
+    :param voter: A voter which can be saved
+    :return: results dict
+    """
+    status = ""
+    create_results = OrganizationManager().create_organization(
+        organization_name=voter.get_full_name(),
+        organization_image=voter.voter_photo_url(),
+        organization_type=INDIVIDUAL,
+        we_vote_hosted_profile_image_url_large=voter.we_vote_hosted_profile_image_url_large,
+        we_vote_hosted_profile_image_url_medium=voter.we_vote_hosted_profile_image_url_medium,
+        we_vote_hosted_profile_image_url_tiny=voter.we_vote_hosted_profile_image_url_tiny
+    )
+    organization_created = False
+    if create_results['organization_created']:
+        # Add value to twitter_owner_voter.linked_organization_we_vote_id when done.
+        organization = create_results['organization']
+        try:
+            voter.linked_organization_we_vote_id = organization.we_vote_id
+            voter.save()
+            organization_created = True
+            status += "ORGANIZATION_CREATED "
+        except Exception as e:
+            status += "UNABLE_TO_CREATE_NEW_ORGANIZATION_TO_VOTER_FROM_RETRIEVE_VOTER2 "
+    return {
+        'status':               status,
+        'success':              organization_created,
+        'organization_created': organization_created,
+    }
+
+
+def create_linked_organization_for_voter(voter_id):
+    """
+    Give a voter without a linked organization their own, so voterRetrieve can return it on the voter's first call.
+    Voters signed in with Twitter are left to repair_voter_account, which links them to their Twitter account's
+    organization (and may need to ask Twitter for the handle).
+    :param voter_id:
+    :return: results dict with organization_created
+    """
+    results = VoterManager().retrieve_voter_by_id(voter_id, read_only=False)
+    if not results['voter_found']:
+        return {
+            'status':               "CREATE_LINKED_ORGANIZATION-VOTER_NOT_FOUND ",
+            'success':              False,
+            'organization_created': False,
+        }
+    voter = results['voter']
+    if positive_value_exists(voter.linked_organization_we_vote_id):
+        return {
+            'status':               "CREATE_LINKED_ORGANIZATION-ALREADY_LINKED ",
+            'success':              True,
+            'organization_created': False,
+        }
+    twitter_link_results = TwitterUserManager().retrieve_twitter_link_to_voter(0, voter.we_vote_id)
+    if twitter_link_results['twitter_link_to_voter_found']:
+        return {
+            'status':               "CREATE_LINKED_ORGANIZATION-TWITTER_LINK_TO_VOTER_FOUND ",
+            'success':              True,
+            'organization_created': False,
+        }
+    return create_organization_for_voter(voter)
+
+
+def repair_voter_account(voter_id):
+    """
+    Make the voter's cached twitter_id and twitter_screen_name match their TwitterLinkToVoter, make sure the voter has
+    a linked organization (creating one, and its TwitterLinkToOrganization, if needed), and copy the latest Facebook
+    images to that organization.
+    :param voter_id:
+    :return: results dict, with the voter as it is after the repair
+    """
+    organization_manager = OrganizationManager()
+    voter_manager = VoterManager()
+    twitter_link_to_voter = TwitterLinkToVoter()
+    repair_twitter_link_to_voter_caching_now = False
+    repair_facebook_link_to_voter_caching_now = False
+    facebook_user = None
+    status = ""
+
+    voter_read_only = True
+    results = voter_manager.retrieve_voter_by_id(voter_id, read_only=True)
+    if not results['voter_found']:
+        return {
+            'status':           "REPAIR_VOTER_ACCOUNT-VOTER_NOT_FOUND " + results['status'],
+            'success':          False,
+            'facebook_user':    None,
+            'voter':            None,
+            'voter_found':      False,
+        }
+    voter = results['voter']
+
+    twitter_link_to_voter_twitter_id = 0
+    # 2018-07-17 DALE Trying with this off
+    # if voter.is_signed_in():
+    twitter_user_manager = TwitterUserManager()
+    twitter_link_results = twitter_user_manager.retrieve_twitter_link_to_voter(0, voter.we_vote_id)
+    if twitter_link_results['twitter_link_to_voter_found']:
+        twitter_link_to_voter = twitter_link_results['twitter_link_to_voter']
+        twitter_link_to_voter_twitter_id = twitter_link_to_voter.twitter_id
+
+    twitter_link_to_organization_we_vote_id = ""
+    twitter_link_to_organization_twitter_id = 0
+    if positive_value_exists(twitter_link_to_voter_twitter_id):
+        twitter_org_link_results = \
+            twitter_user_manager.retrieve_twitter_link_to_organization_from_twitter_user_id(
+                twitter_link_to_voter_twitter_id)
+        if twitter_org_link_results['twitter_link_to_organization_found']:
+            twitter_link_to_organization = twitter_org_link_results['twitter_link_to_organization']
+            twitter_link_to_organization_twitter_id = twitter_link_to_organization.twitter_id
+            twitter_link_to_organization_we_vote_id = twitter_link_to_organization.organization_we_vote_id
+    else:
+        if positive_value_exists(voter.twitter_screen_name) or positive_value_exists(voter.twitter_id):
+            # If the voter has cached twitter information, delete it now because there isn't a
+            #  twitter_link_to_voter entry
+            # Pull voter object we can save
+            if voter_read_only:
+                results = voter_manager.retrieve_voter_by_id(voter_id, read_only=False)
+                if results['voter_found']:
+                    voter = results['voter']
+                    voter_read_only = False
+            try:
+                voter.twitter_id = 0
+                voter.twitter_screen_name = ""
+                voter.save()
+                status += "VOTER_TWITTER_CLEARED1 "
+                repair_twitter_link_to_voter_caching_now = True
+            except Exception as e:
+                status += "UNABLE_TO_CLEAR_TWITTER_SCREEN_NAME1 "
+
+    if positive_value_exists(twitter_link_to_voter_twitter_id) and \
+            positive_value_exists(twitter_link_to_organization_twitter_id) and \
+            twitter_link_to_voter_twitter_id == twitter_link_to_organization_twitter_id:
+        # If we have a twitter link to both the voter and the organization, then we want to make sure the
+        #  voter is linked to the correct organization
+        status += "VERIFYING_TWITTER_LINK_TO_ORGANIZATION "
+        if voter.linked_organization_we_vote_id != twitter_link_to_organization_we_vote_id:
+            # If here there is a mismatch to fix
+            if voter_read_only:
+                # Pull voter object we can save
+                results = voter_manager.retrieve_voter_by_id(voter_id, read_only=False)
+                if results['voter_found']:
+                    voter = results['voter']
+                    voter_read_only = False
+            try:
+                voter.linked_organization_we_vote_id = twitter_link_to_organization_we_vote_id
+                voter.save()
+                repair_twitter_link_to_voter_caching_now = True
+                status += "VOTER_LINKED_ORGANIZATION_FIXED "
+            except Exception as e:
+                status += "VOTER_LINKED_ORGANIZATION_COULD_NOT_BE_FIXED " + str(e) + " "
+
+    if positive_value_exists(voter.linked_organization_we_vote_id):
+        existing_organization_for_this_voter_found = True
+    else:
+        status += "VOTER.LINKED_ORGANIZATION_WE_VOTE_ID-MISSING "
+        existing_organization_for_this_voter_found = False
+        create_twitter_link_to_organization = False
+        organization_twitter_handle = ""
+        organization_twitter_id = ""
+        twitter_link_to_voter_twitter_id = 0
+
+        # Is this voter associated with a Twitter account?
+        # If so, check to see if an organization entry exists for this voter.
+        if twitter_link_results['twitter_link_to_voter_found']:
+            twitter_link_to_voter = twitter_link_results['twitter_link_to_voter']
+            if not positive_value_exists(twitter_link_to_voter.twitter_id):
+                if positive_value_exists(voter.twitter_screen_name) or positive_value_exists(voter.twitter_id):
+                    if voter_read_only:
+                        # Pull voter object we can save
+                        results = voter_manager.retrieve_voter_by_id(voter_id, read_only=False)
+                        if results['voter_found']:
+                            voter = results['voter']
+                            voter_read_only = False
+                    try:
+                        voter.twitter_id = 0
+                        voter.twitter_screen_name = ""
+                        voter.save()
+                        status += "VOTER_TWITTER_CLEARED2 "
+                    except Exception as e:
+                        status += "UNABLE_TO_CLEAR_TWITTER_SCREEN_NAME2: " + str(e) + " "
+            else:
+                # If here there is a twitter_link_to_voter to possibly update
+                try:
+                    value_to_save = False
+                    twitter_link_to_voter_twitter_id = twitter_link_to_voter.twitter_id
+                    if voter.twitter_id == twitter_link_to_voter_twitter_id:
+                        status += "VOTER_TWITTER_ID_MATCHES "
+                    else:
+                        status += "VOTER_TWITTER_ID_DOES_NOT_MATCH_LINKED_TO_VOTER "
+                        if voter_read_only:
+                            # Pull voter object we can save
+                            results = voter_manager.retrieve_voter_by_id(voter_id, read_only=False)
+                            if results['voter_found']:
+                                voter = results['voter']
+                                voter_read_only = False
+                        voter.twitter_id = twitter_link_to_voter_twitter_id
+                        value_to_save = True
+
+                    voter_twitter_screen_name = twitter_link_to_voter.fetch_twitter_handle_locally_or_remotely()
+                    if voter.twitter_screen_name == voter_twitter_screen_name:
+                        status += "VOTER_TWITTER_SCREEN_NAME_MATCHES "
+                    else:
+                        status += "VOTER_TWITTER_SCREEN_NAME_DOES_NOT_MATCH_LINKED_TO_VOTER "
+                        if voter_read_only:
+                            # Pull voter object we can save
+                            results = voter_manager.retrieve_voter_by_id(voter_id, read_only=False)
+                            if results['voter_found']:
+                                voter = results['voter']
+                                voter_read_only = False
+                        voter.twitter_screen_name = voter_twitter_screen_name
+                        value_to_save = True
+
+                    if value_to_save:
+                        voter.save()
+                        repair_twitter_link_to_voter_caching_now = True
+                except Exception as e:
+                    status += "UNABLE_TO_SAVE_VOTER_TWITTER_CACHED_INFO: " + str(e) + " "
+
+                twitter_link_to_voter_twitter_id = twitter_link_to_voter.twitter_id
+                # Since we know this voter has authenticated for a Twitter account,
+                #  check to see if there is an organization associated with this Twitter account
+                # If an existing TwitterLinkToOrganization is found, link this org to this voter
+                twitter_org_link_results = \
+                    twitter_user_manager.retrieve_twitter_link_to_organization_from_twitter_user_id(
+                        twitter_link_to_voter.twitter_id)
+                if twitter_org_link_results['twitter_link_to_organization_found']:
+                    twitter_link_to_organization = twitter_org_link_results['twitter_link_to_organization']
+                    organization_twitter_id = twitter_link_to_organization.twitter_id
+                    if positive_value_exists(twitter_link_to_organization.organization_we_vote_id):
+                        if twitter_link_to_organization.organization_we_vote_id \
+                                != voter.linked_organization_we_vote_id:
+                            if voter_read_only:
+                                # Pull voter object we can save
+                                results = voter_manager.retrieve_voter_by_id(voter_id, read_only=False)
+                                if results['voter_found']:
+                                    voter = results['voter']
+                                    voter_read_only = False
+                            try:
+                                voter.linked_organization_we_vote_id = \
+                                    twitter_link_to_organization.organization_we_vote_id
+                                voter.save()
+                                existing_organization_for_this_voter_found = True
+
+                            except Exception as e:
+                                status += "UNABLE_TO_SAVE_LINKED_ORGANIZATION_FROM_TWITTER_LINK_TO_VOTER " + \
+                                          str(e) + " "
+                else:
+                    # If an existing TwitterLinkToOrganization was not found,
+                    # create the organization below, and then create TwitterLinkToOrganization
+                    organization_twitter_handle = twitter_link_to_voter.fetch_twitter_handle_locally_or_remotely()
+                    organization_twitter_id = twitter_link_to_voter.twitter_id
+                    create_twitter_link_to_organization = True
+
+        if not existing_organization_for_this_voter_found:
+            status += "EXISTING_ORGANIZATION_NOT_FOUND "
+            # If we are here, we need to create an organization for this voter
+            create_results = organization_manager.create_organization(
+                organization_name=voter.get_full_name(),
+                organization_twitter_handle=organization_twitter_handle,
+                organization_image=voter.voter_photo_url(),
+                organization_type=INDIVIDUAL,
+                twitter_id=organization_twitter_id,
+                we_vote_hosted_profile_image_url_large=voter.we_vote_hosted_profile_image_url_large,
+                we_vote_hosted_profile_image_url_medium=voter.we_vote_hosted_profile_image_url_medium,
+                we_vote_hosted_profile_image_url_tiny=voter.we_vote_hosted_profile_image_url_tiny
+            )
+            if create_results['organization_created']:
+                # Add value to twitter_owner_voter.linked_organization_we_vote_id when done.
+                organization = create_results['organization']
+                status += "ORGANIZATION_CREATED "
+                if voter_read_only:
+                    # Pull voter object we can save
+                    results = voter_manager.retrieve_voter_by_id(voter_id, read_only=False)
+                    if results['voter_found']:
+                        voter = results['voter']
+                        voter_read_only = False
+                try:
+                    voter.linked_organization_we_vote_id = organization.we_vote_id
+                    voter.save()
+                    existing_organization_for_this_voter_found = True
+                    if create_twitter_link_to_organization:
+                        create_results = twitter_user_manager.create_twitter_link_to_organization(
+                            twitter_link_to_voter_twitter_id, organization.we_vote_id)
+
+                        if create_results['twitter_link_to_organization_saved']:
+                            twitter_link_to_organization = create_results['twitter_link_to_organization']
+                            organization_list_manager = OrganizationListManager()
+                            repair_results = \
+                                organization_list_manager.repair_twitter_related_organization_caching(
+                                    twitter_link_to_organization.twitter_id)
+                            status += repair_results['status']
+
+                except Exception as e:
+                    status += "UNABLE_TO_CREATE_NEW_ORGANIZATION_TO_VOTER_FROM_RETRIEVE_VOTER: " + str(e) + " "
+            else:
+                status += "ORGANIZATION_NOT_CREATED "
+
+    # Check to see if there is a FacebookLinkToVoter for this voter, and if so, see if we need to make
+    #  organization update with latest Facebook data
+    facebook_manager = FacebookManager()
+    facebook_link_results = facebook_manager.retrieve_facebook_link_to_voter_from_voter_we_vote_id(
+        voter.we_vote_id, read_only=True)
+    if facebook_link_results['facebook_link_to_voter_found']:
+        status += "FACEBOOK_LINK_TO_VOTER_FOUND "
+        facebook_link_to_voter = facebook_link_results['facebook_link_to_voter']
+        facebook_link_to_voter_facebook_user_id = facebook_link_to_voter.facebook_user_id
+        if positive_value_exists(facebook_link_to_voter_facebook_user_id):
+            facebook_user_results = FacebookManager().retrieve_facebook_user_by_facebook_user_id(
+                facebook_link_to_voter_facebook_user_id)
+            if facebook_user_results['facebook_user_found']:
+                status += "FACEBOOK_USER_FOUND "
+                facebook_user = facebook_user_results['facebook_user']
+
+                organization_results = \
+                    OrganizationManager().retrieve_organization_from_we_vote_id(
+                        voter.linked_organization_we_vote_id)
+                if organization_results['organization_found']:
+                    try:
+                        organization = organization_results['organization']
+                        status += "FACEBOOK-ORGANIZATION_FOUND "
+                        save_organization = False
+                        # Look at the linked_organization for the voter and update with latest
+                        if positive_value_exists(facebook_user.facebook_profile_image_url_https):
+                            facebook_profile_image_different = \
+                                not positive_value_exists(organization.facebook_profile_image_url_https) \
+                                or facebook_user.facebook_profile_image_url_https != \
+                                organization.facebook_profile_image_url_https
+                            if facebook_profile_image_different:
+                                organization.facebook_profile_image_url_https = \
+                                    facebook_user.facebook_profile_image_url_https
+                                save_organization = True
+                        if positive_value_exists(facebook_user.facebook_background_image_url_https) and \
+                                not positive_value_exists(organization.facebook_background_image_url_https):
+                            organization.facebook_background_image_url_https = \
+                                facebook_user.facebook_background_image_url_https
+                            save_organization = True
+                        if positive_value_exists(facebook_user.facebook_user_id) and \
+                                not positive_value_exists(organization.facebook_id):
+                            organization.facebook_id = facebook_user.facebook_user_id
+                            save_organization = True
+                        if positive_value_exists(facebook_user.facebook_email) and \
+                                not positive_value_exists(organization.facebook_email):
+                            organization.facebook_email = facebook_user.facebook_email
+                            save_organization = True
+                        if save_organization:
+                            repair_facebook_link_to_voter_caching_now = True
+                            organization.save()
+                            status += "FACEBOOK-ORGANIZATION_SAVED "
+                    except Exception as e:
+                        status += "FAILED_UPDATE_OR_CREATE_ORGANIZATION: " + str(e)
+                        logger.error('FAILED organization_manager.update_or_create_organization. '
+                                     '{error} [type: {error_type}]'.format(error=e, error_type=type(e)))
+                else:
+                    status += "FACEBOOK_RELATED_ORGANIZATION_NOT_FOUND "
+            else:
+                status += "FACEBOOK_USER_NOT_FOUND "
+
+    else:
+        status += "FACEBOOK_LINK_TO_VOTER_NOT_FOUND "
+
+    if not positive_value_exists(voter.linked_organization_we_vote_id):
+        # If we are here, we need to create an organization for this voter
+        status += "NEED_TO_CREATE_ORGANIZATION_FOR_THIS_VOTER "
+        if voter_read_only:
+            # Pull voter object we can save
+            results = voter_manager.retrieve_voter_by_id(voter_id, read_only=False)
+            if results['voter_found']:
+                voter = results['voter']
+                voter_read_only = False
+        create_results = create_organization_for_voter(voter)
+        status += create_results['status']
+
+    if repair_twitter_link_to_voter_caching_now:
+        # If here then we know that we have a twitter_link_to_voter, and there was some data cleanup done
+        repair_results = voter_manager.repair_twitter_related_voter_caching(
+            twitter_link_to_voter.twitter_id)
+        status += repair_results['status']
+
+    # TODO DALE: Add if repair_facebook_link_to_voter_caching_now
+    return {
+        'status':           status,
+        'success':          True,
+        'facebook_user':    facebook_user,
+        'voter':            voter,
+        'voter_found':      True,
+    }
@@ -0,0 +1,85 @@
+import statistics
+import time
+from contextlib import ExitStack
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import RequestFactory
+from django_user_agents.utils import get_user_agent
+
+from voter.controllers import voter_retrieve_for_api
+from voter.models import fetch_voter_id_from_voter_device_link
+from wevote_functions.functions_cache import CACHE_NAMESPACE_VOTER_PROFILE, invalidate_cache_key
+from wevote_functions.functions_voter_identity import end_voter_identity_request, start_voter_identity_request
+
+
+class Command(BaseCommand):
+    help = 'Times voterRetrieve for an existing voter_device_id, with the repairs done on every call (the old way) ' \
+           'and with the fast path, and counts the database queries each call makes. The fast path starts from an ' \
+           'empty profile snapshot, so its first call shows the cost of a cache miss.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('voter_device_id',
+                            help='A voter_device_id from this database, ideally for a voter signed in with Twitter')
+        parser.add_argument('--calls', type=int, default=20,
+                            help='Number of voterRetrieve calls each way')
+        parser.add_argument('--state_code', default='',
+                            help='Pass this as the state_code_from_ip_address')
+
+    def handle(self, *args, **options):
+        voter_device_id = options['voter_device_id']
+        voter_id = fetch_voter_id_from_voter_device_link(voter_device_id)
+        if not voter_id:
+            raise CommandError('No voter found for that voter_device_id')
+        request = RequestFactory().get(
+            '/apis/v1/voterRetrieve/', {'voter_device_id': voter_device_id},
+            HTTP_USER_AGENT='Mozilla/5.0 (benchmark_voter_retrieve)')
+        user_agent_object = get_user_agent(request)
+
+        for label, fast_path in (('repairs on every call', False), ('fast path', True)):
+            invalidate_cache_key(CACHE_NAMESPACE_VOTER_PROFILE, voter_id)
+            timing_list = []
+            for call_number in range(max(2, options['calls'])):
+                query_counter = {'count': 0}
+
+                def count_one_query(execute, sql, params, many, context):
+                    query_counter['count'] += 1
+                    return execute(sql, params, many, context)
+
+                # Like VoterIdentityMiddleware, each call gets its own request memo
+                start_voter_identity_request()
+                try:
+                    with ExitStack() as stack:
+                        for alias in connections:
+                            stack.enter_context(connections[alias].execute_wrapper(count_one_query))
+                        start_time = time.monotonic()
+                        results = voter_retrieve_for_api(
+                            request=request,
+                            state_code_from_ip_address=options['state_code'],
+                            user_agent_string=request.headers['user-agent'],
+                            user_agent_object=user_agent_object,
+                            voter_device_id=voter_device_id,
+                            voter_location_results={'voter_location_found': False},
+                            fast_path=fast_path)
+                        elapsed_seconds = time.monotonic() - start_time
+                finally:
+                    end_voter_identity_request()
+                if not results['success']:
+                    raise CommandError(label + ': ' + results['status'])
+                timing_list.append((elapsed_seconds, query_counter['count']))
+            self.write_timing(label, timing_list)
+
+    def write_timing(self, label, timing_list):
+        first_seconds, first_query_count = timing_list[0]
+        seconds_list = [one_timing[0] for one_timing in timing_list[1:]]
+        query_count_list = [one_timing[1] for one_timing in timing_list[1:]]
+        self.stdout.write(
+            '{label}: first call {first_ms:.1f}ms, {first_queries} queries; '
+            'next {calls} calls median {median_ms:.1f}ms, max {max_ms:.1f}ms, {median_queries} queries'.format(
+                label=label,
+                first_ms=first_seconds * 1000,
+                first_queries=first_query_count,
+                calls=len(seconds_list),
+                median_ms=statistics.median(seconds_list) * 1000,
+                max_ms=max(seconds_list) * 1000,
+                median_queries=statistics.median(query_count_list)))
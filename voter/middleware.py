@@ -0,0 +1,23 @@
+# voter/middleware.py
+# Brought to you by We Vote. Be good.
+# -*- coding: UTF-8 -*-
+
+from wevote_functions.functions_voter_identity import end_voter_identity_request, start_voter_identity_request
+
+
+class VoterIdentityMiddleware(object):
+    """
+    Remember the voter_device_link, voter identity and voter for each voter_device_id for the life of one request.
+    They are looked up the first time a helper like fetch_voter_id_from_voter_device_link needs them, so requests
+    that never look up a voter don't pay for it.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        start_voter_identity_request()
+        try:
+            return self.get_response(request)
+        finally:
+            end_voter_identity_request()
@@ -14,6 +14,8 @@ from django.contrib.auth.models import (BaseUserManager, AbstractBaseUser)  # Pe
 from django.core.validators import RegexValidator
 from django.db import (models, IntegrityError)
 from django.db.models import Q
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
 from django.utils.timezone import now
 from geopy import get_geocoder_for_service
 from validate_email import validate_email
@@ -23,12 +25,15 @@ from apple.models import AppleUser
 from config.base import get_environment_variable, get_environment_variable_default
 from exception.models import handle_exception, handle_record_found_more_than_one_exception, \
     handle_record_not_saved_exception
-from import_export_facebook.models import FacebookManager
+from import_export_facebook.models import FacebookLinkToVoter, FacebookManager
 from sms.models import SMSManager
-from twitter.models import TwitterUserManager
+from twitter.models import TwitterLinkToVoter, TwitterUserManager
 from wevote_functions.functions import extract_state_code_from_address_string, convert_to_int, generate_random_string, \
     generate_voter_device_id, get_voter_api_device_id, positive_value_exists
+from wevote_functions.functions_cache import CACHE_NAMESPACE_VOTER_PROFILE, invalidate_cache_key
 from wevote_functions.functions_date import generate_localized_datetime_from_obj
+from wevote_functions.functions_voter_identity import fetch_memoized_object, forget_memoized_object, \
+    invalidate_voter_identity, memoize_object, retrieve_voter_identity_from_cache, save_voter_identity_to_cache
 from wevote_settings.models import fetch_next_we_vote_id_voter_integer, fetch_site_unique_id_prefix
 
 logger = wevote_functions.admin.get_logger(__name__)
@@ -1141,7 +1146,7 @@ class VoterManager(BaseUserManager):
     def retrieve_voter_from_voter_device_id(voter_device_id, read_only=False):
         success = True
         status = ''
-        voter_id = fetch_voter_id_from_voter_device_link(voter_device_id)
+        voter_id = retrieve_voter_identity_from_voter_device_id(voter_device_id)['voter_id']
 
         if not voter_id:
             status += "MISSING_VOTER_ID "
@@ -1555,8 +1560,26 @@ class VoterManager(BaseUserManager):
 
     @staticmethod
     def retrieve_voter_by_id(voter_id, read_only=False):
+        voter_id = convert_to_int(voter_id)
+        if read_only:
+            # Remembered for the rest of this request (see VoterIdentityMiddleware)
+            voter = fetch_memoized_object('voter', voter_id)
+            if voter is not None:
+                return {
+                    'success':                  True,
+                    'status':                   "VOTER_RETRIEVED_FROM_REQUEST_MEMO ",
+                    'error_result':             False,
+                    'DoesNotExist':             False,
+                    'MultipleObjectsReturned':  False,
+                    'voter_found':              True,
+                    'voter_id':                 voter.id,
+                    'voter':                    voter,
+                }
         voter_manager = VoterManager()
-        return voter_manager.retrieve_voter(voter_id, read_only=read_only)
+        results = voter_manager.retrieve_voter(voter_id, read_only=read_only)
+        if read_only and results['voter_found']:
+            memoize_object('voter', voter_id, results['voter'])
+        return results
 
     @staticmethod
     def retrieve_voter_by_email(email, read_only=False):
@@ -3559,6 +3582,47 @@ CHANGE_TABLE_CHOICES = (
 )
 
 
+@receiver(post_save, sender=Voter)
+def save_voter_memo_signal(sender, instance, **kwargs):
+    forget_memoized_object('voter', instance.id)
+    invalidate_cache_key(CACHE_NAMESPACE_VOTER_PROFILE, instance.id)
+
+
+@receiver(post_delete, sender=Voter)
+def delete_voter_memo_signal(sender, instance, **kwargs):
+    forget_memoized_object('voter', instance.id)
+    invalidate_cache_key(CACHE_NAMESPACE_VOTER_PROFILE, instance.id)
+
+
+def invalidate_voter_profile_from_voter_we_vote_id(voter_we_vote_id):
+    """
+    :return: the voter_id, or 0 if the voter wasn't found
+    """
+    if not positive_value_exists(voter_we_vote_id):
+        return 0
+    voter_id = VoterManager().fetch_local_id_from_we_vote_id(voter_we_vote_id)
+    invalidate_cache_key(CACHE_NAMESPACE_VOTER_PROFILE, voter_id)
+    return voter_id
+
+
+# Signing in with Twitter or Facebook saves these links. Besides changing voterRetrieve's profile snapshot, the voter's
+#  cached Twitter values and linked organization may need repairing (see voter/controllers_voter_repair.py)
+@receiver(post_save, sender=TwitterLinkToVoter)
+@receiver(post_save, sender=FacebookLinkToVoter)
+def save_sign_in_link_signal(sender, instance, **kwargs):
+    from voter.controllers_voter_repair import queue_voter_account_repair
+    voter_id = invalidate_voter_profile_from_voter_we_vote_id(instance.voter_we_vote_id)
+    queue_voter_account_repair(voter_id)
+
+
+@receiver(post_delete, sender=TwitterLinkToVoter)
+@receiver(post_delete, sender=FacebookLinkToVoter)
+@receiver(post_save, sender=AppleUser)
+@receiver(post_delete, sender=AppleUser)
+def change_sign_in_link_signal(sender, instance, **kwargs):
+    invalidate_voter_profile_from_voter_we_vote_id(instance.voter_we_vote_id)
+
+
 class VoterChangeLog(models.Model):
     """
     For keeping track of settings changes either by voter or by system. (i.e., setting new default values)
@@ -3745,6 +3809,17 @@ class VoterDeviceLink(models.Model):
         return generate_voter_device_id()
 
 
+# Signing in, signing out, merging and splitting voters all save or delete VoterDeviceLink entries
+@receiver(post_save, sender=VoterDeviceLink)
+def save_voter_device_link_identity_signal(sender, instance, **kwargs):
+    invalidate_voter_identity(instance.voter_device_id)
+
+
+@receiver(post_delete, sender=VoterDeviceLink)
+def delete_voter_device_link_identity_signal(sender, instance, **kwargs):
+    invalidate_voter_identity(instance.voter_device_id)
+
+
 class VoterDeviceLinkManager(models.Manager):
     """
     In order to start gathering information about a voter prior to authentication, we use a long randomized string
@@ -3897,12 +3972,19 @@ class VoterDeviceLinkManager(models.Manager):
         success = True
         voter_device_link_on_stage = VoterDeviceLink()
 
+        memoized_voter_device_link = \
+            fetch_memoized_object('voter_device_link', voter_device_id) if read_only else None
         try:
-            if positive_value_exists(voter_device_id):
+            if memoized_voter_device_link is not None:
+                status += " RETRIEVE_VOTER_DEVICE_LINK-FROM_REQUEST_MEMO "
+                voter_device_link_on_stage = memoized_voter_device_link
+                voter_device_link_id = voter_device_link_on_stage.id
+            elif positive_value_exists(voter_device_id):
                 status += " RETRIEVE_VOTER_DEVICE_LINK-GET_BY_VOTER_DEVICE_ID "
                 if read_only and 'test' not in sys.argv:
                     voter_device_link_on_stage = VoterDeviceLink.objects.using('readonly').get(
                         voter_device_id=voter_device_id)
+                    memoize_object('voter_device_link', voter_device_id, voter_device_link_on_stage)
                 else:
                     voter_device_link_on_stage = VoterDeviceLink.objects.get(voter_device_id=voter_device_id)
                 voter_device_link_id = voter_device_link_on_stage.id
@@ -4131,7 +4213,9 @@ class VoterDeviceLinkManager(models.Manager):
             status += "UPDATING_VOTER_DEVICE_LINK_RECURSIVELY "
         try:
             if positive_value_exists(voter_device_link.voter_device_id):
+                voter_changed = False
                 if voter_object and positive_value_exists(voter_object.id):
+                    voter_changed = voter_device_link.voter_id != voter_object.id
                     voter_device_link.voter_id = voter_object.id
                 if positive_value_exists(google_civic_election_id):
                     voter_device_link.date_election_last_changed = now()
@@ -4161,6 +4245,10 @@ class VoterDeviceLinkManager(models.Manager):
                     voter_device_link.secret_code_number_of_failed_tries_for_this_code = None
                 voter_device_link.save()
                 status += "UPDATED_VOTER_DEVICE_LINK "
+                if voter_changed:
+                    # Signing in to an existing account moves this voter_device_id to that voter
+                    from voter.controllers_voter_repair import queue_voter_account_repair
+                    queue_voter_account_repair(voter_object.id)
                 voter_device_link_id = voter_device_link.id
             else:
                 missing_required_variables = True
@@ -4383,15 +4471,33 @@ class VoterIssuesLookup(models.Model):
     womens_equality = models.BooleanField(default=None, null=True)
 
 
-# This method *just* returns the voter_id or 0
-def fetch_voter_id_from_voter_device_link(voter_device_id):
+def retrieve_voter_identity_from_voter_device_id(voter_device_id):
+    """
+    The voter_id and voter_we_vote_id for this voter_device_id, from the request memo or the short-lived shared
+    cache when we can (see wevote_functions/functions_voter_identity.py)
+    :param voter_device_id:
+    :return: dict with voter_id (0 if not found) and voter_we_vote_id ("" if not found)
+    """
+    voter_identity = retrieve_voter_identity_from_cache(voter_device_id)
+    if voter_identity is not None:
+        return voter_identity
+    voter_id = 0
+    voter_we_vote_id = ""
     voter_device_link_manager = VoterDeviceLinkManager()
     results = voter_device_link_manager.retrieve_voter_device_link_from_voter_device_id(
         voter_device_id, read_only=True)
     if results['voter_device_link_found']:
-        voter_device_link = results['voter_device_link']
-        return voter_device_link.voter_id
-    return 0
+        voter_id = results['voter_device_link'].voter_id
+        voter_results = VoterManager.retrieve_voter_by_id(voter_id, read_only=True)
+        if voter_results['voter_found']:
+            voter_we_vote_id = voter_results['voter'].we_vote_id
+        save_voter_identity_to_cache(voter_device_id, voter_id, voter_we_vote_id)
+    return {'voter_id': voter_id, 'voter_we_vote_id': voter_we_vote_id}
+
+
+# This method *just* returns the voter_id or 0
+def fetch_voter_id_from_voter_device_link(voter_device_id):
+    return retrieve_voter_identity_from_voter_device_id(voter_device_id)['voter_id']
 
 
 # This method *just* returns the voter_id or 0
@@ -4448,34 +4554,17 @@ def fetch_api_voter_from_request(request):
 
 
 def fetch_voter_from_voter_device_link(voter_device_id):
-    voter_device_link_manager = VoterDeviceLinkManager()
-    results = voter_device_link_manager.retrieve_voter_device_link_from_voter_device_id(
-        voter_device_id, read_only=True)
-    if results['voter_device_link_found']:
-        voter_device_link = results['voter_device_link']
-        voter_id = voter_device_link.voter_id
-        voter_manager = VoterManager()
-        results = voter_manager.retrieve_voter_by_id(voter_id, read_only=True)
+    voter_id = fetch_voter_id_from_voter_device_link(voter_device_id)
+    if positive_value_exists(voter_id):
+        results = VoterManager.retrieve_voter_by_id(voter_id, read_only=True)
         if results['voter_found']:
             voter = results['voter']
             return voter
-        return None
     return None
 
 
 def fetch_voter_we_vote_id_from_voter_device_link(voter_device_id):
-    voter_device_link_manager = VoterDeviceLinkManager()
-    results = voter_device_link_manager.retrieve_voter_device_link_from_voter_device_id(voter_device_id,
-                                                                                        read_only=True)
-    if results['voter_device_link_found']:
-        voter_device_link = results['voter_device_link']
-        voter_id = voter_device_link.voter_id
-        voter_manager = VoterManager()
-        results = voter_manager.retrieve_voter_by_id(voter_id, read_only=True)
-        if results['voter_found']:
-            voter = results['voter']
-            return voter.we_vote_id
-        return ""
+    return retrieve_voter_identity_from_voter_device_id(voter_device_id)['voter_we_vote_id']
 
 
 def retrieve_voter_authority(request):
@@ -4654,6 +4743,16 @@ class VoterAddress(models.Model):
             return ""
 
 
+@receiver(post_save, sender=VoterAddress)
+def save_voter_address_profile_signal(sender, instance, **kwargs):
+    invalidate_cache_key(CACHE_NAMESPACE_VOTER_PROFILE, instance.voter_id)
+
+
+@receiver(post_delete, sender=VoterAddress)
+def delete_voter_address_profile_signal(sender, instance, **kwargs):
+    invalidate_cache_key(CACHE_NAMESPACE_VOTER_PROFILE, instance.voter_id)
+
+
 class VoterAddressManager(models.Manager):
     def __unicode__(self):
         return "VoterAddressManager"
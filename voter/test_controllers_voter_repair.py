@@ -0,0 +1,63 @@
+# voter/test_controllers_voter_repair.py
+# Brought to you by We Vote. Be good.
+# -*- coding: UTF-8 -*-
+
+from unittest import mock
+from django.test import SimpleTestCase, override_settings
+from . import controllers_voter_repair
+from .controllers_voter_repair import create_linked_organization_for_voter, queue_voter_account_repair, \
+    repair_voter_account_list
+from wevote_functions.functions_cache import get_cache
+
+LOCAL_MEMORY_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'voter-account-repair-tests',
+    },
+}
+
+
+@override_settings(CACHES=LOCAL_MEMORY_CACHES)
+class VoterAccountRepairTests(SimpleTestCase):
+
+    def setUp(self):
+        get_cache().clear()
+
+    @mock.patch.object(controllers_voter_repair.voter_account_repair_buffer, 'add')
+    def test_queue_voter_account_repair_once_while_waiting(self, buffer_add):
+        self.assertTrue(queue_voter_account_repair(11))
+        self.assertFalse(queue_voter_account_repair('11'))
+        self.assertTrue(queue_voter_account_repair(12))
+        self.assertFalse(queue_voter_account_repair(0))
+        self.assertEqual([one_call.args[0] for one_call in buffer_add.call_args_list], [11, 12])
+
+    @mock.patch.object(controllers_voter_repair.voter_account_repair_buffer, 'add')
+    @mock.patch.object(controllers_voter_repair, 'connections')
+    @mock.patch.object(controllers_voter_repair, 'repair_voter_account')
+    def test_repair_voter_account_list(self, repair_voter_account, connections, buffer_add):
+        repair_voter_account.side_effect = [{'success': True, 'status': ''}, Exception('broken voter')]
+        queue_voter_account_repair(11)
+        repair_voter_account_list([11, 12, 11])
+        self.assertEqual([one_call.args[0] for one_call in repair_voter_account.call_args_list], [11, 12])
+        # Once its repair has started, a new sign-in event queues the voter again
+        self.assertTrue(queue_voter_account_repair(11))
+
+    @mock.patch.object(controllers_voter_repair, 'create_organization_for_voter')
+    @mock.patch.object(controllers_voter_repair, 'TwitterUserManager')
+    @mock.patch.object(controllers_voter_repair, 'VoterManager')
+    def test_create_linked_organization_for_voter(self, voter_manager, twitter_user_manager,
+                                                  create_organization_for_voter):
+        voter = mock.Mock(we_vote_id='wv01voter11', linked_organization_we_vote_id='')
+        voter_manager.return_value.retrieve_voter_by_id.return_value = {'voter_found': True, 'voter': voter}
+        retrieve_twitter_link_to_voter = twitter_user_manager.return_value.retrieve_twitter_link_to_voter
+        retrieve_twitter_link_to_voter.return_value = {'twitter_link_to_voter_found': False}
+        create_organization_for_voter.return_value = {'status': '', 'success': True, 'organization_created': True}
+        self.assertTrue(create_linked_organization_for_voter(11)['organization_created'])
+        create_organization_for_voter.assert_called_once_with(voter)
+
+        # A voter signed in with Twitter is linked to their Twitter organization by the background repair
+        retrieve_twitter_link_to_voter.return_value = {'twitter_link_to_voter_found': True}
+        self.assertFalse(create_linked_organization_for_voter(11)['organization_created'])
+        voter.linked_organization_we_vote_id = 'wv01org11'
+        self.assertFalse(create_linked_organization_for_voter(11)['organization_created'])
+        self.assertEqual(create_organization_for_voter.call_count, 1)
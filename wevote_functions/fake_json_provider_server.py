@@ -0,0 +1,68 @@
+# wevote_functions/fake_json_provider_server.py
+# Brought to you by We Vote. Be good.
+# -*- coding: UTF-8 -*-
+
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from wevote_functions.functions import convert_to_int
+
+
+class FakeJsonProviderServer:
+    """
+    Local stand-in for a ballot data provider (or SendGrid), for benchmarks and tests which shouldn't depend on (or
+    be rate limited by) the real API. Every GET or POST waits latency_seconds and returns response_text (str, or bytes
+    for an image) with success_status_code. POST bodies are read and thrown away. Use as a context manager.
+    """
+
+    def __init__(self, response_text='{}', latency_seconds=0.0, failures_before_success=0,
+                 content_type='application/json', success_status_code=200):
+        self.response_text = response_text
+        self.content_type = content_type
+        self.success_status_code = success_status_code
+        self.latency_seconds = latency_seconds
+        self.failures_before_success = failures_before_success
+        self.request_count = 0
+        self.request_count_lock = threading.Lock()
+        fake_server = self
+
+        class FakeJsonProviderHandler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'  # Keep-alive, like the real providers
+
+            def do_POST(self):
+                self.rfile.read(convert_to_int(self.headers.get('Content-Length', 0)))
+                self.do_GET()
+
+            def do_GET(self):
+                with fake_server.request_count_lock:
+                    fake_server.request_count += 1
+                    request_number = fake_server.request_count
+                time.sleep(fake_server.latency_seconds)
+                if request_number <= fake_server.failures_before_success:
+                    status_code, body = 503, b''
+                else:
+                    status_code, body = fake_server.success_status_code, fake_server.response_text
+                    if not isinstance(body, bytes):
+                        body = body.encode('utf-8')
+                self.send_response(status_code)
+                self.send_header('Content-Type', fake_server.content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):  # noqa: PLR6301 - Keep the test and benchmark output quiet
+                pass
+
+        self.http_server = ThreadingHTTPServer(('127.0.0.1', 0), FakeJsonProviderHandler)
+        self.http_server.daemon_threads = True
+        self.url = 'http://127.0.0.1:' + str(self.http_server.server_address[1]) + '/'
+        self.thread = threading.Thread(target=self.http_server.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.http_server.shutdown()
+        self.http_server.server_close()
@@ -0,0 +1,178 @@
+# wevote_functions/functions_cache.py
+# Brought to you by We Vote. Be good.
+# -*- coding: UTF-8 -*-
+
+import threading
+from django.conf import settings
+from django.core.cache import caches
+import wevote_functions.admin
+from wevote_functions.functions import positive_value_exists
+
+logger = wevote_functions.admin.get_logger(__name__)
+
+# Namespaces for the read-through caches in front of the hot retrieve_*_from_we_vote_id lookups
+CACHE_NAMESPACE_CANDIDATE = 'candidate'
+CACHE_NAMESPACE_CONTEST_OFFICE = 'contest_office'
+CACHE_NAMESPACE_ELECTION = 'election'
+CACHE_NAMESPACE_ORGANIZATION = 'organization'
+# politician_we_vote_id by seo_friendly_path, for saveAnalyticsAction
+CACHE_NAMESPACE_POLITICIAN_SEO_FRIENDLY_PATH = 'politician_seo_friendly_path'
+# Precomputed positionListForBallotItem responses, by ballot item we_vote_id and stance
+CACHE_NAMESPACE_POSITION_LIST_FOR_BALLOT_ITEM = 'position_list_for_ballot_item'
+# voterRetrieve's profile snapshot, by voter_id
+CACHE_NAMESPACE_VOTER_PROFILE = 'voter_profile'
+
+CACHE_KEY_PREFIX = 'wv'
+CACHE_TIMEOUT_IN_SECONDS = 300
+# Backends each process (or server) keeps to itself. A key invalidated in one process would still be served by the
+#  others, so the read-through caches stay off with these, unless CACHE_IS_SHARED says there is only one process.
+UNSHARED_CACHE_BACKEND_NAMES = ('DummyCache', 'FileBasedCache', 'LocMemCache')
+# An invalidated key holds this for a few seconds instead of being deleted. Until it expires, reads aren't cached,
+#  so a read from a replica which hasn't caught up with the save can't put the old row back for
+#  CACHE_TIMEOUT_IN_SECONDS.
+CACHE_INVALIDATED_TOMBSTONE = 'wv:invalidated'
+CACHE_INVALIDATED_TOMBSTONE_SECONDS = 10
+
+# Hit/miss counters for this process, by namespace
+cache_metrics = {}
+cache_metrics_lock = threading.Lock()
+
+
+def get_cache():
+    return caches['default']
+
+
+def is_cache_shared():
+    """
+    True when every API process uses the same cache (Redis or Memcached), so an invalidation reaches all of them.
+    Set CACHE_IS_SHARED for a single-process development server with the local memory cache.
+    :return:
+    """
+    if getattr(settings, 'CACHE_IS_SHARED', False):
+        return True
+    return get_cache().__class__.__name__ not in UNSHARED_CACHE_BACKEND_NAMES
+
+
+def increment_cache_metric(namespace, metric_name):
+    with cache_metrics_lock:
+        namespace_metrics = cache_metrics.setdefault(namespace, {'hits': 0, 'misses': 0, 'invalidations': 0})
+        namespace_metrics[metric_name] += 1
+
+
+def fetch_cache_metrics():
+    """
+    Hit, miss and invalidation counts by namespace since this process started, with the hit rate
+    :return:
+    """
+    metrics_dict = {}
+    with cache_metrics_lock:
+        for namespace, namespace_metrics in cache_metrics.items():
+            lookups = namespace_metrics['hits'] + namespace_metrics['misses']
+            metrics_dict[namespace] = dict(namespace_metrics)
+            metrics_dict[namespace]['hit_rate'] = \
+                round(namespace_metrics['hits'] / lookups, 4) if positive_value_exists(lookups) else 0
+    return metrics_dict
+
+
+def reset_cache_metrics():
+    with cache_metrics_lock:
+        cache_metrics.clear()
+
+
+def fetch_cache_namespace_version(namespace):
+    """
+    Every key in a namespace includes the namespace version, so bumping the version invalidates the whole namespace
+    :param namespace:
+    :return:
+    """
+    version_key = '{prefix}:{namespace}:version'.format(prefix=CACHE_KEY_PREFIX, namespace=namespace)
+    try:
+        namespace_version = get_cache().get(version_key)
+        if namespace_version is None:
+            namespace_version = 1
+            get_cache().add(version_key, namespace_version, timeout=None)
+        return namespace_version
+    except Exception as e:
+        logger.error("fetch_cache_namespace_version " + namespace + ": " + str(e))
+        return 1
+
+
+def generate_cache_key(namespace, key):
+    return '{prefix}:{namespace}:v{version}:{key}'.format(
+        prefix=CACHE_KEY_PREFIX,
+        namespace=namespace,
+        version=fetch_cache_namespace_version(namespace),
+        key=str(key).lower())
+
+
+def generate_cache_namespace_invalidated_key(namespace):
+    return '{prefix}:{namespace}:invalidated'.format(prefix=CACHE_KEY_PREFIX, namespace=namespace)
+
+
+def invalidate_cache_key(namespace, key):
+    if not positive_value_exists(key):
+        return
+    try:
+        get_cache().set(generate_cache_key(namespace, key), CACHE_INVALIDATED_TOMBSTONE,
+                        timeout=CACHE_INVALIDATED_TOMBSTONE_SECONDS)
+        increment_cache_metric(namespace, 'invalidations')
+    except Exception as e:
+        logger.error("invalidate_cache_key " + namespace + ": " + str(e))
+
+
+def invalidate_cache_namespace(namespace):
+    """
+    Use after bulk changes (queryset.update(), merges, imports) that don't go through model save()
+    :param namespace:
+    :return:
+    """
+    version_key = '{prefix}:{namespace}:version'.format(prefix=CACHE_KEY_PREFIX, namespace=namespace)
+    try:
+        try:
+            get_cache().incr(version_key)
+        except ValueError:
+            # The version key expired or was evicted, so start a version no existing key can be using
+            get_cache().set(version_key, fetch_cache_namespace_version(namespace) + 1, timeout=None)
+        get_cache().set(generate_cache_namespace_invalidated_key(namespace), CACHE_INVALIDATED_TOMBSTONE,
+                        timeout=CACHE_INVALIDATED_TOMBSTONE_SECONDS)
+        increment_cache_metric(namespace, 'invalidations')
+    except Exception as e:
+        logger.error("invalidate_cache_namespace " + namespace + ": " + str(e))
+
+
+def retrieve_results_through_cache(namespace, key, found_key, retrieve_function):
+    """
+    Return the results dict from retrieve_function(), reading through the cache. Only results where found_key
+    is True are cached, so "not found" is always checked against the database again. Nothing is cached while the
+    key (or its namespace) was invalidated within CACHE_INVALIDATED_TOMBSTONE_SECONDS, or when the cache isn't
+    shared between processes.
+    :param namespace:
+    :param key:
+    :param found_key:
+    :param retrieve_function:
+    :return:
+    """
+    if not positive_value_exists(key) or not is_cache_shared():
+        return retrieve_function()
+    cache_key = generate_cache_key(namespace, key)
+    namespace_invalidated_key = generate_cache_namespace_invalidated_key(namespace)
+    try:
+        cached_dict = get_cache().get_many([cache_key, namespace_invalidated_key])
+    except Exception as e:
+        logger.error("retrieve_results_through_cache get " + namespace + ": " + str(e))
+        cached_dict = {}
+    results = cached_dict.get(cache_key)
+    recently_invalidated = results == CACHE_INVALIDATED_TOMBSTONE or namespace_invalidated_key in cached_dict
+    if results is not None and not recently_invalidated:
+        increment_cache_metric(namespace, 'hits')
+        return results
+
+    increment_cache_metric(namespace, 'misses')
+    results = retrieve_function()
+    if not recently_invalidated and results.get('success') and results.get(found_key):
+        try:
+            # add, not set, so a read which started before an invalidation can't overwrite its tombstone
+            get_cache().add(cache_key, results, timeout=CACHE_TIMEOUT_IN_SECONDS)
+        except Exception as e:
+            logger.error("retrieve_results_through_cache set " + namespace + ": " + str(e))
+    return results
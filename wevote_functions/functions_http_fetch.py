@@ -0,0 +1,174 @@
+# wevote_functions/functions_http_fetch.py
+# Brought to you by We Vote. Be good.
+# -*- coding: UTF-8 -*-
+
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import wevote_functions.admin
+from wevote_functions.functions import convert_to_int, positive_value_exists
+
+logger = wevote_functions.admin.get_logger(__name__)
+
+# Responses worth trying again: rate limited, or the provider is having trouble
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+MAX_RETRY_DELAY_SECONDS = 30
+
+# Rate limiters are shared by every thread in this process, so all the fetches to one provider share its budget
+rate_limiter_by_name = {}
+rate_limiter_by_name_lock = threading.Lock()
+# Each fetch thread keeps its own keep-alive session (requests.Session isn't safe to share between threads)
+session_by_thread = threading.local()
+
+
+class TokenBucketRateLimiter:
+    """
+    Allows requests_per_second on average, with bursts of up to burst requests after a quiet period.
+    acquire() blocks until the next request is allowed.
+    """
+
+    def __init__(self, requests_per_second, burst=1, clock=time.monotonic, sleep=time.sleep):
+        self.requests_per_second = float(requests_per_second)
+        self.burst = max(1, burst)
+        self.clock = clock
+        self.sleep = sleep
+        self.tokens = float(self.burst)
+        self.last_refill_time = clock()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        if self.requests_per_second <= 0:
+            return
+        while True:
+            with self.lock:
+                time_now = self.clock()
+                self.tokens = min(
+                    self.burst, self.tokens + (time_now - self.last_refill_time) * self.requests_per_second)
+                self.last_refill_time = time_now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                seconds_to_wait = (1 - self.tokens) / self.requests_per_second
+            self.sleep(seconds_to_wait)
+
+
+def get_rate_limiter(name, requests_per_second, burst=1):
+    with rate_limiter_by_name_lock:
+        rate_limiter = rate_limiter_by_name.get(name)
+        if rate_limiter is None or rate_limiter.requests_per_second != float(requests_per_second):
+            rate_limiter = TokenBucketRateLimiter(requests_per_second, burst=burst)
+            rate_limiter_by_name[name] = rate_limiter
+        return rate_limiter
+
+
+def get_pooled_session():
+    session = getattr(session_by_thread, 'session', None)
+    if session is None:
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=4)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        session_by_thread.session = session
+    return session
+
+
+def fetch_url_with_retry(url, params=None, headers=None, rate_limiter=None, max_attempts=4, timeout=30):
+    """
+    GET url, waiting on rate_limiter before every attempt, and retrying connection errors and RETRY_STATUS_CODES
+    with exponential backoff (or the provider's Retry-After).
+    :return: results with response_text, response_url and status_code from the last attempt, and elapsed_seconds
+      for all the attempts (including waits)
+    """
+    status = ""
+    response_text = ''
+    response_url = ''
+    status_code = 0
+    start_time = time.monotonic()
+    for attempt in range(max(1, max_attempts)):
+        if rate_limiter is not None:
+            rate_limiter.acquire()
+        retry_delay = min(0.5 * (2 ** attempt), MAX_RETRY_DELAY_SECONDS) * random.uniform(0.5, 1.0)
+        try:
+            response = get_pooled_session().get(url, params=params, headers=headers, timeout=timeout)
+            status_code = response.status_code
+            response_url = response.url
+            response_text = response.text
+            if status_code not in RETRY_STATUS_CODES:
+                results = {
+                    'success':          True,
+                    'status':           status,
+                    'response_text':    response_text,
+                    'response_url':     response_url,
+                    'status_code':      status_code,
+                    'elapsed_seconds':  time.monotonic() - start_time,
+                }
+                return results
+            status += "HTTP_FETCH_RETRY_STATUS_CODE: " + str(status_code) + " "
+            retry_after = convert_to_int(response.headers.get('Retry-After', 0))
+            if positive_value_exists(retry_after):
+                retry_delay = min(retry_after, MAX_RETRY_DELAY_SECONDS)
+        except requests.RequestException as e:
+            status += "HTTP_FETCH_RETRY_EXCEPTION: " + str(e) + " "
+        if attempt + 1 < max_attempts:
+            time.sleep(retry_delay)
+
+    status += "HTTP_FETCH_FAILED_AFTER_ATTEMPTS: " + str(max_attempts) + " "
+    results = {
+        'success':          False,
+        'status':           status,
+        'response_text':    response_text,
+        'response_url':     response_url,
+        'status_code':      status_code,
+        'elapsed_seconds':  time.monotonic() - start_time,
+    }
+    return results
+
+
+def fetch_urls_concurrently(request_list, rate_limiter=None, max_workers=4, max_in_flight=0, max_attempts=4):
+    """
+    Generator which fetches every request in request_list on max_workers threads, and yields
+    (request, fetch_url_with_retry results) as each finishes. At most max_in_flight requests are started ahead of
+    the caller, so slow processing of the results (parsing, database writes) applies back-pressure instead of
+    piling up responses in memory, while the fetches keep running behind it.
+    :param request_list: dicts with url, and optional params and headers. Other keys are passed back untouched.
+    """
+    if not positive_value_exists(max_in_flight):
+        max_in_flight = max_workers * 2
+    request_iterator = iter(request_list)
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='http_fetch') as executor:
+        request_by_future = {}
+
+        def submit_next_request():
+            try:
+                request = next(request_iterator)
+            except StopIteration:
+                return False
+            future = executor.submit(
+                fetch_url_with_retry, request['url'], params=request.get('params'), headers=request.get('headers'),
+                rate_limiter=rate_limiter, max_attempts=max_attempts)
+            request_by_future[future] = request
+            return True
+
+        while len(request_by_future) < max_in_flight and submit_next_request():
+            pass
+        while request_by_future:
+            done_future_set, _ = wait(request_by_future, return_when=FIRST_COMPLETED)
+            for future in done_future_set:
+                request = request_by_future.pop(future)
+                submit_next_request()
+                try:
+                    results = future.result()
+                except Exception as e:
+                    results = {
+                        'success':          False,
+                        'status':           "HTTP_FETCH_CRASH: " + str(e) + " ",
+                        'response_text':    '',
+                        'response_url':     '',
+                        'status_code':      0,
+                    }
+                yield request, results
@@ -0,0 +1,174 @@
+# wevote_functions/functions_sync.py
+# Brought to you by We Vote. Be good.
+# -*- coding: UTF-8 -*-
+
+import json
+from django.contrib import messages
+from django.db.models import F
+from django.http import StreamingHttpResponse
+from django.utils.dateparse import parse_date, parse_datetime
+from django.utils.timezone import is_naive, make_aware
+import requests
+import wevote_functions.admin
+from wevote_functions.functions import convert_to_int, positive_value_exists
+
+logger = wevote_functions.admin.get_logger(__name__)
+
+# A *SyncOut request with format=ndjson gets one JSON object per line, streamed from a server-side cursor,
+#  instead of one JSON list built in memory
+SYNC_OUT_FORMAT_NDJSON = 'ndjson'
+SYNC_OUT_CONTENT_TYPE_NDJSON = 'application/x-ndjson'
+# The last line of an ndjson stream, so the consumer knows it got everything
+SYNC_OUT_END_KEY = 'sync_out_end'
+# Each ndjson row carries its id under this key, so a consumer whose stream was cut off can resume with since_id
+SYNC_OUT_ID_KEY = 'sync_out_id'
+# Rows fetched from the database cursor at a time
+SYNC_OUT_CURSOR_CHUNK_SIZE = 2000
+# Rows handed to the *_import_from_structured_json function at a time
+SYNC_IMPORT_BATCH_SIZE = 500
+# Counts in the import results which are added up across batches
+SYNC_IMPORT_COUNT_KEYS = ('saved', 'updated', 'not_processed', 'duplicates_removed')
+
+
+def is_sync_out_streaming_request(request):
+    return request.GET.get('format', '') == SYNC_OUT_FORMAT_NDJSON
+
+
+def convert_changed_since_to_datetime(changed_since):
+    """
+    :param changed_since: 'YYYY-MM-DD' or an ISO 8601 date and time, from the changed_since request variable
+    :return: an aware datetime, or None if changed_since can't be understood
+    """
+    if not positive_value_exists(changed_since):
+        return None
+    try:
+        changed_since_datetime = parse_datetime(changed_since)
+        if changed_since_datetime is None:
+            changed_since_date = parse_date(changed_since)
+            if changed_since_date is None:
+                return None
+            changed_since_datetime = parse_datetime(changed_since_date.isoformat() + 'T00:00:00')
+    except ValueError:
+        return None
+    if is_naive(changed_since_datetime):
+        changed_since_datetime = make_aware(changed_since_datetime)
+    return changed_since_datetime
+
+
+def filter_sync_out_queryset_for_cursor(request, queryset, changed_since_field_name=''):
+    """
+    Limit a *SyncOut queryset to what an incremental pull asks for, and put it in keyset (id) order.
+      changed_since: only rows with changed_since_field_name on or after this date/time
+      since_id: only rows after this id (the last_id of an earlier stream which was cut off)
+    """
+    changed_since_datetime = convert_changed_since_to_datetime(request.GET.get('changed_since', ''))
+    if changed_since_datetime is not None and positive_value_exists(changed_since_field_name):
+        queryset = queryset.filter(**{changed_since_field_name + '__gte': changed_since_datetime})
+    since_id = convert_to_int(request.GET.get('since_id', 0))
+    if positive_value_exists(since_id):
+        queryset = queryset.filter(id__gt=since_id)
+    return queryset.order_by('id')
+
+
+def stream_sync_out_response(queryset, field_name_list):
+    """
+    Stream a *SyncOut queryset as ndjson. Rows come from a server-side cursor SYNC_OUT_CURSOR_CHUNK_SIZE at a time,
+    so memory use doesn't grow with the size of the election. The last line is
+    {"sync_out_end": {"row_count": ..., "last_id": ...}}
+    """
+    def generate_ndjson_lines():
+        row_count = 0
+        last_id = 0
+        for one_row in queryset.values(*field_name_list, **{SYNC_OUT_ID_KEY: F('id')}).iterator(
+                chunk_size=SYNC_OUT_CURSOR_CHUNK_SIZE):
+            last_id = one_row[SYNC_OUT_ID_KEY]
+            row_count += 1
+            yield json.dumps(one_row, default=str) + '\n'
+        yield json.dumps({SYNC_OUT_END_KEY: {'row_count': row_count, 'last_id': last_id}}) + '\n'
+
+    return StreamingHttpResponse(generate_ndjson_lines(), content_type=SYNC_OUT_CONTENT_TYPE_NDJSON)
+
+
+def add_sync_import_counts(total_results, batch_results):
+    for count_key in SYNC_IMPORT_COUNT_KEYS:
+        if count_key in batch_results:
+            total_results[count_key] = total_results.get(count_key, 0) + convert_to_int(batch_results[count_key])
+    if not batch_results.get('success', True):
+        total_results['success'] = False
+    if 'status' in batch_results and batch_results['status'] not in total_results['status']:
+        total_results['status'] += batch_results['status'] + " "
+    return total_results
+
+
+def process_request_from_master_in_batches(
+        request, message_text, get_url, get_params, import_function, batch_size=SYNC_IMPORT_BATCH_SIZE):
+    """
+    Like process_request_from_master, but the master server streams ndjson, and import_function is called with
+    batch_size rows at a time as they arrive, so neither server holds the whole table in memory.
+    Falls back to a single JSON list (in batches) if the master server doesn't stream yet.
+    :param import_function: One of the *_import_from_structured_json functions (or a wrapper) taking a list of dicts
+    :return: import_results, with the saved/updated/not_processed counts added up across batches, and
+      last_id of the last row imported (pass as since_id to resume an incomplete stream)
+    """
+    status = ""
+    try:
+        if 'google_civic_election_id' in get_params:
+            message_text += " for google_civic_election_id " + str(get_params['google_civic_election_id'])
+        messages.add_message(request, messages.INFO, message_text)
+        logger.info(message_text)
+        print("process_request_from_master_in_batches: " + message_text)  # Please don't remove this line
+    except Exception as e:
+        status += "ERROR_PRINTING_MESSAGE_TEXT: " + str(e) + " "
+
+    import_results = {
+        'success':          True,
+        'status':           status,
+        'row_count':        0,
+        'last_id':          0,
+        'stream_complete':  False,
+    }
+    streaming_get_params = dict(get_params)
+    streaming_get_params['format'] = SYNC_OUT_FORMAT_NDJSON
+    try:
+        response = requests.get(get_url, params=streaming_get_params, stream=True, timeout=60)
+        if response.headers.get('Content-Type', '').startswith(SYNC_OUT_CONTENT_TYPE_NDJSON):
+            row_iterator = (json.loads(line) for line in response.iter_lines() if line)
+        else:
+            # Older master server: one JSON list (or an error dict)
+            structured_json = json.loads(response.text)
+            row_iterator = iter(structured_json if isinstance(structured_json, list) else [structured_json])
+
+        one_batch = []
+        one_batch_last_id = 0
+        for one_row in row_iterator:
+            if SYNC_OUT_END_KEY in one_row:
+                import_results['stream_complete'] = True
+                continue
+            if 'success' in one_row and not one_row['success'] and 'status' in one_row:
+                import_results['success'] = False
+                import_results['status'] += "Error: " + str(one_row['status']) + " "
+                break
+            if SYNC_OUT_ID_KEY in one_row:
+                one_batch_last_id = one_row.pop(SYNC_OUT_ID_KEY)
+            one_batch.append(one_row)
+            if len(one_batch) >= batch_size:
+                add_sync_import_counts(import_results, import_function(one_batch))
+                import_results['row_count'] += len(one_batch)
+                import_results['last_id'] = one_batch_last_id
+                one_batch = []
+        if one_batch:
+            add_sync_import_counts(import_results, import_function(one_batch))
+            import_results['row_count'] += len(one_batch)
+            import_results['last_id'] = one_batch_last_id
+        if not response.headers.get('Content-Type', '').startswith(SYNC_OUT_CONTENT_TYPE_NDJSON):
+            import_results['stream_complete'] = import_results['success']
+        elif not import_results['stream_complete'] and import_results['success']:
+            import_results['success'] = False
+            import_results['status'] += "SYNC_STREAM_ENDED_EARLY "
+    except Exception as e:
+        import_results['success'] = False
+        import_results['status'] += "SYNC_STREAM_FAILED: " + str(e) + " "
+
+    # Please don't remove this line
+    print("... the master server returned " + str(import_results['row_count']) + " items.")
+    return import_results
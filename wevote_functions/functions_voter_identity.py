@@ -0,0 +1,124 @@
+# wevote_functions/functions_voter_identity.py
+# Brought to you by We Vote. Be good.
+# -*- coding: UTF-8 -*-
+
+"""
+Remember which voter a voter_device_id belongs to.
+
+Within a request (see voter.middleware.VoterIdentityMiddleware), the voter_device_link, voter identity and voter
+retrieved for a voter_device_id are kept in memory, so the helpers in voter/models.py only go to the database once.
+Behind that, the identity (voter_id and voter_we_vote_id) is kept in the shared cache for
+VOTER_IDENTITY_CACHE_SECONDS. Saving or deleting a VoterDeviceLink (sign in, sign out, merge, split) invalidates
+it, and blocks it from being cached again for VOTER_IDENTITY_SETTLE_SECONDS, so a lagging replica can't put the
+old voter back.
+"""
+
+import copy
+import threading
+from config.base import get_environment_variable_default
+import wevote_functions.admin
+from wevote_functions.functions import convert_to_int, positive_value_exists
+from wevote_functions.functions_cache import CACHE_KEY_PREFIX, get_cache
+
+logger = wevote_functions.admin.get_logger(__name__)
+
+VOTER_IDENTITY_CACHE_SECONDS = convert_to_int(get_environment_variable_default('VOTER_IDENTITY_CACHE_SECONDS', 30))
+VOTER_IDENTITY_SETTLE_SECONDS = 5
+VOTER_IDENTITY_CHANGED = 'CHANGED'
+
+request_identity_state = threading.local()
+
+
+def start_voter_identity_request():
+    request_identity_state.memo = {}
+
+
+def end_voter_identity_request():
+    request_identity_state.memo = None
+
+
+def fetch_request_memo():
+    # None outside a request (management commands, background jobs), which only use the shared cache
+    return getattr(request_identity_state, 'memo', None)
+
+
+def generate_voter_identity_cache_key(voter_device_id):
+    return '{prefix}:voter_identity:{voter_device_id}'.format(prefix=CACHE_KEY_PREFIX, voter_device_id=voter_device_id)
+
+
+def retrieve_voter_identity_from_cache(voter_device_id):
+    """
+    :return: dict with voter_id and voter_we_vote_id, or None if not cached
+    """
+    if not positive_value_exists(voter_device_id):
+        return None
+    memo = fetch_request_memo()
+    if memo is not None and ('identity', voter_device_id) in memo:
+        return memo[('identity', voter_device_id)]
+    if not positive_value_exists(VOTER_IDENTITY_CACHE_SECONDS):
+        return None
+    try:
+        voter_identity = get_cache().get(generate_voter_identity_cache_key(voter_device_id))
+    except Exception as e:
+        logger.error("retrieve_voter_identity_from_cache: " + str(e))
+        return None
+    if not isinstance(voter_identity, dict):
+        return None
+    if memo is not None:
+        memo[('identity', voter_device_id)] = voter_identity
+    return voter_identity
+
+
+def save_voter_identity_to_cache(voter_device_id, voter_id, voter_we_vote_id):
+    if not positive_value_exists(voter_device_id) or not positive_value_exists(voter_id):
+        return
+    voter_identity = {'voter_id': voter_id, 'voter_we_vote_id': voter_we_vote_id}
+    memo = fetch_request_memo()
+    if memo is not None:
+        memo[('identity', voter_device_id)] = voter_identity
+    if not positive_value_exists(VOTER_IDENTITY_CACHE_SECONDS) or not positive_value_exists(voter_we_vote_id):
+        return
+    try:
+        # add() won't replace the VOTER_IDENTITY_CHANGED marker left by a recent invalidation
+        get_cache().add(
+            generate_voter_identity_cache_key(voter_device_id), voter_identity, timeout=VOTER_IDENTITY_CACHE_SECONDS)
+    except Exception as e:
+        logger.error("save_voter_identity_to_cache: " + str(e))
+
+
+def invalidate_voter_identity(voter_device_id):
+    if not positive_value_exists(voter_device_id):
+        return
+    memo = fetch_request_memo()
+    if memo is not None:
+        memo.pop(('identity', voter_device_id), None)
+        memo.pop(('voter_device_link', voter_device_id), None)
+    try:
+        get_cache().set(generate_voter_identity_cache_key(voter_device_id), VOTER_IDENTITY_CHANGED,
+                        timeout=VOTER_IDENTITY_SETTLE_SECONDS)
+    except Exception as e:
+        logger.error("invalidate_voter_identity: " + str(e))
+
+
+def fetch_memoized_object(kind_of_object, key):
+    """
+    A copy of the object remembered for this request, so a caller changing it doesn't change it for the next caller
+    :return: None if there isn't one
+    """
+    memo = fetch_request_memo()
+    if memo is None or not positive_value_exists(key):
+        return None
+    memoized_object = memo.get((kind_of_object, key))
+    return copy.copy(memoized_object) if memoized_object is not None else None
+
+
+def memoize_object(kind_of_object, key, one_object):
+    memo = fetch_request_memo()
+    if memo is not None and positive_value_exists(key):
+        memo[(kind_of_object, key)] = copy.copy(one_object)
+
+
+def forget_memoized_object(kind_of_object, key):
+    memo = fetch_request_memo()
+    if memo is not None:
+        memo.pop((kind_of_object, key), None)
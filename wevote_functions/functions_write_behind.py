@@ -0,0 +1,161 @@
+# wevote_functions/functions_write_behind.py
+# Brought to you by We Vote. Be good.
+# -*- coding: UTF-8 -*-
+
+import atexit
+import os
+import threading
+import time
+import wevote_functions.admin
+from wevote_functions.functions import positive_value_exists
+
+logger = wevote_functions.admin.get_logger(__name__)
+
+# Every buffer in this process, so they can all be flushed when the process exits
+write_behind_buffer_list = []
+write_behind_buffer_list_lock = threading.Lock()
+
+
+class WriteBehindBuffer:
+    """
+    Accepts items in-process and hands them to flush_function in batches, from a background thread, when
+    max_batch_size items are waiting or the oldest item has waited max_delay_seconds. Whatever is still waiting is
+    flushed when the process exits normally (gunicorn's graceful shutdown, manage.py commands).
+    If flush_function raises, the batch is put back to be tried again, up to max_buffered_items in all, after which
+    the oldest items are dropped (and counted), so a database outage can't use up the server's memory.
+    :param flush_function: Takes a list of items, and saves them (ex/ with bulk_create)
+    """
+
+    def __init__(self, name, flush_function, max_batch_size=200, max_delay_seconds=2.0, max_buffered_items=20000):
+        self.name = name
+        self.flush_function = flush_function
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_delay_seconds = max_delay_seconds
+        self.max_buffered_items = max(self.max_batch_size, max_buffered_items)
+        self.item_list = []
+        self.lock = threading.Lock()
+        # Only one flush at a time, so batches are written in the order they were added
+        self.flush_lock = threading.Lock()
+        self.flush_needed = threading.Event()
+        self.thread = None
+        self.thread_pid = None
+        self.stopped = False
+        self.metrics = {'added': 0, 'flushed': 0, 'dropped': 0, 'flush_count': 0, 'flush_failures': 0}
+        with write_behind_buffer_list_lock:
+            write_behind_buffer_list.append(self)
+
+    def add(self, item):
+        with self.lock:
+            self.item_list.append(item)
+            self.metrics['added'] += 1
+            buffered_count = len(self.item_list)
+            self.start_thread_if_needed()
+        if buffered_count >= self.max_batch_size:
+            self.flush_needed.set()
+
+    def start_thread_if_needed(self):
+        # A forked worker (gunicorn --preload) doesn't inherit the parent's thread, so we start one per process
+        if self.stopped or (self.thread is not None and self.thread_pid == os.getpid() and self.thread.is_alive()):
+            return
+        self.thread_pid = os.getpid()
+        self.thread = threading.Thread(
+            target=self.run_flush_loop, name='write_behind_' + self.name, daemon=True)
+        self.thread.start()
+
+    def run_flush_loop(self):
+        while not self.stopped:
+            self.flush_needed.wait(timeout=self.max_delay_seconds)
+            self.flush_needed.clear()
+            self.flush()
+
+    def flush(self):
+        """
+        Write everything waiting now, max_batch_size items at a time
+        :return: the number of items written
+        """
+        flushed_count = 0
+        with self.flush_lock:
+            while True:
+                with self.lock:
+                    one_batch = self.item_list[:self.max_batch_size]
+                    del self.item_list[:self.max_batch_size]
+                if not one_batch:
+                    break
+                try:
+                    self.flush_function(one_batch)
+                    flushed_count += len(one_batch)
+                    with self.lock:
+                        self.metrics['flushed'] += len(one_batch)
+                        self.metrics['flush_count'] += 1
+                except Exception as e:
+                    logger.error("WriteBehindBuffer " + self.name + " flush failed: " + str(e))
+                    self.put_back_failed_batch(one_batch)
+                    break
+        return flushed_count
+
+    def put_back_failed_batch(self, one_batch):
+        with self.lock:
+            self.metrics['flush_failures'] += 1
+            self.item_list[:0] = one_batch
+            overflow_count = len(self.item_list) - self.max_buffered_items
+            if overflow_count > 0:
+                del self.item_list[:overflow_count]
+                self.metrics['dropped'] += overflow_count
+
+    def stop(self):
+        """
+        Stop the background thread, and write everything still waiting
+        """
+        self.stopped = True
+        self.flush_needed.set()
+        if self.thread is not None and self.thread_pid == os.getpid() and self.thread.is_alive():
+            self.thread.join(timeout=self.max_delay_seconds + 5)
+        return self.flush()
+
+    def reset_after_fork(self):
+        # The parent process still owns (and will write) anything that was waiting when we forked
+        self.item_list = []
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+        self.flush_needed = threading.Event()
+        self.thread = None
+        self.thread_pid = None
+
+    def fetch_metrics(self):
+        with self.lock:
+            metrics_dict = dict(self.metrics)
+            metrics_dict['buffered'] = len(self.item_list)
+        return metrics_dict
+
+
+def fetch_write_behind_metrics():
+    """
+    Added, flushed, dropped and buffered counts for each buffer in this process
+    :return:
+    """
+    with write_behind_buffer_list_lock:
+        return {one_buffer.name: one_buffer.fetch_metrics() for one_buffer in write_behind_buffer_list}
+
+
+def flush_all_write_behind_buffers(max_seconds=10.0):
+    time_limit = time.monotonic() + max_seconds if positive_value_exists(max_seconds) else None
+    with write_behind_buffer_list_lock:
+        buffer_list = list(write_behind_buffer_list)
+    for one_buffer in buffer_list:
+        if time_limit is not None and time.monotonic() > time_limit:
+            logger.error("flush_all_write_behind_buffers ran out of time before " + one_buffer.name)
+            break
+        try:
+            one_buffer.stop()
+        except Exception as e:
+            logger.error("flush_all_write_behind_buffers " + one_buffer.name + ": " + str(e))
+
+
+def reset_write_behind_buffers_after_fork():
+    for one_buffer in write_behind_buffer_list:
+        one_buffer.reset_after_fork()
+
+
+atexit.register(flush_all_write_behind_buffers)
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=reset_write_behind_buffers_after_fork)
@@ -0,0 +1,65 @@
+# wevote_functions/test_functions_cache.py
+# Brought to you by We Vote. Be good.
+# -*- coding: UTF-8 -*-
+
+from django.test import SimpleTestCase, override_settings
+from .functions_cache import fetch_cache_metrics, get_cache, invalidate_cache_key, invalidate_cache_namespace, \
+    is_cache_shared, reset_cache_metrics, retrieve_results_through_cache
+
+LOCAL_MEMORY_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'wevote-functions-cache-tests',
+    },
+}
+
+
+@override_settings(CACHES=LOCAL_MEMORY_CACHES, CACHE_IS_SHARED=True)
+class WeVoteFunctionsTestsCache(SimpleTestCase):
+
+    def setUp(self):
+        get_cache().clear()
+        reset_cache_metrics()
+        self.retrieve_count = 0
+
+    def retrieve_function(self):
+        self.retrieve_count += 1
+        return {'success': True, 'status': '', 'thing_found': True, 'thing': self.retrieve_count}
+
+    def test_read_through_and_invalidate(self):
+        results = retrieve_results_through_cache('thing', 'wv01thing1', 'thing_found', self.retrieve_function)
+        self.assertEqual(results['thing'], 1)
+        results = retrieve_results_through_cache('thing', 'wv01thing1', 'thing_found', self.retrieve_function)
+        self.assertEqual(results['thing'], 1)
+        self.assertEqual(self.retrieve_count, 1)
+
+        # Right after an invalidation the replica may not have the save yet, so what is read isn't cached
+        invalidate_cache_key('thing', 'wv01thing1')
+        results = retrieve_results_through_cache('thing', 'wv01thing1', 'thing_found', self.retrieve_function)
+        self.assertEqual(results['thing'], 2)
+        results = retrieve_results_through_cache('thing', 'wv01thing1', 'thing_found', self.retrieve_function)
+        self.assertEqual(results['thing'], 3)
+
+        invalidate_cache_namespace('thing')
+        results = retrieve_results_through_cache('thing', 'wv01thing1', 'thing_found', self.retrieve_function)
+        self.assertEqual(results['thing'], 4)
+
+        metrics = fetch_cache_metrics()['thing']
+        self.assertEqual(metrics['hits'], 1)
+        self.assertEqual(metrics['misses'], 4)
+        self.assertEqual(metrics['invalidations'], 2)
+
+    def test_not_found_is_not_cached(self):
+        def retrieve_not_found():
+            self.retrieve_count += 1
+            return {'success': True, 'status': '', 'thing_found': False}
+        retrieve_results_through_cache('thing', 'wv01thing2', 'thing_found', retrieve_not_found)
+        retrieve_results_through_cache('thing', 'wv01thing2', 'thing_found', retrieve_not_found)
+        self.assertEqual(self.retrieve_count, 2)
+
+    @override_settings(CACHE_IS_SHARED=False)
+    def test_not_cached_unless_shared_between_processes(self):
+        self.assertFalse(is_cache_shared())
+        retrieve_results_through_cache('thing', 'wv01thing3', 'thing_found', self.retrieve_function)
+        retrieve_results_through_cache('thing', 'wv01thing3', 'thing_found', self.retrieve_function)
+        self.assertEqual(self.retrieve_count, 2)
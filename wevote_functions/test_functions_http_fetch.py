@@ -0,0 +1,43 @@
+# wevote_functions/test_functions_http_fetch.py
+# Brought to you by We Vote. Be good.
+# -*- coding: UTF-8 -*-
+
+from django.test import SimpleTestCase
+from .fake_json_provider_server import FakeJsonProviderServer
+from .functions_http_fetch import TokenBucketRateLimiter, fetch_url_with_retry, fetch_urls_concurrently
+
+
+class WeVoteFunctionsTestsHttpFetch(SimpleTestCase):
+
+    def test_token_bucket_rate_limiter(self):
+        clock_time = [0.0]
+        sleep_list = []
+
+        def sleep(seconds):
+            sleep_list.append(seconds)
+            clock_time[0] += seconds
+
+        rate_limiter = TokenBucketRateLimiter(2, burst=2, clock=lambda: clock_time[0], sleep=sleep)
+        for _ in range(4):
+            rate_limiter.acquire()
+        # The burst of two goes through right away, then one request every half second
+        self.assertEqual(sleep_list, [0.5, 0.5])
+        self.assertAlmostEqual(clock_time[0], 1.0)
+
+    def test_fetch_url_with_retry(self):
+        with FakeJsonProviderServer(response_text='{"contests": []}', failures_before_success=1) as server:
+            results = fetch_url_with_retry(server.url, max_attempts=3)
+            self.assertTrue(results['success'])
+            self.assertEqual(results['response_text'], '{"contests": []}')
+            self.assertEqual(server.request_count, 2)
+
+    def test_fetch_urls_concurrently(self):
+        with FakeJsonProviderServer(response_text='{}', latency_seconds=0.05) as server:
+            request_list = [{'url': server.url, 'params': {'address': str(number)}, 'number': number}
+                            for number in range(12)]
+            fetched_number_list = []
+            for request, results in fetch_urls_concurrently(request_list, max_workers=4, max_in_flight=4):
+                self.assertTrue(results['success'])
+                fetched_number_list.append(request['number'])
+            self.assertEqual(sorted(fetched_number_list), list(range(12)))
+            self.assertEqual(server.request_count, 12)
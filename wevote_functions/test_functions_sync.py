@@ -0,0 +1,63 @@
+# wevote_functions/test_functions_sync.py
+# Brought to you by We Vote. Be good.
+# -*- coding: UTF-8 -*-
+
+import json
+from django.test import SimpleTestCase
+from .fake_json_provider_server import FakeJsonProviderServer
+from .functions_sync import convert_changed_since_to_datetime, process_request_from_master_in_batches, \
+    SYNC_OUT_CONTENT_TYPE_NDJSON, SYNC_OUT_END_KEY, SYNC_OUT_ID_KEY
+
+
+class WeVoteFunctionsTestsSync(SimpleTestCase):
+
+    def setUp(self):
+        self.batch_list = []
+
+    def import_function(self, structured_json):
+        self.batch_list.append([one_row['we_vote_id'] for one_row in structured_json])
+        return {'success': True, 'status': 'IMPORTED ', 'saved': len(structured_json), 'updated': 0}
+
+    def test_convert_changed_since_to_datetime(self):
+        changed_since_datetime = convert_changed_since_to_datetime('2024-03-01')
+        self.assertEqual(changed_since_datetime.date().isoformat(), '2024-03-01')
+        self.assertIsNotNone(changed_since_datetime.tzinfo)
+        self.assertEqual(convert_changed_since_to_datetime('2024-03-01T10:30:00').hour, 10)
+        self.assertIsNone(convert_changed_since_to_datetime(''))
+        self.assertIsNone(convert_changed_since_to_datetime('not a date'))
+        self.assertIsNone(convert_changed_since_to_datetime('2024-13-45'))
+
+    def test_process_request_from_master_in_batches(self):
+        row_list = [{'we_vote_id': 'wv01pos' + str(number), SYNC_OUT_ID_KEY: number} for number in range(1, 6)]
+        response_text = ''.join(json.dumps(one_row) + '\n' for one_row in row_list) + \
+            json.dumps({SYNC_OUT_END_KEY: {'row_count': 5, 'last_id': 5}}) + '\n'
+        with FakeJsonProviderServer(response_text=response_text, content_type=SYNC_OUT_CONTENT_TYPE_NDJSON) as server:
+            results = process_request_from_master_in_batches(
+                None, "Loading test rows", server.url, {}, self.import_function, batch_size=2)
+        self.assertTrue(results['success'])
+        self.assertTrue(results['stream_complete'])
+        self.assertEqual(results['row_count'], 5)
+        self.assertEqual(results['saved'], 5)
+        self.assertEqual(results['last_id'], 5)
+        self.assertEqual(self.batch_list, [['wv01pos1', 'wv01pos2'], ['wv01pos3', 'wv01pos4'], ['wv01pos5']])
+
+    def test_process_request_from_master_in_batches_ended_early(self):
+        row_list = [{'we_vote_id': 'wv01pos' + str(number), SYNC_OUT_ID_KEY: number} for number in range(1, 4)]
+        response_text = ''.join(json.dumps(one_row) + '\n' for one_row in row_list)
+        with FakeJsonProviderServer(response_text=response_text, content_type=SYNC_OUT_CONTENT_TYPE_NDJSON) as server:
+            results = process_request_from_master_in_batches(
+                None, "Loading test rows", server.url, {}, self.import_function, batch_size=2)
+        self.assertFalse(results['success'])
+        self.assertIn('SYNC_STREAM_ENDED_EARLY', results['status'])
+        self.assertEqual(results['last_id'], 3)
+
+    def test_process_request_from_master_in_batches_json_list(self):
+        # A master server which doesn't stream yet returns one JSON list
+        response_text = json.dumps([{'we_vote_id': 'wv01pos1'}, {'we_vote_id': 'wv01pos2'}])
+        with FakeJsonProviderServer(response_text=response_text) as server:
+            results = process_request_from_master_in_batches(
+                None, "Loading test rows", server.url, {}, self.import_function)
+        self.assertTrue(results['success'])
+        self.assertTrue(results['stream_complete'])
+        self.assertEqual(results['saved'], 2)
+        self.assertEqual(self.batch_list, [['wv01pos1', 'wv01pos2']])
@@ -0,0 +1,47 @@
+# wevote_functions/test_functions_voter_identity.py
+# Brought to you by We Vote. Be good.
+# -*- coding: UTF-8 -*-
+
+from django.test import SimpleTestCase, override_settings
+from .functions_cache import get_cache
+from .functions_voter_identity import end_voter_identity_request, fetch_memoized_object, invalidate_voter_identity, \
+    memoize_object, retrieve_voter_identity_from_cache, save_voter_identity_to_cache, start_voter_identity_request
+
+LOCAL_MEMORY_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'wevote-functions-voter-identity-tests',
+    },
+}
+
+
+@override_settings(CACHES=LOCAL_MEMORY_CACHES)
+class WeVoteFunctionsTestsVoterIdentity(SimpleTestCase):
+
+    def setUp(self):
+        get_cache().clear()
+
+    def tearDown(self):
+        end_voter_identity_request()
+
+    def test_identity_is_cached_until_invalidated(self):
+        save_voter_identity_to_cache('device1', 11, 'wvvoter11')
+        self.assertEqual(retrieve_voter_identity_from_cache('device1'),
+                         {'voter_id': 11, 'voter_we_vote_id': 'wvvoter11'})
+        invalidate_voter_identity('device1')
+        self.assertIsNone(retrieve_voter_identity_from_cache('device1'))
+        # Right after a sign in or merge, don't let a lagging replica put the old voter back in the shared cache
+        save_voter_identity_to_cache('device1', 11, 'wvvoter11')
+        self.assertIsNone(retrieve_voter_identity_from_cache('device1'))
+
+    def test_request_memo(self):
+        memoize_object('voter', 11, {'name': 'outside a request'})
+        self.assertIsNone(fetch_memoized_object('voter', 11))
+        start_voter_identity_request()
+        one_voter = {'name': 'Ann'}
+        memoize_object('voter', 11, one_voter)
+        memoized_voter = fetch_memoized_object('voter', 11)
+        memoized_voter['name'] = 'Changed by one caller'
+        self.assertEqual(fetch_memoized_object('voter', 11), {'name': 'Ann'})
+        end_voter_identity_request()
+        self.assertIsNone(fetch_memoized_object('voter', 11))
@@ -0,0 +1,49 @@
+# wevote_functions/test_functions_write_behind.py
+# Brought to you by We Vote. Be good.
+# -*- coding: UTF-8 -*-
+
+import threading
+from django.test import SimpleTestCase
+from .functions_write_behind import WriteBehindBuffer
+
+
+class WeVoteFunctionsTestsWriteBehind(SimpleTestCase):
+
+    def test_flush_on_batch_size(self):
+        batch_list = []
+        batch_written = threading.Event()
+
+        def flush_function(one_batch):
+            batch_list.append(list(one_batch))
+            batch_written.set()
+
+        write_behind_buffer = WriteBehindBuffer('test_batch_size', flush_function, max_batch_size=3,
+                                                max_delay_seconds=60)
+        for item in range(3):
+            write_behind_buffer.add(item)
+        self.assertTrue(batch_written.wait(timeout=5))
+        self.assertEqual(batch_list, [[0, 1, 2]])
+        write_behind_buffer.add(3)
+        write_behind_buffer.stop()
+        self.assertEqual(batch_list, [[0, 1, 2], [3]])
+        self.assertEqual(write_behind_buffer.fetch_metrics()['flushed'], 4)
+
+    def test_failed_flush_is_retried_then_dropped(self):
+        batch_list = []
+        fail_flush = [True]
+
+        def flush_function(one_batch):
+            if fail_flush[0]:
+                raise Exception("database unavailable")
+            batch_list.append(list(one_batch))
+
+        write_behind_buffer = WriteBehindBuffer('test_retry', flush_function, max_batch_size=2,
+                                                max_delay_seconds=60, max_buffered_items=3)
+        write_behind_buffer.stopped = True  # No background thread, so the test decides when to flush
+        for item in range(5):
+            write_behind_buffer.add(item)
+        self.assertEqual(write_behind_buffer.flush(), 0)
+        self.assertEqual(write_behind_buffer.fetch_metrics()['dropped'], 2)
+        fail_flush[0] = False
+        self.assertEqual(write_behind_buffer.flush(), 3)
+        self.assertEqual(batch_list, [[2, 3], [4]])